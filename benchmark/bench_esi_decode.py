@@ -0,0 +1,111 @@
+"""
+ESI 响应解析基准测试
+
+对比每页的解析耗时与内存占用：
+- json:   当前路径，response.json() 使用标准库 json 解析为 dict
+- orjson: orjson 解析为 dict
+- typed:  esi_decode 的记录类型解析（msgspec 可用时直接解析为 slots dataclass）
+
+用法:
+    python -m benchmark.bench_esi_decode --pages 20 --out bench_decode.json
+"""
+import argparse
+import gc
+import json
+import time
+import tracemalloc
+
+from src_v2.model.EVE.eveesi import esi_decode
+
+from .synthetic import make_market_order_page, make_asset_page, make_blueprint_page, make_industry_job_page
+
+PAYLOADS = {
+    "orders": (make_market_order_page, esi_decode.decode_market_orders),
+    "assets": (make_asset_page, esi_decode.decode_assets),
+    "blueprints": (make_blueprint_page, esi_decode.decode_blueprints),
+    "jobs": (make_industry_job_page, esi_decode.decode_industry_jobs),
+}
+
+
+def _decoders(typed_decoder):
+    decoders = {
+        # aiohttp 的 response.json() 先解码为 str 再交给 json.loads
+        "json": lambda raw: json.loads(raw.decode("utf-8")),
+    }
+    if esi_decode.orjson is not None:
+        decoders["orjson"] = esi_decode.orjson.loads
+    decoders["typed"] = typed_decoder
+    return decoders
+
+
+def measure(decoder, raw_pages: list[bytes], repeat: int) -> dict:
+    """测量单页平均解析耗时、单页结果常驻内存与解析峰值内存"""
+    # 耗时
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for raw in raw_pages:
+            decoder(raw)
+        best = min(best, time.perf_counter() - start)
+
+    # 内存：持有一页结果时的常驻内存，以及解析过程中的峰值
+    gc.collect()
+    tracemalloc.start()
+    retained = 0
+    peak = 0
+    for raw in raw_pages:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        result = decoder(raw)
+        after, page_peak = tracemalloc.get_traced_memory()
+        retained += after - before
+        peak = max(peak, page_peak - before)
+        del result
+    tracemalloc.stop()
+
+    pages = len(raw_pages)
+    return {
+        "ms_per_page": best / pages * 1000,
+        "retained_kb_per_page": retained / pages / 1024,
+        "peak_kb_per_page": peak / 1024,
+    }
+
+
+def run(pages: int, repeat: int) -> dict:
+    results = {"backend": esi_decode.get_decode_backend(), "pages": pages, "payloads": {}}
+    for name, (make_page, typed_decoder) in PAYLOADS.items():
+        raw_pages = [json.dumps(make_page(p)).encode("utf-8") for p in range(1, pages + 1)]
+        payload_result = {"raw_kb_per_page": sum(len(r) for r in raw_pages) / pages / 1024}
+        for decoder_name, decoder in _decoders(typed_decoder).items():
+            payload_result[decoder_name] = measure(decoder, raw_pages, repeat)
+        results["payloads"][name] = payload_result
+    return results
+
+
+def print_results(results: dict):
+    print(f"解析后端: {results['backend']}, 页数: {results['pages']}")
+    print(f"{'payload':<12}{'decoder':<10}{'ms/page':>10}{'retained KB':>14}{'peak KB':>10}")
+    for name, payload_result in results["payloads"].items():
+        for decoder_name, m in payload_result.items():
+            if decoder_name == "raw_kb_per_page":
+                continue
+            print(f"{name:<12}{decoder_name:<10}{m['ms_per_page']:>10.2f}"
+                  f"{m['retained_kb_per_page']:>14.1f}{m['peak_kb_per_page']:>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=20)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default=None, help="结果输出 JSON 文件")
+    args = parser.parse_args()
+
+    results = run(args.pages, args.repeat)
+    print_results(results)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+吉他价格聚合基准测试
+
+对合成的 400 页 The Forge 区域订单比较：
+- collect:   旧路径，先收集全部订单再按物品聚合
+- streaming: PriceAggregator 逐页折叠，只保留每个物品的汇总
+指标为聚合耗时（不含生成/解析）与聚合过程中的峰值内存。
+
+加 --emulator 时通过本地 ESI 替身端到端运行 esi_pages + PriceAggregator，统计总耗时。
+
+用法:
+    python -m benchmark.bench_jita_aggregate --pages 400 --out bench_jita.json
+    python -m benchmark.bench_jita_aggregate --pages 400 --emulator --latency-ms 50
+"""
+import argparse
+import asyncio
+import gc
+import json
+import time
+import tracemalloc
+from unittest.mock import patch
+
+from src_v2.model.EVE.eveesi import esi_decode
+from src_v2.model.EVE.market.price_aggregator import PriceAggregator
+
+from .synthetic import make_market_order_page, JITA_STATION_ID
+
+REGION_FORGE_ID = 10000002
+
+
+def iter_pages(pages: int):
+    """逐页生成并解析为 MarketOrder，生成与解析不计入聚合耗时"""
+    for page in range(1, pages + 1):
+        raw = json.dumps(make_market_order_page(page, seed=REGION_FORGE_ID)).encode("utf-8")
+        yield esi_decode.decode_market_orders(raw)
+
+
+def collect_aggregate(pages: int) -> tuple[dict, float]:
+    """旧路径：收集全部订单后聚合"""
+    all_orders = []
+    elapsed = 0.0
+    for order_list in iter_pages(pages):
+        start = time.perf_counter()
+        all_orders.extend(order_list)
+        elapsed += time.perf_counter() - start
+    start = time.perf_counter()
+    result = {}
+    for order in all_orders:
+        if order.location_id != JITA_STATION_ID:
+            continue
+        entry = result.setdefault(order.type_id, {"max_buy": 0, "min_sell": None})
+        if order.is_buy_order:
+            entry["max_buy"] = max(entry["max_buy"], order.price)
+        elif entry["min_sell"] is None or order.price < entry["min_sell"]:
+            entry["min_sell"] = order.price
+    elapsed += time.perf_counter() - start
+    return result, elapsed
+
+
+def streaming_aggregate(pages: int) -> tuple[PriceAggregator, float]:
+    aggregator = PriceAggregator(location_ids=[JITA_STATION_ID])
+    elapsed = 0.0
+    for order_list in iter_pages(pages):
+        start = time.perf_counter()
+        aggregator.fold(order_list)
+        elapsed += time.perf_counter() - start
+    return aggregator, elapsed
+
+
+def measure(func, pages: int) -> dict:
+    gc.collect()
+    tracemalloc.start()
+    result, elapsed = func(pages)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return {"aggregate_s": elapsed, "peak_mb": peak / 1024 / 1024}
+
+
+async def run_emulator(pages: int, latency_ms: float) -> dict:
+    """通过本地 ESI 替身端到端拉取并聚合"""
+    from src_v2.model.EVE.eveesi import eveesi
+    from src_v2.model.EVE.eveesi.esi_req_manager import esi_manager
+
+    from .esi_emulator import EsiEmulator, start_emulator
+
+    emulator = EsiEmulator(order_pages=pages, latency_ms=latency_ms)
+    runner = await start_emulator(emulator, port=0)
+    port = runner.addresses[0][1]
+    await esi_manager.start()
+    try:
+        with patch("src_v2.model.EVE.eveesi.eveutils.ESI_BASE_URL", f"http://127.0.0.1:{port}"):
+            aggregator = PriceAggregator(location_ids=[JITA_STATION_ID])
+            start = time.perf_counter()
+            async for order_list in eveesi.esi_pages(eveesi.markets_region_orders, REGION_FORGE_ID, typed=True):
+                aggregator.fold(order_list)
+            elapsed = time.perf_counter() - start
+    finally:
+        await esi_manager.stop()
+        await runner.cleanup()
+    return {"total_s": elapsed, "requests": emulator.stats["requests"], "summary": aggregator.summary()}
+
+
+def run(pages: int) -> dict:
+    results = {"backend": esi_decode.get_decode_backend(), "pages": pages}
+    results["collect"] = measure(collect_aggregate, pages)
+    results["streaming"] = measure(streaming_aggregate, pages)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--emulator", action="store_true", help="通过本地 ESI 替身端到端运行")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--out", default=None, help="结果输出 JSON 文件")
+    args = parser.parse_args()
+
+    if args.emulator:
+        results = {"pages": args.pages, "emulator": asyncio.run(run_emulator(args.pages, args.latency_ms))}
+        print(f"端到端: {results['emulator']['total_s']:.2f}s, 请求数 {results['emulator']['requests']}")
+        print(results["emulator"]["summary"])
+    else:
+        results = run(args.pages)
+        print(f"解析后端: {results['backend']}, 页数: {results['pages']}")
+        for name in ("collect", "streaming"):
+            m = results[name]
+            print(f"{name:<10} 聚合 {m['aggregate_s']:.3f}s  峰值内存 {m['peak_mb']:.1f} MB")
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+"""
+市场数据端到端基准与回归对比
+
+在子进程中启动本地 ESI 替身（默认 400 页 x 2500 单 = 100 万订单），随后在本进程内：
+- refresh:  MarketManager.refresh_markets(["jita"]) 端到端耗时（拉取、聚合、订单簿、价格模型、快照发布）
+- rss:      刷新前后的进程常驻内存与峰值（ru_maxrss）
+- redis:    刷新与查询过程中的 Redis 往返次数（单条命令与每次 pipeline 执行各计一次）
+- lookup:   PriceService.get_many 批量查询延迟，分别统计冷缓存与热缓存的 p50/p95
+结果写入 JSON；指定 --baseline 时与上一次结果对比，超出阈值的指标视为回归并以非 0 退出。
+
+Redis 默认使用 fakeredis（开发依赖 fakeredis、lupa；往返次数仍然准确，延迟不代表真实网络），
+设置 --redis-url 可连接真实 Redis。
+运行需要 config.toml（market_manager 依赖 [EVE] 配置）。
+
+用法:
+    python -m benchmark.bench_market_pipeline --out bench_market.json
+    python -m benchmark.bench_market_pipeline --pages 100 --baseline bench_market.json --threshold 0.2
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional
+from unittest.mock import patch
+
+try:
+    import resource
+except ImportError:
+    # Windows 没有 resource 模块，峰值内存记为 None，对比时跳过
+    resource = None
+
+REGION_FORGE_ID = 10000002
+
+# 对比时越小越好的指标
+REGRESSION_METRICS = (
+    ("refresh", "total_s"),
+    ("refresh", "redis_round_trips"),
+    ("rss", "peak_mb"),
+    ("lookup", "cold_p95_ms"),
+    ("lookup", "warm_p95_ms"),
+    ("lookup", "cold_round_trips_per_call"),
+)
+
+
+def rss_mb() -> float:
+    """当前常驻内存，非 Linux 时返回 0"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return 0.0
+
+
+def peak_rss_mb() -> Optional[float]:
+    """进程峰值常驻内存，没有 resource 模块时返回 None"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # macOS 单位为字节，Linux 为 KB
+    return peak / 1024 / 1024 if platform.system() == "Darwin" else peak / 1024
+
+
+class RoundTripCounter:
+    """统计 redis.asyncio 客户端的网络往返：非 pipeline 的命令各一次，pipeline 每次 execute 一次"""
+
+    def __init__(self):
+        self.count = 0
+
+    @contextmanager
+    def patch(self):
+        from redis.asyncio.client import Pipeline, Redis
+
+        counter = self
+        original_execute_command = Redis.execute_command
+        original_pipeline_execute = Pipeline.execute
+
+        async def execute_command(self, *args, **kwargs):
+            if not isinstance(self, Pipeline):
+                counter.count += 1
+            return await original_execute_command(self, *args, **kwargs)
+
+        async def pipeline_execute(self, *args, **kwargs):
+            counter.count += 1
+            return await original_pipeline_execute(self, *args, **kwargs)
+
+        with patch.object(Redis, "execute_command", execute_command), \
+                patch.object(Pipeline, "execute", pipeline_execute):
+            yield self
+
+
+def percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(pct * (len(values) - 1))))]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+@contextmanager
+def emulator_process(pages: int, orders_per_page: int, latency_ms: float):
+    """子进程运行 ESI 替身，避免生成数据的 CPU 与内存计入被测进程"""
+    port = _free_port()
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "benchmark.esi_emulator", "--port", str(port),
+         "--order-pages", str(pages), "--orders-per-page", str(orders_per_page),
+         "--latency-ms", str(latency_ms)],
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        deadline = time.time() + 30
+        while time.time() < deadline:
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            raise RuntimeError("ESI 替身启动超时")
+        yield f"http://127.0.0.1:{port}"
+    finally:
+        proc.terminate()
+        proc.wait(timeout=10)
+
+
+def make_redis(redis_url: str | None):
+    if redis_url:
+        import redis.asyncio as aioredis
+
+        return aioredis.from_url(redis_url, decode_responses=True)
+    try:
+        import fakeredis
+        import lupa  # noqa: F401  快照发布使用 Lua 脚本切换指针
+    except ImportError as e:
+        raise SystemExit(
+            f"默认的 fakeredis 不可用（{e.name} 未安装）：安装开发依赖 fakeredis、lupa，"
+            f"或通过 --redis-url 连接真实 Redis"
+        )
+
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+async def run_pipeline(base_url: str, redis_url: str | None, lookup_size: int, lookup_rounds: int) -> dict:
+    from src_v2.core.database.connect_manager import redis_manager
+    from src_v2.model.EVE.eveesi.esi_req_manager import esi_manager
+    from src_v2.model.EVE.market.market_manager import MarketManager
+    from src_v2.model.EVE.market.market_source import market_source_registry
+    from src_v2.model.EVE.market.order_book import OrderBookSnapshot
+    from src_v2.model.EVE.market.price_service import PriceService
+
+    redis = make_redis(redis_url)
+    counter = RoundTripCounter()
+    results = {}
+    with tempfile.TemporaryDirectory() as book_dir, \
+            patch.object(redis_manager, "_redis", redis), \
+            patch("src_v2.model.EVE.eveesi.eveutils.ESI_BASE_URL", base_url), \
+            patch.object(OrderBookSnapshot, "default_path",
+                         side_effect=lambda book_id: os.path.join(book_dir, f"{book_id}.npz")), \
+            counter.patch():
+        await redis.delete(market_source_registry.get("jita").update_flag_key)
+        await esi_manager.start()
+        try:
+            rss_before = rss_mb()
+            counter.count = 0
+            start = time.perf_counter()
+            await MarketManager().refresh_markets(["jita"])
+            refresh_s = time.perf_counter() - start
+            results["refresh"] = {"total_s": refresh_s, "redis_round_trips": counter.count}
+            results["rss"] = {"before_mb": rss_before, "after_mb": rss_mb(), "peak_mb": peak_rss_mb()}
+
+            book = await MarketManager().get_order_book(REGION_FORGE_ID)
+            results["refresh"]["orders"] = len(book.sell.price) + len(book.buy.price) if book else 0
+            type_ids = sorted(set(book.sell.type_id.tolist())) if book else []
+            results["lookup"] = await measure_lookup(PriceService(), counter, type_ids, lookup_size, lookup_rounds)
+        finally:
+            await esi_manager.stop()
+    return results
+
+
+async def measure_lookup(service, counter: RoundTripCounter, type_ids: list[int], size: int, rounds: int) -> dict:
+    rng = random.Random(0)
+    batches = [rng.sample(type_ids, min(size, len(type_ids))) for _ in range(rounds)]
+    fields = ("max_buy", "min_sell", "sell_pct")
+    cold, warm = [], []
+    cold_round_trips = warm_round_trips = 0
+    for batch in batches:
+        service.clear()
+        counter.count = 0
+        start = time.perf_counter()
+        await service.get_many(batch, fields)
+        cold.append((time.perf_counter() - start) * 1000)
+        cold_round_trips += counter.count
+
+        # 同一批再查一次，全部命中进程内缓存
+        counter.count = 0
+        start = time.perf_counter()
+        await service.get_many(batch, fields)
+        warm.append((time.perf_counter() - start) * 1000)
+        warm_round_trips += counter.count
+    return {
+        "batch_size": size,
+        "rounds": rounds,
+        "cold_p50_ms": statistics.median(cold) if cold else 0,
+        "cold_p95_ms": percentile(cold, 0.95),
+        "warm_p50_ms": statistics.median(warm) if warm else 0,
+        "warm_p95_ms": percentile(warm, 0.95),
+        "cold_round_trips_per_call": cold_round_trips / max(rounds, 1),
+        "warm_round_trips_per_call": warm_round_trips / max(rounds, 1),
+    }
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def compare(current: dict, baseline: dict, threshold: float) -> list[str]:
+    """返回超出阈值的回归指标描述"""
+    regressions = []
+    for section, metric in REGRESSION_METRICS:
+        old = baseline.get(section, {}).get(metric)
+        new = current.get(section, {}).get(metric)
+        if not old or new is None:
+            continue
+        change = (new - old) / old
+        line = f"{section}.{metric}: {old:.3f} -> {new:.3f} ({change:+.1%})"
+        print(line)
+        if change > threshold:
+            regressions.append(line)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", type=int, default=400)
+    parser.add_argument("--orders-per-page", type=int, default=2500)
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--emulator-url", default=None, help="使用已启动的 ESI 替身，不再启动子进程")
+    parser.add_argument("--redis-url", default=None, help="真实 Redis 地址，默认使用 fakeredis")
+    parser.add_argument("--lookup-size", type=int, default=2000)
+    parser.add_argument("--lookup-rounds", type=int, default=50)
+    parser.add_argument("--out", default=None, help="结果输出 JSON 文件")
+    parser.add_argument("--baseline", default=None, help="上一次结果 JSON，用于回归对比")
+    parser.add_argument("--threshold", type=float, default=0.2, help="允许的相对退化比例")
+    args = parser.parse_args()
+
+    from src_v2.model.EVE.eveesi import esi_decode
+
+    results = {
+        "time": datetime.now(timezone.utc).isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "decode_backend": esi_decode.get_decode_backend(),
+        "redis": "redis" if args.redis_url else "fakeredis",
+        "pages": args.pages,
+        "orders_per_page": args.orders_per_page,
+        "latency_ms": args.latency_ms,
+    }
+    if args.emulator_url:
+        results.update(asyncio.run(run_pipeline(args.emulator_url, args.redis_url, args.lookup_size, args.lookup_rounds)))
+    else:
+        with emulator_process(args.pages, args.orders_per_page, args.latency_ms) as base_url:
+            results.update(asyncio.run(run_pipeline(base_url, args.redis_url, args.lookup_size, args.lookup_rounds)))
+
+    refresh, rss, lookup = results["refresh"], results["rss"], results["lookup"]
+    print(f"刷新: {refresh['total_s']:.2f}s, 订单 {refresh['orders']}, Redis 往返 {refresh['redis_round_trips']}")
+    print(f"内存: 刷新前 {rss['before_mb']:.0f} MB, 刷新后 {rss['after_mb']:.0f} MB, 峰值 {rss['peak_mb']:.0f} MB")
+    print(f"批量查询 {lookup['batch_size']} 个: 冷 p50 {lookup['cold_p50_ms']:.2f}ms / p95 {lookup['cold_p95_ms']:.2f}ms, "
+          f"热 p50 {lookup['warm_p50_ms']:.2f}ms / p95 {lookup['warm_p95_ms']:.2f}ms, "
+          f"冷查询往返 {lookup['cold_round_trips_per_call']:.1f} 次/调用")
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print("性能回归:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
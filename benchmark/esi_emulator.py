@@ -0,0 +1,240 @@
+"""
+本地 ESI 替身服务
+
+用于在不访问真实 ESI 的情况下压测资产、市场与计划流程：
+- 优先回放录制目录中的真实响应（get_request_async 在 ESI_RECORD_DIR 下录制）
+- 未录制的接口按 eveesi/esi_api 中的路径生成合成数据
+- 返回 X-Pages、ETag、Expires、Last-Modified 与错误限额响应头，支持 If-None-Match
+- 可配置延迟与错误率，错误会消耗错误限额，耗尽后返回 420
+
+用法:
+    python -m benchmark.esi_emulator --port 8089 --order-pages 400 --latency-ms 80 --error-rate 0.01
+    ESI_BASE_URL=http://127.0.0.1:8089 python run_server.py --dev
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from collections import OrderedDict
+from email.utils import formatdate
+from typing import Callable, Optional
+
+from aiohttp import web
+
+from src_v2.model.EVE.eveesi.esi_record import ResponseStore, normalize_path, normalize_params
+
+from . import synthetic
+
+ERROR_LIMIT = 100
+ERROR_LIMIT_WINDOW = 60
+
+
+class EsiEmulator:
+    def __init__(
+            self,
+            record_dir: Optional[str] = None,
+            latency_ms: float = 0,
+            jitter_ms: float = 0,
+            error_rate: float = 0.0,
+            order_pages: int = 400,
+            orders_per_page: int = synthetic.ORDERS_PER_PAGE,
+            structure_pages: int = 20,
+            asset_pages: int = 20,
+            blueprint_pages: int = 5,
+            job_pages: int = 2,
+            seed: int = 0,
+            body_cache_size: int = 64,
+    ):
+        self.store = ResponseStore(record_dir) if record_dir else None
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.seed = seed
+        self.orders_per_page = orders_per_page
+        self.rng = random.Random(seed)
+        self.body_cache_size = body_cache_size
+        self._body_cache: OrderedDict = OrderedDict()
+
+        # 错误限额
+        self.error_limit_remain = ERROR_LIMIT
+        self.error_limit_window_start = time.time()
+
+        # 统计
+        self.stats = {"requests": 0, "not_modified": 0, "errors": 0, "error_limited": 0, "bytes": 0, "replayed": 0}
+
+        # (路径正则, 总页数或 params -> 总页数, 缓存秒数, 页生成函数(match, params, page) -> list)
+        self.routes: list[tuple[re.Pattern, int | Callable, int, Callable]] = [
+            (re.compile(r"^/markets/(\d+)/orders/$"),
+             lambda params: 1 if "type_id" in params else order_pages, 300, self._region_orders),
+            (re.compile(r"^/markets/structures/(\d+)/$"), structure_pages, 300,
+             lambda m, params, page: synthetic.make_market_order_page(page, seed=int(m.group(1)))),
+            (re.compile(r"^/markets/prices/$"), 1, 3600,
+             lambda m, params, page: synthetic.make_market_prices(seed=self.seed)),
+            (re.compile(r"^/markets/(\d+)/history/$"), 1, 3600,
+             lambda m, params, page: synthetic.make_market_history(int(params.get("type_id", 34)), seed=self.seed)),
+            (re.compile(r"^/industry/systems/$"), 1, 3600,
+             lambda m, params, page: synthetic.make_industry_systems(seed=self.seed)),
+            (re.compile(r"^/(corporations|characters)/(\d+)/assets/$"), asset_pages, 3600,
+             lambda m, params, page: synthetic.make_asset_page(page, seed=int(m.group(2)))),
+            (re.compile(r"^/(corporations|characters)/(\d+)/blueprints/$"), blueprint_pages, 3600,
+             lambda m, params, page: synthetic.make_blueprint_page(page, seed=int(m.group(2)))),
+            (re.compile(r"^/corporations/(\d+)/industry/jobs/$"), job_pages, 300,
+             lambda m, params, page: synthetic.make_industry_job_page(page, seed=int(m.group(1)))),
+            (re.compile(r"^/characters/(\d+)/industry/jobs/$"), 1, 300,
+             lambda m, params, page: synthetic.make_industry_job_page(page, seed=int(m.group(1)), size=20)),
+        ]
+
+    def _region_orders(self, match, params, page):
+        orders = synthetic.make_market_order_page(
+            page, seed=int(match.group(1)) + self.seed, size=self.orders_per_page
+        )
+        if "type_id" in params:
+            type_id = int(params["type_id"])
+            for order in orders:
+                order["type_id"] = type_id
+        return orders
+
+    def _error_limit_headers(self) -> dict:
+        now = time.time()
+        if now - self.error_limit_window_start >= ERROR_LIMIT_WINDOW:
+            self.error_limit_window_start = now
+            self.error_limit_remain = ERROR_LIMIT
+        reset = max(0, int(ERROR_LIMIT_WINDOW - (now - self.error_limit_window_start)))
+        return {
+            "X-ESI-Error-Limit-Remain": str(self.error_limit_remain),
+            "X-ESI-Error-Limit-Reset": str(reset),
+        }
+
+    def _error_response(self, status: int, message: str) -> web.Response:
+        self.stats["errors"] += 1
+        self.error_limit_remain = max(0, self.error_limit_remain - 1)
+        return web.json_response({"error": message}, status=status, headers=self._error_limit_headers())
+
+    def _cached_body(self, key, build: Callable[[], list]) -> bytes:
+        body = self._body_cache.get(key)
+        if body is not None:
+            self._body_cache.move_to_end(key)
+            return body
+        body = json.dumps(build(), separators=(",", ":")).encode("utf-8")
+        self._body_cache[key] = body
+        if len(self._body_cache) > self.body_cache_size:
+            self._body_cache.popitem(last=False)
+        return body
+
+    def _resolve(self, path: str, params: dict) -> Optional[tuple[int, dict, bytes]]:
+        """返回 (状态码, 响应头, 响应体)，无法处理的路径返回 None"""
+        if self.store is not None:
+            recorded = self.store.load(path, params)
+            if recorded is not None:
+                self.stats["replayed"] += 1
+                return recorded
+
+        page = int(params.get("page", 1))
+        for pattern, pages, cache_seconds, make_page in self.routes:
+            match = pattern.match(path)
+            if not match:
+                continue
+            if callable(pages):
+                pages = pages(params)
+            if page < 1 or page > pages:
+                return 404, {}, b'{"error":"Requested page does not exist!"}'
+            body = self._cached_body((path, tuple(sorted(params.items()))),
+                                     lambda: make_page(match, params, page))
+            headers = {
+                "X-Pages": str(pages),
+                "Cache-Control": f"public, max-age={cache_seconds}",
+                "Expires": formatdate(time.time() + cache_seconds, usegmt=True),
+                "Last-Modified": formatdate(time.time() - self.rng.randint(0, cache_seconds), usegmt=True),
+                "Content-Type": "application/json; charset=UTF-8",
+            }
+            return 200, headers, body
+        return None
+
+    async def handle(self, request: web.Request) -> web.StreamResponse:
+        self.stats["requests"] += 1
+        if self.latency_ms or self.jitter_ms:
+            await asyncio.sleep(max(0.0, self.latency_ms + self.rng.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+
+        self._error_limit_headers()
+        if self.error_limit_remain <= 0:
+            self.stats["error_limited"] += 1
+            return web.json_response({"error": "This software has exceeded the error limit for ESI."},
+                                     status=420, headers=self._error_limit_headers())
+        if self.error_rate and self.rng.random() < self.error_rate:
+            status = self.rng.choice([500, 502, 503, 504])
+            return self._error_response(status, "Synthetic upstream error")
+
+        path = normalize_path(request.path)
+        params = normalize_params(dict(request.query))
+        resolved = self._resolve(path, params)
+        if resolved is None:
+            return self._error_response(404, "Not found")
+        status, headers, body = resolved
+        if status >= 400:
+            return self._error_response(status, json.loads(body).get("error", "error"))
+
+        headers = dict(headers)
+        etag = headers.get("ETag") or f'"{hashlib.sha1(body).hexdigest()}"'
+        headers["ETag"] = etag
+        headers.update(self._error_limit_headers())
+        if request.headers.get("If-None-Match") == etag:
+            self.stats["not_modified"] += 1
+            return web.Response(status=304, headers=headers)
+
+        self.stats["bytes"] += len(body)
+        content_type = headers.pop("Content-Type", "application/json; charset=UTF-8")
+        return web.Response(status=status, body=body, headers=headers,
+                            content_type=content_type.split(";")[0], charset="utf-8")
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        return web.json_response(self.stats)
+
+    def make_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get("/_emulator/stats", self.handle_stats)
+        app.router.add_get("/{tail:.*}", self.handle)
+        return app
+
+
+async def start_emulator(emulator: EsiEmulator, host: str = "127.0.0.1", port: int = 8089) -> web.AppRunner:
+    """在当前事件循环中启动替身服务，返回 runner，调用方负责 runner.cleanup()"""
+    runner = web.AppRunner(emulator.make_app(), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    return runner
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--record-dir", default=None, help="回放录制目录（ESI_RECORD_DIR 录制的内容）")
+    parser.add_argument("--latency-ms", type=float, default=0)
+    parser.add_argument("--jitter-ms", type=float, default=0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--order-pages", type=int, default=400)
+    parser.add_argument("--orders-per-page", type=int, default=synthetic.ORDERS_PER_PAGE)
+    parser.add_argument("--asset-pages", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    emulator = EsiEmulator(
+        record_dir=args.record_dir,
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        error_rate=args.error_rate,
+        order_pages=args.order_pages,
+        orders_per_page=args.orders_per_page,
+        asset_pages=args.asset_pages,
+        seed=args.seed,
+    )
+    print(f"本地 ESI 替身: http://{args.host}:{args.port}")
+    web.run_app(emulator.make_app(), host=args.host, port=args.port, access_log=None, print=None)
+
+
+if __name__ == "__main__":
+    main()
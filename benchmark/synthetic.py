@@ -0,0 +1,167 @@
+"""
+合成 ESI 数据，用于基准测试与本地 ESI 替身
+字段与 ESI 返回保持一致，数值分布大致贴近吉他市场
+"""
+import random
+from datetime import datetime, timedelta, timezone
+
+JITA_STATION_ID = 60003760
+FORGE_SYSTEM_IDS = [30000142, 30000144, 30000139, 30000145, 30000140]
+FORGE_STATION_IDS = [JITA_STATION_ID, 60002959, 60003463, 60003055, 60004423]
+
+ORDERS_PER_PAGE = 1000
+ASSETS_PER_PAGE = 1000
+BLUEPRINTS_PER_PAGE = 1000
+
+
+def _issued(rng: random.Random) -> str:
+    issued = datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, 90 * 86400))
+    return issued.strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def make_market_order_page(page: int, type_count: int = 15000, seed: int = 0, size: int = ORDERS_PER_PAGE) -> list[dict]:
+    """生成一页区域市场订单"""
+    rng = random.Random(seed * 100003 + page)
+    orders = []
+    for i in range(size):
+        type_id = rng.randint(1, type_count) * 7 + 11
+        base_price = (type_id % 997 + 1) * 1000.0
+        is_buy = rng.random() < 0.45
+        # 买单低于基准价，卖单高于基准价，偶尔出现离谱价格
+        spread = rng.uniform(0.80, 1.0) if is_buy else rng.uniform(1.0, 1.25)
+        if rng.random() < 0.005:
+            spread = rng.uniform(0.01, 0.1) if is_buy else rng.uniform(5, 50)
+        volume_total = rng.choice([1, 5, 10, 100, 1000, 10000, 250000])
+        location_index = 0 if rng.random() < 0.7 else rng.randint(1, len(FORGE_STATION_IDS) - 1)
+        orders.append({
+            "duration": 90,
+            "is_buy_order": is_buy,
+            "issued": _issued(rng),
+            "location_id": FORGE_STATION_IDS[location_index],
+            "min_volume": 1,
+            "order_id": 6000000000 + page * size + i,
+            "price": round(base_price * spread, 2),
+            "range": "region" if is_buy else "station",
+            "system_id": FORGE_SYSTEM_IDS[location_index],
+            "type_id": type_id,
+            "volume_remain": rng.randint(1, volume_total),
+            "volume_total": volume_total,
+        })
+    return orders
+
+
+def make_asset_page(page: int, seed: int = 0, size: int = ASSETS_PER_PAGE) -> list[dict]:
+    """生成一页资产"""
+    rng = random.Random(seed * 100019 + page)
+    assets = []
+    for i in range(size):
+        assets.append({
+            "is_blueprint_copy": rng.random() < 0.05,
+            "is_singleton": rng.random() < 0.2,
+            "item_id": 1000000000000 + page * size + i,
+            "location_flag": rng.choice(["Hangar", "CorpSAG1", "CorpSAG2", "Cargo", "OfficeFolder"]),
+            "location_id": rng.choice([1035466617946, 1045441547980, 60003760]),
+            "location_type": rng.choice(["item", "station"]),
+            "quantity": rng.randint(1, 100000),
+            "type_id": rng.randint(18, 60000),
+        })
+    return assets
+
+
+def make_blueprint_page(page: int, seed: int = 0, size: int = BLUEPRINTS_PER_PAGE) -> list[dict]:
+    """生成一页蓝图"""
+    rng = random.Random(seed * 100043 + page)
+    blueprints = []
+    for i in range(size):
+        is_bpo = rng.random() < 0.3
+        blueprints.append({
+            "item_id": 1000000000000 + page * size + i,
+            "location_flag": "CorpSAG1",
+            "location_id": 1035466617946,
+            "material_efficiency": rng.randint(0, 10),
+            "quantity": -1 if is_bpo else -2,
+            "runs": -1 if is_bpo else rng.randint(1, 300),
+            "time_efficiency": rng.choice([0, 2, 4, 10, 20]),
+            "type_id": rng.randint(681, 60000),
+        })
+    return blueprints
+
+
+def make_industry_job_page(page: int, seed: int = 0, size: int = 500) -> list[dict]:
+    """生成一页工业作业"""
+    rng = random.Random(seed * 100049 + page)
+    jobs = []
+    for i in range(size):
+        start = datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, 86400))
+        duration = rng.randint(3600, 7 * 86400)
+        type_id = rng.randint(681, 60000)
+        jobs.append({
+            "activity_id": rng.choice([1, 1, 1, 11]),
+            "blueprint_id": 1000000000000 + i,
+            "blueprint_location_id": 1035466617946,
+            "blueprint_type_id": type_id,
+            "cost": round(rng.uniform(1e4, 1e8), 2),
+            "duration": duration,
+            "end_date": (start + timedelta(seconds=duration)).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "facility_id": 1035466617946,
+            "installer_id": 2110000000 + rng.randint(0, 50),
+            "job_id": 500000000 + page * size + i,
+            "licensed_runs": 1,
+            "output_location_id": 1035466617946,
+            "product_type_id": type_id + 1,
+            "runs": rng.randint(1, 100),
+            "start_date": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "station_id": 1035466617946,
+            "status": "active",
+        })
+    return jobs
+
+
+def make_market_prices(type_count: int = 15000, seed: int = 0) -> list[dict]:
+    """生成 /markets/prices 全量调整价格"""
+    rng = random.Random(seed * 100057)
+    prices = []
+    for i in range(1, type_count + 1):
+        type_id = i * 7 + 11
+        base_price = (type_id % 997 + 1) * 1000.0
+        prices.append({
+            "adjusted_price": round(base_price * rng.uniform(0.9, 1.1), 2),
+            "average_price": round(base_price * rng.uniform(0.9, 1.1), 2),
+            "type_id": type_id,
+        })
+    return prices
+
+
+def make_industry_systems(system_count: int = 5000, seed: int = 0) -> list[dict]:
+    """生成 /industry/systems 全量成本指数"""
+    rng = random.Random(seed * 100069)
+    activities = ["manufacturing", "researching_time_efficiency", "researching_material_efficiency",
+                  "copying", "invention", "reaction"]
+    return [
+        {
+            "solar_system_id": 30000001 + i,
+            "cost_indices": [{"activity": a, "cost_index": round(rng.uniform(0.0001, 0.15), 6)} for a in activities],
+        }
+        for i in range(system_count)
+    ]
+
+
+def make_market_history(type_id: int, days: int = 400, seed: int = 0) -> list[dict]:
+    """生成单个物品的区域历史数据"""
+    rng = random.Random(seed * 100103 + type_id)
+    base_price = (type_id % 997 + 1) * 1000.0
+    today = datetime.now(timezone.utc).date()
+    history = []
+    price = base_price
+    for d in range(days, 0, -1):
+        price = max(0.01, price * rng.uniform(0.97, 1.03))
+        volume = rng.randint(0, 100000)
+        history.append({
+            "average": round(price, 2),
+            "date": (today - timedelta(days=d)).isoformat(),
+            "highest": round(price * rng.uniform(1.0, 1.05), 2),
+            "lowest": round(price * rng.uniform(0.95, 1.0), 2),
+            "order_count": rng.randint(0, 5000),
+            "volume": volume,
+        })
+    return history
@@ -140,8 +140,12 @@ async def main():
     try:
         from src_v2.core.database.neo4j_utils import Neo4jIndustryUtils as NIU
         
-        deleted_count = await NIU.delete_label_node("Blueprint")
-        print(f"  ✓ 已清理 {deleted_count} 个 Blueprint 节点")
+        # 蓝图图谱批量导入可重复执行，仅在清理模式下删除旧节点
+        if args.clean:
+            deleted_count = await NIU.delete_label_node("Blueprint")
+            print(f"  ✓ 已清理 {deleted_count} 个 Blueprint 节点")
+        else:
+            print("  - 正常模式，跳过清理")
         
     except Exception as e:
         print(f"  ✗ 清理蓝图节点失败: {e}")
@@ -155,8 +159,10 @@ async def main():
     try:
         from src_v2.model.EVE.industry.blueprint import BPManager
         
-        await BPManager.init_bp_data_to_neo4j()
-        print("  ✓ 蓝图数据初始化完成")
+        if await BPManager.init_bp_data_to_neo4j(force=args.clean):
+            print("  ✓ 蓝图数据初始化完成")
+        else:
+            print("  ✓ 蓝图数据已是最新版本，跳过")
         
     except Exception as e:
         print(f"  ✗ 蓝图数据初始化失败: {e}")
@@ -35,7 +35,14 @@ async def cleanup_resources():
     """清理所有资源"""
     from src_v2.core.database.connect_manager import postgres_manager, redis_manager, neo4j_manager
     from src_v2.model.EVE.eveesi import shutdown_esi_manager
-    
+    from src_v2.model.EVE.market.refresh_scheduler import shutdown_refresh_scheduler
+
+    try:
+        # 先停止后台刷新，它依赖 ESI 管理器和数据库连接
+        await shutdown_refresh_scheduler()
+    except Exception as e:
+        print(f"[清理] 后台刷新任务关闭时出错: {e}")
+
     try:
         # 关闭 ESI 管理器
         await shutdown_esi_manager()
@@ -132,6 +139,10 @@ async def main():
     await init_esi_manager()
     await permission_manager.init_base_roles()
 
+    # 后台刷新市场价格、星系成本指数与调整价
+    from src_v2.model.EVE.market.refresh_scheduler import init_refresh_scheduler
+    await init_refresh_scheduler()
+
     from src_v2.core.database.connect_manager import redis_manager
     # await redis_manager.r.flushall()
 
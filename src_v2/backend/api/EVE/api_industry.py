@@ -39,6 +39,27 @@ async def get_market_tree():
         logger.error(f"获取市场树失败: {traceback.format_exc()}")
         return jsonify({"status": 500, "message": "获取市场树失败"}), 500
 
+@api_industry_bp.route("/getMarketTreeExport", methods=["POST"])
+@auth_required
+async def get_market_tree_export():
+    data = await request.json or {}
+
+    try:
+        export = await IndustryManager.get_market_tree_export()
+        if export is None:
+            return jsonify({"status": 500, "message": "市场树尚未就绪"}), 500
+        # 前端已缓存同一 SDE 版本时不再返回整棵树
+        if data.get("version") == export["version"]:
+            return jsonify({"data": None, "version": export["version"], "status": 200})
+        # 键统一为字符串（"root" 与 market_group_id），避免 JSON 排序时比较混合类型
+        children = {str(key): nodes for key, nodes in export["children"].items()}
+        return jsonify({"data": children, "version": export["version"], "status": 200})
+    except KahunaException as e:
+        return jsonify({"status": 500, "message": str(e)}), 500
+    except Exception as e:
+        logger.error(f"获取市场树导出失败: {traceback.format_exc()}")
+        return jsonify({"status": 500, "message": "获取市场树导出失败"}), 500
+
 @api_industry_bp.route("/createPlan", methods=["POST"])
 @auth_required
 async def create_plan():
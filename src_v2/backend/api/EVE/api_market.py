@@ -0,0 +1,40 @@
+import traceback
+
+from quart import request, jsonify, Blueprint
+from src_v2.backend.auth import auth_required
+
+from src_v2.core.log import logger
+from src_v2.core.utils import KahunaException
+from src_v2.model.EVE.market.price_service import PriceService, DEFAULT_PRICE_FIELDS
+
+api_market_bp = Blueprint('api_market', __name__, url_prefix='/api/EVE/market')
+
+# 单次请求最多查询的物品数
+MAX_PRICE_TYPE_IDS = 20000
+
+
+@api_market_bp.route("/getPrices", methods=["POST"])
+@auth_required
+async def get_prices():
+    """
+    批量获取价格
+    请求: {"type_ids": [34, 35], "fields": ["max_buy", "min_sell"], "hub": "jita"}
+    返回: {"data": {"34": {"max_buy": 4.0, "min_sell": 5.0}, ...}, "status": 200}，无价格数据的字段为 null
+    """
+    data = await request.json
+
+    try:
+        type_ids = data.get("type_ids", [])
+        if not isinstance(type_ids, list):
+            raise KahunaException("type_ids 必须为列表")
+        if len(type_ids) > MAX_PRICE_TYPE_IDS:
+            raise KahunaException(f"单次最多查询 {MAX_PRICE_TYPE_IDS} 个物品")
+        prices = await PriceService().get_many(
+            type_ids, data.get("fields") or DEFAULT_PRICE_FIELDS, data.get("hub", "jita")
+        )
+        return jsonify({"data": prices, "status": 200})
+    except (KahunaException, ValueError, TypeError) as e:
+        return jsonify({"status": 500, "message": str(e)}), 500
+    except Exception as e:
+        logger.error(f"获取价格失败: {traceback.format_exc()}")
+        return jsonify({"status": 500, "message": "获取价格失败"}), 500
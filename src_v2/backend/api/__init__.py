@@ -7,6 +7,7 @@ def init_api(app):
     # from .api_permission import api_permission_bp
     # from .api_vip import api_vip_bp
     from .EVE.api_industry import api_industry_bp
+    from .EVE.api_market import api_market_bp
 
     app.register_blueprint(api_EVE_asset_bp)
     app.register_blueprint(api_auth_bp)
@@ -16,3 +17,4 @@ def init_api(app):
     # app.register_blueprint(api_permission_bp)
     # app.register_blueprint(api_vip_bp)
     app.register_blueprint(api_industry_bp)
+    app.register_blueprint(api_market_bp)
@@ -1,6 +1,7 @@
 from typing import AnyStr, AsyncGenerator
 from sqlalchemy import delete, select, text, func, distinct, or_
 from sqlalchemy.dialects.sqlite import insert as insert
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import aliased
 from contextlib import asynccontextmanager
 import asyncio
@@ -762,4 +763,139 @@ class VipStateDBUtils(_CommonUtils):
             
             await session.commit()
             return vip_state
-            
\ No newline at end of file
+            
+
+class EveMarketHistoryDBUtils(_CommonUtils):
+    cls_model = model.EveMarketHistory
+    # asyncpg 单条语句参数上限为 32767
+    UPSERT_CHUNK_SIZE = 2000
+
+    @classmethod
+    async def upsert_history_rows(cls, rows: list[dict]):
+        """批量写入每日历史，同一天的数据以最新为准"""
+        if not rows:
+            return
+        async with dbm.get_session() as session:
+            for i in range(0, len(rows), cls.UPSERT_CHUNK_SIZE):
+                stmt = pg_insert(cls.cls_model).values(rows[i:i + cls.UPSERT_CHUNK_SIZE])
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=["region_id", "type_id", "date"],
+                    set_={c.name: c for c in stmt.excluded if c.name not in ("region_id", "type_id", "date")}
+                )
+                await session.execute(stmt)
+
+    @classmethod
+    async def select_history(cls, region_id: int, type_id: int, since=None):
+        async with dbm.get_session() as session:
+            stmt = select(cls.cls_model).where(
+                cls.cls_model.region_id == region_id, cls.cls_model.type_id == type_id
+            )
+            if since is not None:
+                stmt = stmt.where(cls.cls_model.date >= since)
+            result = await session.execute(stmt.order_by(cls.cls_model.date))
+            return result.scalars().all()
+
+
+class EveMarketHistoryRefreshDBUtils(_CommonUtils):
+    cls_model = model.EveMarketHistoryRefresh
+
+    @classmethod
+    async def select_by_type_ids(cls, region_id: int, type_ids: list[int]) -> dict:
+        """返回 {type_id: 刷新状态}"""
+        async with dbm.get_session() as session:
+            stmt = select(cls.cls_model).where(
+                cls.cls_model.region_id == region_id, cls.cls_model.type_id.in_(type_ids)
+            )
+            result = await session.execute(stmt)
+            return {row.type_id: row for row in result.scalars().all()}
+
+    @classmethod
+    async def upsert_states(cls, rows: list[dict]):
+        if not rows:
+            return
+        async with dbm.get_session() as session:
+            stmt = pg_insert(cls.cls_model).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["region_id", "type_id"],
+                set_={c.name: c for c in stmt.excluded if c.name not in ("region_id", "type_id")}
+            )
+            await session.execute(stmt)
+
+
+class EveMarketHistoryStatsDBUtils(_CommonUtils):
+    cls_model = model.EveMarketHistoryStats
+
+    # 以区域内最新一天为基准聚合 7/30/90 天的成交量加权均价、日均成交量与日对数收益率标准差
+    # 历史多取一天用于计算窗口首日的收益率
+    REFRESH_STATS_SQL = """
+        WITH anchor AS (
+            SELECT MAX(date) AS last_date FROM eve_market_history WHERE region_id = :region_id
+        ),
+        daily AS (
+            SELECT h.region_id, h.type_id, h.date, h.average, h.volume,
+                   (SELECT last_date FROM anchor) - h.date AS age,
+                   LN(NULLIF(h.average, 0) / NULLIF(LAG(h.average) OVER (PARTITION BY h.type_id ORDER BY h.date), 0)) AS ret
+            FROM eve_market_history h
+            WHERE h.region_id = :region_id
+              AND h.date > (SELECT last_date FROM anchor) - 91
+              {type_filter}
+        )
+        INSERT INTO eve_market_history_stats (
+            region_id, type_id,
+            avg_price_7d, avg_price_30d, avg_price_90d,
+            avg_volume_7d, avg_volume_30d, avg_volume_90d,
+            volatility_7d, volatility_30d, volatility_90d,
+            last_date, update_time
+        )
+        SELECT region_id, type_id,
+            SUM(average * volume) FILTER (WHERE age < 7) / NULLIF(SUM(volume) FILTER (WHERE age < 7), 0),
+            SUM(average * volume) FILTER (WHERE age < 30) / NULLIF(SUM(volume) FILTER (WHERE age < 30), 0),
+            SUM(average * volume) / NULLIF(SUM(volume), 0),
+            COALESCE(SUM(volume) FILTER (WHERE age < 7), 0) / 7.0,
+            COALESCE(SUM(volume) FILTER (WHERE age < 30), 0) / 30.0,
+            COALESCE(SUM(volume), 0) / 90.0,
+            STDDEV_SAMP(ret) FILTER (WHERE age < 7),
+            STDDEV_SAMP(ret) FILTER (WHERE age < 30),
+            STDDEV_SAMP(ret),
+            MAX(date), NOW()
+        FROM daily
+        WHERE age < 90
+        GROUP BY region_id, type_id
+        ON CONFLICT (region_id, type_id) DO UPDATE SET
+            avg_price_7d = EXCLUDED.avg_price_7d,
+            avg_price_30d = EXCLUDED.avg_price_30d,
+            avg_price_90d = EXCLUDED.avg_price_90d,
+            avg_volume_7d = EXCLUDED.avg_volume_7d,
+            avg_volume_30d = EXCLUDED.avg_volume_30d,
+            avg_volume_90d = EXCLUDED.avg_volume_90d,
+            volatility_7d = EXCLUDED.volatility_7d,
+            volatility_30d = EXCLUDED.volatility_30d,
+            volatility_90d = EXCLUDED.volatility_90d,
+            last_date = EXCLUDED.last_date,
+            update_time = EXCLUDED.update_time
+    """
+
+    @classmethod
+    async def refresh_stats(cls, region_id: int, type_ids: list[int] | None = None):
+        """
+        由历史表重新聚合统计，type_ids 为 None 时刷新整个区域
+        """
+        params = {"region_id": region_id}
+        type_filter = ""
+        if type_ids is not None:
+            if not type_ids:
+                return
+            type_filter = "AND h.type_id = ANY(:type_ids)"
+            params["type_ids"] = list(type_ids)
+        async with dbm.get_session() as session:
+            await session.execute(text(cls.REFRESH_STATS_SQL.format(type_filter=type_filter)), params)
+
+    @classmethod
+    async def select_by_type_ids(cls, region_id: int, type_ids: list[int]) -> dict:
+        """一次索引查询返回 {type_id: 统计行}"""
+        async with dbm.get_session() as session:
+            stmt = select(cls.cls_model).where(
+                cls.cls_model.region_id == region_id, cls.cls_model.type_id.in_(type_ids)
+            )
+            result = await session.execute(stmt)
+            return {row.type_id: row for row in result.scalars().all()}
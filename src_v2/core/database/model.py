@@ -12,6 +12,7 @@ from sqlalchemy import (
     UUID,
     ARRAY,
     TIMESTAMP,
+    Date,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
@@ -212,6 +213,47 @@ class EveIndustryPlanConfigFlowPresupposition(PostgreModel):
     config_list = Column(ARRAY(Integer))
 all_model.append(EveIndustryPlanConfigFlowPresupposition)
 
+# 市场历史（ESI markets/{region_id}/history 每日数据）
+class EveMarketHistory(PostgreModel):
+    __tablename__ = 'eve_market_history'
+    region_id = Column(Integer, primary_key=True)
+    type_id = Column(Integer, primary_key=True)
+    date = Column(Date, primary_key=True)
+    average = Column(Float)
+    highest = Column(Float)
+    lowest = Column(Float)
+    order_count = Column(BigInteger)
+    volume = Column(BigInteger)
+all_model.append(EveMarketHistory)
+
+# 市场历史条件请求状态
+class EveMarketHistoryRefresh(PostgreModel):
+    __tablename__ = 'eve_market_history_refresh'
+    region_id = Column(Integer, primary_key=True)
+    type_id = Column(Integer, primary_key=True)
+    etag = Column(Text)
+    expires = Column(type_=TIMESTAMP(timezone=True))
+    refresh_time = Column(type_=TIMESTAMP(timezone=True))
+all_model.append(EveMarketHistoryRefresh)
+
+# 市场历史滚动统计，由 eve_market_history 聚合刷新
+class EveMarketHistoryStats(PostgreModel):
+    __tablename__ = 'eve_market_history_stats'
+    region_id = Column(Integer, primary_key=True)
+    type_id = Column(Integer, primary_key=True)
+    avg_price_7d = Column(Float)
+    avg_price_30d = Column(Float)
+    avg_price_90d = Column(Float)
+    avg_volume_7d = Column(Float)
+    avg_volume_30d = Column(Float)
+    avg_volume_90d = Column(Float)
+    volatility_7d = Column(Float)
+    volatility_30d = Column(Float)
+    volatility_90d = Column(Float)
+    last_date = Column(Date)
+    update_time = Column(type_=TIMESTAMP(timezone=True))
+all_model.append(EveMarketHistoryStats)
+
 
 # class EveIndustryPlanSetting(PostgreModel):
 #     __tablename__ = 'eve_industry_plan_setting'
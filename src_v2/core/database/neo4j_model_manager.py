@@ -18,15 +18,22 @@ Neo4j 模型管理器 - 负责创建索引和管理模型
            {"properties": ["owner_id", "item_id"], "type": "COMPOSITE"},  # 复合索引
        ]
 
+3. 单属性唯一性约束:
+   在模型的 get_constraints() 方法中返回：
+   {"property": "property_name", "type": "UNIQUE"}
+   约束自带索引，同一属性不要再在 get_indexes() 中声明；
+   旧版本在该属性上建立的 {标签}_{属性}_index 会在创建约束前删除，约束最终不存在时抛出异常
+
 注意：
 - 复合索引要求至少2个属性
 - 索引不能保证唯一性，需要在应用层通过 MERGE 语句确保唯一性（不要使用 CREATE）
-- 所有约束相关功能已移除，使用索引替代
+- 唯一性约束只用于批量导入的静态数据（如蓝图节点），其余模型仍使用索引
 """
 from typing import List, Type, Dict, Any, TYPE_CHECKING
 from .neo4j_models import NodeModel
 from .connect_manager import neo4j_manager
 from ..log import logger
+from ..utils import KahunaException
 
 if TYPE_CHECKING:
     from .neo4j_models import RelationshipType
@@ -110,6 +117,75 @@ class Neo4jModelManager:
                 except Exception as e:
                     logger.warning(f"创建复合索引失败 {index_name}: {e}")
     
+    async def create_constraints(self):
+        """创建所有模型的唯一性约束，缺失时抛出异常"""
+        await self.ensure_constraints(*self.registered_models)
+    
+    async def ensure_constraints(self, *model_classes: Type[NodeModel]):
+        """
+        创建指定模型的唯一性约束，并确认约束确实存在
+        
+        每条语句在独立事务中执行，一条失败不会连带回滚其他模型的约束；
+        批量导入依赖约束自带的唯一索引，约束缺失时抛出 KahunaException
+        """
+        expected = []
+        for model_class in model_classes:
+            expected.extend(await self._create_model_constraints(model_class))
+        if not expected:
+            return
+        
+        existing = set(await self.get_constraint_names())
+        missing = [name for name in expected if name not in existing]
+        if missing:
+            raise KahunaException(f"Neo4j 唯一性约束缺失: {missing}，请检查该标签下是否有重复数据")
+    
+    async def get_constraint_names(self) -> List[str]:
+        """当前数据库中的约束名称"""
+        async with neo4j_manager.get_session() as session:
+            result = await session.run("SHOW CONSTRAINTS YIELD name")
+            return [record["name"] async for record in result]
+    
+    async def _create_model_constraints(self, model_class: Type[NodeModel]) -> List[str]:
+        """创建单个模型的唯一性约束
+        
+        旧版本在同一属性上建过 {标签}_{属性}_index 的 RANGE 索引，会阻止约束创建，先将其删除
+        
+        Args:
+            model_class: 模型类
+        
+        Returns:
+            应存在的约束名称
+        """
+        labels_list = model_class.get_labels()
+        primary_label = labels_list[0] if labels_list else model_class.__name__
+        
+        constraint_names = []
+        for constraint_def in model_class.get_constraints():
+            if constraint_def.get("type") != "UNIQUE" or "property" not in constraint_def:
+                logger.warning(f"不支持的约束定义，跳过: {constraint_def}")
+                continue
+            property_name = constraint_def["property"]
+            constraint_name = f"{primary_label.lower()}_{property_name}_unique"
+            legacy_index_name = f"{primary_label.lower()}_{property_name}_index"
+            constraint_names.append(constraint_name)
+            
+            query = f"""
+            CREATE CONSTRAINT {constraint_name} IF NOT EXISTS
+            FOR (n:{primary_label})
+            REQUIRE n.{property_name} IS UNIQUE
+            """
+            
+            try:
+                async with neo4j_manager.get_transaction() as tx:
+                    await tx.run(f"DROP INDEX {legacy_index_name} IF EXISTS")
+                async with neo4j_manager.get_transaction() as tx:
+                    await tx.run(query)
+                logger.info(f"创建唯一性约束: {constraint_name} 在 {primary_label}.{property_name}")
+            except Exception as e:
+                # 已有重复数据时无法建立约束，需先清理该标签的节点；是否缺失由调用方统一检查
+                logger.error(f"创建唯一性约束失败 {constraint_name}: {e}")
+        return constraint_names
+    
     async def drop_all_constraints(self):
         """删除所有约束（谨慎使用）"""
         async with neo4j_manager.get_session() as session:
@@ -214,6 +290,9 @@ class Neo4jModelManager:
         """初始化数据库模式（创建所有索引）"""
         logger.info("开始初始化 Neo4j 数据库模式...")
         
+        # 先建唯一性约束，避免同一属性上的独立索引与约束冲突
+        await self.create_constraints()
+        
         # 创建所有节点索引（包括单属性索引和复合索引）
         await self.create_indexes()
         
@@ -230,13 +309,13 @@ neo4j_model_manager = Neo4jModelManager()
 from .neo4j_models import (
     Asset, SolarSystem, Station, Structure,
     Plan, Blueprint, PlanBlueprint,
-    MarketGroup, Type
+    MarketGroup, Type, GraphVersion
 )
 
 neo4j_model_manager.register_models(
     Asset, SolarSystem, Station, Structure,
     Plan, Blueprint, PlanBlueprint,
-    MarketGroup, Type
+    MarketGroup, Type, GraphVersion
 )
 
 
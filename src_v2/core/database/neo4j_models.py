@@ -188,14 +188,15 @@ class Blueprint(NodeModel):
     
     @classmethod
     def get_indexes(cls) -> List[Dict[str, Any]]:
-        return [
-            {"property": "type_id", "type": "RANGE"}
-        ]
+        # type_id 由唯一性约束自带的索引覆盖
+        return []
     
     @classmethod
     def get_constraints(cls) -> List[Dict[str, Any]]:
-        """获取约束定义（已废弃，使用索引替代）"""
-        return []
+        """蓝图节点由 SDE 批量导入，type_id 唯一"""
+        return [
+            {"property": "type_id", "type": "UNIQUE"}
+        ]
 
 @dataclass
 class PlanBlueprint(NodeModel):
@@ -225,6 +226,22 @@ class PlanBlueprint(NodeModel):
         """获取约束定义（已废弃，使用索引替代）"""
         return []
 
+@dataclass
+class GraphVersion(NodeModel):
+    """批量导入的图数据版本标记（如 name="blueprint" 对应的 SDE 版本）"""
+    name: str
+    version: Optional[int] = None
+
+    @classmethod
+    def get_labels(cls) -> List[str]:
+        return ["GraphVersion"]
+
+    @classmethod
+    def get_constraints(cls) -> List[Dict[str, Any]]:
+        return [
+            {"property": "name", "type": "UNIQUE"}
+        ]
+
 # =================== 市场树型图 ===================
 class MarketGroup(NodeModel):
     """市场组节点"""
@@ -237,9 +254,10 @@ class MarketGroup(NodeModel):
         return ["MarketGroup"]
     
     @classmethod
-    def get_indexes(cls) -> List[Dict[str, Any]]:
+    def get_constraints(cls) -> List[Dict[str, Any]]:
+        """市场组节点由 SDE 批量导入，market_group_id 唯一"""
         return [
-            {"property": "market_group_id", "type": "RANGE"},
+            {"property": "market_group_id", "type": "UNIQUE"},
         ]
 
 class Type(NodeModel):
@@ -258,9 +276,10 @@ class Type(NodeModel):
         return ["Type"]
 
     @classmethod
-    def get_indexes(cls) -> List[Dict[str, Any]]:
+    def get_constraints(cls) -> List[Dict[str, Any]]:
+        """物品节点由 SDE 批量导入，type_id 唯一"""
         return [
-            {"property": "type_id", "type": "RANGE"},
+            {"property": "type_id", "type": "UNIQUE"},
         ]
 
 # ==================== 关系定义 ====================
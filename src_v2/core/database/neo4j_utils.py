@@ -1410,6 +1410,143 @@ class Neo4jIndustryUtils:
             deleted_count = record["deleted_count"] if record else 0
             return deleted_count
 
+    @staticmethod
+    async def batch_merge_nodes(node_label: str, index_keys: List[str], rows: List[Dict[str, Any]],
+                                batch_size: int = 5000) -> int:
+        """批量新建或更新节点
+        
+        Args:
+            node_label: 节点的标签
+            index_keys: 作为 MERGE 唯一键的属性名，应当有对应的唯一性约束
+            rows: 节点属性字典列表，各行的键相同
+            batch_size: 每个事务 UNWIND 的行数
+            
+        Returns:
+            int: 处理的节点数量
+            
+        功能说明：
+            与 merge_node 相同，属性为 null 时保留旧值；每批一个事务，重复执行结果不变
+        """
+        if not rows:
+            return 0
+        merge_where = ", ".join(f"{key}: row.{key}" for key in index_keys)
+        set_props = ", ".join(
+            f"n.{key} = COALESCE(row.{key}, n.{key})" for key in rows[0] if key not in index_keys
+        )
+        query = f"UNWIND $rows AS row\nMERGE (n:{node_label} {{{merge_where}}})\n"
+        if set_props:
+            query += f"SET {set_props}\n"
+        query += "RETURN count(n) AS count"
+        
+        count = 0
+        for start in range(0, len(rows), batch_size):
+            async with neo4j_manager.get_transaction() as tx:
+                result = await tx.run(query, {"rows": rows[start:start + batch_size]})
+                record = await result.single()
+                count += record["count"] if record else 0
+        return count
+
+    @staticmethod
+    async def batch_merge_relations(
+        source_label: str,
+        source_index: Dict[str, str],
+        relation_label: str,
+        relation_index: List[str],
+        target_label: str,
+        target_index: Dict[str, str],
+        rows: List[Dict[str, Any]],
+        batch_size: int = 5000
+    ) -> int:
+        """批量新建或更新关系，两端节点需已存在
+        
+        Args:
+            source_label: 源节点的标签
+            source_index: 源节点属性名 -> 行中的字段名（如 {"type_id": "product"}）
+            relation_label: 关系的标签
+            relation_index: 作为关系 MERGE 匹配条件的字段名（可为空，两节点间只保留一条该类型关系）
+            target_label: 目标节点的标签
+            target_index: 目标节点属性名 -> 行中的字段名
+            rows: 关系属性字典列表，各行的键相同，行中的全部字段都会写入关系属性
+            batch_size: 每个事务 UNWIND 的行数
+            
+        Returns:
+            int: 处理的关系数量（端点不存在的行被跳过）
+        """
+        if not rows:
+            return 0
+        source_where = ", ".join(f"{key}: row.{field}" for key, field in source_index.items())
+        target_where = ", ".join(f"{key}: row.{field}" for key, field in target_index.items())
+        relation_where = ", ".join(f"{key}: row.{key}" for key in relation_index)
+        relation_pattern = f"[r:{relation_label} {{{relation_where}}}]" if relation_where else f"[r:{relation_label}]"
+        set_props = ", ".join(
+            f"r.{key} = COALESCE(row.{key}, r.{key})" for key in rows[0] if key not in relation_index
+        )
+        query = (
+            f"UNWIND $rows AS row\n"
+            f"MATCH (source:{source_label} {{{source_where}}})\n"
+            f"MATCH (target:{target_label} {{{target_where}}})\n"
+            f"MERGE (source)-{relation_pattern}->(target)\n"
+        )
+        if set_props:
+            query += f"SET {set_props}\n"
+        query += "RETURN count(r) AS count"
+        
+        count = 0
+        for start in range(0, len(rows), batch_size):
+            async with neo4j_manager.get_transaction() as tx:
+                result = await tx.run(query, {"rows": rows[start:start + batch_size]})
+                record = await result.single()
+                count += record["count"] if record else 0
+        return count
+
+    @staticmethod
+    async def delete_stale(label: str, version_property: str, version: Any, relation: bool = False) -> int:
+        """删除版本属性不等于 version 的节点（连同其关系）或关系
+        
+        批量导入时为每个节点/关系写入版本属性，导入完成后用本函数清理新版本中已不存在的部分
+        """
+        if relation:
+            query = f"""
+            MATCH ()-[r:{label}]->()
+            WHERE r.{version_property} IS NULL OR r.{version_property} <> $version
+            DELETE r
+            RETURN count(r) AS deleted_count
+            """
+        else:
+            query = f"""
+            MATCH (n:{label})
+            WHERE n.{version_property} IS NULL OR n.{version_property} <> $version
+            DETACH DELETE n
+            RETURN count(n) AS deleted_count
+            """
+        async with neo4j_manager.get_transaction() as tx:
+            result = await tx.run(query, {"version": version})
+            record = await result.single()
+            return record["deleted_count"] if record else 0
+
+    @staticmethod
+    async def get_graph_version(name: str) -> Optional[Any]:
+        """获取批量导入的图数据版本标记，不存在时返回 None"""
+        async with neo4j_manager.get_session() as session:
+            result = await session.run("MATCH (v:GraphVersion {name: $name}) RETURN v.version AS version", {"name": name})
+            record = await result.single()
+            return record["version"] if record else None
+
+    @staticmethod
+    async def set_graph_version(name: str, version: Any):
+        """写入批量导入的图数据版本标记"""
+        async with neo4j_manager.get_transaction() as tx:
+            await tx.run(
+                "MERGE (v:GraphVersion {name: $name}) SET v.version = $version, v.updated_at = datetime()",
+                {"name": name, "version": version}
+            )
+
+    @staticmethod
+    async def ensure_constraints(*model_classes):
+        """批量导入前确认 MERGE 依赖的唯一性约束存在，缺失时抛出 KahunaException"""
+        from .neo4j_model_manager import neo4j_model_manager
+        await neo4j_model_manager.ensure_constraints(*model_classes)
+
     @staticmethod
     async def get_structure_node_by_id(structure_id: int) -> Dict[str, Any]:
         """获取结构节点"""
@@ -0,0 +1,176 @@
+"""
+Redis 版本化快照
+
+整批写入一组 hash（如每个物品的价格），写完后原子切换 "当前快照" 指针：
+    {prefix}:version_seq         版本号自增序列
+    {prefix}:current             当前快照版本号
+    {prefix}:v{version}:{id}     快照中每个成员的 hash
+    {prefix}:v{version}:members  快照包含的成员 id 集合
+    {prefix}:v{version}:meta     快照元数据（发布时间、成员数）
+写入通过分块 pipeline 完成，整次刷新只需少量往返；读取方先读指针再读对应版本的 hash，
+不会看到写了一半的数据。被替换的旧快照保留 retire_seconds 秒供正在读取的请求完成后过期。
+"""
+import time
+from typing import Iterable, Optional, Tuple
+
+from src_v2.core.database.connect_manager import redis_manager
+
+DEFAULT_CHUNK_SIZE = 1000
+DEFAULT_RETIRE_SECONDS = 300
+
+# 只在新版本号更大时切换指针，返回旧版本号（无旧版本返回 0），被更新的版本抢先时返回 -1
+SWAP_POINTER_LUA = """
+local cur = redis.call('GET', KEYS[1])
+if cur and tonumber(cur) >= tonumber(ARGV[1]) then
+    return -1
+end
+redis.call('SET', KEYS[1], ARGV[1])
+if cur then
+    return tonumber(cur)
+end
+return 0
+"""
+
+
+class RedisSnapshotStore:
+    """
+    Args:
+        prefix: key 前缀，如 "market_price:jita"；未发布过快照时读取回退到旧格式 "{prefix}:{id}"
+        redis: Redis 客户端，默认使用 redis_manager.r
+    """
+
+    def __init__(self, prefix: str, redis=None, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                 retire_seconds: int = DEFAULT_RETIRE_SECONDS):
+        self.prefix = prefix
+        self._redis = redis
+        self.chunk_size = chunk_size
+        self.retire_seconds = retire_seconds
+
+    @property
+    def r(self):
+        return self._redis if self._redis is not None else redis_manager.r
+
+    @property
+    def pointer_key(self) -> str:
+        return f"{self.prefix}:current"
+
+    def member_key(self, version: Optional[int], member_id) -> str:
+        if version is None:
+            return f"{self.prefix}:{member_id}"
+        return f"{self.prefix}:v{version}:{member_id}"
+
+    def members_key(self, version: int) -> str:
+        return f"{self.prefix}:v{version}:members"
+
+    def meta_key(self, version: int) -> str:
+        return f"{self.prefix}:v{version}:meta"
+
+    async def current_version(self) -> Optional[int]:
+        version = await self.r.get(self.pointer_key)
+        return int(version) if version is not None else None
+
+    async def publish(self, items: Iterable[Tuple[int, dict]]) -> int:
+        """
+        写入一份完整快照并切换当前指针
+        Args:
+            items: (成员 id, hash mapping) 迭代器
+        Returns:
+            int: 新快照版本号
+        """
+        r = self.r
+        version = await r.incr(f"{self.prefix}:version_seq")
+        count = 0
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= self.chunk_size:
+                await self._write_chunk(version, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            await self._write_chunk(version, chunk)
+            count += len(chunk)
+        await r.hset(self.meta_key(version), mapping={"published_at": int(time.time()), "count": count})
+
+        old_version = await r.eval(SWAP_POINTER_LUA, 1, self.pointer_key, version)
+        if old_version == -1:
+            # 并发发布时更新的版本已生效，本次快照直接过期
+            await self._retire(version)
+        elif old_version:
+            await self._retire(old_version)
+        return version
+
+    async def _write_chunk(self, version: int, chunk: list):
+        async with self.r.pipeline(transaction=False) as pipe:
+            for member_id, mapping in chunk:
+                pipe.hset(self.member_key(version, member_id), mapping=mapping)
+            pipe.sadd(self.members_key(version), *[member_id for member_id, _ in chunk])
+            await pipe.execute()
+
+    async def _retire(self, version: int):
+        """为旧快照设置过期时间"""
+        r = self.r
+        members = list(await r.smembers(self.members_key(version)))
+        for i in range(0, len(members), self.chunk_size):
+            async with r.pipeline(transaction=False) as pipe:
+                for member_id in members[i:i + self.chunk_size]:
+                    pipe.expire(self.member_key(version, member_id), self.retire_seconds)
+                await pipe.execute()
+        async with r.pipeline(transaction=False) as pipe:
+            pipe.expire(self.members_key(version), self.retire_seconds)
+            pipe.expire(self.meta_key(version), self.retire_seconds)
+            await pipe.execute()
+
+    async def hget(self, member_id, field: str):
+        version = await self.current_version()
+        return await self.r.hget(self.member_key(version, member_id), field)
+
+    async def hmget(self, member_id, *fields: str) -> list:
+        version = await self.current_version()
+        return await self.r.hmget(self.member_key(version, member_id), list(fields))
+
+    async def hgetall(self, member_id) -> dict:
+        version = await self.current_version()
+        return await self.r.hgetall(self.member_key(version, member_id))
+
+    async def hmget_many(self, member_ids: Iterable, fields: Iterable[str]) -> dict:
+        """批量读取多个成员的字段，返回 {id: {field: value}}"""
+        return (await read_many([self], member_ids, fields))[self.prefix]
+
+    async def hmget_many_at(self, version: Optional[int], member_ids: Iterable, fields: Iterable[str]) -> dict:
+        """在调用方已读到的版本上批量读取（一个 pipeline），返回 {id: {field: value}}"""
+        member_ids = list(member_ids)
+        fields = list(fields)
+        async with self.r.pipeline(transaction=False) as pipe:
+            for member_id in member_ids:
+                pipe.hmget(self.member_key(version, member_id), fields)
+            values = await pipe.execute()
+        return {member_id: dict(zip(fields, value)) for member_id, value in zip(member_ids, values)}
+
+
+async def read_many(stores: list, member_ids: Iterable, fields: Iterable[str], redis=None) -> dict:
+    """
+    一次 MGET 读取所有快照指针，再用一个 pipeline 读取所有快照中所有成员的字段
+    Returns:
+        dict: {prefix: {id: {field: value}}}
+    """
+    if not stores:
+        return {}
+    r = redis if redis is not None else stores[0].r
+    member_ids = list(member_ids)
+    fields = list(fields)
+    versions = await r.mget([store.pointer_key for store in stores])
+    async with r.pipeline(transaction=False) as pipe:
+        for store, version in zip(stores, versions):
+            version = int(version) if version is not None else None
+            for member_id in member_ids:
+                pipe.hmget(store.member_key(version, member_id), fields)
+        values = await pipe.execute()
+
+    result = {}
+    it = iter(values)
+    for store in stores:
+        result[store.prefix] = {
+            member_id: dict(zip(fields, next(it))) for member_id in member_ids
+        }
+    return result
@@ -0,0 +1,148 @@
+"""
+进程内定时任务
+
+多个服务进程通过 Redis 锁选主，只有持有锁的进程执行任务，其余进程定期尝试接管：
+    {lock_key}  值为本进程的随机 token，TTL 为 leader_ttl 秒，主进程每个 tick 续期
+每个任务通过一组刷新标记（由刷新函数自己设置带 TTL 的 key）判断是否到期：
+任一标记不存在即到期执行；执行后按标记剩余 TTL 安排下次检查，因此刷新节奏与各自的缓存过期时间一致。
+"""
+import asyncio
+import time
+import uuid
+from dataclasses import dataclass
+from typing import Awaitable, Callable
+
+from src_v2.core.database.connect_manager import redis_manager
+from src_v2.core.log import logger
+
+# 只有 token 一致时才续期/释放，避免误操作其他进程的锁
+RENEW_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('EXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+@dataclass
+class ScheduledJob:
+    name: str
+    run: Callable[[], Awaitable]
+    # 返回刷新标记 key 列表，全部存在时视为未到期
+    flag_keys: Callable[[], list[str]]
+    min_interval: int = 60
+    max_interval: int = 60 * 60
+    next_run: float = 0
+
+
+class LeaderScheduler:
+    def __init__(self, lock_key: str, leader_ttl: int = 30, tick_seconds: int = 10, redis=None):
+        self.lock_key = lock_key
+        self.leader_ttl = leader_ttl
+        self.tick_seconds = tick_seconds
+        self.token = uuid.uuid4().hex
+        self.jobs: list[ScheduledJob] = []
+        self.is_leader = False
+        self._redis = redis
+        self._task: asyncio.Task | None = None
+
+    @property
+    def r(self):
+        return self._redis if self._redis is not None else redis_manager.r
+
+    def add_job(self, job: ScheduledJob):
+        self.jobs.append(job)
+
+    async def try_acquire_leader(self) -> bool:
+        """获取或续期主进程锁"""
+        if self.is_leader:
+            renewed = await self.r.eval(RENEW_LOCK_LUA, 1, self.lock_key, self.token, self.leader_ttl)
+            if not renewed:
+                logger.warning(f"定时任务主进程锁 {self.lock_key} 已丢失")
+                self.is_leader = False
+        if not self.is_leader:
+            self.is_leader = bool(await self.r.set(self.lock_key, self.token, nx=True, ex=self.leader_ttl))
+            if self.is_leader:
+                logger.info(f"获得定时任务主进程锁 {self.lock_key}")
+                # 新主进程立即检查所有任务
+                for job in self.jobs:
+                    job.next_run = 0
+        return self.is_leader
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(max(self.leader_ttl / 3, 1))
+            await self.r.eval(RENEW_LOCK_LUA, 1, self.lock_key, self.token, self.leader_ttl)
+
+    async def release_leader(self):
+        if self.is_leader:
+            await self.r.eval(RELEASE_LOCK_LUA, 1, self.lock_key, self.token)
+            self.is_leader = False
+
+    async def seconds_until_due(self, job: ScheduledJob) -> float:
+        """刷新标记中最短的剩余 TTL，任一标记不存在时返回 0"""
+        keys = job.flag_keys()
+        if not keys:
+            return 0
+        async with self.r.pipeline(transaction=False) as pipe:
+            for key in keys:
+                pipe.ttl(key)
+            ttls = await pipe.execute()
+        # -2 为 key 不存在，-1 为未设置过期时间
+        if any(ttl == -2 for ttl in ttls):
+            return 0
+        return min(ttl if ttl >= 0 else job.max_interval for ttl in ttls)
+
+    async def run_job(self, job: ScheduledJob):
+        if await self.seconds_until_due(job) <= 0:
+            started = time.perf_counter()
+            # 任务可能远长于锁 TTL，执行期间持续续期
+            keep_alive = asyncio.create_task(self._keep_alive())
+            try:
+                await job.run()
+                logger.info(f"定时任务 {job.name} 完成，耗时 {time.perf_counter() - started:.1f}s")
+            except Exception as e:
+                logger.error(f"定时任务 {job.name} 执行失败: {e}")
+            finally:
+                keep_alive.cancel()
+        wait = await self.seconds_until_due(job)
+        job.next_run = time.time() + min(max(wait, job.min_interval), job.max_interval)
+
+    async def tick(self):
+        if not await self.try_acquire_leader():
+            return
+        now = time.time()
+        for job in self.jobs:
+            if job.next_run <= now:
+                await self.run_job(job)
+
+    async def _loop(self):
+        while True:
+            try:
+                await self.tick()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"定时任务调度出错: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    async def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._loop())
+            logger.info(f"定时任务调度已启动，共 {len(self.jobs)} 个任务")
+
+    async def stop(self):
+        if self._task and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        await self.release_leader()
+        logger.info("定时任务调度已停止")
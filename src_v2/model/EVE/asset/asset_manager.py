@@ -3,6 +3,7 @@ import asyncio
 from datetime import datetime, timezone, timedelta
 import json
 import pathlib
+from typing import AsyncIterator
 
 from tqdm.std import tqdm
 
@@ -29,6 +30,8 @@ from src_v2.model.EVE.eveesi import eveesi
 from src_v2.core.log import logger
 
 CREATE_STATION_SEMAPHORE = asyncio.Semaphore(1)
+# 生成资产节点时每块并发的任务数，实际 neo4j 请求数仍受 neo4j_manager.semaphore 限制
+ASSET_NODE_CHUNK_SIZE = 200
 
 structure_sub_location_flags = [
     "OfficeFolder",
@@ -224,49 +227,61 @@ class AssetManager(metaclass=SingletonMeta):
                 {}
             )
 
-    async def _generate_all_nodes(self, assets_list: list[dict], mission_obj: M_EveAssetPullMission):
-        stucture_list = await NAU.get_structure_nodes()
-        structure_item_id_list = [structure.get("item_id", None) for structure in stucture_list]
-        status_key = f'asset_pull_mission_status:{mission_obj.asset_owner_type}:{mission_obj.asset_owner_id}'
-
-        last_progress = 0
-        async def generate_with_semaphore(asset: dict):
-            nonlocal last_progress
-            async with neo4j_manager.semaphore:
-                if asset["item_id"] in structure_item_id_list:
-                    return
-                asset.update({
-                    'type_name': await SdeUtils.get_name_by_id(asset['type_id']),
-                    'owner_id': mission_obj.asset_owner_id
-                })
-                await NIU.merge_node(
-                    "Asset",
-                    {
-                        "item_id": asset["item_id"],
-                        "owner_id": asset["owner_id"],
-                    },
-                    asset
-                )
+    async def _generate_asset_node(self, asset: dict, mission_obj: M_EveAssetPullMission, structure_item_id_list: list, type_names: dict):
+        async with neo4j_manager.semaphore:
+            if asset["item_id"] in structure_item_id_list:
+                return
+            asset.update({
+                'type_name': type_names[asset['type_id']],
+                'owner_id': mission_obj.asset_owner_id
+            })
+            await NIU.merge_node(
+                "Asset",
+                {
+                    "item_id": asset["item_id"],
+                    "owner_id": asset["owner_id"],
+                },
+                asset
+            )
 
-                if asset["location_type"] == 'station':
-                    await self.create_station_node(asset["location_id"])
+            if asset["location_type"] == 'station':
+                await self.create_station_node(asset["location_id"])
 
-                now_progress = await tqdm_manager.update_mission("_generate_all_nodes", 1)
-                if now_progress / len(assets_list) * 100 > last_progress + 0.1:
-                    await rdm.r.hset(status_key, 'step_progress', now_progress / len(assets_list))
-                    last_progress = now_progress / len(assets_list)
+    async def _generate_all_nodes(self, assets_pages: AsyncIterator[list[dict]], mission_obj: M_EveAssetPullMission) -> list[dict]:
+        """分页到达后立即生成资产节点，与后续分页的下载重叠，返回全部资产"""
+        stucture_list = await NAU.get_structure_nodes()
+        structure_item_id_list = [structure.get("item_id", None) for structure in stucture_list]
+        assets_list = []
 
-        await tqdm_manager.add_mission("_generate_all_nodes", len(assets_list))
-        await rdm.r.hset(status_key, 'step_name', "生成资产树节点")
-        await rdm.r.hset(status_key, 'step_progress', 0)
-        tasks = [asyncio.create_task(generate_with_semaphore(asset)) for asset in assets_list]
-        await asyncio.gather(*tasks)
-        await tqdm_manager.complete_mission("_generate_all_nodes")
+        async def generate_with_progress(asset: dict, type_names: dict):
+            await self._generate_asset_node(asset, mission_obj, structure_item_id_list, type_names)
+            if asset["item_id"] not in structure_item_id_list:
+                await tqdm_manager.update_mission("_generate_all_nodes", 1)
+
+        # 总数要等分页全部到达才知道，进度条只计数；页进度由 esi_pages 写入 step_progress
+        await tqdm_manager.add_mission("_generate_all_nodes", None)
+        try:
+            async for assets_batch in assets_pages:
+                assets_list.extend(assets_batch)
+                # 每页的物品名称一次批量读取
+                type_names = await SdeUtils.get_names_by_ids(asset['type_id'] for asset in assets_batch)
+                # 分块 gather，同时存在的节点任务不超过 ASSET_NODE_CHUNK_SIZE 个
+                for start in range(0, len(assets_batch), ASSET_NODE_CHUNK_SIZE):
+                    await asyncio.gather(*(
+                        generate_with_progress(asset, type_names)
+                        for asset in assets_batch[start:start + ASSET_NODE_CHUNK_SIZE]
+                    ))
+        finally:
+            await tqdm_manager.complete_mission("_generate_all_nodes")
+        return assets_list
 
     async def _generate_all_locate_relation(self, assets_list: list[dict], mission_obj: M_EveAssetPullMission):
         status_key = f'asset_pull_mission_status:{mission_obj.asset_owner_type}:{mission_obj.asset_owner_id}'
         structure_nodes = await NAU.get_structure_nodes()
         structure_item_id_list = [structure.get("structure_id", None) for structure in structure_nodes]
+        system_infos = await SdeUtils.get_system_infos(
+            asset["location_id"] for asset in assets_list if asset["location_type"] == 'solar_system'
+        )
         
         last_progress = 0
         async def generate_with_semaphore(asset: dict):
@@ -292,7 +307,7 @@ class AssetManager(metaclass=SingletonMeta):
                 elif asset["location_type"] == 'solar_system':
                     if asset["item_id"] in structure_item_id_list:
                         return
-                    system_info = await SdeUtils.get_system_info_by_id(asset["location_id"])
+                    system_info = system_infos[asset["location_id"]]
                     system_node = {
                         'system_id': system_info['system_id'],
                         'system_name': system_info['system_name'],
@@ -529,18 +544,17 @@ class AssetManager(metaclass=SingletonMeta):
 
         access_character = await CharacterManager().get_character_by_character_id(mission_obj.access_character_id)
 
-        await rdm.r.hset(status_key, 'step_name', "通过api拉取资产")
-        assets = await pull_function(
-            access_character.ac_token,
-            mission_obj.asset_owner_id,
-            status_key=status_key
+        await rdm.r.hset(status_key, 'step_name', "通过api拉取资产并生成资产树节点")
+        assets_list = await self._generate_all_nodes(
+            eveesi.esi_pages(
+                pull_function,
+                access_character.ac_token,
+                mission_obj.asset_owner_id,
+                progress_key=status_key
+            ),
+            mission_obj
         )
-        assets_list = []
-        for assets_list_batch in assets:
-            assets_list.extend(assets_list_batch)
 
-        # 生成所有节点
-        await self._generate_all_nodes(assets_list, mission_obj)
         await self._generate_all_locate_relation(assets_list, mission_obj)
         await self._generate_forbidden_structure_node(mission_obj)
         await self._update_structure_node(mission_obj)
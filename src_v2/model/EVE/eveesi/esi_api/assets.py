@@ -10,7 +10,7 @@ from src_v2.core.database.connect_manager import redis_manager as rdm
 # esi-assets.read_corporation_assets.v1
 # https://esi.evetech.net/corporations/{corporation_id}/assets/locations
 @esi_request
-async def corporations_corporation_assets(access_token, corporation_id: int, page: int=1, test=False, max_retries=3, log=True, **kwargs):
+async def corporations_corporation_assets(access_token, corporation_id: int, page: int=1, test=False, max_retries=3, log=True, single_page: bool = False, **kwargs):
     """
     # is_blueprint_copy - Boolean
     # is_singleton - Boolean
@@ -26,11 +26,14 @@ async def corporations_corporation_assets(access_token, corporation_id: int, pag
         ac_token = await access_token
     else:
         ac_token = access_token
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/latest/corporations/{corporation_id}/assets/",
         headers={"Authorization": f"Bearer {ac_token}"}, params={"page": page}, log=log, max_retries=max_retries,
         no_retry_code=[OUT_PAGE_ERROR]
     )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
 
     if test or page != 1:
         if page != 1:
@@ -60,17 +63,20 @@ async def corporations_corporation_assets(access_token, corporation_id: int, pag
 # https://esi.evetech.net/characters/{character_id}/assets
 # esi-assets.read_assets.v1.
 @esi_request
-async def characters_character_assets(access_token, character_id: int, page: int=1, test=False, max_retries=3, log=True, **kwargs):
+async def characters_character_assets(access_token, character_id: int, page: int=1, test=False, max_retries=3, log=True, single_page: bool = False, **kwargs):
     status_key = kwargs.get('status_key', None)
     if not isinstance(access_token, str):
         ac_token = await access_token
     else:
         ac_token = access_token
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/latest/characters/{character_id}/assets/",
         headers={"Authorization": f"Bearer {ac_token}"}, params={"page": page}, log=log, max_retries=max_retries,
         no_retry_code=[OUT_PAGE_ERROR]
     )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
 
     if test or page != 1:
         if page != 1:
@@ -12,7 +12,7 @@ from src_v2.core.utils import tqdm_manager
 
 @esi_request
 async def character_character_id_portrait(access_token, character_id, log=True):
-    ac_token = await access_token
+    ac_token = await parse_token(access_token)
     data, _, _ = await get_request_async(f"https://esi.evetech.net/latest/characters/{character_id}/portrait/",
                        headers={"Authorization": f"Bearer {ac_token}"}, log=log)
     return data
@@ -22,13 +22,16 @@ async def character_character_id_portrait(access_token, character_id, log=True):
 # https://esi.evetech.net/characters/{character_id}/blueprints
 # esi-characters.read_blueprints.v1
 @esi_request
-async def characters_character_id_blueprints(access_token, character_id: int, page: int=1, max_retries=3, log=True):
+async def characters_character_id_blueprints(access_token, character_id: int, page: int=1, max_retries=3, log=True, single_page: bool = False):
     access_token = await parse_token(access_token)
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/latest/characters/{character_id}/blueprints/",
         headers={"Authorization": f"Bearer {access_token}"}, params={"page": page}, log=log, max_retries=max_retries,
         no_retry_code=[OUT_PAGE_ERROR]
     )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
     if page != 1:
         await tqdm_manager.update_mission(f'character_character_id_blueprints_{character_id}')
         return data
@@ -1,7 +1,7 @@
 import asyncio
 
 from ..esi_req_manager import esi_request
-from ..eveutils import get_request_async, OUT_PAGE_ERROR
+from ..eveutils import get_request_async, OUT_PAGE_ERROR, parse_token
 from src_v2.core.utils import tqdm_manager
 
 
@@ -29,16 +29,19 @@ async def corporations_corporation_id_icons(corporation_id: int, log=True):
 # esi-corporations.read_blueprints.v1
 # This route is part of the rate limit group corp-industry. This group is limited to 600 tokens per 15 minutes.
 @esi_request(limit=2/3)
-async def corporations_corporation_id_blueprints(access_token, corporation_id: int, page: int=1, max_retries=3, log=True):
+async def corporations_corporation_id_blueprints(access_token, corporation_id: int, page: int=1, max_retries=3, log=True, single_page: bool = False):
     if not isinstance(access_token, str):
         ac_token = await access_token
     else:
         ac_token = access_token
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/latest/corporations/{corporation_id}/blueprints/",
         headers={"Authorization": f"Bearer {ac_token}"}, params={"page": page}, log=log, max_retries=max_retries,
         no_retry_code=[OUT_PAGE_ERROR]
     )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
     if page != 1:
         await tqdm_manager.update_mission(f'corporations_corporation_id_blueprints_{corporation_id}')
         return data
@@ -61,7 +64,7 @@ async def corporations_corporation_id_blueprints(access_token, corporation_id: i
 # esi-corporations.read_corporation_membership.v1
 @esi_request
 async def corporations_corporation_id_members(access_token, corporation_id: int, log=True):
-    ac_token = await access_token
+    ac_token = await parse_token(access_token)
     data, _, _ = await get_request_async(f"https://esi.evetech.net/latest/corporations/{corporation_id}/members/",
                        headers={"Authorization": f"Bearer {ac_token}"}, log=log, max_retries=1)
     return data
@@ -5,10 +5,12 @@ from ..eveutils import get_request_async, OUT_PAGE_ERROR, parse_token
 from src_v2.core.utils import tqdm_manager
 
 
-@esi_request
+# ESI 缓存1小时，多个计划同时计算时共享结果
+@esi_request(result_ttl=60)
 async def industry_systems(log=True):
-    data, _, _ =  await get_request_async(f"https://esi.evetech.net/latest/industry/systems/", log=log)
-    return data
+    data, _, status_code = await get_request_async(f"https://esi.evetech.net/latest/industry/systems/", log=log)
+    # 失败时返回 None（不进入短期缓存），不把网络错误时的 [] 当作结果
+    return data if status_code == 200 else None
 
 
 # List corporation industry jobs
@@ -18,10 +20,11 @@ async def industry_systems(log=True):
 # This route is part of the rate limit group corp-industry. This group is limited to 600 tokens per 15 minutes.
 @esi_request
 async def corporations_corporation_id_industry_jobs(
-        access_token, corporation_id: int, page: int=1, include_completed: bool = False, max_retries=3, log=True
+        access_token, corporation_id: int, page: int=1, include_completed: bool = False, max_retries=3, log=True,
+        single_page: bool = False
 ):
     access_token = await parse_token(access_token)
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/corporations/{corporation_id}/industry/jobs/",
             headers={"Authorization": f"Bearer {access_token}"},
             params={
@@ -30,6 +33,9 @@ async def corporations_corporation_id_industry_jobs(
             }, log=log, max_retries=max_retries,
             no_retry_code=[OUT_PAGE_ERROR]
         )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
     if page != 1:
         await tqdm_manager.update_mission(f'corporations_corporation_id_industry_jobs_{corporation_id}')
         return data
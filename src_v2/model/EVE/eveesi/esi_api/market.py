@@ -1,7 +1,9 @@
 import asyncio
+from typing import Optional
 
 from ..esi_req_manager import esi_request
-from ..eveutils import get_request_async, OUT_PAGE_ERROR
+from ..eveutils import get_request_async, OUT_PAGE_ERROR, parse_token
+from ..esi_decode import decode_market_orders
 from src_v2.core.utils import tqdm_manager
 
 
@@ -9,16 +11,23 @@ from src_v2.core.utils import tqdm_manager
 # esi-markets.structure_markets.v1
 # https://esi.evetech.net/markets/structures/{structure_id}
 @esi_request
-async def markets_structures(access_token, structure_id: int, page: int=1, test=False, max_retries=3, log=True) -> dict:
+async def markets_structures(
+        access_token, structure_id: int, page: int=1, test=False, max_retries=3, log=True, single_page: bool = False,
+        typed: bool = False, response_meta: Optional[dict] = None
+) -> dict:
+    """typed 为 True 时每页解析为 MarketOrder 列表；response_meta 传入 dict 时写入 Expires 等响应头"""
     if not isinstance(access_token, str):
         ac_token = await access_token
     else:
         ac_token = access_token
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/markets/structures/{structure_id}/",
         headers={"Authorization": f"Bearer {ac_token}"}, params={"page": page}, log=log, max_retries=max_retries,
-        no_retry_code=[OUT_PAGE_ERROR]
+        no_retry_code=[OUT_PAGE_ERROR], decoder=decode_market_orders if typed else None, response_meta=response_meta
     )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
 
     if test or page != 1:
         if page != 1:
@@ -29,7 +38,7 @@ async def markets_structures(access_token, structure_id: int, page: int=1, test=
     tasks = []
     data = [data]
     for p in range(2, pages + 1):
-        tasks.append(asyncio.create_task(markets_structures(ac_token, structure_id, p, test, max_retries, log)))
+        tasks.append(asyncio.create_task(markets_structures(ac_token, structure_id, p, test, max_retries, log, typed=typed)))
     page_results = await asyncio.gather(*tasks)
     for page_data in page_results:
         data.append(page_data)
@@ -41,14 +50,22 @@ async def markets_structures(access_token, structure_id: int, page: int=1, test=
 # List orders in a region
 # https://esi.evetech.net/markets/{region_id}/orders
 @esi_request(limit=20)
-async def markets_region_orders(region_id: int, type_id: int = None, page: int=1, max_retries=3, log=True):
+async def markets_region_orders(
+        region_id: int, type_id: int = None, page: int=1, max_retries=3, log=True, single_page: bool = False,
+        typed: bool = False, response_meta: Optional[dict] = None
+):
+    """typed 为 True 时每页解析为 MarketOrder 列表；response_meta 传入 dict 时写入 Expires 等响应头"""
     params = {"page": page}
     if type_id is not None:
         params["type_id"] = type_id
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/markets/{region_id}/orders/", headers={},
-       params=params, log=log, max_retries=max_retries, no_retry_code=[OUT_PAGE_ERROR]
+       params=params, log=log, max_retries=max_retries, no_retry_code=[OUT_PAGE_ERROR],
+       decoder=decode_market_orders if typed else None, response_meta=response_meta
     )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
     if page != 1:
         await tqdm_manager.update_mission(f'markets_region_orders_{region_id}')
         return data
@@ -57,7 +74,7 @@ async def markets_region_orders(region_id: int, type_id: int = None, page: int=1
     tasks = []
     data = [data]
     for p in range(2, pages + 1):
-        tasks.append(asyncio.create_task(markets_region_orders(region_id, type_id, p, max_retries, log)))
+        tasks.append(asyncio.create_task(markets_region_orders(region_id, type_id, p, max_retries, log, typed=typed)))
     page_results = await asyncio.gather(*tasks)
     for data_page in page_results:
         data.append(data_page)
@@ -67,10 +84,12 @@ async def markets_region_orders(region_id: int, type_id: int = None, page: int=1
 
 # List market prices
 # https://esi.evetech.net/markets/prices
-@esi_request
+# ESI 缓存1小时，多个计划同时计算时共享结果
+@esi_request(result_ttl=60)
 async def markets_prices(log=True):
-    data, _, _ = await get_request_async(f'https://esi.evetech.net/markets/prices/', log=log)
-    return data
+    data, _, status_code = await get_request_async(f'https://esi.evetech.net/markets/prices/', log=log)
+    # 失败时返回 None（不进入短期缓存），不把网络错误时的 [] 当作结果
+    return data if status_code == 200 else None
 
 # List historical market statistics in a region
 # https://esi.evetech.net/markets/{region_id}/history
@@ -80,16 +99,31 @@ async def markets_region_history(region_id: int, type_id: int, log=True):
                        params={"type_id": type_id, "region_id": region_id}, log=log, max_retries=1)
     return data
 
+@esi_request
+async def markets_region_history_conditional(region_id: int, type_id: int, etag: str = None, log=True):
+    """
+    带 If-None-Match 的市场历史请求
+    Returns:
+        (data, status_code, meta): 未变化时 data 为 None、status_code 为 304；meta 为 ETag/Expires/Last-Modified
+    """
+    meta = {}
+    headers = {"If-None-Match": etag} if etag else {}
+    data, _, status_code = await get_request_async(
+        f"https://esi.evetech.net/markets/{region_id}/history/", headers=headers,
+        params={"type_id": type_id}, log=log, max_retries=1, no_retry_code=[OUT_PAGE_ERROR], response_meta=meta
+    )
+    return data, status_code, meta
+
 # List historical orders by a character
 # esi-markets.read_character_orders.v1
 # https://esi.evetech.net/characters/{character_id}/orders/history
 @esi_request
-async def characters_character_orders_history(access_token, character_id: int, page: int=1, max_retries=3, log=True):
+async def characters_character_orders_history(access_token, character_id: int, page: int=1, max_retries=3, log=True, single_page: bool = False):
     if not isinstance(access_token, str):
         ac_token = await access_token
     else:
         ac_token = access_token
-    data, pages, _ = await get_request_async(
+    data, pages, status_code = await get_request_async(
         f"https://esi.evetech.net/characters/{character_id}/orders/history/",
         headers={"Authorization": f"Bearer {ac_token}"},
         params={"page": page},
@@ -97,6 +131,9 @@ async def characters_character_orders_history(access_token, character_id: int, p
         max_retries=max_retries,
         no_retry_code=[OUT_PAGE_ERROR]
     )
+    # esi_pages 流式拉取时只返回当前页及总页数，非 200（含网络错误时的 []）返回 None 表示失败
+    if single_page:
+        return (data if status_code == 200 else None), pages or 1
     if page != 1:
         await tqdm_manager.update_mission(f'characters_character_orders_history_{character_id}')
         return data
@@ -118,7 +155,7 @@ async def characters_character_orders_history(access_token, character_id: int, p
 # esi-markets.read_character_orders.v1.
 @esi_request
 async def characters_character_orders(access_token, character_id: int, log=True):
-    ac_token = await access_token
+    ac_token = await parse_token(access_token)
     data, _, _ = await get_request_async(
         f"https://esi.evetech.net/characters/{character_id}/orders/",
         headers={"Authorization": f"Bearer {ac_token}"},
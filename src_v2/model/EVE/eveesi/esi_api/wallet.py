@@ -10,7 +10,7 @@ from src_v2.core.utils import tqdm_manager
 # esi-wallet.read_character_wallet.v1
 @esi_request
 async def character_character_id_wallet(access_token, character_id, log=True):
-    ac_token = await access_token
+    ac_token = await parse_token(access_token)
     data, _, _ = await get_request_async(f"https://esi.evetech.net/latest/characters/{character_id}/wallet/",
                        headers={"Authorization": f"Bearer {ac_token}"}, log=log)
     return data
\ No newline at end of file
@@ -0,0 +1,103 @@
+"""
+ESI 响应解析
+
+大体积分页（市场订单、资产、蓝图、工业作业）的快速解析路径：
+- 安装了 msgspec 时直接从 bytes 解析为只含必要字段的 slots dataclass，跳过中间 dict
+- 否则使用 orjson（或标准库 json）解析后再转换为同样的记录类型
+"""
+import json
+from dataclasses import dataclass, fields
+from typing import Any, Callable, Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+def json_loads(raw) -> Any:
+    """通用 JSON 解析，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+@dataclass(slots=True)
+class MarketOrder:
+    order_id: int
+    type_id: int
+    location_id: int
+    price: float
+    volume_remain: int
+    is_buy_order: bool
+    system_id: int = 0
+
+
+@dataclass(slots=True)
+class AssetItem:
+    item_id: int
+    type_id: int
+    location_id: int
+    location_flag: str
+    location_type: str
+    quantity: int
+    is_singleton: bool
+    is_blueprint_copy: bool = False
+
+
+@dataclass(slots=True)
+class BlueprintItem:
+    item_id: int
+    type_id: int
+    location_id: int
+    location_flag: str
+    material_efficiency: int
+    time_efficiency: int
+    quantity: int
+    runs: int
+
+
+@dataclass(slots=True)
+class IndustryJob:
+    job_id: int
+    activity_id: int
+    blueprint_type_id: int
+    installer_id: int
+    output_location_id: int
+    runs: int
+    status: str
+    end_date: str
+    product_type_id: int = 0
+
+
+def _build_decoder(record_type) -> Callable[[bytes], list]:
+    """构造 bytes -> list[record_type] 的解析函数"""
+    if msgspec is not None:
+        decoder = msgspec.json.Decoder(list[record_type])
+        return decoder.decode
+
+    names = [f.name for f in fields(record_type)]
+
+    def decode(raw) -> list:
+        return [record_type(**{k: item[k] for k in names if k in item}) for item in json_loads(raw)]
+    return decode
+
+
+decode_market_orders = _build_decoder(MarketOrder)
+decode_assets = _build_decoder(AssetItem)
+decode_blueprints = _build_decoder(BlueprintItem)
+decode_industry_jobs = _build_decoder(IndustryJob)
+
+
+def get_decode_backend() -> str:
+    """返回当前使用的解析后端名称"""
+    if msgspec is not None:
+        return "msgspec"
+    if orjson is not None:
+        return "orjson"
+    return "json"
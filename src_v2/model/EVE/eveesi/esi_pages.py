@@ -0,0 +1,88 @@
+import asyncio
+import inspect
+from typing import AsyncIterator, Callable, Optional
+
+from src_v2.core.database.connect_manager import redis_manager as rdm
+from src_v2.core.utils import KahunaException, tqdm_manager
+from src_v2.core.log import logger
+
+from .eveutils import parse_token
+
+# 默认同时在途的分页请求数量
+DEFAULT_PAGE_WINDOW = 8
+
+
+async def esi_pages(
+        func: Callable, *args, window: int = DEFAULT_PAGE_WINDOW, progress_key: Optional[str] = None, **kwargs
+) -> AsyncIterator[list]:
+    """
+    流式拉取分页ESI接口，按到达顺序逐页返回数据
+
+    用法:
+        async for page in esi_pages(eveesi.markets_region_orders, REGION_FORGE_ID):
+            ...
+
+    Args:
+        func: 支持 single_page 参数的分页ESI函数，如 markets_region_orders，返回 (单页数据, 总页数)，
+              请求失败（包括网络错误）时单页数据为 None
+        *args: 传给 func 的位置参数（不含 page）
+        window: 同时在途的分页请求上限，峰值内存约为 window 页数据
+        progress_key: 可选的 redis 状态 key，写入 total_page 与 step_progress
+        **kwargs: 传给 func 的关键字参数（不含 page）
+    Yields:
+        单页数据列表，页的顺序不保证
+    """
+    window = max(1, window)
+
+    # access_token 可能是协程，需要在复用前解析一次
+    if args and inspect.isawaitable(args[0]):
+        args = (await parse_token(args[0]),) + args[1:]
+    if 'access_token' in kwargs:
+        kwargs['access_token'] = await parse_token(kwargs['access_token'])
+
+    first_page, pages = await func(*args, page=1, single_page=True, **kwargs)
+    if first_page is None:
+        raise KahunaException(f"ESI分页请求失败: {func.__name__} page 1")
+
+    mission_id = f"{func.__name__}_{'_'.join(str(a) for a in args if isinstance(a, int))}"
+    await tqdm_manager.add_mission(mission_id, pages)
+    if progress_key:
+        await rdm.r.hset(progress_key, "total_page", pages)
+        await rdm.r.hset(progress_key, "step_progress", 0)
+
+    async def fetch_page(p: int):
+        page_data, _ = await func(*args, page=p, single_page=True, **kwargs)
+        return p, page_data
+
+    pending = set()
+    next_page = 2
+    finished = 1
+    try:
+        await tqdm_manager.update_mission(mission_id)
+        yield first_page
+        del first_page
+
+        while next_page <= pages or pending:
+            # 补满窗口
+            while next_page <= pages and len(pending) < window:
+                pending.add(asyncio.create_task(fetch_page(next_page)))
+                next_page += 1
+
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                p, page_data = task.result()
+                if page_data is None:
+                    raise KahunaException(f"ESI分页请求失败: {func.__name__} page {p}")
+                finished += 1
+                await tqdm_manager.update_mission(mission_id)
+                if progress_key:
+                    await rdm.r.hset(progress_key, "step_progress", finished / pages)
+                yield page_data
+    finally:
+        # 调用方提前退出或出错时取消剩余请求
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.debug(f"{func.__name__} 流式分页提前结束，取消 {len(pending)} 个在途请求")
+        await tqdm_manager.complete_mission(mission_id)
@@ -0,0 +1,83 @@
+"""
+ESI 响应录制存储
+
+get_request_async 在录制模式下将真实 ESI 响应写入目录，本地 ESI 替身（benchmark/esi_emulator.py）从同一目录回放。
+每个响应保存为两个文件：
+    <key>.json  元数据（路径、参数、状态码、响应头）
+    <key>.body  原始响应体
+"""
+import hashlib
+import json
+import os
+from typing import Optional, Tuple
+from urllib.parse import urlsplit
+
+# 录制时保留的响应头
+RECORDED_HEADERS = ("X-Pages", "ETag", "Expires", "Last-Modified", "Cache-Control", "Content-Type")
+# 不参与匹配的查询参数
+IGNORED_PARAMS = {"datasource", "token"}
+
+
+def normalize_path(url_or_path: str) -> str:
+    """去掉协议/主机与 /latest 前缀，统一以 / 结尾"""
+    path = urlsplit(url_or_path).path or "/"
+    if path.startswith("/latest/"):
+        path = path[len("/latest"):]
+    if not path.endswith("/"):
+        path += "/"
+    return path
+
+
+def normalize_params(params: Optional[dict]) -> dict:
+    """统一参数为字符串，列表参数按逗号拼接"""
+    result = {}
+    for k, v in (params or {}).items():
+        if k in IGNORED_PARAMS or v is None:
+            continue
+        if isinstance(v, (list, tuple)):
+            v = ",".join(str(i) for i in v)
+        elif isinstance(v, bool):
+            v = "true" if v else "false"
+        result[str(k)] = str(v)
+    if result.get("page") == "1":
+        # page=1 与不带 page 等价
+        result.pop("page")
+    return result
+
+
+class ResponseStore:
+    """按 (路径, 参数) 存取录制的 ESI 响应"""
+
+    def __init__(self, root: str):
+        self.root = root
+
+    @staticmethod
+    def make_key(path: str, params: Optional[dict]) -> str:
+        normalized = json.dumps([normalize_path(path), normalize_params(params)], sort_keys=True)
+        return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+    def save(self, url: str, params: Optional[dict], status: int, headers, body: bytes):
+        os.makedirs(self.root, exist_ok=True)
+        key = self.make_key(url, params)
+        meta = {
+            "path": normalize_path(url),
+            "params": normalize_params(params),
+            "status": status,
+            "headers": {h: headers[h] for h in RECORDED_HEADERS if h in headers},
+        }
+        with open(os.path.join(self.root, f"{key}.body"), "wb") as f:
+            f.write(body)
+        with open(os.path.join(self.root, f"{key}.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False)
+
+    def load(self, path: str, params: Optional[dict]) -> Optional[Tuple[int, dict, bytes]]:
+        """返回 (状态码, 响应头, 响应体)，未录制时返回 None"""
+        key = self.make_key(path, params)
+        meta_path = os.path.join(self.root, f"{key}.json")
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(self.root, f"{key}.body"), "rb") as f:
+            body = f.read()
+        return meta["status"], meta["headers"], body
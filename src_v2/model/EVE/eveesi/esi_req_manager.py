@@ -1,12 +1,59 @@
+import os
 import time
 import math
 import asyncio
+import hashlib
+import inspect
 from collections import deque, defaultdict
 from functools import wraps
 from typing import Callable, Any, Awaitable, Dict, Optional, List, Tuple
 
+import jwt
+
 from src_v2.core.log import logger
 
+# 合并请求时不参与请求key计算的参数（access_token 会被替换为其身份标识）
+COALESCE_EXCLUDE_PARAMS = {"access_token", "log", "max_retries", "response_meta"}
+# 结果缓存最大条目数，超过后清理过期条目
+RESULT_CACHE_MAX_SIZE = 1024
+
+# 跨进程令牌桶默认配置
+DEFAULT_REDIS_BUCKET_KEY = "esi_rate_limit:bucket"
+DEFAULT_PREFETCH_TOKENS = 120
+
+# 令牌桶 Lua 脚本，保证多个进程对同一令牌池的累积/扣除是原子的
+# KEYS[1]: 令牌桶 hash key
+# ARGV: 产生速率, 最大容量, 期望获取数量, 最少获取数量, 惩罚数量
+# 返回: {实际获取数量, 剩余令牌数}
+TOKEN_BUCKET_LUA = """
+local key = KEYS[1]
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local min_take = tonumber(ARGV[4])
+local penalty = tonumber(ARGV[5])
+
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+
+local state = redis.call('HMGET', key, 'tokens', 'ts')
+local tokens = tonumber(state[1]) or 0
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+local granted = 0
+if penalty > 0 then
+    tokens = tokens - penalty
+elseif tokens >= min_take then
+    granted = math.min(requested, math.floor(tokens))
+    tokens = tokens - granted
+end
+
+redis.call('HSET', key, 'tokens', tostring(tokens), 'ts', tostring(now))
+redis.call('EXPIRE', key, 3600)
+return {granted, tostring(tokens)}
+"""
+
 # 定义请求对象类型
 class EsiRequest:
     def __init__(self, func: Callable, args: Tuple, kwargs: Dict, future: asyncio.Future, required_tokens: int = 60, limit: int = 5):
@@ -19,6 +66,34 @@ class EsiRequest:
         self.required_tokens = required_tokens  # 该请求需要的令牌数量
         self.limit = limit  # 该接口的限速值（每秒请求上限）
 
+class RedisTokenBucket:
+    """
+    基于 Redis Lua 脚本的跨进程令牌桶
+    同一 Redis 上的所有进程（hypercorn 多 worker、独立的资产拉取进程等）共享同一份令牌预算
+    """
+    def __init__(self, redis, key: str, rate: float, capacity: float):
+        self.key = key
+        self.rate = rate
+        self.capacity = capacity
+        self._script = redis.register_script(TOKEN_BUCKET_LUA)
+
+    async def take(self, requested: int, min_take: int) -> Tuple[int, float]:
+        """
+        从共享令牌池获取令牌，池中令牌不少于 min_take 时获取 min(requested, 可用令牌)
+        返回: (实际获取数量, 剩余令牌数)
+        """
+        granted, tokens = await self._script(
+            keys=[self.key], args=[self.rate, self.capacity, requested, min_take, 0]
+        )
+        return int(granted), float(tokens)
+
+    async def penalize(self, penalty_tokens: int) -> float:
+        """扣除惩罚令牌，返回剩余令牌数（可能为负）"""
+        _, tokens = await self._script(
+            keys=[self.key], args=[self.rate, self.capacity, 0, 0, penalty_tokens]
+        )
+        return float(tokens)
+
 class EsiReqManager:
     def __init__(self):
         # 使用字典存储不同函数类型的请求队列，实现轮询调度
@@ -35,6 +110,15 @@ class EsiReqManager:
         self.max_token_pool = 600  # 令牌池最大容量
         self.last_token_update_time = time.time()  # 上次更新令牌的时间戳
         self.lock = asyncio.Lock()  # 保护令牌池操作的锁
+
+        # 跨进程令牌桶（为None时使用进程内令牌池）
+        self.redis_bucket: Optional[RedisTokenBucket] = None
+        self.prefetch_tokens = DEFAULT_PREFETCH_TOKENS  # 每次从共享令牌池预取的令牌数量
+        self.prefetched_tokens = 0  # 已预取到本地、尚未使用的令牌
+
+        # 请求合并（single-flight）
+        self.inflight_requests: Dict[Tuple, asyncio.Future] = {}  # {request_key: 共享future}
+        self.result_cache: Dict[Tuple, Tuple[float, Any]] = {}  # {request_key: (过期时间戳, 结果)}
         
         # 日志
         self.logger = logger
@@ -43,8 +127,34 @@ class EsiReqManager:
         self._queue_task = None
         self._processing_task = None
 
+    def init_rate_limit_backend(self):
+        """
+        根据配置选择令牌桶后端
+        [ESI_RATE_LIMIT] Backend = "redis" 时使用 Redis 共享令牌池，否则使用进程内令牌池
+        """
+        from src_v2.core.config.config import config
+        from src_v2.core.database.connect_manager import redis_manager
+
+        backend = os.getenv('ESI_RATE_LIMIT_BACKEND') or config.get('ESI_RATE_LIMIT', 'Backend', fallback='local')
+        if backend != 'redis':
+            self.redis_bucket = None
+            return
+
+        try:
+            key = config.get('ESI_RATE_LIMIT', 'Redis_Key', fallback=DEFAULT_REDIS_BUCKET_KEY)
+            self.prefetch_tokens = config.getint('ESI_RATE_LIMIT', 'Prefetch_Tokens', fallback=DEFAULT_PREFETCH_TOKENS)
+            self.redis_bucket = RedisTokenBucket(
+                redis_manager.r, key, self.token_generation_rate, self.max_token_pool
+            )
+            self.logger.info(f"ESI令牌桶使用 Redis 共享令牌池: {key}，本地预取 {self.prefetch_tokens} 个令牌")
+        except Exception as e:
+            self.redis_bucket = None
+            self.logger.error(f"初始化 Redis 令牌桶失败，使用进程内令牌池: {e}")
+
     async def start(self):
         """启动请求处理协程"""
+        if self.redis_bucket is None:
+            self.init_rate_limit_backend()
         if self._queue_task is None or self._queue_task.done():
             self._queue_task = asyncio.create_task(self._accept_request())
             self.logger.info("ESI请求队列处理协程已启动")
@@ -76,8 +186,36 @@ class EsiReqManager:
         """
         获取指定数量的令牌，如果令牌不足则返回False
         令牌按时间连续累积，每秒产生token_generation_rate个令牌
+        配置了 Redis 令牌桶时从共享令牌池获取，每次多预取一部分令牌到本地以减少 Redis 往返
         返回: True表示获取成功并已消耗令牌，False表示令牌不足
         """
+        if self.redis_bucket is not None:
+            try:
+                return await self._get_shared_tokens(required_tokens)
+            except Exception as e:
+                self.logger.error(f"Redis 令牌桶获取令牌失败，本次使用进程内令牌池: {e}")
+        return await self._get_local_tokens(required_tokens)
+
+    async def _get_shared_tokens(self, required_tokens: int) -> bool:
+        """从 Redis 共享令牌池获取令牌"""
+        async with self.lock:
+            if self.prefetched_tokens < required_tokens:
+                granted, tokens = await self.redis_bucket.take(
+                    max(required_tokens, self.prefetch_tokens) - self.prefetched_tokens,
+                    required_tokens - self.prefetched_tokens
+                )
+                self.prefetched_tokens += granted
+                self.logger.debug(
+                    f"共享令牌池预取: 获得 {granted} 个, 本地预取 {self.prefetched_tokens} 个, 共享池剩余 {tokens:.2f}"
+                )
+
+            if self.prefetched_tokens >= required_tokens:
+                self.prefetched_tokens -= required_tokens
+                return True
+            return False
+
+    async def _get_local_tokens(self, required_tokens: int) -> bool:
+        """从进程内令牌池获取令牌"""
         async with self.lock:
             current_time = time.time()
             
@@ -125,6 +263,21 @@ class EsiReqManager:
         参数:
             penalty_tokens: 惩罚令牌数量，默认220（60 * 300 / 100，向上取整）
         """
+        if self.redis_bucket is not None:
+            try:
+                async with self.lock:
+                    # 本地预取的令牌一并作废，让所有进程一起放缓
+                    self.prefetched_tokens = 0
+                    tokens = await self.redis_bucket.penalize(penalty_tokens)
+                self.logger.warning(
+                    f"检测到ESI错误响应，共享令牌池扣除 {penalty_tokens} 个令牌，"
+                    f"当前令牌池: {tokens:.2f}, "
+                    f"预计恢复时间: {max(0, -tokens) / self.token_generation_rate:.2f}s"
+                )
+                return
+            except Exception as e:
+                self.logger.error(f"Redis 令牌桶扣除惩罚失败，本次使用进程内令牌池: {e}")
+
         async with self.lock:
             # 更新令牌池（先累积令牌）
             current_time = time.time()
@@ -325,19 +478,132 @@ class EsiReqManager:
                 # 如果出错，短暂暂停后继续
                 await asyncio.sleep(1)
 
+    def get_cached_result(self, key: Tuple) -> Tuple[bool, Any]:
+        """
+        获取请求key对应的短期缓存结果
+        返回: (是否命中, 结果)
+        """
+        cached = self.result_cache.get(key)
+        if cached is None:
+            return False, None
+        expires_at, result = cached
+        if expires_at < time.time():
+            self.result_cache.pop(key, None)
+            return False, None
+        return True, result
+
+    def register_inflight(self, key: Tuple, future: asyncio.Future, result_ttl: float = 0):
+        """
+        登记正在执行的请求，完成后自动移除，并按需写入短期结果缓存
+        """
+        self.inflight_requests[key] = future
+
+        def _on_done(fut: asyncio.Future):
+            if self.inflight_requests.get(key) is fut:
+                self.inflight_requests.pop(key, None)
+            if result_ttl <= 0 or fut.cancelled() or fut.exception() is not None:
+                return
+            result = fut.result()
+            # None 表示请求失败，不缓存
+            if result is None:
+                return
+            if len(self.result_cache) >= RESULT_CACHE_MAX_SIZE:
+                now = time.time()
+                for k in [k for k, (expires_at, _) in self.result_cache.items() if expires_at < now]:
+                    self.result_cache.pop(k, None)
+            self.result_cache[key] = (time.time() + result_ttl, result)
+
+        future.add_done_callback(_on_done)
+
 # 创建全局单例
 esi_manager = EsiReqManager()
 
+def _token_identity(token: str) -> str:
+    """
+    从 access token 中提取身份标识（JWT 的 sub，如 CHARACTER:EVE:123），不校验签名
+    无法解析时退化为 token 的摘要，保证不同身份的请求不会被合并
+    """
+    try:
+        payload = jwt.decode(token, options={"verify_signature": False})
+        sub = payload.get("sub")
+        if sub:
+            return sub
+    except Exception:
+        pass
+    return hashlib.sha256(token.encode()).hexdigest()
+
+def _normalize_arg(value):
+    """将参数转换为可哈希的规范形式，无法规范化时抛出 TypeError"""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize_arg(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((str(k), _normalize_arg(v)) for k, v in value.items()))
+    raise TypeError(f"无法规范化的参数类型: {type(value)}")
+
+def build_request_key(func: Callable, bound: inspect.BoundArguments) -> Optional[Tuple]:
+    """
+    根据函数和规范化后的参数构造请求key
+    access_token 以其身份标识代替，log/max_retries 等不影响结果的参数不参与计算
+    返回None表示该请求无法合并
+    """
+    items = []
+    for name, value in bound.arguments.items():
+        if name == "access_token":
+            if not isinstance(value, str):
+                return None
+            items.append((name, _token_identity(value)))
+            continue
+        if name in COALESCE_EXCLUDE_PARAMS:
+            continue
+        try:
+            items.append((name, _normalize_arg(value)))
+        except TypeError:
+            return None
+    return (func.__module__, func.__qualname__, tuple(items))
+
 # ESI函数装饰器
-def esi_request(limit: int = 5):
+def esi_request(limit: int = 5, coalesce: bool = True, result_ttl: float = 0):
     """
     装饰器，将ESI函数调用转换为队列请求
     参数:
         limit: 该接口每秒请求上限，默认值为5
+        coalesce: 是否合并并发的相同请求（函数相同且规范化参数相同，access_token 按身份区分），
+                  合并后所有调用方共享同一个结果对象，调用方不应修改返回值
+        result_ttl: 合并请求结果的短期缓存时间（秒），0表示不缓存
     """
     def decorator(func):
+        signature = inspect.signature(func)
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
+            request_key = None
+            if coalesce:
+                try:
+                    bound = signature.bind(*args, **kwargs)
+                except TypeError:
+                    bound = None
+                if bound is not None:
+                    bound.apply_defaults()
+                    # 先解析 access_token，按身份区分请求
+                    access_token = bound.arguments.get("access_token")
+                    if access_token is not None and inspect.isawaitable(access_token):
+                        bound.arguments["access_token"] = await access_token
+                        args, kwargs = bound.args, bound.kwargs
+                    request_key = build_request_key(func, bound)
+
+            if request_key is not None:
+                hit, cached_result = esi_manager.get_cached_result(request_key)
+                if hit:
+                    logger.debug(f"ESI请求命中短期缓存: {func.__name__}")
+                    return cached_result
+                shared_future = esi_manager.inflight_requests.get(request_key)
+                if shared_future is not None:
+                    logger.debug(f"ESI请求合并到进行中的相同请求: {func.__name__}")
+                    # shield 防止某个调用方取消时影响其他共享该结果的调用方
+                    return await asyncio.shield(shared_future)
+
             # 计算该接口需要的令牌数量
             # required_tokens = token_generation_rate / limit，向上取整，确保至少为1
             token_generation_rate = esi_manager.token_generation_rate
@@ -356,11 +622,16 @@ def esi_request(limit: int = 5):
 
             req = EsiRequest(execute_func, args, kwargs, future, required_tokens=required_tokens, limit=limit)
 
+            if request_key is not None:
+                esi_manager.register_inflight(request_key, future, result_ttl)
+
             # 将请求添加到队列
             await esi_manager.add_request(req)
             
             # 等待请求完成并返回结果
             try:
+                if request_key is not None:
+                    return await asyncio.shield(future)
                 return await future
             except Exception as e:
                 # 确保异常被正确传播
@@ -3,6 +3,7 @@ import asyncio
 # kahuna logger
 from src_v2.core.log import logger
 from .esi_req_manager import esi_request
+from .esi_pages import esi_pages
 
 from .esi_api.character import *
 from .esi_api.market import *
@@ -14,7 +15,8 @@ from .esi_api.assets import *
 
 permission_set = set()
 
-@esi_request
+# token 校验结果与 token 本身相关，不参与请求合并
+@esi_request(coalesce=False)
 async def verify_token(access_token, log=True):
     data, _, _ = await get_request_async("https://esi.evetech.net/verify/", headers={"Authorization": f"Bearer {access_token}"}, log=log)
     return data
@@ -1,14 +1,36 @@
+import os
 import json
+import time
 from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
 import asyncio
-from typing import Optional, Any
+from typing import Optional, Any, Callable
 import aiohttp
 import traceback
 
 from src_v2.core.log import logger
+from src_v2.core.config.config import config
+from .esi_decode import json_loads
+from .esi_record import ResponseStore
 
 OUT_PAGE_ERROR = 404
 FORBIDDEN_ERROR = 403
+NOT_MODIFIED = 304
+# 条件请求需要保存的响应头
+CACHE_HEADERS = ("ETag", "Expires", "Last-Modified")
+
+ESI_HOST = "https://esi.evetech.net"
+# 本地 ESI 替身地址，设置后所有 ESI 请求改发到该地址（用于压测/离线基准）
+ESI_BASE_URL = os.getenv('ESI_BASE_URL') or config.get('ESI_DEV', 'Base_URL', fallback='')
+# 录制目录，设置后成功的 ESI 响应会写入该目录，供本地 ESI 替身回放
+ESI_RECORD_DIR = os.getenv('ESI_RECORD_DIR') or config.get('ESI_DEV', 'Record_Dir', fallback='')
+esi_record_store = ResponseStore(ESI_RECORD_DIR) if ESI_RECORD_DIR else None
+
+def resolve_esi_url(url: str) -> str:
+    """配置了 ESI_BASE_URL 时将 ESI 地址替换为本地替身地址"""
+    if ESI_BASE_URL and url.startswith(ESI_HOST):
+        return ESI_BASE_URL.rstrip('/') + url[len(ESI_HOST):]
+    return url
 
 class DateTimeEncoder(json.JSONEncoder):
     """Custom JSONEncoder subclass to handle datetime objects."""
@@ -35,8 +57,20 @@ def parse_iso_datetime(dt_string):
         raise ValueError(f"无法解析时间字符串 '{dt_string}': {str(e)}")
 
 
+def expires_in(response_meta: dict) -> Optional[float]:
+    """响应头 Expires 距当前的秒数，缺失或无法解析时返回 None"""
+    value = response_meta.get("Expires") if response_meta else None
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value).timestamp() - time.time()
+    except (TypeError, ValueError):
+        return None
+
+
 async def get_request_async(
-        url, headers=None, params=None, log=True, max_retries=2, timeout=60, no_retry_code = None
+        url, headers=None, params=None, log=True, max_retries=2, timeout=60, no_retry_code = None,
+        decoder: Optional[Callable[[bytes], Any]] = None, response_meta: Optional[dict] = None
 ) -> Optional[Any]:
     """
     异步发送GET请求，带有重试机制
@@ -48,19 +82,35 @@ async def get_request_async(
         log: 是否记录日志
         max_retries: 最大重试次数
         timeout: 超时时间（秒）
+        decoder: 可选的 bytes 解析函数（如 esi_decode.decode_market_orders），为空时解析为 dict/list
+        response_meta: 传入 dict 时写入 ETag/Expires/Last-Modified 响应头，用于下次条件请求（请求头带 If-None-Match）
     Returns:
         (data, pages, status_code): 成功时返回数据和页数及状态码
+        (None, 0, 304): 条件请求命中，数据未变化
         (None, 0, status_code): 失败时返回None和状态码
     """
+    url = resolve_esi_url(url)
     for attempt in range(max_retries):
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.get(url, params=params, headers=headers,
                                        timeout=aiohttp.ClientTimeout(total=timeout)) as response:
                     status_code = response.status
+                    if response_meta is not None and status_code in (200, NOT_MODIFIED):
+                        response_meta.update({h: response.headers[h] for h in CACHE_HEADERS if h in response.headers})
+                    if status_code == NOT_MODIFIED:
+                        return None, 0, status_code
                     if status_code == 200:
                         try:
-                            data = await asyncio.wait_for(response.json(), timeout=timeout)
+                            if esi_record_store is not None:
+                                raw = await asyncio.wait_for(response.read(), timeout=timeout)
+                                await asyncio.to_thread(
+                                    esi_record_store.save, url, params, status_code, response.headers, raw
+                                )
+                            if decoder is not None:
+                                data = decoder(await asyncio.wait_for(response.read(), timeout=timeout))
+                            else:
+                                data = await asyncio.wait_for(response.json(loads=json_loads), timeout=timeout)
                             pages = response.headers.get('X-Pages')
                             if pages:
                                 pages = int(pages)
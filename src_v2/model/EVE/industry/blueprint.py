@@ -1,5 +1,5 @@
 from functools import wraps
-from typing import Callable, Optional, List
+from typing import Callable, Optional, List, Dict, Iterable, Tuple
 from cachetools import LRUCache
 import asyncio
 from sqlalchemy import select
@@ -9,6 +9,7 @@ from ..sde.sde_builder import IndustryActivityMaterials, IndustryActivityProduct
 from ..sde.utils import get_db_manager
 from src_v2.core.database.neo4j_utils import Neo4jIndustryUtils as NIU
 from src_v2.core.database.connect_manager import neo4j_manager
+from src_v2.core.database.neo4j_models import Blueprint, GraphVersion
 from src_v2.core.utils import tqdm_manager
 
 from src_v2.core.log import logger
@@ -16,6 +17,13 @@ from src_v2.core.log import logger
 # 限制并发任务数量的信号量，防止连接池耗尽
 # 设置为 50，确保不超过连接池大小（200）的合理比例
 
+# 45732 是测试用蓝图，会导致误判，构建蓝图图谱时排除
+TEST_BLUEPRINT_TYPE_ID = 45732
+# 蓝图图谱在 GraphVersion 中的名称，版本为导入时的 SDE buildNumber
+BP_GRAPH_NAME = "blueprint"
+# 批量写入 Neo4j 时每个事务的行数
+BP_GRAPH_BATCH_SIZE = 5000
+
 def async_lru_cache(maxsize: int = 128):
     """
     异步LRU缓存装饰器
@@ -58,6 +66,68 @@ def async_lru_cache(maxsize: int = 128):
     return decorator
 
 
+def build_bp_graph(
+    product_rows: Iterable[Tuple[int, int, int, Optional[int]]],
+    material_rows: Iterable[Tuple[int, int, int, Optional[int]]],
+    activity_id_map: Dict[int, str],
+) -> Tuple[Dict[int, dict], List[dict]]:
+    """
+    由蓝图产出表与材料表在内存中计算整张蓝图依赖图，结果与逐个调用 fill_bp_node_and_link_child 一致
+    
+    参数:
+        product_rows: (blueprintTypeID, activityID, productTypeID, quantity)
+        material_rows: (blueprintTypeID, activityID, materialTypeID, quantity)
+        activity_id_map: activityID -> 活动名称
+    返回:
+        (nodes, edges)
+        nodes: {type_id: {"type_id", "bp_type_id"}}，包含全部产品及其材料
+        edges: [{"product", "material", "material_num", "product_num", "activity_id", "activity_type"}]
+    """
+    # 蓝图 -> 制造/反应材料
+    bp_materials: Dict[int, List[Tuple[int, Optional[int]]]] = {}
+    for bp_id, activity_id, material_id, quantity in material_rows:
+        if activity_id in (1, 11):
+            bp_materials.setdefault(bp_id, []).append((material_id, quantity))
+
+    products: Dict[int, List[Tuple[int, int, Optional[int]]]] = {}
+    for bp_id, activity_id, product_id, quantity in product_rows:
+        rows = products.setdefault(product_id, [])
+        if bp_id != TEST_BLUEPRINT_TYPE_ID:
+            rows.append((bp_id, activity_id, quantity))
+
+    nodes: Dict[int, dict] = {}
+    edges: List[dict] = []
+    for product_id, rows in products.items():
+        # 优先制造活动（1），其次反应活动（11）
+        producing = sorted((row for row in rows if row[1] in (1, 11)), key=lambda row: row[1])
+        bp_type_id, activity_id = (producing[0][0], producing[0][1]) if producing else (None, None)
+        nodes[product_id] = {"type_id": product_id, "bp_type_id": bp_type_id}
+
+        # 与 get_bp_product_quantity_typeid 一致：恰好一条产出记录时取其数量，否则为 1
+        product_num = (rows[0][2] or 1) if len(rows) == 1 else 1
+        activity_type = activity_id_map.get(activity_id, "Unknown") if activity_id is not None else "Unknown"
+
+        # 与 get_bp_materials 一致：该产品所有产出记录对应蓝图的制造/反应材料，同一材料后者覆盖前者
+        materials: Dict[int, Optional[int]] = {}
+        for bp_id, _, _ in rows:
+            for material_id, quantity in bp_materials.get(bp_id, ()):
+                materials[material_id] = quantity
+        for material_id, quantity in materials.items():
+            edges.append({
+                "product": product_id,
+                "material": material_id,
+                "material_num": quantity,
+                "product_num": product_num,
+                "activity_id": activity_id,
+                "activity_type": activity_type,
+            })
+
+    for edge in edges:
+        if edge["material"] not in nodes:
+            nodes[edge["material"]] = {"type_id": edge["material"], "bp_type_id": None}
+    return nodes, edges
+
+
 class BPManager:
     ACTIVITY_ID_MAP = {
         1: "Manufacturing",
@@ -354,21 +424,77 @@ class BPManager:
             return [row[0] for row in result]
 
     @classmethod
-    async def init_bp_data_to_neo4j(cls):
-        product_typeids = await cls.get_all_product_typeids()
-        semaphore = asyncio.Semaphore(50)
-        # 使用信号量限制并发任务数量，防止连接池耗尽
-        async def process_with_semaphore(product_typeid):
-            async with semaphore:
-                return await cls.fill_bp_node_and_link_child(product_typeid, finished_set, root=True)
-
-        finished_set = set()
-        await tqdm_manager.add_mission("init_bp_data_to_neo4j", len(product_typeids))
-        tasks = [
-            asyncio.create_task(process_with_semaphore(product_typeid)) for product_typeid in product_typeids
-        ]
-        await asyncio.gather(*tasks)
-        await tqdm_manager.complete_mission("init_bp_data_to_neo4j")
+    async def get_bp_graph_rows(cls) -> Tuple[list, list]:
+        """整表读取蓝图产出与材料记录"""
+        async with (await get_db_manager()).get_readonly_session() as session:
+            product_rows = (await session.execute(select(
+                IndustryActivityProducts.blueprintTypeID, IndustryActivityProducts.activityID,
+                IndustryActivityProducts.productTypeID, IndustryActivityProducts.quantity
+            ))).all()
+            material_rows = (await session.execute(select(
+                IndustryActivityMaterials.blueprintTypeID, IndustryActivityMaterials.activityID,
+                IndustryActivityMaterials.materialTypeID, IndustryActivityMaterials.quantity
+            ))).all()
+        return product_rows, material_rows
+
+    @classmethod
+    async def init_bp_data_to_neo4j(cls, force: bool = False) -> bool:
+        """
+        批量导入蓝图依赖图：在内存中算出全部节点与边，用 UNWIND MERGE 分批写入
+        以 SDE 版本号作为版本标记，版本未变时直接跳过；重复执行结果不变，新版本中已不存在的节点与边会被删除
+        参数:
+            force (bool): 忽略版本标记强制重新导入
+        返回:
+            bool: 是否执行了导入
+        """
+        version = await SdeUtils.get_build_number()
+        if version is None:
+            logger.warning("SDE 中没有版本信息，跳过蓝图图谱导入")
+            return False
+        if not force and await NIU.get_graph_version(BP_GRAPH_NAME) == version:
+            logger.info(f"蓝图图谱已是 SDE 版本 {version}，跳过导入")
+            return False
+
+        # UNWIND MERGE 依赖 type_id 唯一约束自带的索引
+        await NIU.ensure_constraints(Blueprint, GraphVersion)
+
+        product_rows, material_rows = await cls.get_bp_graph_rows()
+        nodes, edges = build_bp_graph(product_rows, material_rows, cls.ACTIVITY_ID_MAP)
+        type_ids = list(nodes)
+        type_rows = await SdeUtils.get_type_rows(type_ids)
+        market_paths = await SdeUtils.get_market_group_paths(type_ids)
+
+        node_rows = []
+        for type_id, node in nodes.items():
+            row = type_rows.get(type_id, {})
+            node_rows.append({
+                "type_id": type_id,
+                "type_name": row.get("name_en"),
+                "group_name": row.get("group_name_en"),
+                "category": row.get("category_name_en"),
+                "meta": row.get("meta_name_en"),
+                "market_list": market_paths.get(type_id, []),
+                "bp_type_id": node["bp_type_id"],
+                "sde_version": version,
+            })
+        for edge in edges:
+            edge["sde_version"] = version
+
+        node_count = await NIU.batch_merge_nodes("Blueprint", ["type_id"], node_rows, BP_GRAPH_BATCH_SIZE)
+        edge_count = await NIU.batch_merge_relations(
+            "Blueprint", {"type_id": "product"},
+            "BP_DEPEND_ON", ["product", "material"],
+            "Blueprint", {"type_id": "material"},
+            edges, BP_GRAPH_BATCH_SIZE
+        )
+        stale_edges = await NIU.delete_stale("BP_DEPEND_ON", "sde_version", version, relation=True)
+        stale_nodes = await NIU.delete_stale("Blueprint", "sde_version", version)
+        await NIU.set_graph_version(BP_GRAPH_NAME, version)
+        logger.info(
+            f"蓝图图谱导入完成 (SDE {version}): 节点 {node_count}, 关系 {edge_count}, "
+            f"删除过期节点 {stale_nodes}, 过期关系 {stale_edges}"
+        )
+        return True
 
     @classmethod
     async def fill_bp_node_and_link_child(cls, product_typeid: int, finished_set: set, root=False):
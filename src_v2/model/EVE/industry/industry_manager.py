@@ -6,7 +6,7 @@ from asyncio import Queue
 from enum import Flag
 from itertools import product
 from math import ceil, sqrt
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
 # 本地导入 - 核心工具
 from src_v2.core.database.connect_manager import (
@@ -33,6 +33,8 @@ from src_v2.core.utils import KahunaException, SingletonMeta, tqdm_manager
 from src_v2.model.EVE.character import CharacterManager
 from src_v2.model.EVE.eveesi import eveesi
 from src_v2.model.EVE.market.market_manager import MarketManager
+from src_v2.model.EVE.market.price_models import PLAN_BUY_PRICE_FIELD, PLAN_SELL_PRICE_FIELD
+from src_v2.model.EVE.market.price_service import PriceService
 from src_v2.model.EVE.sde import SdeUtils
 
 # 本地导入 - 相对导入
@@ -44,6 +46,7 @@ from .industry_utils import (
     AsyncCounter,
     MarketTree,
     get_market_tree,
+    get_market_tree_export,
     create_config_flow_config,
     fetch_recommended_presets,
     delete_config_flow_config,
@@ -101,10 +104,14 @@ class IndustryManager(metaclass=SingletonMeta):
                 "products": []
             }
         
-        async for product in await EveIndustryPlanProductDBUtils.select_all_by_user_name(user_name):
+        products = [product async for product in await EveIndustryPlanProductDBUtils.select_all_by_user_name(user_name)]
+        product_type_ids = {product.product_type_id for product in products}
+        type_names = await SdeUtils.get_names_by_ids(product_type_ids)
+        type_names_zh = await SdeUtils.get_names_by_ids(product_type_ids, zh=True)
+        for product in products:
             logger.info(f"获取计划表格数据: {product.plan_name} {product.product_type_id} {product.quantity}")
-            type_name = await SdeUtils.get_name_by_id(product.product_type_id)
-            type_name_zh = await SdeUtils.get_cn_name_by_id(product.product_type_id)
+            type_name = type_names[product.product_type_id]
+            type_name_zh = type_names_zh[product.product_type_id]
             plan_list[product.plan_name]["products"].append({
                 "row_id": await row_id_counter.next_node(),
                 "index_id": product.index_id,
@@ -297,6 +304,15 @@ class IndustryManager(metaclass=SingletonMeta):
         logger.info("收集关系数据")
         
         relations = await NIU.get_user_plan_relation(user_name, plan_name)
+        # 整个计划的材料报价一次批量读取
+        plan_prices = await PriceService().get_many(
+            set(node_dict) | {relation['material'] for relation in relations},
+            (PLAN_BUY_PRICE_FIELD, PLAN_SELL_PRICE_FIELD),
+        )
+        # 整个计划用到的物品名称一次批量读取
+        plan_type_ids = set(node_dict) | {relation['material'] for relation in relations} | set(op.index_product_dict.values())
+        type_names = await SdeUtils.get_names_by_ids(plan_type_ids)
+        type_names_zh = await SdeUtils.get_names_by_ids(plan_type_ids, zh=True)
         await tqdm_manager.add_mission(f"收集关系数据 {plan_name}", len(relations))
         await rdm.r.hset(op.current_progress_key, mapping={"name": "收集关系数据", "progress": 0, "is_indeterminate": 1})
         last_progress = 0
@@ -320,7 +336,7 @@ class IndustryManager(metaclass=SingletonMeta):
                     eiv_cost_dict[top_product_type_id] = {
                         "eiv_cost": 0,
                         "type_id": top_product_type_id,
-                        "type_name": await SdeUtils.get_name_by_id(top_product_type_id),
+                        "type_name": type_names[top_product_type_id],
                         "index_id": relation["index_id"],
                         "product_num": op.product_num_dict[top_product_type_id],
                         "children": [],
@@ -331,13 +347,13 @@ class IndustryManager(metaclass=SingletonMeta):
                 })
                 if op.get_node_type(relation['material']) != "product":
                     material_type_node = await cls._get_material_type(relation['material'])
-                    jita_buy_price = await rdm.r.hget(f"market_price:jita:{relation['material']}", "max_buy")
+                    jita_buy_price = plan_prices[relation['material']][PLAN_BUY_PRICE_FIELD]
                     eiv_cost_dict[top_product_type_id]['children'].append({
                         "type_id": relation['material'],
-                        "type_name": await SdeUtils.get_name_by_id(relation['material']),
+                        "type_name": type_names[relation['material']],
                         "index_id": relation["index_id"],
                         "quantity": relation['quantity'],
-                        "jita_buy_price": jita_buy_price if jita_buy_price else 0,
+                        "jita_buy_price": jita_buy_price if jita_buy_price is not None else 0,
                         "material_type_node": material_type_node,
                     })
             
@@ -396,13 +412,13 @@ class IndustryManager(metaclass=SingletonMeta):
         await tqdm_manager.add_mission(f"分类节点 {plan_name}", len(node_dict))
         for node in node_dict.values():
             # 整理库存状态
-            node['tpye_name_zh'] = await SdeUtils.get_cn_name_by_id(node['type_id'])
+            node['tpye_name_zh'] = type_names_zh[node['type_id']]
             if op.get_node_type(node['type_id']) != "product":
                 material_type_node = await cls._get_material_type(node['type_id'])
-                buy_price = await rdm.r.hget(f"market_price:jita:{node['type_id']}", "max_buy")
-                sell_price = await rdm.r.hget(f"market_price:jita:{node['type_id']}", "min_sell")
-                node['buy_price'] = buy_price if buy_price else 0
-                node['sell_price'] = sell_price if sell_price else 0
+                buy_price = plan_prices[node['type_id']][PLAN_BUY_PRICE_FIELD]
+                sell_price = plan_prices[node['type_id']][PLAN_SELL_PRICE_FIELD]
+                node['buy_price'] = buy_price if buy_price is not None else 0
+                node['sell_price'] = sell_price if sell_price is not None else 0
                 material_output[material_type_node]['children'].append(node)
             else:
                 flow_output[node['max_distance'] - 1]["children"].append(node)
@@ -415,8 +431,8 @@ class IndustryManager(metaclass=SingletonMeta):
             work_flow.extend([{
                     "type_id": work["type_id"],
                     "active_id": await BPM.get_activity_id_by_product_typeid(work["type_id"]),
-                    "type_name_zh": await SdeUtils.get_cn_name_by_id(work["type_id"]),
-                    "type_name": await SdeUtils.get_name_by_id(work["type_id"]),
+                    "type_name_zh": type_names_zh[work["type_id"]],
+                    "type_name": type_names[work["type_id"]],
                     "avaliable": work["avaliable"],
                     "runs": work["runs"],
                     "bp_object": work["bp_object"],
@@ -496,13 +512,20 @@ class IndustryManager(metaclass=SingletonMeta):
                             logistic_dict[(lack_structure_id, provide_structure_id, lack_type_id)]["provide_quantity"] += provide_quantity
         # 整理为可以持计划的数据
         save_logistic_data = []
+        logistic_system_infos = await SdeUtils.get_system_infos(
+            info[role]["system_id"] for info in logistic_dict.values()
+            for role in ("provide_structure_info", "lack_structure_info")
+        )
+        lack_type_ids = list({lack_type_id for _, _, lack_type_id in logistic_dict})
+        lack_type_names = await SdeUtils.get_names_by_ids(lack_type_ids, zh=True)
+        lack_type_volumes = dict(zip(lack_type_ids, (await SdeUtils.get_volumes(lack_type_ids)).tolist()))
         for d, logistic_info in logistic_dict.items():
             lack_structure_id, provide_structure_id, lack_type_id = d
             provide_structure_info = logistic_info["provide_structure_info"]
             lack_structure_info = logistic_info["lack_structure_info"]
             light_year = 9.461e15
-            provide_system_info = await SdeUtils.get_system_info_by_id(provide_structure_info["system_id"])
-            lack_system_info = await SdeUtils.get_system_info_by_id(lack_structure_info["system_id"])
+            provide_system_info = logistic_system_infos[int(provide_structure_info["system_id"])]
+            lack_system_info = logistic_system_infos[int(lack_structure_info["system_id"])]
             save_logistic_data.append({
                 "lack_structure_id": lack_structure_id,
                 "lack_structure_name": lack_structure_info["structure_name"],
@@ -520,9 +543,9 @@ class IndustryManager(metaclass=SingletonMeta):
                     (provide_system_info["z"] - lack_system_info["z"])**2
                 ) / light_year,
                 "lack_type_id": lack_type_id,
-                "lack_type_name": await SdeUtils.get_cn_name_by_id(lack_type_id),
+                "lack_type_name": lack_type_names[lack_type_id],
                 "provide_quantity": logistic_info["provide_quantity"],
-                "provide_volume": await SdeUtils.get_volume_by_type_id(lack_type_id) * logistic_info["provide_quantity"],
+                "provide_volume": lack_type_volumes[lack_type_id] * logistic_info["provide_quantity"],
             })
 
 
@@ -547,6 +570,11 @@ class IndustryManager(metaclass=SingletonMeta):
         """获取市场树（代理方法，保持向后兼容）"""
         return await get_market_tree(node)
 
+    @staticmethod
+    async def get_market_tree_export() -> Optional[dict]:
+        """获取整棵市场树导出（按 SDE 版本缓存），供前端一次性加载"""
+        return await get_market_tree_export()
+
     @classmethod
     async def _init_index_root_status(cls, plan_user_dict: dict, product_data: dict):
         pass
@@ -885,19 +913,10 @@ class IndustryManager(metaclass=SingletonMeta):
         ]
 
         # 系数成本计算 ==============================================================================================
-        structure_info = await op.get_type_assign_structure_info(product_type_id)
-        if not structure_info:
-            # raise KahunaException(f"物品 {product_type_id}: {await SdeUtils.get_name_by_id(product_type_id)} 未分配建筑")
-            system_cost = {"manufacturing": 0.14 / 100, "reaction": 0.14 / 100}
-        else:
-            system_cost = await op.get_system_cost(structure_info['system_id'])
-        
+        # 未分配建筑时使用默认成本指数，系数在更新树状态前已对全部产品批量计算
+        job_cost_factor = await op.get_job_cost_factor(product_type_id, self_relation['activity_id'])
         material_adjust_price = await op.get_type_adjust_price(material_type_id)
-        
-        actype = "manufacturing" if self_relation['activity_id'] == 1 else "reaction"
-        if "manufacturing" not in system_cost:
-            logger.error(f"system_cost {system_cost} not have {actype}")
-        eiv_cost = float(float(system_cost[actype]) + 0.04) * material_adjust_price * self_relation['material_num']
+        eiv_cost = job_cost_factor * material_adjust_price * self_relation['material_num']
         real_eiv_cost_list = [eiv_cost * work['runs'] for work in job_list]
         quantity_material_need = sum(quantity_material_need_list)
         real_quantity_material_need = sum(real_quantity_material_need_list)
@@ -987,6 +1006,14 @@ class IndustryManager(metaclass=SingletonMeta):
         plan_settings = json.loads(plan_node['plan_settings'])
         plan_settings["operate_center"] = op
         all_relation_list = await NIU.get_relations("PLAN_BP_DEPEND_ON", {"user_name": user_name, "plan_name": plan_name})
+        await op.prefetch_type_adjust_price({relation['relation']['material'] for relation in all_relation_list})
+        await op.prefetch_job_cost_factor(
+            (relation['relation']['product'], relation['relation']['activity_id']) for relation in all_relation_list
+        )
+        await op.prefetch_keyword_attrs(
+            type_id for relation in all_relation_list
+            for type_id in (relation['relation']['product'], relation['relation']['material'])
+        )
 
         async def relation_calculater_with_semaphore(relation: dict, product_node_in_relation: List[dict], same_route_relations: List[dict]):
             async with neo4j_manager.semaphore:
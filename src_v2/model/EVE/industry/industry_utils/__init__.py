@@ -4,7 +4,7 @@ industry_utils 模块
 """
 
 from .async_counter import AsyncCounter
-from .market_tree import MarketTree, get_market_tree
+from .market_tree import MarketTree, get_market_tree, get_market_tree_export
 from .config_utils import (
     create_config_flow_config,
     fetch_recommended_presets,
@@ -34,6 +34,7 @@ __all__ = [
     'AsyncCounter',
     'MarketTree',
     'get_market_tree',
+    'get_market_tree_export',
     'create_config_flow_config',
     'fetch_recommended_presets',
     'delete_config_flow_config',
@@ -1,20 +1,151 @@
 # 标准库导入
 import asyncio
-from typing import Dict, List
+import time
+from typing import Dict, List, Optional, Tuple
 
 # 本地导入 - 核心工具
 from src_v2.core.database.connect_manager import neo4j_manager
 from src_v2.core.database.neo4j_utils import Neo4jIndustryUtils as NIU
-from src_v2.core.utils import tqdm_manager
+from src_v2.core.database.neo4j_models import MarketGroup, Type, GraphVersion
+from src_v2.core.log import logger
 
 # 本地导入 - EVE 模块
 from src_v2.model.EVE.sde import SdeUtils
-from src_v2.model.EVE.sde.sde_builder import InvTypes, MarketGroups
+from src_v2.model.EVE.sde.sde_builder import InvTypes, MarketGroups, IndustryActivityProducts
 from src_v2.model.EVE.sde.utils import get_db_manager
 from sqlalchemy import select
 
 # 本地导入 - 相对导入
-from ..blueprint import BPManager as BPM
+from ..blueprint import BPManager as BPM, build_bp_graph
+
+# 市场树在 GraphVersion 中的名称，版本为导入时的 SDE buildNumber
+MARKET_TREE_GRAPH_NAME = "market_tree"
+# 批量写入 Neo4j 时每个事务的行数
+MARKET_TREE_BATCH_SIZE = 5000
+
+# 导出缓存命中后复用 SDE 版本号的秒数，期间的请求不再查询版本
+MARKET_TREE_VERSION_TTL = 300
+
+# 前端市场树导出缓存：{"version": SDE 版本, "children": {"root" 或 market_group_id: [节点字典]}}
+_market_tree_export: Optional[dict] = None
+_market_tree_export_lock = asyncio.Lock()
+# 上次确认导出缓存版本的时间（time.monotonic）
+_market_tree_version_checked_at = 0.0
+# 市场树行数据缓存：(SDE 版本, 市场组行, 物品行)，导入市场组、导入物品与导出共用一次读取
+_market_tree_rows: Optional[Tuple[int, List[Dict], List[Dict]]] = None
+
+
+async def load_market_tree_rows() -> Tuple[List[Dict], List[Dict]]:
+    """整表读取市场组与挂在市场组下的物品，转换为 Neo4j 节点属性
+    
+    Returns:
+        (市场组属性列表（含 parent_group_id）, 物品属性列表（含 market_group_id）)
+    """
+    async with (await get_db_manager()).get_readonly_session() as session:
+        market_groups = (await session.execute(select(
+            MarketGroups.marketGroupID, MarketGroups.hasTypes, MarketGroups.iconID,
+            MarketGroups.nameID_en, MarketGroups.nameID_zh, MarketGroups.parentGroupID
+        ))).all()
+        types = (await session.execute(
+            select(InvTypes.typeID, InvTypes.marketGroupID, InvTypes.typeName_en, InvTypes.typeName_zh)
+            .where(InvTypes.marketGroupID.isnot(None))
+        )).all()
+        product_rows = (await session.execute(select(
+            IndustryActivityProducts.blueprintTypeID, IndustryActivityProducts.activityID,
+            IndustryActivityProducts.productTypeID, IndustryActivityProducts.quantity
+        ))).all()
+    
+    group_rows = [
+        {
+            "market_group_id": row.marketGroupID,
+            "has_types": row.hasTypes,
+            "icon_id": row.iconID,
+            "name_id": row.nameID_en,
+            "name_id_zh": row.nameID_zh,
+            "parent_group_id": row.parentGroupID,
+        }
+        for row in market_groups
+    ]
+    
+    # 与 BPManager.get_bp_id_by_prod_typeid 一致：优先制造蓝图，其次反应配方
+    bp_nodes, _ = build_bp_graph(product_rows, [], BPM.ACTIVITY_ID_MAP)
+    type_infos = await SdeUtils.get_type_rows([row.typeID for row in types])
+    type_rows = []
+    for row in types:
+        info = type_infos.get(row.typeID, {})
+        bp_node = bp_nodes.get(row.typeID)
+        type_rows.append({
+            "type_id": row.typeID,
+            "type_name": row.typeName_en,
+            "type_name_zh": row.typeName_zh,
+            "meta_group_name": info.get("meta_name_en"),
+            "category_name": info.get("category_name_en"),
+            "category_name_zh": info.get("category_name_zh"),
+            "bp_id": bp_node["bp_type_id"] if bp_node else None,
+            "market_group_id": row.marketGroupID,
+        })
+    return group_rows, type_rows
+
+
+async def get_market_tree_rows(version: int) -> Tuple[List[Dict], List[Dict]]:
+    """按 SDE 版本缓存 load_market_tree_rows 的结果，同一版本只读取一次数据库"""
+    global _market_tree_rows
+    cached = _market_tree_rows
+    if cached is None or cached[0] != version:
+        group_rows, type_rows = await load_market_tree_rows()
+        cached = _market_tree_rows = (version, group_rows, type_rows)
+    return cached[1], cached[2]
+
+
+def _market_group_view(row: Dict) -> Dict:
+    node = {key: row.get(key) for key in ("market_group_id", "has_types", "icon_id", "name_id", "name_id_zh")}
+    node["hasChildren"] = True
+    node["row_id"] = node["market_group_id"]
+    node["name"] = node["name_id_zh"]
+    return node
+
+
+def _type_view(row: Dict) -> Dict:
+    node = {key: value for key, value in row.items() if key != "market_group_id"}
+    node["hasChildren"] = False
+    node["row_id"] = node["type_id"]
+    node["name"] = node.get("type_name_zh")
+    node["can_add_plan"] = bool(node.get("bp_id"))
+    return node
+
+
+def build_market_tree_export(group_rows: List[Dict], type_rows: List[Dict], version: Optional[int]) -> dict:
+    """按父节点分组整棵市场树，节点字段与 get_market_tree 的返回一致"""
+    children: Dict = {"root": []}
+    for row in sorted(group_rows, key=lambda row: row["market_group_id"]):
+        children.setdefault(row["parent_group_id"] or "root", []).append(_market_group_view(row))
+    for row in sorted(type_rows, key=lambda row: row["type_id"]):
+        children.setdefault(row["market_group_id"], []).append(_type_view(row))
+    return {"version": version, "children": children}
+
+
+async def get_market_tree_export() -> Optional[dict]:
+    """获取前端市场树导出，按 SDE 版本缓存在内存中；SDE 没有版本信息时返回 None
+    
+    缓存命中后 MARKET_TREE_VERSION_TTL 秒内直接返回，不再逐次查询 SDE 版本
+    """
+    global _market_tree_export, _market_tree_version_checked_at
+    export = _market_tree_export
+    if export is not None and time.monotonic() - _market_tree_version_checked_at < MARKET_TREE_VERSION_TTL:
+        return export
+    version = await SdeUtils.get_build_number()
+    if version is None:
+        return None
+    if export is not None and export["version"] == version:
+        _market_tree_version_checked_at = time.monotonic()
+        return export
+    async with _market_tree_export_lock:
+        if _market_tree_export is None or _market_tree_export["version"] != version:
+            group_rows, type_rows = await get_market_tree_rows(version)
+            _market_tree_export = build_market_tree_export(group_rows, type_rows, version)
+            logger.info(f"市场树导出已更新 (SDE {version})")
+        _market_tree_version_checked_at = time.monotonic()
+        return _market_tree_export
 
 
 async def get_market_tree(node) -> List[Dict]:
@@ -26,48 +157,46 @@ async def get_market_tree(node) -> List[Dict]:
     Returns:
         List[Dict]: 节点字典列表
     """
+    export = await get_market_tree_export()
+    if export is not None:
+        key = "root" if node == "root" else int(node)
+        return [dict(child) for child in export["children"].get(key, [])]
+    return await get_market_tree_from_neo4j(node)
+
+
+async def get_market_tree_from_neo4j(node) -> List[Dict]:
+    """从 Neo4j 查询市场树的一层子节点（参数化查询，按 market_group_id 索引定位）"""
     async with neo4j_manager.get_session() as session:
         if node == "root":
             query = """
-            match (a:MarketGroup)
-            where not exists { (a)-[]->() }
-            return a
+            MATCH (a:MarketGroup)
+            WHERE NOT EXISTS { (a)-[:EVE_MARKET_GROUP]->() }
+            RETURN a
+            ORDER BY a.market_group_id
             """
             result = await session.run(query)
             nodes = []
             async for record in result:
                 node_obj = record["a"]
                 if node_obj:
-                    node_dict = dict(node_obj)
-                    node_dict["hasChildren"] = True
-                    node_dict['row_id'] = node_dict['market_group_id']
-                    node_dict["name"] = node_dict["name_id_zh"]
-                    nodes.append(node_dict)
+                    nodes.append(_market_group_view({**dict(node_obj), "parent_group_id": None}))
             return nodes
         else:
-            query = f"""
-            match (b)-[]->(a:MarketGroup {{market_group_id:{node}}}) return b
+            query = """
+            MATCH (b)-[:EVE_MARKET_GROUP]->(a:MarketGroup {market_group_id: $market_group_id})
+            RETURN b
+            ORDER BY coalesce(b.market_group_id, b.type_id)
             """
-            result = await session.run(query)
+            result = await session.run(query, {"market_group_id": int(node)})
             nodes = []
             async for record in result:
                 node_b = record.get("b")
                 if node_b:
                     node_dict_b = dict(node_b)
                     if node_dict_b.get("type_id"):
-                        bp_id = await BPM.get_bp_id_by_prod_typeid(node_dict_b["type_id"])
-                        node_dict_b["hasChildren"] = False
-                        node_dict_b["row_id"] = node_dict_b["type_id"]
-                        node_dict_b["name"] = node_dict_b["type_name_zh"]
-                        if bp_id:
-                            node_dict_b["can_add_plan"] = True
-                        else:
-                            node_dict_b["can_add_plan"] = False
+                        nodes.append(_type_view(node_dict_b))
                     else:
-                        node_dict_b["hasChildren"] = True
-                        node_dict_b['row_id'] = node_dict_b['market_group_id']
-                        node_dict_b["name"] = node_dict_b["name_id_zh"]
-                    nodes.append(node_dict_b)
+                        nodes.append(_market_group_view({**node_dict_b, "parent_group_id": int(node)}))
             return nodes
 
 
@@ -78,123 +207,93 @@ class MarketTree():
         pass
 
     @classmethod
-    async def init_market_tree(cls, clean=False):
-        """初始化市场树
+    async def init_market_tree(cls, clean=False, force=False) -> bool:
+        """批量导入市场组节点及其父子关系
         
         Args:
             clean: 是否清理现有数据
+            force: 忽略版本标记强制导入
+        
+        Returns:
+            bool: 是否执行了导入（市场树已是当前 SDE 版本时跳过）
         """
-        # 市场组入数据库
-        # 拉取全量market_group数据
         if clean:
             await NIU.delete_label_node("MarketGroup")
+        version = await SdeUtils.get_build_number()
+        if version is None:
+            logger.warning("SDE 中没有版本信息，跳过市场树导入")
+            return False
+        if not (clean or force) and await NIU.get_graph_version(MARKET_TREE_GRAPH_NAME) == version:
+            logger.info(f"市场树已是 SDE 版本 {version}，跳过导入")
+            return False
         
-        # 先创建所有节点
-        async def create_market_group_node_with_semaphore(market_group: MarketGroups):
-            async with neo4j_manager.semaphore:
-                cn_name = await SdeUtils.get_market_group_name_by_groupid(market_group.marketGroupID, zh=True)
-                await NIU.merge_node(
-                    "MarketGroup",
-                    {"market_group_id": market_group.marketGroupID},
-                    {
-                        "market_group_id": market_group.marketGroupID,
-                        "has_types": market_group.hasTypes,
-                        "icon_id": market_group.iconID,
-                        "name_id": market_group.nameID_en,
-                        "name_id_zh": cn_name,
-                    }
-                )
-                await tqdm_manager.update_mission("init_market_tree", 1)
-        tasks = []
-        async with (await get_db_manager()).get_session() as session:
-            stmt = select(MarketGroups)
-            result = await session.execute(stmt)
-            market_group_data = result.scalars().all()
-            await tqdm_manager.add_mission("init_market_tree", len(market_group_data))
-            for market_group in market_group_data:
-                tasks.append(asyncio.create_task(create_market_group_node_with_semaphore(market_group)))
-        await asyncio.gather(*tasks)
-        await tqdm_manager.complete_mission("init_market_tree")
-
-        # 再创建所有关系
-        async def link_market_group_to_market_group_with_semaphore(market_group: MarketGroups):
-            async with neo4j_manager.semaphore:
-                cn_name = await SdeUtils.get_market_group_name_by_groupid(market_group.marketGroupID, zh=True)
-                await NIU.link_node(
-                    "MarketGroup",
-                    {"market_group_id": market_group.marketGroupID},
-                    {"market_group_id": market_group.marketGroupID},
-                    "EVE_MARKET_GROUP",
-                    {},
-                    {},
-                    "MarketGroup",
-                    {"market_group_id": market_group.parentGroupID},
-                    {"market_group_id": market_group.parentGroupID},
-                )
-                await tqdm_manager.update_mission("link_type_to_market_group", 1)
-        async with (await get_db_manager()).get_session() as session:
-            stmt = select(MarketGroups)
-            result = await session.execute(stmt)
-            market_group_data = result.scalars().all()
-            tasks = []
-            await tqdm_manager.add_mission("init_market_tree", len(market_group_data))
-            for market_group in market_group_data:
-                if market_group.parentGroupID:
-                    tasks.append(asyncio.create_task(link_market_group_to_market_group_with_semaphore(market_group)))
-        await asyncio.gather(*tasks)
-        await tqdm_manager.complete_mission("init_market_tree")
+        # UNWIND MERGE 依赖 market_group_id 唯一约束自带的索引
+        await NIU.ensure_constraints(MarketGroup, GraphVersion)
+        group_rows, _ = await get_market_tree_rows(version)
+        node_rows = [
+            {**{key: value for key, value in row.items() if key != "parent_group_id"}, "sde_version": version}
+            for row in group_rows
+        ]
+        link_rows = [
+            {"child": row["market_group_id"], "parent": row["parent_group_id"], "sde_version": version}
+            for row in group_rows if row["parent_group_id"]
+        ]
+        node_count = await NIU.batch_merge_nodes("MarketGroup", ["market_group_id"], node_rows, MARKET_TREE_BATCH_SIZE)
+        link_count = await NIU.batch_merge_relations(
+            "MarketGroup", {"market_group_id": "child"},
+            "EVE_MARKET_GROUP", [],
+            "MarketGroup", {"market_group_id": "parent"},
+            link_rows, MARKET_TREE_BATCH_SIZE
+        )
+        logger.info(f"市场组导入完成 (SDE {version}): 节点 {node_count}, 关系 {link_count}")
+        return True
 
     @classmethod
-    async def link_type_to_market_group(cls, clean=False):
-        """将类型链接到市场组
+    async def link_type_to_market_group(cls, clean=False, force=False) -> bool:
+        """批量导入物品节点并链接到市场组，完成后清理过期数据并写入版本标记
         
         Args:
             clean: 是否清理现有数据
+            force: 忽略版本标记强制导入
+        
+        Returns:
+            bool: 是否执行了导入（市场树已是当前 SDE 版本时跳过）
         """
-        # type 数据入库
-        # 拉取全量type数据
         if clean:
             await NIU.delete_label_node("Type")
-
-        async def link_type_to_market_group_with_semaphore(type: InvTypes):
-            async with neo4j_manager.semaphore:
-                cn_name = await SdeUtils.get_cn_name_by_id(type.typeID)
-                meta_group_name = await SdeUtils.get_metaname_by_metaid(type.typeID)
-                category_name = await SdeUtils.get_category_by_id(type.typeID)
-                category_name_zh = await SdeUtils.get_category_by_id(type.typeID, zh=True)
-                bp_id = await BPM.get_bp_id_by_prod_typeid(type.typeID)
-
-                await NIU.link_node(
-                    "Type",
-                    {"type_id": type.typeID},
-                    {
-                        "type_id": type.typeID,
-                        "type_name": type.typeName_en,
-                        "type_name_zh": cn_name,
-                        "meta_group_name": meta_group_name,
-                        "category_name": category_name,
-                        "category_name_zh": category_name_zh,
-                        "bp_id": bp_id
-                    },
-                    "EVE_MARKET_GROUP",
-                    {},
-                    {},
-                    "MarketGroup",
-                    {"market_group_id": type.marketGroupID},
-                    {"market_group_id": type.marketGroupID}
-                )
-                await tqdm_manager.update_mission("link_type_to_market_group", 1)
-        async with (await get_db_manager()).get_session() as session:
-            stmt = select(InvTypes)
-            result = await session.execute(stmt)
-            type_data = result.scalars().all()
-            tasks = []
-            await tqdm_manager.add_mission("link_type_to_market_group", len(type_data))
-            for type in type_data:
-                if type.marketGroupID:
-                    tasks.append(asyncio.create_task(link_type_to_market_group_with_semaphore(type)))
-                else:
-                    await tqdm_manager.update_mission("link_type_to_market_group", 1)
-        await asyncio.gather(*tasks)
-        await tqdm_manager.complete_mission("link_type_to_market_group")
-
+        version = await SdeUtils.get_build_number()
+        if version is None:
+            logger.warning("SDE 中没有版本信息，跳过物品导入")
+            return False
+        if not (clean or force) and await NIU.get_graph_version(MARKET_TREE_GRAPH_NAME) == version:
+            logger.info(f"市场树已是 SDE 版本 {version}，跳过物品导入")
+            return False
+        
+        await NIU.ensure_constraints(Type, MarketGroup, GraphVersion)
+        _, type_rows = await get_market_tree_rows(version)
+        node_rows = [
+            {**{key: value for key, value in row.items() if key != "market_group_id"}, "sde_version": version}
+            for row in type_rows
+        ]
+        link_rows = [
+            {"type_id": row["type_id"], "market_group_id": row["market_group_id"], "sde_version": version}
+            for row in type_rows
+        ]
+        node_count = await NIU.batch_merge_nodes("Type", ["type_id"], node_rows, MARKET_TREE_BATCH_SIZE)
+        link_count = await NIU.batch_merge_relations(
+            "Type", {"type_id": "type_id"},
+            "EVE_MARKET_GROUP", [],
+            "MarketGroup", {"market_group_id": "market_group_id"},
+            link_rows, MARKET_TREE_BATCH_SIZE
+        )
+        
+        # 市场组与物品都已写入当前版本，清理新版本中已不存在的部分
+        stale_links = await NIU.delete_stale("EVE_MARKET_GROUP", "sde_version", version, relation=True)
+        stale_types = await NIU.delete_stale("Type", "sde_version", version)
+        stale_groups = await NIU.delete_stale("MarketGroup", "sde_version", version)
+        await NIU.set_graph_version(MARKET_TREE_GRAPH_NAME, version)
+        logger.info(
+            f"物品导入完成 (SDE {version}): 节点 {node_count}, 关系 {link_count}, "
+            f"删除过期物品 {stale_types}, 过期市场组 {stale_groups}, 过期关系 {stale_links}"
+        )
+        return True
@@ -3,6 +3,8 @@ from copy import deepcopy
 import json
 import time
 from math import ceil
+
+import numpy as np
 from src_v2.core.database.kahuna_database_utils_v2 import (
     EveAssetPullMissionDBUtils,
     EveIndustryPlanConfigFlowDBUtils,
@@ -18,8 +20,19 @@ from src_v2.core.database.kahuna_database_utils_v2 import EveIndustryPlanDBUtils
 from src_v2.model.EVE.eveesi import eveesi
 from src_v2.model.EVE.sde import SdeUtils
 from src_v2.model.EVE.industry.blueprint import BPManager as BPM
+from src_v2.model.EVE.industry.system_cost import (
+    ACTIVITY_NAMES,
+    DEFAULT_SYSTEM_COST_INDEX,
+    SCC_SURCHARGE,
+    SystemCostTable,
+    job_cost_factors,
+    load_system_cost_table,
+    publish_system_cost_table,
+)
 
 from src_v2.core.database.connect_manager import redis_manager as rds
+from src_v2.core.database.redis_snapshot import RedisSnapshotStore
+from src_v2.model.EVE.market.price_service import PriceService, ADJUSTED_PRICE_HUB, ADJUSTED_PRICE_PREFIX
 
 running_job_update_lock = asyncio.Lock()
 bp_asset_prepare_lock = asyncio.Lock()
@@ -28,6 +41,9 @@ running_asset_prepare_lock = asyncio.Lock()
 refresh_system_cost_lock = asyncio.Lock()
 refresh_market_price_lock = asyncio.Lock()
 
+# 全服调整价/平均价快照
+market_price_snapshot = RedisSnapshotStore(ADJUSTED_PRICE_PREFIX)
+
 from src_v2.core.log import logger
 
 NULL_MANU_SEC_BONUS = 2.1
@@ -68,6 +84,13 @@ LARGE_COST_EFF = 0.05
 MID_COST_EFF = 0.04
 SMALL_COST_EFF = 0.03
 
+# 工程复合体的制造安装费加成
+STRUCTURE_COST_EFF = {
+    "Sotiyo": LARGE_COST_EFF,
+    "Azbel": MID_COST_EFF,
+    "Raitaru": SMALL_COST_EFF,
+}
+
 class ConfigFlowOperateCenter():
     def __init__(self, user_name: str, plan_name: str):
         # 同步初始化基本属性
@@ -110,8 +133,10 @@ class ConfigFlowOperateCenter():
 
         self.set_uped_jobs = {}
 
-        self._system_cost_status = False
-        self._system_cost = {}
+        self._system_cost_table = None
+        self._job_cost_factor = {}
+
+        self._keyword_attrs = {}
 
         self.type_eff_cache = {}
 
@@ -261,13 +286,33 @@ class ConfigFlowOperateCenter():
 
         return installer_data
 
+    async def prefetch_keyword_attrs(self, type_ids):
+        """一次批量读取关键字匹配用到的组、meta、类别与市场组路径"""
+        type_ids = [type_id for type_id in dict.fromkeys(type_ids) if type_id not in self._keyword_attrs]
+        if not type_ids:
+            return
+        type_rows = await SdeUtils.get_type_rows(type_ids)
+        paths_en = await SdeUtils.get_market_group_paths(type_ids)
+        paths_zh = await SdeUtils.get_market_group_paths(type_ids, zh=True)
+        for type_id in type_ids:
+            row = type_rows.get(type_id, {})
+            self._keyword_attrs[type_id] = {
+                "group": [row.get("group_name_en"), row.get("group_name_zh")],
+                "meta": [row.get("meta_name_en"), row.get("meta_name_zh")],
+                "category": [row.get("category_name_en"), row.get("category_name_zh")],
+                # 祖先市场组名称集合，关键字匹配为 O(1) 成员判断
+                "marketGroup": set(paths_en[type_id]) | set(paths_zh[type_id]),
+            }
+
     async def _is_match_keyword(self, conf_list, type_id: int):
-        group_list = [await SdeUtils.get_groupname_by_id(type_id), await SdeUtils.get_groupname_by_id(type_id, zh=True)]
-        meta_list = [await SdeUtils.get_metaname_by_typeid(type_id), await SdeUtils.get_metaname_by_typeid(type_id, zh=True)]
+        if type_id not in self._keyword_attrs:
+            await self.prefetch_keyword_attrs([type_id])
+        attrs = self._keyword_attrs[type_id]
+        group_list = attrs["group"]
+        meta_list = attrs["meta"]
         bp_name_list = [await BPM.get_bp_name_by_typeid(type_id), await BPM.get_bp_name_by_typeid(type_id, zh=True)]
-        category_list = [await SdeUtils.get_category_by_id(type_id), await SdeUtils.get_category_by_id(type_id, zh=True)]
-        market_group_list = await SdeUtils.get_market_group_list(type_id)
-        market_group_list.extend(await SdeUtils.get_market_group_list(type_id, zh=True))
+        category_list = attrs["category"]
+        market_group_list = attrs["marketGroup"]
 
         for config in conf_list:
             match = True
@@ -777,18 +822,19 @@ class ConfigFlowOperateCenter():
 
         return self._running_asset_allocate[(type_id, index_id)]
 
-    async def refresh_system_cost(self):
+    @staticmethod
+    async def refresh_system_cost():
         async with refresh_system_cost_lock:
             if await rds.r.get(f"system_cost_cache:status") == "ok":
                 return
-                
-            result = await eveesi.industry_systems(log=True)
 
-            for item in result:
-                data = {"solar_system_id": item["solar_system_id"]}
-                for cost in item["cost_indices"]:
-                    data[cost["activity"]] = cost["cost_index"]
-                await rds.r.hset(f"system_cost_cache:{item['solar_system_id']}", mapping=data)
+            result = await eveesi.industry_systems(log=True)
+            if not result:
+                # 拉取失败时保留当前成本指数表，不设置状态，下次调用重新拉取
+                logger.warning("获取星系成本指数失败，保留当前成本指数表")
+                return
+            # 全部星系写入一张版本化的成本指数表
+            await publish_system_cost_table(result)
 
             # 过期时间到下一个整小时
             now = time.time()
@@ -799,71 +845,111 @@ class ConfigFlowOperateCenter():
                 ex_seconds = 3600  # 如果计算错误，默认1小时
             await rds.r.set(f"system_cost_cache:status", "ok", ex=ex_seconds)
 
-    async def get_system_cost(self, solar_system_id: int):
-        if not self._system_cost_status and await rds.r.get(f"system_cost_cache:status") != "ok":
-            await self.refresh_system_cost()
-
-            system_cost = await rds.r.hgetall(f"system_cost_cache:{solar_system_id}")
-            self._system_cost[solar_system_id] = system_cost
+    async def get_system_cost_table(self) -> SystemCostTable:
+        """每个计划计算只读取一次成本指数表"""
+        if self._system_cost_table is None:
+            if await rds.r.get(f"system_cost_cache:status") != "ok":
+                await self.refresh_system_cost()
+            self._system_cost_table = await load_system_cost_table()
+        return self._system_cost_table
 
-            return system_cost
+    async def get_system_cost(self, solar_system_id: int):
+        table = await self.get_system_cost_table()
+        return table.get(solar_system_id) or {
+            "manufacturing": DEFAULT_SYSTEM_COST_INDEX,
+            "reaction": DEFAULT_SYSTEM_COST_INDEX,
+        }
 
-        if solar_system_id in self._system_cost:
-            return self._system_cost[solar_system_id]
+    async def prefetch_job_cost_factor(self, items):
+        """
+        一次向量化计算一批 (产品 type_id, 活动 id) 的安装费系数
+        系数 = 星系成本指数 x (1 - 建筑成本加成) + SCC 附加税，乘以 EIV 即为安装费
+        """
+        items = [item for item in dict.fromkeys(items) if item not in self._job_cost_factor]
+        if not items:
+            return
+        table = await self.get_system_cost_table()
+        system_ids = np.zeros(len(items), dtype=np.int64)
+        cost_bonus = np.zeros(len(items), dtype=np.float64)
+        for i, (type_id, activity_id) in enumerate(items):
+            structure_info = await self.get_type_assign_structure_info(type_id)
+            if not structure_info:
+                continue
+            system_ids[i] = structure_info['system_id']
+            if activity_id == 1:
+                cost_bonus[i] = STRUCTURE_COST_EFF.get(structure_info['structure_type'], 0)
+        activities = [ACTIVITY_NAMES.get(activity_id, "manufacturing") for _, activity_id in items]
+        factors = job_cost_factors(
+            table.lookup(system_ids, activities), cost_bonus, np.full(len(items), SCC_SURCHARGE)
+        )
+        for item, factor in zip(items, factors.tolist()):
+            self._job_cost_factor[item] = factor
 
-        system_cost = await rds.r.hgetall(f"system_cost_cache:{solar_system_id}")
-        if not system_cost:
-            return {
-                "manufacturing": 0.14 / 100 + 0.04,
-                "reaction": 0.14 / 100 + 0.04
-            }
-        self._system_cost[solar_system_id] = system_cost
-        return system_cost
+    async def get_job_cost_factor(self, type_id: int, activity_id: int) -> float:
+        if (type_id, activity_id) not in self._job_cost_factor:
+            await self.prefetch_job_cost_factor([(type_id, activity_id)])
+        return self._job_cost_factor[(type_id, activity_id)]
 
-    async def refresh_market_price(self):
+    @staticmethod
+    async def refresh_market_price():
+        # 由定时任务与计划计算共用，整个刷新过程持锁避免重复拉取
         async with refresh_market_price_lock:
             if await rds.r.get(f"market_price_cache:status") == "ok":
                 return
 
-        results = await eveesi.markets_prices(log=True)
-        # results = [{'adjusted_price': 36.93619227019693, 'average_price': 33.77, 'type_id': 18}, ...]
-        for data in results:
-            if 'adjusted_price' not in data:
-                data['adjusted_price'] = 0.0
-            if  'average_price' not in data:
-                data['average_price'] = 0.0
-
-            await rds.r.hset(f"market_price_cache:{data['type_id']}", mapping=data)
-
-        # 获取到明天0点的时间间隔，单位分钟
-        now = time.time()
-        # 获取当前时间的struct_time
-        now_struct = time.localtime(now)
-        # 构造明天0点的struct_time
-        tomorrow_zero_struct = time.struct_time((
-            now_struct.tm_year,
-            now_struct.tm_mon,
-            now_struct.tm_mday + 1,
-            0, 0, 0,
-            now_struct.tm_wday,
-            now_struct.tm_yday,
-            now_struct.tm_isdst,
-        ))
-        # 转换为时间戳
-        tomorrow_zero_ts = time.mktime(tomorrow_zero_struct)
-        ex_seconds = int(tomorrow_zero_ts - now)
-        # 确保过期时间至少为1秒
-        if ex_seconds <= 0:
-            ex_seconds = 86400  # 如果计算错误，默认24小时（1天）
-        await rds.r.set(f"market_price_cache:status", "ok", ex=ex_seconds)
+            results = await eveesi.markets_prices(log=True)
+            if not results:
+                # 拉取失败时保留当前快照，不设置状态，下次调用重新拉取
+                logger.warning("获取全服调整价失败，保留当前价格快照")
+                return
+            # results = [{'adjusted_price': 36.93619227019693, 'average_price': 33.77, 'type_id': 18}, ...]
+            # 结果可能与其他调用方共享，构造新的 mapping 而不修改原数据
+            await market_price_snapshot.publish(
+                (data['type_id'], {
+                    'type_id': data['type_id'],
+                    'adjusted_price': data.get('adjusted_price', 0.0),
+                    'average_price': data.get('average_price', 0.0),
+                })
+                for data in results
+            )
+
+            # 获取到明天0点的时间间隔，单位分钟
+            now = time.time()
+            # 获取当前时间的struct_time
+            now_struct = time.localtime(now)
+            # 构造明天0点的struct_time
+            tomorrow_zero_struct = time.struct_time((
+                now_struct.tm_year,
+                now_struct.tm_mon,
+                now_struct.tm_mday + 1,
+                0, 0, 0,
+                now_struct.tm_wday,
+                now_struct.tm_yday,
+                now_struct.tm_isdst,
+            ))
+            # 转换为时间戳
+            tomorrow_zero_ts = time.mktime(tomorrow_zero_struct)
+            ex_seconds = int(tomorrow_zero_ts - now)
+            # 确保过期时间至少为1秒
+            if ex_seconds <= 0:
+                ex_seconds = 86400  # 如果计算错误，默认24小时（1天）
+            await rds.r.set(f"market_price_cache:status", "ok", ex=ex_seconds)
 
-    async def get_type_adjust_price(self, type_id: int):
+    async def prefetch_type_adjust_price(self, type_ids):
+        """一次批量读取计划中全部材料的调整价"""
         if not self._market_price_status and await rds.r.get(f"market_price_cache:status") != "ok":
             await self.refresh_market_price()
+        self._market_price_status = True
 
-        if type_id in self._type_adjust_price:
-            return self._type_adjust_price[type_id]
+        type_ids = [type_id for type_id in type_ids if type_id not in self._type_adjust_price]
+        prices = await PriceService().get_many(type_ids, ("adjusted_price",), ADJUSTED_PRICE_HUB)
+        for type_id, price in prices.items():
+            self._type_adjust_price[type_id] = price["adjusted_price"]
 
-        type_adjust_price = float(await rds.r.hget(f"market_price_cache:{type_id}", "adjusted_price"))
-        self._type_adjust_price[type_id] = type_adjust_price
+    async def get_type_adjust_price(self, type_id: int):
+        if type_id not in self._type_adjust_price:
+            await self.prefetch_type_adjust_price([type_id])
+        type_adjust_price = self._type_adjust_price[type_id]
+        if type_adjust_price is None:
+            raise KahunaException(f"缺少物品 {type_id} 的调整价")
         return type_adjust_price
@@ -0,0 +1,138 @@
+"""
+工业星系成本指数表
+
+industry_systems 的全部结果保存为一张紧凑表：按星系 id 排序的数组 + (星系数 x 活动数) 的指数矩阵。
+Redis 中只存一份版本化的 JSON：
+    system_cost_table:current    当前版本号
+    system_cost_table:v{version} 完整表
+进程内按版本缓存，计划计算时一次读取，之后所有星系/活动查询都在内存中完成，并可对一批节点向量化计算。
+"""
+import json
+
+import numpy as np
+
+from src_v2.core.database.connect_manager import redis_manager as rds
+
+SYSTEM_COST_TABLE_PREFIX = "system_cost_table"
+# 旧版本保留一段时间供正在读取的请求使用
+SYSTEM_COST_TABLE_RETIRE_SECONDS = 300
+
+# 未分配建筑或星系无数据时使用的成本指数
+DEFAULT_SYSTEM_COST_INDEX = 0.14 / 100
+# SCC 附加税
+SCC_SURCHARGE = 0.04
+
+ACTIVITY_NAMES = {
+    1: "manufacturing",
+    11: "reaction",
+}
+
+
+class SystemCostTable:
+    def __init__(self, version: int, system_ids: np.ndarray, activities: tuple, indices: np.ndarray):
+        self.version = version
+        self.system_ids = system_ids
+        self.activities = activities
+        self.indices = indices
+        self._activity_pos = {activity: i for i, activity in enumerate(activities)}
+
+    @classmethod
+    def empty(cls) -> "SystemCostTable":
+        return cls(0, np.zeros(0, dtype=np.int64), (), np.zeros((0, 0)))
+
+    @classmethod
+    def from_esi(cls, payload: list, version: int = 0) -> "SystemCostTable":
+        """由 industry_systems 的返回值构建"""
+        activities = tuple(sorted({cost["activity"] for item in payload for cost in item["cost_indices"]}))
+        activity_pos = {activity: i for i, activity in enumerate(activities)}
+        payload = sorted(payload, key=lambda item: item["solar_system_id"])
+        system_ids = np.fromiter((item["solar_system_id"] for item in payload), dtype=np.int64, count=len(payload))
+        indices = np.zeros((len(payload), len(activities)), dtype=np.float64)
+        for row, item in enumerate(payload):
+            for cost in item["cost_indices"]:
+                indices[row, activity_pos[cost["activity"]]] = cost["cost_index"]
+        return cls(version, system_ids, activities, indices)
+
+    def dumps(self) -> str:
+        return json.dumps({
+            "version": self.version,
+            "system_ids": self.system_ids.tolist(),
+            "activities": list(self.activities),
+            "indices": self.indices.tolist(),
+        }, separators=(",", ":"))
+
+    @classmethod
+    def loads(cls, raw: str) -> "SystemCostTable":
+        data = json.loads(raw)
+        return cls(
+            data["version"],
+            np.asarray(data["system_ids"], dtype=np.int64),
+            tuple(data["activities"]),
+            np.asarray(data["indices"], dtype=np.float64).reshape(len(data["system_ids"]), len(data["activities"])),
+        )
+
+    def lookup(self, system_ids, activities, default: float = DEFAULT_SYSTEM_COST_INDEX) -> np.ndarray:
+        """
+        向量化查询
+        Args:
+            system_ids: 星系 id 数组
+            activities: 与 system_ids 对齐的活动名数组，或单个活动名
+        Returns:
+            np.ndarray: 成本指数，星系或活动不存在时为 default
+        """
+        system_ids = np.asarray(system_ids, dtype=np.int64)
+        if isinstance(activities, str):
+            activities = [activities] * len(system_ids)
+        cols = np.fromiter((self._activity_pos.get(a, -1) for a in activities), dtype=np.int64, count=len(system_ids))
+        result = np.full(len(system_ids), default, dtype=np.float64)
+        if not len(self.system_ids):
+            return result
+        rows = np.searchsorted(self.system_ids, system_ids)
+        rows = np.minimum(rows, len(self.system_ids) - 1)
+        found = (self.system_ids[rows] == system_ids) & (cols >= 0)
+        result[found] = self.indices[rows[found], cols[found]]
+        return result
+
+    def get(self, system_id: int) -> dict:
+        """单个星系的 {活动: 指数}，无数据时为空"""
+        row = np.searchsorted(self.system_ids, system_id)
+        if row >= len(self.system_ids) or self.system_ids[row] != system_id:
+            return {}
+        return {activity: float(self.indices[row, i]) for i, activity in enumerate(self.activities)}
+
+
+def job_cost_factors(index: np.ndarray, structure_cost_bonus: np.ndarray, tax: np.ndarray) -> np.ndarray:
+    """每单位 EIV 的安装费系数：指数 x (1 - 建筑成本加成) + 税"""
+    return index * (1 - structure_cost_bonus) + tax
+
+
+_cached_table: SystemCostTable | None = None
+
+
+async def publish_system_cost_table(payload: list) -> SystemCostTable:
+    """写入新版本的成本指数表并切换当前指针"""
+    version = await rds.r.incr(f"{SYSTEM_COST_TABLE_PREFIX}:version_seq")
+    table = SystemCostTable.from_esi(payload, version)
+    old_version = await rds.r.get(f"{SYSTEM_COST_TABLE_PREFIX}:current")
+    async with rds.r.pipeline(transaction=True) as pipe:
+        pipe.set(f"{SYSTEM_COST_TABLE_PREFIX}:v{version}", table.dumps())
+        pipe.set(f"{SYSTEM_COST_TABLE_PREFIX}:current", version)
+        if old_version is not None:
+            pipe.expire(f"{SYSTEM_COST_TABLE_PREFIX}:v{old_version}", SYSTEM_COST_TABLE_RETIRE_SECONDS)
+        await pipe.execute()
+    return table
+
+
+async def load_system_cost_table() -> SystemCostTable:
+    """读取当前版本的成本指数表，版本未变化时直接使用进程内缓存"""
+    global _cached_table
+    version = await rds.r.get(f"{SYSTEM_COST_TABLE_PREFIX}:current")
+    if version is None:
+        return SystemCostTable.empty()
+    if _cached_table is not None and _cached_table.version == int(version):
+        return _cached_table
+    raw = await rds.r.get(f"{SYSTEM_COST_TABLE_PREFIX}:v{version}")
+    if raw is None:
+        return _cached_table or SystemCostTable.empty()
+    _cached_table = SystemCostTable.loads(raw)
+    return _cached_table
@@ -0,0 +1,154 @@
+"""
+市场历史存储
+
+每日按物品批量拉取 ESI 市场历史（带 If-None-Match 条件请求，未过期的物品直接跳过），
+写入 eve_market_history，并在同一次刷新后由 SQL 聚合出 7/30/90 天滚动统计到 eve_market_history_stats。
+需求/流动性查询只需对统计表做一次按 type_id 的索引查询。
+"""
+import asyncio
+from datetime import date, datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+
+from src_v2.core.database.connect_manager import redis_manager as rdm
+from src_v2.core.database.kahuna_database_utils_v2 import (
+    EveMarketHistoryDBUtils,
+    EveMarketHistoryRefreshDBUtils,
+    EveMarketHistoryStatsDBUtils,
+)
+from src_v2.core.log import logger
+from src_v2.core.utils import SingletonMeta
+from src_v2.model.EVE.eveesi import eveesi
+from src_v2.model.EVE.eveesi.eveutils import NOT_MODIFIED
+
+# 每批并发请求的物品数，请求统一经过 ESI 管理器限流
+HISTORY_REFRESH_BATCH = 200
+# 已有历史的物品只写入最近几天，ESI 每次返回完整的一年多数据
+HISTORY_OVERLAP_DAYS = 3
+STATS_FIELDS = (
+    "avg_price_7d", "avg_price_30d", "avg_price_90d",
+    "avg_volume_7d", "avg_volume_30d", "avg_volume_90d",
+    "volatility_7d", "volatility_30d", "volatility_90d",
+)
+
+
+def _parse_expires(value: str | None) -> datetime | None:
+    if not value:
+        return None
+    try:
+        return parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class MarketHistoryManager(metaclass=SingletonMeta):
+    def __init__(self):
+        self.refresh_lock = asyncio.Lock()
+
+    async def refresh_region_history(self, region_id: int, type_ids: list[int]) -> dict:
+        """
+        刷新指定物品的历史并重算统计
+        Returns:
+            dict: 本次刷新的请求/更新/未变化/失败数量
+        """
+        now = datetime.now(timezone.utc)
+        states = await EveMarketHistoryRefreshDBUtils.select_by_type_ids(region_id, type_ids)
+        due = [
+            type_id for type_id in type_ids
+            if type_id not in states or not states[type_id].expires or states[type_id].expires <= now
+        ]
+        summary = {"requested": len(due), "changed": 0, "not_modified": 0, "failed": 0}
+        changed_type_ids = []
+
+        for i in range(0, len(due), HISTORY_REFRESH_BATCH):
+            batch = due[i:i + HISTORY_REFRESH_BATCH]
+            results = await asyncio.gather(*(
+                eveesi.markets_region_history_conditional(
+                    region_id, type_id, etag=states[type_id].etag if type_id in states else None, log=False
+                )
+                for type_id in batch
+            ), return_exceptions=True)
+
+            history_rows = []
+            state_rows = []
+            for type_id, result in zip(batch, results):
+                if isinstance(result, Exception) or result is None:
+                    summary["failed"] += 1
+                    continue
+                data, status_code, meta = result
+                state = states.get(type_id)
+                if status_code == NOT_MODIFIED:
+                    summary["not_modified"] += 1
+                elif status_code == 200 and data is not None:
+                    since = state.refresh_time.date() - timedelta(days=HISTORY_OVERLAP_DAYS) \
+                        if state and state.refresh_time else None
+                    history_rows.extend(self._history_rows(region_id, type_id, data, since))
+                    changed_type_ids.append(type_id)
+                    summary["changed"] += 1
+                else:
+                    summary["failed"] += 1
+                    continue
+                state_rows.append({
+                    "region_id": region_id,
+                    "type_id": type_id,
+                    "etag": meta.get("ETag") or (state.etag if state else None),
+                    "expires": _parse_expires(meta.get("Expires")),
+                    "refresh_time": now,
+                })
+
+            await EveMarketHistoryDBUtils.upsert_history_rows(history_rows)
+            await EveMarketHistoryRefreshDBUtils.upsert_states(state_rows)
+
+        await EveMarketHistoryStatsDBUtils.refresh_stats(region_id, changed_type_ids)
+        logger.info(f"区域 {region_id} 市场历史刷新完成: {summary}")
+        return summary
+
+    @staticmethod
+    def _history_rows(region_id: int, type_id: int, data: list, since: date | None) -> list[dict]:
+        rows = []
+        for item in data:
+            day = date.fromisoformat(item["date"])
+            if since is not None and day < since:
+                continue
+            rows.append({
+                "region_id": region_id,
+                "type_id": type_id,
+                "date": day,
+                "average": item.get("average", 0),
+                "highest": item.get("highest", 0),
+                "lowest": item.get("lowest", 0),
+                "order_count": item.get("order_count", 0),
+                "volume": item.get("volume", 0),
+            })
+        return rows
+
+    async def refresh_daily(self, region_id: int, type_ids: list[int] | None = None):
+        """
+        每日刷新，type_ids 为空时刷新该区域订单簿中出现的全部物品
+        刷新标记 1 小时，过期后只会请求 Expires 已过的物品
+        """
+        async with self.refresh_lock:
+            flag_key = f"market_history_update_flag:{region_id}"
+            if await rdm.r.get(flag_key):
+                return
+            if type_ids is None:
+                from .market_manager import MarketManager
+
+                order_book = await MarketManager().get_order_book(region_id)
+                if order_book is None:
+                    logger.warning(f"区域 {region_id} 订单簿尚未拉取，跳过市场历史刷新")
+                    return
+                type_ids = sorted(set(order_book.sell.type_id.tolist()) | set(order_book.buy.type_id.tolist()))
+            await self.refresh_region_history(region_id, type_ids)
+            await rdm.r.set(flag_key, "1", ex=60 * 60)
+
+    async def get_stats(self, type_ids: list[int], region_id: int) -> dict:
+        """
+        批量获取滚动统计
+        Returns:
+            dict: {type_id: {字段: 值}}，没有历史的物品不在结果中
+        """
+        rows = await EveMarketHistoryStatsDBUtils.select_by_type_ids(region_id, type_ids)
+        return {
+            type_id: {field: getattr(row, field) or 0 for field in STATS_FIELDS} | {"last_date": row.last_date}
+            for type_id, row in rows.items()
+        }
@@ -1,15 +1,22 @@
 
 import asyncio
+import os
 from datetime import datetime
 
 # from .marker import Market
 from src_v2.core.database.connect_manager import redis_manager as rdm
+from src_v2.core.database.redis_snapshot import RedisSnapshotStore, read_many
 from src_v2.model.EVE.character.character_manager import CharacterManager
 from src_v2.core.config.config import config, update_config
 #import Exception
 from src_v2.core.utils import KahunaException, SingletonMeta
 
 from src_v2.model.EVE.eveesi import eveesi
+from src_v2.model.EVE.eveesi.eveutils import expires_in
+from .price_aggregator import PriceAggregator
+from .order_book import OrderBookBuilder, OrderBookSnapshot, FillResult
+from .price_models import price_model_mappings
+from .market_source import MarketSource, market_source_registry
 
 # kahuna logger
 from src_v2.core.log import logger
@@ -24,55 +31,172 @@ S33RB_O_STRUCTURE_ID = 1045441547980
 B_9C24_KEEPSTAR_ID = 1046831245129
 PIMI_STRUCTURE_LIST = [1042508032148, 1042499803831, 1044752365771]
 
+# 吉他最优买/卖价快照，读取统一通过该对象以保证读到完整的一版价格
+jita_price_snapshot = RedisSnapshotStore("market_price:jita")
+
+# 同时刷新的市场数量，各市场的分页请求共享 ESI 管理器的令牌桶
+MAX_CONCURRENT_MARKET_REFRESH = config.getint('MARKET', 'Max_Concurrent_Refresh', fallback=2)
+
 class MarketManager(metaclass=SingletonMeta):
     def __init__(self):
-        self.update_jita_price_lock = asyncio.Lock()
+        self.refresh_locks: dict[str, asyncio.Lock] = {}
+        self.refresh_semaphore = asyncio.Semaphore(MAX_CONCURRENT_MARKET_REFRESH)
+        # book_id（区域 id 或建筑 id）-> 最近一次拉取的列式订单簿
+        self.order_books: dict[int, OrderBookSnapshot] = {}
+        # 市场名 -> 按空间站过滤后的订单簿
+        self._source_order_books: dict[str, OrderBookSnapshot] = {}
 
-    async def _batch_insert_redis(self, batch: list):
-        """批量插入Redis的辅助方法"""
-        for type_id, price_data in batch:
-            await rdm.r.hset(f"market_price:jita:{type_id}", mapping=price_data)
+    def get_price_snapshot(self, name: str) -> RedisSnapshotStore:
+        if name == "jita":
+            return jita_price_snapshot
+        return RedisSnapshotStore(market_source_registry.get(name).price_prefix)
 
     async def update_jita_price(self):
-        async with self.update_jita_price_lock:
-            update_flag = await rdm.r.get(f"market_update_flag:jita")
-            if update_flag:
+        await self._refresh_group([market_source_registry.get("jita")])
+
+    async def refresh_markets(self, names: list[str] | None = None):
+        """
+        并发刷新多个市场，同一区域的多个 NPC 贸易中心共享一次区域订单拉取
+        Args:
+            names: 市场名列表，为空时刷新注册表中的全部市场
+        """
+        sources = [market_source_registry.get(n) for n in names] if names else market_source_registry.all()
+
+        groups: dict[tuple, list[MarketSource]] = {}
+        for source in sources:
+            key = ("structure", source.structure_id) if source.is_structure else ("region", source.region_id)
+            groups.setdefault(key, []).append(source)
+
+        results = await asyncio.gather(
+            *(self._refresh_group(group) for group in groups.values()), return_exceptions=True
+        )
+        for group, result in zip(groups.values(), results):
+            if isinstance(result, Exception):
+                logger.error(f"刷新市场 {[s.name for s in group]} 失败: {result}")
+
+    async def _refresh_group(self, sources: list[MarketSource]):
+        book_id = sources[0].book_id
+        lock = self.refresh_locks.setdefault(f"book:{book_id}", asyncio.Lock())
+        async with lock:
+            flags = await rdm.r.mget([s.update_flag_key for s in sources])
+            sources = [s for s, flag in zip(sources, flags) if not flag]
+            if not sources:
                 return
+            async with self.refresh_semaphore:
+                await self._pull_and_publish(sources)
+
+    async def _pull_and_publish(self, sources: list[MarketSource]):
+        first = sources[0]
+        # 订单响应的 Expires，刷新标记在 ESI 缓存到期时过期
+        response_meta = {}
+        if first.is_structure:
+            character = await CharacterManager().get_character_by_character_id(first.character_id)
+            pages = eveesi.esi_pages(eveesi.markets_structures, character.ac_token, first.structure_id, typed=True,
+                                     response_meta=response_meta)
+            # 建筑市场接口只返回该建筑内的订单，无需按地点过滤
+            aggregators = {first.name: PriceAggregator()}
+        else:
+            pages = eveesi.esi_pages(eveesi.markets_region_orders, first.region_id, typed=True,
+                                     response_meta=response_meta)
+            aggregators = {s.name: PriceAggregator(location_ids=s.location_ids) for s in sources}
+
+        # 逐页折叠为每个物品的最优买/卖价，下载后续分页的同时处理已到达的分页；订单直接解析为 MarketOrder
+        book_builder = OrderBookBuilder(first.book_id)
+        async for order_list in pages:
+            for aggregator in aggregators.values():
+                aggregator.fold(order_list)
+            book_builder.append(order_list)
+
+        order_book = await asyncio.to_thread(book_builder.build)
+        if not len(order_book):
+            # 没有任何订单时保留当前订单簿与价格快照，不设置刷新标记，下次重新拉取
+            logger.warning(f"{first.name} 未拉取到任何订单，保留当前价格快照")
+            return
+        self._set_order_book(order_book)
+        await asyncio.to_thread(order_book.save, OrderBookSnapshot.default_path(first.book_id))
+
+        for source in sources:
+            aggregator = aggregators[source.name]
+            if not aggregator.quotes:
+                logger.warning(f"{source.name} 没有任何报价，保留当前价格快照")
+                continue
+            logger.info(f"{source.name} 价格聚合完成: {aggregator.summary()}")
+
+            # 基于同一份订单簿向量化计算价格模型，与最优价写入同一个 hash
+            source_book = await self.get_source_order_book(source.name)
+            model_prices = await asyncio.to_thread(price_model_mappings, source_book, aggregator.quotes.keys())
+            price_items = ((type_id, {**mapping, **model_prices[type_id]}) for type_id, mapping in aggregator.items())
+
+            # 整批写入新快照并原子切换当前指针
+            version = await self.get_price_snapshot(source.name).publish(price_items)
+            logger.info(f"{source.name} 价格快照已发布: version={version}")
+
+            await rdm.r.set(source.update_flag_key, "1", ex=source.refresh_ttl(expires_in(response_meta)))
+
+    def _set_order_book(self, order_book: OrderBookSnapshot):
+        self.order_books[order_book.region_id] = order_book
+        for source in market_source_registry.all():
+            if source.book_id == order_book.region_id:
+                self._source_order_books.pop(source.name, None)
+
+    async def get_order_book(self, book_id: int = REGION_FORGE_ID) -> OrderBookSnapshot | None:
+        """获取区域（或玩家建筑）订单簿，内存中没有时从磁盘加载最近一次保存的快照"""
+        if book_id in self.order_books:
+            return self.order_books[book_id]
+        path = OrderBookSnapshot.default_path(book_id)
+        if not os.path.exists(path):
+            return None
+        self._set_order_book(await asyncio.to_thread(OrderBookSnapshot.load, path))
+        return self.order_books[book_id]
+
+    async def get_source_order_book(self, name: str) -> OrderBookSnapshot | None:
+        """指定市场的订单簿，NPC 贸易中心只保留该空间站的订单"""
+        if name not in self._source_order_books:
+            source = market_source_registry.get(name)
+            order_book = await self.get_order_book(source.book_id)
+            if order_book is None:
+                return None
+            if not source.is_structure:
+                order_book = order_book.filter_locations(source.location_ids)
+            self._source_order_books[name] = order_book
+        return self._source_order_books[name]
+
+    async def get_jita_order_book(self) -> OrderBookSnapshot | None:
+        """吉他 4-4 空间站订单簿"""
+        return await self.get_source_order_book("jita")
+
+    async def estimate_jita_buy_cost(self, type_ids: list[int], quantities) -> FillResult:
+        """按吉他卖单深度估算买入成本，quantities 可为单个数量或与 type_ids 等长的列表"""
+        order_book = await self.get_jita_order_book()
+        if order_book is None:
+            raise KahunaException("吉他订单簿尚未拉取")
+        return order_book.cost_to_buy(type_ids, quantities)
+
+    async def estimate_jita_sell_proceeds(self, type_ids: list[int], quantities) -> FillResult:
+        """按吉他买单深度估算卖出收入"""
+        order_book = await self.get_jita_order_book()
+        if order_book is None:
+            raise KahunaException("吉他订单簿尚未拉取")
+        return order_book.proceeds_from_selling(type_ids, quantities)
 
-        type_price_cache = {}
-        jita_order = await eveesi.markets_region_orders(REGION_FORGE_ID)
-        for order_list in jita_order:
-            for order in order_list:
-                if order["location_id"] != JITA_TRADE_HUB_STRUCTURE_ID:
-                    continue
-                    
-                if order["type_id"] not in type_price_cache:
-                    type_price_cache[order["type_id"]] = {
-                        "max_buy": 0,
-                        "min_sell": 1000000000000000000000,
-                    }
-                else:
-                    if order["is_buy_order"]:
-                        type_price_cache[order["type_id"]]["max_buy"] = max(type_price_cache[order["type_id"]]["max_buy"], order["price"])
-                    else:
-                        type_price_cache[order["type_id"]]["min_sell"] = min(type_price_cache[order["type_id"]]["min_sell"], order["price"])
-
-
-        
-        # 分批处理并并发插入Redis
-        batch_size = 100  # 每批处理100个type_id
-        items = list(type_price_cache.items())
-        tasks = []
-        
-        for i in range(0, len(items), batch_size):
-            batch = items[i:i + batch_size]
-            task = asyncio.create_task(self._batch_insert_redis(batch))
-            tasks.append(task)
-        
-        # 等待所有批次完成
-        await asyncio.gather(*tasks)
-
-        await rdm.r.set(f"market_update_flag:jita", "1", ex=60*60*4)
+    async def get_hub_prices(
+            self, type_ids: list[int], hubs: list[str] | None = None, fields: tuple = ("max_buy", "min_sell")
+    ) -> dict:
+        """
+        一次读取多个市场、多个物品的价格（两次 Redis 往返）
+        Returns:
+            dict: {市场名: {type_id: {field: float}}}，无数据的字段为 None
+        """
+        hubs = hubs or [s.name for s in market_source_registry.all()]
+        stores = [self.get_price_snapshot(name) for name in hubs]
+        raw = await read_many(stores, type_ids, fields)
+        return {
+            name: {
+                type_id: {f: float(v) if v else None for f, v in values.items()}
+                for type_id, values in raw[store.prefix].items()
+            }
+            for name, store in zip(hubs, stores)
+        }
 
 
 # class MarketManagerOld():
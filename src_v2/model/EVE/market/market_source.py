@@ -0,0 +1,119 @@
+"""
+市场数据源注册表
+
+每个数据源对应一个交易中心：NPC 星域贸易中心按区域订单 + 空间站过滤，玩家建筑按建筑市场接口拉取（需要授权角色）。
+价格快照写入 market_price:{name}，刷新标记为 market_update_flag:{name}，
+标记的过期时间取订单接口响应的 Expires（ESI 缓存到期即刷新），缺少该响应头时使用 refresh_seconds。
+玩家建筑在 config.toml 中配置:
+    [MARKET]
+    Hubs = ["jita", "amarr", "dodixie", "rens", "hek"]
+    Structures = [{name = "frt", structure_id = 1035466617946, character_id = 2112345678}]
+"""
+import ast
+from dataclasses import dataclass, field
+from typing import Optional
+
+from src_v2.core.config.config import config
+from src_v2.core.log import logger
+from src_v2.core.utils import KahunaException
+
+# 订单响应没有 Expires 时的刷新间隔
+DEFAULT_REFRESH_SECONDS = config.getint('MARKET', 'Refresh_Seconds', fallback=60 * 60 * 4)
+# 刷新间隔下限，Expires 已过期或过近时避免连续拉取
+MIN_REFRESH_SECONDS = config.getint('MARKET', 'Min_Refresh_Seconds', fallback=60)
+
+
+@dataclass
+class MarketSource:
+    name: str
+    region_id: Optional[int] = None
+    location_ids: tuple = field(default_factory=tuple)
+    structure_id: Optional[int] = None
+    # 玩家建筑市场需要有停靠权限的角色
+    character_id: Optional[int] = None
+    refresh_seconds: int = DEFAULT_REFRESH_SECONDS
+
+    @property
+    def is_structure(self) -> bool:
+        return self.structure_id is not None
+
+    @property
+    def book_id(self) -> int:
+        """订单簿快照编号：NPC 贸易中心为区域 id，玩家建筑为建筑 id"""
+        return self.structure_id if self.is_structure else self.region_id
+
+    @property
+    def price_prefix(self) -> str:
+        return f"market_price:{self.name}"
+
+    @property
+    def update_flag_key(self) -> str:
+        return f"market_update_flag:{self.name}"
+
+    def refresh_ttl(self, expires_in: Optional[float]) -> int:
+        """刷新标记的过期秒数：优先使用订单响应 Expires 的剩余时间，缺失时为 refresh_seconds"""
+        if expires_in is None:
+            return self.refresh_seconds
+        return max(MIN_REFRESH_SECONDS, int(expires_in))
+
+
+NPC_HUBS = [
+    MarketSource("jita", region_id=10000002, location_ids=(60003760,)),
+    MarketSource("amarr", region_id=10000043, location_ids=(60008494,)),
+    MarketSource("dodixie", region_id=10000032, location_ids=(60011866,)),
+    MarketSource("rens", region_id=10000030, location_ids=(60004588,)),
+    MarketSource("hek", region_id=10000042, location_ids=(60005686,)),
+]
+
+
+def _parse_list(value: str) -> list:
+    """TOML 列表会被转换为字符串，需要解析"""
+    if not value or not value.strip():
+        return []
+    try:
+        parsed = ast.literal_eval(value)
+    except (ValueError, SyntaxError) as e:
+        logger.warning(f"解析市场配置失败: {value}, 错误: {e}")
+        return []
+    return parsed if isinstance(parsed, list) else []
+
+
+class MarketSourceRegistry:
+    def __init__(self):
+        self.sources: dict[str, MarketSource] = {}
+
+    def register(self, source: MarketSource):
+        if not source.is_structure and (source.region_id is None or not source.location_ids):
+            raise KahunaException(f"市场 {source.name} 缺少区域或空间站")
+        self.sources[source.name] = source
+
+    def get(self, name: str) -> MarketSource:
+        if name not in self.sources:
+            raise KahunaException(f"未知市场: {name}")
+        return self.sources[name]
+
+    def all(self) -> list[MarketSource]:
+        return list(self.sources.values())
+
+    def load_from_config(self):
+        enabled_hubs = _parse_list(config.get('MARKET', 'Hubs', fallback='["jita"]'))
+        for hub in NPC_HUBS:
+            if hub.name in enabled_hubs:
+                self.register(hub)
+        for item in _parse_list(config.get('MARKET', 'Structures', fallback='[]')):
+            try:
+                self.register(MarketSource(
+                    name=item["name"],
+                    structure_id=int(item["structure_id"]),
+                    character_id=int(item["character_id"]),
+                    refresh_seconds=int(item.get("refresh_seconds", DEFAULT_REFRESH_SECONDS)),
+                ))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.warning(f"玩家建筑市场配置无效: {item}, 错误: {e}")
+        # 吉他始终可用，计划成本计算依赖它
+        if "jita" not in self.sources:
+            self.register(NPC_HUBS[0])
+
+
+market_source_registry = MarketSourceRegistry()
+market_source_registry.load_from_config()
@@ -0,0 +1,209 @@
+"""
+列式订单簿快照
+
+每次区域订单拉取保存为一份列式快照（NumPy 数组），买/卖两侧分别按 (type_id, 价格优先级) 排序：
+    type_id, price, volume, location_id
+并预先计算每个物品段内的累计挂单量与累计成交额，任意物品的 "买入 N 个的成本"、"卖出 N 个的收入"
+都是段内一次二分查找，多个物品可以一次向量化计算。
+累计值在每个物品段首重新从 0 开始：区域内有 1e18 ISK 量级的离谱挂单时，全局累计后再相减会丢失小额物品的精度。
+快照以 .npz 保存在 [MARKET] Order_Book_Dir 下，重启后可直接加载。
+"""
+import os
+import time
+from typing import Iterable, NamedTuple, Optional
+
+import numpy as np
+
+from src_v2.core.config.config import config
+from src_v2.core.utils.path import TMP_PATH
+
+ORDER_BOOK_DIR = config.get('MARKET', 'Order_Book_Dir', fallback=os.path.join(TMP_PATH, 'order_book'))
+
+
+class FillResult(NamedTuple):
+    """按数量成交的估算结果，各字段与输入的 type_ids 一一对应"""
+    total: np.ndarray        # 总成本 / 总收入
+    filled: np.ndarray       # 实际可成交数量（深度不足时小于请求数量）
+    avg_price: np.ndarray    # 成交均价，无法成交时为 nan
+    worst_price: np.ndarray  # 最后成交一档的价格，无法成交时为 nan
+
+
+def segment_cumsum(values: np.ndarray, segment_id: np.ndarray) -> np.ndarray:
+    """
+    按已排序的 segment_id 分段求累加和，每段从 0 重新开始
+
+    采用倍增扫描，每一步只把同一段内的值相加，结果不受前面各段数值大小的影响
+    """
+    result = values.astype(np.float64, copy=True)
+    n = len(result)
+    if not n:
+        return result
+    starts = np.flatnonzero(np.r_[True, segment_id[1:] != segment_id[:-1]])
+    longest = int(np.diff(np.r_[starts, n]).max())
+    shift = 1
+    while shift < longest:
+        same = segment_id[shift:] == segment_id[:-shift]
+        result[shift:] = result[shift:] + np.where(same, result[:-shift], 0.0)
+        shift *= 2
+    return result
+
+
+class BookSide:
+    """订单簿单侧，订单按 type_id 排序，同一物品内按价格优先级排序（卖单升序、买单降序）"""
+
+    def __init__(self, type_id: np.ndarray, price: np.ndarray, volume: np.ndarray, location_id: np.ndarray,
+                 is_buy: bool):
+        order = np.lexsort((-price if is_buy else price, type_id))
+        self.is_buy = is_buy
+        self.type_id = type_id[order]
+        self.price = price[order]
+        self.volume = volume[order]
+        self.location_id = location_id[order]
+        # 物品段内的累计值，每个 type_id 段首重新从 0 开始
+        self.cum_volume = segment_cumsum(self.volume, self.type_id)
+        self.cum_cost = segment_cumsum(self.price * self.volume, self.type_id)
+
+    def __len__(self):
+        return len(self.type_id)
+
+    def segments(self, type_ids: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """返回每个物品在本侧的 [start, end) 区间"""
+        return (np.searchsorted(self.type_id, type_ids, side='left'),
+                np.searchsorted(self.type_id, type_ids, side='right'))
+
+    def fill(self, type_ids, quantities) -> FillResult:
+        type_ids = np.atleast_1d(np.asarray(type_ids, dtype=np.int64))
+        quantities = np.broadcast_to(np.asarray(quantities, dtype=np.float64), type_ids.shape)
+        if not len(self):
+            nan = np.full(type_ids.shape, np.nan)
+            return FillResult(np.zeros(type_ids.shape), np.zeros(type_ids.shape), nan, nan)
+
+        start, end = self.segments(type_ids)
+        last = np.minimum(np.maximum(end - 1, start), len(self) - 1)
+        available = np.where(end > start, self.cum_volume[last], 0.0)
+        filled = np.minimum(quantities, available)
+        has_fill = filled > 0
+
+        # 成交到的最后一档：段内累计量首次达到成交数量的位置
+        idx = self._first_reaching(np.minimum(start, last), last, filled)
+        before_volume = np.where(idx > start, self.cum_volume[idx - 1], 0.0)
+        before_cost = np.where(idx > start, self.cum_cost[idx - 1], 0.0)
+
+        total = np.where(has_fill, before_cost + (filled - before_volume) * self.price[idx], 0.0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            avg_price = np.where(has_fill, total / filled, np.nan)
+        worst_price = np.where(has_fill, self.price[idx], np.nan)
+        return FillResult(total, filled, avg_price, worst_price)
+
+    def _first_reaching(self, lo: np.ndarray, hi: np.ndarray, target: np.ndarray) -> np.ndarray:
+        """在各自的 [lo, hi] 段内向量化二分，返回段内累计量首次 >= target 的位置，达不到时为 hi"""
+        lo, hi = lo.copy(), hi.copy()
+        while True:
+            active = lo < hi
+            if not active.any():
+                return lo
+            mid = (lo + hi) // 2
+            below = self.cum_volume[mid] < target
+            lo = np.where(active & below, mid + 1, lo)
+            hi = np.where(active & ~below, mid, hi)
+
+    def depth(self, type_id: int, k: int) -> tuple[np.ndarray, np.ndarray]:
+        start, end = self.segments(np.array([type_id]))
+        end = min(int(end[0]), int(start[0]) + k)
+        return self.price[int(start[0]):end], self.volume[int(start[0]):end]
+
+
+class OrderBookSnapshot:
+    """单个区域某一时刻的列式订单簿"""
+
+    def __init__(self, region_id: int, fetched_at: float, type_id: np.ndarray, price: np.ndarray,
+                 volume: np.ndarray, location_id: np.ndarray, is_buy: np.ndarray):
+        self.region_id = region_id
+        self.fetched_at = fetched_at
+        self.sell = BookSide(type_id[~is_buy], price[~is_buy], volume[~is_buy], location_id[~is_buy], is_buy=False)
+        self.buy = BookSide(type_id[is_buy], price[is_buy], volume[is_buy], location_id[is_buy], is_buy=True)
+
+    def __len__(self):
+        return len(self.sell) + len(self.buy)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(arr.nbytes for side in (self.sell, self.buy)
+                   for arr in (side.type_id, side.price, side.volume, side.location_id, side.cum_volume, side.cum_cost))
+
+    def cost_to_buy(self, type_ids, quantities) -> FillResult:
+        """从最低卖单开始买入 quantities 个的成本，type_ids/quantities 可为数组"""
+        return self.sell.fill(type_ids, quantities)
+
+    def proceeds_from_selling(self, type_ids, quantities) -> FillResult:
+        """从最高买单开始卖出 quantities 个的收入，type_ids/quantities 可为数组"""
+        return self.buy.fill(type_ids, quantities)
+
+    def top_k(self, type_id: int, k: int = 5) -> dict:
+        """买卖两侧前 k 档 (价格, 数量)"""
+        sell_price, sell_volume = self.sell.depth(type_id, k)
+        buy_price, buy_volume = self.buy.depth(type_id, k)
+        return {
+            "sell": list(zip(sell_price.tolist(), sell_volume.tolist())),
+            "buy": list(zip(buy_price.tolist(), buy_volume.tolist())),
+        }
+
+    def filter_locations(self, location_ids: Iterable[int]) -> "OrderBookSnapshot":
+        """只保留指定地点订单的新快照（如吉他 4-4）"""
+        location_ids = np.fromiter(location_ids, dtype=np.int64)
+        columns = self._columns()
+        mask = np.isin(columns["location_id"], location_ids)
+        return OrderBookSnapshot(self.region_id, self.fetched_at, **{k: v[mask] for k, v in columns.items()})
+
+    def _columns(self) -> dict:
+        return {
+            "type_id": np.concatenate([self.sell.type_id, self.buy.type_id]),
+            "price": np.concatenate([self.sell.price, self.buy.price]),
+            "volume": np.concatenate([self.sell.volume, self.buy.volume]),
+            "location_id": np.concatenate([self.sell.location_id, self.buy.location_id]),
+            "is_buy": np.concatenate([np.zeros(len(self.sell), dtype=bool), np.ones(len(self.buy), dtype=bool)]),
+        }
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, region_id=self.region_id, fetched_at=self.fetched_at, **self._columns())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> "OrderBookSnapshot":
+        with np.load(path) as data:
+            return cls(int(data["region_id"]), float(data["fetched_at"]),
+                       data["type_id"], data["price"], data["volume"], data["location_id"], data["is_buy"])
+
+    @staticmethod
+    def default_path(region_id: int) -> str:
+        return os.path.join(ORDER_BOOK_DIR, f"{region_id}.npz")
+
+
+class OrderBookBuilder:
+    """逐页追加 MarketOrder，最后一次性拼接为快照"""
+
+    def __init__(self, region_id: int):
+        self.region_id = region_id
+        self._chunks: list[tuple[np.ndarray, ...]] = []
+
+    def append(self, orders: list):
+        count = len(orders)
+        if not count:
+            return
+        self._chunks.append((
+            np.fromiter((o.type_id for o in orders), dtype=np.int32, count=count),
+            np.fromiter((o.price for o in orders), dtype=np.float64, count=count),
+            np.fromiter((o.volume_remain for o in orders), dtype=np.int64, count=count),
+            np.fromiter((o.location_id for o in orders), dtype=np.int64, count=count),
+            np.fromiter((o.is_buy_order for o in orders), dtype=bool, count=count),
+        ))
+
+    def build(self, fetched_at: Optional[float] = None) -> OrderBookSnapshot:
+        if self._chunks:
+            columns = [np.concatenate(column) for column in zip(*self._chunks)]
+        else:
+            columns = [np.empty(0, dtype=dtype) for dtype in (np.int32, np.float64, np.int64, np.int64, bool)]
+        self._chunks = []
+        return OrderBookSnapshot(self.region_id, fetched_at or time.time(), *columns)
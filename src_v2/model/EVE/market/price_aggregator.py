@@ -0,0 +1,94 @@
+"""
+市场订单流式聚合
+
+逐页折叠区域订单，只保留每个物品的最优买/卖价、订单数与挂单量，
+内存占用与物品种类数成正比，与订单总数无关。
+"""
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+
+@dataclass(slots=True)
+class TypeQuote:
+    """单个物品在某个市场的报价汇总，无对应订单的一侧价格为 0，写入 redis 时不写该侧价格字段"""
+    max_buy: float = 0
+    min_sell: float = 0
+    buy_orders: int = 0
+    sell_orders: int = 0
+    buy_volume: int = 0
+    sell_volume: int = 0
+
+    def to_mapping(self) -> dict:
+        mapping = {
+            "buy_orders": self.buy_orders,
+            "sell_orders": self.sell_orders,
+            "buy_volume": self.buy_volume,
+            "sell_volume": self.sell_volume,
+        }
+        # 没有订单的一侧不写价格，读取时为 None，与价格为 0 区分
+        if self.buy_orders:
+            mapping["max_buy"] = self.max_buy
+        if self.sell_orders:
+            mapping["min_sell"] = self.min_sell
+        return mapping
+
+
+class PriceAggregator:
+    """
+    流式最优价聚合器
+    Args:
+        location_ids: 只统计这些地点的订单，为空时统计全部订单
+    """
+
+    def __init__(self, location_ids: Optional[Iterable[int]] = None):
+        self.location_ids = set(location_ids) if location_ids else None
+        self.quotes: dict[int, TypeQuote] = {}
+        self.pages = 0
+        self.scanned_orders = 0
+        self.matched_orders = 0
+
+    def fold(self, orders: Iterable) -> None:
+        """折叠一页 MarketOrder，首个订单同样参与比较"""
+        quotes = self.quotes
+        location_ids = self.location_ids
+        scanned = 0
+        matched = 0
+        for order in orders:
+            scanned += 1
+            if location_ids is not None and order.location_id not in location_ids:
+                continue
+            matched += 1
+            quote = quotes.get(order.type_id)
+            if quote is None:
+                quote = quotes[order.type_id] = TypeQuote()
+            if order.is_buy_order:
+                if quote.buy_orders == 0 or order.price > quote.max_buy:
+                    quote.max_buy = order.price
+                quote.buy_orders += 1
+                quote.buy_volume += order.volume_remain
+            else:
+                if quote.sell_orders == 0 or order.price < quote.min_sell:
+                    quote.min_sell = order.price
+                quote.sell_orders += 1
+                quote.sell_volume += order.volume_remain
+        self.pages += 1
+        self.scanned_orders += scanned
+        self.matched_orders += matched
+
+    def items(self):
+        """返回 (type_id, redis hash mapping) 迭代器"""
+        return ((type_id, quote.to_mapping()) for type_id, quote in self.quotes.items())
+
+    def summary(self) -> dict:
+        buy_orders = sum(q.buy_orders for q in self.quotes.values())
+        sell_orders = sum(q.sell_orders for q in self.quotes.values())
+        return {
+            "pages": self.pages,
+            "scanned_orders": self.scanned_orders,
+            "matched_orders": self.matched_orders,
+            "types": len(self.quotes),
+            "buy_orders": buy_orders,
+            "sell_orders": sell_orders,
+            "buy_volume": sum(q.buy_volume for q in self.quotes.values()),
+            "sell_volume": sum(q.sell_volume for q in self.quotes.values()),
+        }
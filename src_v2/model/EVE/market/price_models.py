@@ -0,0 +1,67 @@
+"""
+价格模型
+
+单个最低卖价/最高买价容易被一张恶意挂单带偏，这里基于列式订单簿对所有物品一次向量化计算更稳健的价格：
+    sell_pct / buy_pct          最优 percentile 比例挂单量的成交均价（如最便宜 5% 卖单量的均价）
+    sell_trimmed / buy_trimmed  跳过最优 trim_ratio 比例挂单量后的最优价，剔除极小量的离谱挂单
+    mid_price                   最高买价与最低卖价的中间价，任一侧无订单时无法计算
+计算结果与 max_buy/min_sell 写在同一个 market_price:jita:* hash 中，无法计算的字段不写入。
+"""
+import math
+
+import numpy as np
+
+from src_v2.core.config.config import config
+
+from .order_book import OrderBookSnapshot
+
+PRICE_MODEL_PERCENTILE = config.getfloat('MARKET', 'Price_Percentile', fallback=0.05)
+PRICE_MODEL_TRIM_RATIO = config.getfloat('MARKET', 'Price_Trim_Ratio', fallback=0.01)
+
+PRICE_MODEL_FIELDS = ("sell_pct", "buy_pct", "sell_trimmed", "buy_trimmed", "mid_price")
+
+# 计划成本计算使用的价格字段
+PLAN_BUY_PRICE_FIELD = config.get('MARKET', 'Plan_Buy_Price_Field', fallback='max_buy')
+PLAN_SELL_PRICE_FIELD = config.get('MARKET', 'Plan_Sell_Price_Field', fallback='min_sell')
+
+
+def compute_price_models(
+        order_book: OrderBookSnapshot,
+        type_ids,
+        percentile: float = PRICE_MODEL_PERCENTILE,
+        trim_ratio: float = PRICE_MODEL_TRIM_RATIO,
+) -> dict[str, np.ndarray]:
+    """
+    Args:
+        order_book: 已按地点过滤的订单簿
+        type_ids: 需要计算的物品
+    Returns:
+        dict[str, np.ndarray]: 字段名 -> 与 type_ids 对齐的价格数组，无法计算时为 nan
+    """
+    type_ids = np.asarray(type_ids, dtype=np.int64)
+    result = {}
+    for side_name, side in (("sell", order_book.sell), ("buy", order_book.buy)):
+        available = side.fill(type_ids, np.inf).filled
+        # 至少成交 1 个，避免极小挂单量时比例数量为 0
+        pct_fill = side.fill(type_ids, np.maximum(available * percentile, np.minimum(available, 1)))
+        trimmed_fill = side.fill(type_ids, np.maximum(available * trim_ratio, np.minimum(available, 1)))
+        best = side.fill(type_ids, np.minimum(available, 1)).worst_price
+        result[f"{side_name}_pct"] = pct_fill.avg_price
+        result[f"{side_name}_trimmed"] = trimmed_fill.worst_price
+        result[f"_{side_name}_best"] = best
+
+    sell_best = result.pop("_sell_best")
+    buy_best = result.pop("_buy_best")
+    result["mid_price"] = (sell_best + buy_best) / 2
+    return {field: np.round(values, 2) for field, values in result.items()}
+
+
+def price_model_mappings(order_book: OrderBookSnapshot, type_ids) -> dict[int, dict]:
+    """按物品拆分为 redis hash mapping，无法计算的字段不写入"""
+    type_ids = list(type_ids)
+    models = compute_price_models(order_book, type_ids)
+    columns = {field: values.tolist() for field, values in models.items()}
+    return {
+        type_id: {field: columns[field][i] for field in PRICE_MODEL_FIELDS if not math.isnan(columns[field][i])}
+        for i, type_id in enumerate(type_ids)
+    }
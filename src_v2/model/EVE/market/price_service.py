@@ -0,0 +1,105 @@
+"""
+批量价格查询
+
+PriceService.get_many 一次返回一批物品的价格：
+    1. 读取市场快照当前版本号（一次 GET）
+    2. 命中进程内 LRU 的物品直接返回，其余物品在该版本上用一个 pipeline 读取
+缓存 key 带快照版本号，价格刷新切换指针后旧条目自然不再命中，由 LRU 淘汰；
+快照尚无版本号（旧的无版本布局）时不缓存，每次都直接读取。
+无价格数据的字段返回 None，与价格为 0 区分。
+hub 为市场名（见 market_source_registry），"adjusted" 表示全服调整价/平均价快照。
+"""
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from src_v2.core.config.config import config
+from src_v2.core.database.redis_snapshot import RedisSnapshotStore
+from src_v2.core.utils import KahunaException, SingletonMeta
+
+from .market_source import market_source_registry
+from .price_models import PRICE_MODEL_FIELDS
+
+PRICE_CACHE_SIZE = config.getint('MARKET', 'Price_Cache_Size', fallback=50000)
+
+ADJUSTED_PRICE_HUB = "adjusted"
+ADJUSTED_PRICE_PREFIX = "market_price_cache"
+
+DEFAULT_PRICE_FIELDS = ("max_buy", "min_sell")
+HUB_PRICE_FIELDS = DEFAULT_PRICE_FIELDS + PRICE_MODEL_FIELDS
+ADJUSTED_PRICE_FIELDS = ("adjusted_price", "average_price")
+
+
+class PriceService(metaclass=SingletonMeta):
+    def __init__(self, cache_size: int = PRICE_CACHE_SIZE):
+        self.cache_size = cache_size
+        # (快照前缀, 版本号, type_id) -> {field: float | None}
+        self._cache: OrderedDict[tuple, dict] = OrderedDict()
+        self._stores: dict[str, RedisSnapshotStore] = {}
+
+    def get_store(self, hub: str) -> RedisSnapshotStore:
+        if hub not in self._stores:
+            prefix = ADJUSTED_PRICE_PREFIX if hub == ADJUSTED_PRICE_HUB else market_source_registry.get(hub).price_prefix
+            self._stores[hub] = RedisSnapshotStore(prefix)
+        return self._stores[hub]
+
+    @staticmethod
+    def allowed_fields(hub: str) -> tuple:
+        return ADJUSTED_PRICE_FIELDS if hub == ADJUSTED_PRICE_HUB else HUB_PRICE_FIELDS
+
+    async def get_many(
+            self, type_ids: Iterable[int], fields: Iterable[str] = DEFAULT_PRICE_FIELDS, hub: str = "jita"
+    ) -> dict[int, dict[str, Optional[float]]]:
+        """
+        Args:
+            type_ids: 物品 id，重复的 id 只查询一次
+            fields: 价格字段
+            hub: 市场名
+        Returns:
+            dict: {type_id: {field: float}}，无数据的字段为 None
+        """
+        fields = tuple(fields)
+        invalid = set(fields) - set(self.allowed_fields(hub))
+        if invalid:
+            raise KahunaException(f"市场 {hub} 不支持价格字段: {sorted(invalid)}")
+
+        store = self.get_store(hub)
+        type_ids = list(dict.fromkeys(int(type_id) for type_id in type_ids))
+        if not type_ids:
+            return {}
+        version = await store.current_version()
+
+        result = {}
+        missing = []
+        for type_id in type_ids:
+            key = (store.prefix, version, type_id)
+            cached = self._cache.get(key) if version is not None else None
+            if cached is not None and all(f in cached for f in fields):
+                self._cache.move_to_end(key)
+                result[type_id] = {f: cached[f] for f in fields}
+            else:
+                missing.append(type_id)
+
+        if missing:
+            raw = await store.hmget_many_at(version, missing, fields)
+            for type_id, values in raw.items():
+                prices = {f: float(v) if v else None for f, v in values.items()}
+                result[type_id] = prices
+                if version is not None:
+                    self._remember((store.prefix, version, type_id), prices)
+        return result
+
+    async def get_one(self, type_id: int, field: str, hub: str = "jita") -> Optional[float]:
+        return (await self.get_many([type_id], (field,), hub))[int(type_id)][field]
+
+    def _remember(self, key: tuple, prices: dict):
+        cached = self._cache.get(key)
+        if cached is not None:
+            cached.update(prices)
+            self._cache.move_to_end(key)
+        else:
+            self._cache[key] = dict(prices)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def clear(self):
+        self._cache.clear()
@@ -0,0 +1,102 @@
+"""
+市场相关数据的后台刷新
+
+启动时注册到进程内定时任务，由 Redis 锁选出的主进程按各自刷新标记的过期时间刷新：
+    market_prices     全部已注册市场的订单与价格（market_update_flag:{name}，订单响应 Expires 到期时过期）
+    system_cost       工业星系成本指数（system_cost_cache:status，整点过期）
+    adjusted_price    全服调整价/平均价（market_price_cache:status，次日 0 点过期）
+    market_history    配置的区域市场历史（market_history_update_flag:{region_id}）
+用户请求中的计划计算因此总能读到已就绪的数据，原有的惰性刷新保留为兜底。
+配置:
+    [SCHEDULER]
+    Enabled = true
+    Market_History_Regions = [10000002]
+"""
+import ast
+
+from src_v2.core.config.config import config
+from src_v2.core.log import logger
+from src_v2.core.scheduler import LeaderScheduler, ScheduledJob
+
+from .market_source import market_source_registry
+
+SCHEDULER_ENABLED = config.getboolean('SCHEDULER', 'Enabled', fallback=True)
+SCHEDULER_TICK_SECONDS = config.getint('SCHEDULER', 'Tick_Seconds', fallback=10)
+SCHEDULER_LEADER_TTL = config.getint('SCHEDULER', 'Leader_TTL', fallback=30)
+
+
+def _history_regions() -> list[int]:
+    value = config.get('SCHEDULER', 'Market_History_Regions', fallback='[]')
+    try:
+        return [int(region_id) for region_id in ast.literal_eval(value or '[]')]
+    except (ValueError, SyntaxError, TypeError) as e:
+        logger.warning(f"解析 Market_History_Regions 失败: {value}, 错误: {e}")
+        return []
+
+
+async def _refresh_markets():
+    from .market_manager import MarketManager
+
+    await MarketManager().refresh_markets()
+
+
+async def _refresh_system_cost():
+    from src_v2.model.EVE.industry.plan_configflow_operate import ConfigFlowOperateCenter
+
+    await ConfigFlowOperateCenter.refresh_system_cost()
+
+
+async def _refresh_adjusted_price():
+    from src_v2.model.EVE.industry.plan_configflow_operate import ConfigFlowOperateCenter
+
+    await ConfigFlowOperateCenter.refresh_market_price()
+
+
+def _history_job(region_id: int) -> ScheduledJob:
+    async def run():
+        from .market_history import MarketHistoryManager
+
+        await MarketHistoryManager().refresh_daily(region_id)
+
+    return ScheduledJob(
+        name=f"market_history:{region_id}",
+        run=run,
+        flag_keys=lambda: [f"market_history_update_flag:{region_id}"],
+        min_interval=5 * 60,
+    )
+
+
+def build_refresh_scheduler() -> LeaderScheduler:
+    scheduler = LeaderScheduler(
+        "scheduler:market_refresh", leader_ttl=SCHEDULER_LEADER_TTL, tick_seconds=SCHEDULER_TICK_SECONDS
+    )
+    scheduler.add_job(ScheduledJob(
+        name="market_prices",
+        run=_refresh_markets,
+        flag_keys=lambda: [source.update_flag_key for source in market_source_registry.all()],
+    ))
+    scheduler.add_job(ScheduledJob(
+        name="system_cost",
+        run=_refresh_system_cost,
+        flag_keys=lambda: ["system_cost_cache:status"],
+    ))
+    scheduler.add_job(ScheduledJob(
+        name="adjusted_price",
+        run=_refresh_adjusted_price,
+        flag_keys=lambda: ["market_price_cache:status"],
+    ))
+    for region_id in _history_regions():
+        scheduler.add_job(_history_job(region_id))
+    return scheduler
+
+
+refresh_scheduler = build_refresh_scheduler()
+
+
+async def init_refresh_scheduler():
+    if SCHEDULER_ENABLED:
+        await refresh_scheduler.start()
+
+
+async def shutdown_refresh_scheduler():
+    await refresh_scheduler.stop()
@@ -0,0 +1,83 @@
+"""
+名称模糊搜索索引
+
+对一组名称预先建立 n-gram 倒排索引：
+- 名称先按 rapidfuzz 默认规则归一化（小写、非字母数字转空格），再按词排序，与 token_sort_ratio 的比较方式一致
+- 英文使用三元组，中文单字信息量大，使用二元组
+查询时用 n-gram 重合度（Dice 系数）从全部名称中挑出少量候选，再用 rapidfuzz 的 token_sort_ratio 精确打分。
+构建与查询都是纯 CPU 计算，由调用方放到工作线程中执行，不阻塞事件循环。
+"""
+from typing import Optional
+
+import numpy as np
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+# 精确打分的候选数量上限
+FUZZY_CANDIDATES = 512
+FUZZY_NGRAM_EN = 3
+FUZZY_NGRAM_ZH = 2
+
+
+def normalize(name: str) -> str:
+    """归一化并按词排序"""
+    return " ".join(sorted(default_process(name).split()))
+
+
+def ngrams(text: str, n: int) -> set[str]:
+    padded = f" {text} "
+    if len(padded) <= n:
+        return {padded}
+    return {padded[i:i + n] for i in range(len(padded) - n + 1)}
+
+
+class FuzzyIndex:
+    def __init__(self, names: list[str], ngram: int = FUZZY_NGRAM_EN, version: Optional[int] = None):
+        self.version = version
+        self.ngram = ngram
+        self.names = list(dict.fromkeys(name for name in names if name))
+        self.normalized = [normalize(name) for name in self.names]
+
+        postings: dict[str, list[int]] = {}
+        gram_counts = np.zeros(len(self.names), dtype=np.int32)
+        for i, text in enumerate(self.normalized):
+            grams = ngrams(text, ngram)
+            gram_counts[i] = len(grams)
+            for gram in grams:
+                postings.setdefault(gram, []).append(i)
+        self.postings = {gram: np.asarray(ids, dtype=np.int32) for gram, ids in postings.items()}
+        self.gram_counts = gram_counts
+
+    def __len__(self):
+        return len(self.names)
+
+    def candidates(self, query: str, max_candidates: int = FUZZY_CANDIDATES) -> np.ndarray:
+        """按 n-gram 重合度挑出候选名称的下标（升序，保持原列表顺序以便同分时排序一致）"""
+        grams = ngrams(query, self.ngram)
+        hits = [self.postings[gram] for gram in grams if gram in self.postings]
+        if not hits:
+            return np.zeros(0, dtype=np.int64)
+        overlap = np.bincount(np.concatenate(hits), minlength=len(self.names))
+        matched = np.flatnonzero(overlap)
+        if len(matched) <= max_candidates:
+            return matched
+        dice = 2 * overlap[matched] / (self.gram_counts[matched] + len(grams))
+        top = np.argpartition(-dice, max_candidates - 1)[:max_candidates]
+        return np.sort(matched[top])
+
+    def extract(self, query: str, limit: int = 5, max_candidates: int = FUZZY_CANDIDATES) -> list[tuple[str, float]]:
+        """
+        返回得分最高的 limit 个名称及得分
+        有重合的候选不足 limit 个时退回全量打分，结果与逐个比较一致
+        """
+        query = normalize(query)
+        if not query or not self.names:
+            return []
+        candidates = self.candidates(query, max_candidates)
+        if len(candidates) >= limit:
+            choices = {int(i): self.normalized[i] for i in candidates}
+        else:
+            choices = dict(enumerate(self.normalized))
+        # 名称已按词排序，ratio 即 token_sort_ratio
+        result = process.extract(query, choices, scorer=fuzz.ratio, processor=None, limit=limit)
+        return [(self.names[key], score) for _, score, key in result]
@@ -21,6 +21,8 @@ from .inv_categories_model import InvCategories, process_inv_categories_row
 from .market_groups_model import MarketGroups, process_market_groups_row
 from .map_solar_systems_model import MapSolarSystems, process_map_solar_systems_row
 from .map_regions_model import MapRegions, process_map_regions_row
+from .sde_changes_model import SdeChanges
+from .snapshot import SdeSnapshot, MarketGroupClosure, build_snapshot_from_db
 
 __all__ = [
     'SDEBuilder',
@@ -51,5 +53,9 @@ __all__ = [
     'process_map_solar_systems_row',
     'MapRegions',
     'process_map_regions_row',
+    'SdeChanges',
+    'SdeSnapshot',
+    'MarketGroupClosure',
+    'build_snapshot_from_db',
 ]
 
@@ -1,11 +1,18 @@
 """
 SDE 下载模块
 从官方网站下载最新的 SDE 数据包
+
+下载中断后按 HTTP Range 从已写入的位置续传，完成后校验大小与服务器提供的 MD5，
+并记录 SHA-256 供再次使用时校验；on_chunk 回调可把数据块实时交给流式解压。
 """
 import os
+import re
+import asyncio
+import base64
+import hashlib
 import aiohttp
 import aiofiles
-from typing import Optional, Dict
+from typing import Optional, Dict, Callable, Awaitable, Tuple
 from datetime import datetime
 from tqdm import tqdm
 
@@ -14,6 +21,53 @@ from src_v2.core.log import logger
 from src_v2.core.utils.path import DOWNLOAD_RESOURCE_PATH
 import json
 
+# 下载时每次读取的字节数
+DOWNLOAD_CHUNK_BYTES = 1024 * 1024
+PART_SUFFIX = '.part'
+CHECKSUM_SUFFIX = '.sha256'
+_MD5_ETAG = re.compile(r'^"?([0-9a-fA-F]{32})"?$')
+
+
+class SDEDownloadError(Exception):
+    """下载无法续传（远端文件变化、续传位置不一致等），需要丢弃已下载部分"""
+
+
+def parse_content_range(value: str) -> Tuple[int, int]:
+    """
+    解析 Content-Range: bytes start-end/total
+    
+    Returns:
+        (start, total)，total 未知时为 0
+    """
+    match = re.match(r'bytes (\d+)-\d+/(\d+|\*)', value or '')
+    if not match:
+        raise SDEDownloadError(f"无法解析 Content-Range: {value}")
+    total = match.group(2)
+    return int(match.group(1)), 0 if total == '*' else int(total)
+
+
+def expected_md5(headers) -> Optional[str]:
+    """
+    服务器提供的整个文件的 MD5（十六进制），没有时返回 None
+    优先使用 Content-MD5；S3/CDN 单段上传对象的 ETag 即 MD5，多段上传的 ETag 带 "-" 不可用
+    """
+    content_md5 = headers.get('Content-MD5')
+    if content_md5:
+        try:
+            return base64.b64decode(content_md5).hex()
+        except ValueError:
+            pass
+    match = _MD5_ETAG.match(headers.get('ETag') or '')
+    return match.group(1).lower() if match else None
+
+
+def file_sha256(file_path: str) -> str:
+    hasher = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(DOWNLOAD_CHUNK_BYTES), b''):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
 
 class SDEDownloader:
     """SDE 数据包下载器"""
@@ -26,6 +80,8 @@ class SDEDownloader:
         download_path = config.get('SDE_BUILDER', 'Download_Path', 
                                    fallback=os.path.join(DOWNLOAD_RESOURCE_PATH, 'sde'))
         self.download_path = str(download_path) if download_path else os.path.join(DOWNLOAD_RESOURCE_PATH, 'sde')
+        # 断线续传的最大尝试次数
+        self.max_retries = config.getint('SDE_BUILDER', 'Download_Retries', fallback=5)
         
         # 确保下载目录存在
         os.makedirs(self.download_path, exist_ok=True)
@@ -60,13 +116,48 @@ class SDEDownloader:
             logger.error(f"获取最新版本信息时出错: {e}")
             return None
     
-    async def download(self, url: Optional[str] = None, target_build_number: Optional[int] = None) -> Optional[str]:
+    def get_file_path(self, target_build_number: Optional[int] = None) -> str:
+        """
+        数据包的本地保存路径
+        
+        Args:
+            target_build_number: 目标版本号，为 None 时使用时间戳命名
+        """
+        if target_build_number:
+            filename = f"eve-online-static-data-{target_build_number}-jsonl.zip"
+        else:
+            # 使用时间戳作为文件名
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            filename = f"eve-online-static-data-latest-{timestamp}.zip"
+        return os.path.join(self.download_path, filename)
+    
+    def verify_file(self, file_path: str) -> bool:
+        """
+        用下载完成时记录的 SHA-256 校验已有文件，没有记录时视为有效
+        """
+        checksum_path = file_path + CHECKSUM_SUFFIX
+        if not os.path.exists(checksum_path):
+            return True
+        with open(checksum_path, 'r') as f:
+            expected = f.read().split()[0]
+        actual = file_sha256(file_path)
+        if actual != expected:
+            logger.warning(f"文件校验失败: {file_path}, 期望 {expected}, 实际 {actual}")
+            return False
+        return True
+    
+    async def download(self, url: Optional[str] = None, target_build_number: Optional[int] = None,
+                       on_chunk: Optional[Callable[[bytes], Awaitable[None]]] = None) -> Optional[str]:
         """
-        下载 SDE 数据包
+        下载 SDE 数据包，断线后按 Range 从已下载的位置续传，完成后校验大小与服务器提供的 MD5
+        
+        下载中的数据写入 {文件}.part，服务器的 ETag / Last-Modified 记录在 {文件}.part.json，
+        续传时通过 If-Range 确认远端文件未变化；完成后改名并在 {文件}.sha256 记录校验和
         
         Args:
             url: 下载 URL，如果为 None 则使用最新版本 URL
             target_build_number: 目标版本号，用于生成文件名
+            on_chunk: 按文件顺序接收数据块的回调，每个字节只传递一次（已存在的文件或续传前的部分从磁盘读取）
         
         Returns:
             下载文件的本地路径，失败返回 None
@@ -74,95 +165,184 @@ class SDEDownloader:
         if url is None:
             url = self.latest_download_url
         
-        # 生成文件名
-        if target_build_number:
-            filename = f"eve-online-static-data-{target_build_number}-jsonl.zip"
-        else:
-            # 使用时间戳作为文件名
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            filename = f"eve-online-static-data-latest-{timestamp}.zip"
-        
-        file_path = os.path.join(self.download_path, filename)
+        file_path = self.get_file_path(target_build_number)
+        part_path = file_path + PART_SUFFIX
+        meta_path = part_path + '.json'
         
         # 检查文件是否已存在
         if os.path.exists(file_path):
-            logger.info(f"文件已存在，跳过下载: {file_path}")
-            return file_path
+            if self.verify_file(file_path):
+                logger.info(f"文件已存在，跳过下载: {file_path}")
+                if on_chunk is not None:
+                    await self._feed_from_disk(file_path, 0, on_chunk)
+                return file_path
+            logger.warning(f"已有文件校验失败，重新下载: {file_path}")
+            os.remove(file_path)
+        
+        # 只有同一 URL 的未完成下载可以续传
+        meta = {}
+        if os.path.exists(part_path) and os.path.exists(meta_path):
+            with open(meta_path, 'r') as f:
+                meta = json.load(f)
+        if meta.get('url') != url:
+            meta = {'url': url}
+            for path in (part_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+        
+        # 已写入磁盘的字节数、已交给 on_chunk 的字节数
+        written = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        fed = 0
+        hasher = hashlib.sha256()
+        md5 = hashlib.md5()
+        if written:
+            logger.info(f"发现未完成的下载，从 {written / (1024 * 1024):.2f} MB 处续传: {part_path}")
+            fed = await self._feed_from_disk(part_path, 0, on_chunk, hasher, md5)
         
         logger.info(f"开始下载 SDE 数据包: {url}")
         logger.info(f"保存路径: {file_path}")
         
-        try:
-            async with aiohttp.ClientSession() as session:
-                async with session.get(url, ssl=False, 
-                                     timeout=aiohttp.ClientTimeout(total=3600)) as response:
-                    if response.status == 200:
-                        total_size = int(response.headers.get('Content-Length', 0))
-                        downloaded = 0
+        for attempt in range(self.max_retries):
+            if attempt > 0:
+                wait_time = min(2 ** attempt, 60)
+                logger.info(f"{wait_time} 秒后续传 (第 {attempt + 1}/{self.max_retries} 次)，已下载 {written} 字节")
+                await asyncio.sleep(wait_time)
+            
+            headers = {}
+            if written:
+                headers['Range'] = f'bytes={written}-'
+                validator = meta.get('etag') or meta.get('last_modified')
+                if validator:
+                    headers['If-Range'] = validator
+            
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async with session.get(url, ssl=False, headers=headers,
+                                           timeout=aiohttp.ClientTimeout(total=None, sock_read=60)) as response:
+                        if response.status == 416 and written:
+                            # 已下载部分与远端不一致（例如远端变小），只能重新开始
+                            logger.warning("服务器拒绝续传范围，重新下载")
+                            written = self._reset_part(part_path)
+                            hasher, md5 = hashlib.sha256(), hashlib.md5()
+                            continue
+                        if response.status not in (200, 206):
+                            logger.error(f"下载失败，状态码: {response.status}")
+                            return None
                         
-                        # 创建进度条
-                        if total_size > 0:
-                            # 有文件大小信息，显示进度条
-                            progress_bar = tqdm(
-                                total=total_size,
-                                unit='B',
-                                unit_scale=True,
-                                unit_divisor=1024,
-                                desc="下载 SDE 数据包",
-                                ncols=100,
-                                bar_format='{l_bar}{bar}| {n_fmt}/{total_fmt} [{elapsed}<{remaining}, {rate_fmt}]'
-                            )
+                        etag = response.headers.get('ETag')
+                        last_modified = response.headers.get('Last-Modified')
+                        if response.status == 200:
+                            # 服务器不支持 Range 或远端文件已变化，从头写入
+                            if written:
+                                logger.warning("服务器未按范围返回，重新下载完整文件")
+                                if fed and etag != meta.get('etag'):
+                                    raise SDEDownloadError("远端文件已变化，已交给解压流程的数据无法续用")
+                                written = self._reset_part(part_path)
+                                hasher, md5 = hashlib.sha256(), hashlib.md5()
+                            total_size = int(response.headers.get('Content-Length', 0))
                         else:
-                            # 没有文件大小信息，显示不确定进度条
-                            progress_bar = tqdm(
-                                unit='B',
-                                unit_scale=True,
-                                unit_divisor=1024,
-                                desc="下载 SDE 数据包",
-                                ncols=100,
-                                bar_format='{l_bar}{bar}| {n_fmt} [{elapsed}, {rate_fmt}]'
-                            )
+                            start, total_size = parse_content_range(response.headers.get('Content-Range', ''))
+                            if start != written:
+                                raise SDEDownloadError(f"续传位置不一致: 期望 {written}，服务器返回 {start}")
                         
+                        meta.update({'etag': etag, 'last_modified': last_modified,
+                                     'content_md5': expected_md5(response.headers) or meta.get('content_md5')})
+                        with open(meta_path, 'w') as f:
+                            json.dump(meta, f)
+                        
+                        progress_bar = tqdm(
+                            total=total_size or None,
+                            initial=written,
+                            unit='B',
+                            unit_scale=True,
+                            unit_divisor=1024,
+                            desc="下载 SDE 数据包",
+                            ncols=100,
+                        )
                         try:
-                            async with aiofiles.open(file_path, 'wb') as f:
-                                async for chunk in response.content.iter_chunked(8192):
+                            async with aiofiles.open(part_path, 'ab') as f:
+                                async for chunk in response.content.iter_chunked(DOWNLOAD_CHUNK_BYTES):
                                     await f.write(chunk)
-                                    downloaded += len(chunk)
-                                    # 更新进度条
+                                    hasher.update(chunk)
+                                    md5.update(chunk)
+                                    end = written + len(chunk)
+                                    # 重新下载时跳过已交给 on_chunk 的部分
+                                    if on_chunk is not None and end > fed:
+                                        await on_chunk(chunk[max(fed - written, 0):])
+                                        fed = end
+                                    written = end
                                     progress_bar.update(len(chunk))
-                            
-                            progress_bar.close()
-                            
-                            # 格式化文件大小显示
-                            if total_size > 0:
-                                size_mb = total_size / (1024 * 1024)
-                                logger.info(f"SDE 数据包下载完成: {file_path} ({size_mb:.2f} MB)")
-                            else:
-                                size_mb = downloaded / (1024 * 1024)
-                                logger.info(f"SDE 数据包下载完成: {file_path} ({size_mb:.2f} MB)")
-                            
-                            return file_path
-                        except Exception as e:
+                        finally:
                             progress_bar.close()
-                            logger.error(f"下载过程中出错: {e}")
-                            raise
-                    else:
-                        logger.error(f"下载失败，状态码: {response.status}")
-                        return None
-        except Exception as e:
-            logger.error(f"下载 SDE 数据包时出错: {e}")
-            # 清理失败的文件
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except:
-                    pass
+                
+                if total_size and written != total_size:
+                    raise aiohttp.ClientPayloadError(f"下载不完整: {written}/{total_size} 字节")
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                logger.warning(f"下载中断: {e}")
+                # 以磁盘上实际写入的大小为准继续
+                written = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+                if attempt == self.max_retries - 1:
+                    logger.error(f"达到最大重试次数，下载失败，保留 {part_path} 供下次续传")
+                    return None
+            except SDEDownloadError as e:
+                logger.error(f"下载 SDE 数据包时出错: {e}")
+                for path in (part_path, meta_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                return None
+        else:
+            # 没有一次尝试完整下载（例如最后一次仍被拒绝续传），不能把不完整的文件当作成功
+            logger.error(f"达到最大重试次数，下载失败: {url}")
             return None
+        
+        # 校验：服务器提供 MD5（Content-MD5 或单段上传的 ETag）时比对整个文件
+        sha256 = hasher.hexdigest()
+        expected = meta.get('content_md5')
+        if expected and md5.hexdigest() != expected:
+            logger.error(f"下载文件 MD5 校验失败: 期望 {expected}，实际 {md5.hexdigest()}")
+            for path in (part_path, meta_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return None
+        
+        os.replace(part_path, file_path)
+        with open(file_path + CHECKSUM_SUFFIX, 'w') as f:
+            f.write(f"{sha256}  {os.path.basename(file_path)}\n")
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        logger.info(f"SDE 数据包下载完成: {file_path} ({written / (1024 * 1024):.2f} MB, sha256={sha256})")
+        return file_path
+    
+    @staticmethod
+    def _reset_part(part_path: str) -> int:
+        with open(part_path, 'wb'):
+            pass
+        return 0
     
-    async def download_latest(self) -> Optional[str]:
+    @staticmethod
+    async def _feed_from_disk(file_path: str, start: int, on_chunk, *hashers) -> int:
+        """读取磁盘上的文件交给 on_chunk 并更新哈希，返回读取到的位置"""
+        position = start
+        async with aiofiles.open(file_path, 'rb') as f:
+            await f.seek(start)
+            while True:
+                chunk = await f.read(DOWNLOAD_CHUNK_BYTES)
+                if not chunk:
+                    return position
+                for hasher in hashers:
+                    hasher.update(chunk)
+                if on_chunk is not None:
+                    await on_chunk(chunk)
+                position += len(chunk)
+    
+    async def download_latest(self, on_chunk: Optional[Callable[[bytes], Awaitable[None]]] = None) -> Optional[str]:
         """
         下载最新版本的 SDE 数据包
         
+        Args:
+            on_chunk: 按文件顺序接收数据块的回调，见 download
+        
         Returns:
             下载文件的本地路径，失败返回 None
         """
@@ -170,8 +350,8 @@ class SDEDownloader:
         version_info = await self.get_latest_version()
         if version_info:
             build_number = version_info.get('buildNumber')
-            return await self.download(target_build_number=build_number)
+            return await self.download(target_build_number=build_number, on_chunk=on_chunk)
         else:
             # 如果获取版本信息失败，直接下载最新版本
-            return await self.download()
+            return await self.download(on_chunk=on_chunk)
 
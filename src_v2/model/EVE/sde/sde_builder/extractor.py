@@ -1,10 +1,19 @@
 """
 SDE 解压模块
 自动解压下载的数据包
+
+除解压完整文件外，还支持流式解压：按顺序读取 ZIP 的本地文件头，
+下载到的数据块在后台线程中边到达边解压，只写出需要导入的 JSONL，
+每个文件写完即通知导入流程，下载、解压与导入因此可以重叠进行。
 """
 import os
+import queue
+import struct
+import asyncio
+import threading
 import zipfile
-from typing import Optional
+import zlib
+from typing import Optional, Callable, Dict, Iterable
 import shutil
 
 from src_v2.core.config.config import config
@@ -12,6 +21,321 @@ from src_v2.core.log import logger
 from src_v2.core.utils.path import TMP_PATH
 
 
+# 流式解压时在途数据块的上限（每块约 1 MB）
+STREAM_QUEUE_CHUNKS = 32
+# 解压输出写盘的块大小
+_WRITE_CHUNK_BYTES = 1024 * 1024
+
+_LOCAL_HEADER = struct.Struct('<IHHHHHIIIHH')
+_LOCAL_HEADER_SIG = 0x04034b50
+_DATA_DESCRIPTOR_SIG = 0x08074b50
+# 本地文件之后是中央目录或结束记录，流式解压到此为止
+_END_SIGS = (0x02014b50, 0x06054b50, 0x06064b50, 0x05054b50, 0x08064b50)
+_ZIP64_EXTRA_ID = 0x0001
+_METHOD_STORED = 0
+_METHOD_DEFLATED = 8
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DATA_DESCRIPTOR = 0x8
+
+
+class ZipStreamError(Exception):
+    """ZIP 数据损坏或包含流式解压不支持的条目"""
+
+
+class ZipStreamExtractor:
+    """
+    按顺序解析 ZIP 本地文件头的增量解压器
+    
+    只依赖数据到达顺序，不需要文件末尾的中央目录；支持 stored / deflate、
+    数据描述符与 zip64，写出的文件逐个校验 CRC 与大小。
+    """
+    
+    def __init__(self, extract_to: str, wanted: Callable[[str], bool],
+                 on_file: Optional[Callable[[str, str], None]] = None):
+        """
+        Args:
+            extract_to: 输出目录，条目按文件名（去掉目录部分）写入
+            wanted: 判断文件名是否需要写出
+            on_file: 每写完一个文件调用 on_file(文件名, 路径)
+        """
+        self.extract_to = extract_to
+        self.wanted = wanted
+        self.on_file = on_file
+        self._buffer = bytearray()
+        self._state = 'header'
+        self._entry: Optional[dict] = None
+        self._out = None
+        self.bytes_in = 0
+    
+    def feed(self, data: bytes):
+        """送入下一段压缩包数据"""
+        self.bytes_in += len(data)
+        if self._state == 'done':
+            return
+        self._buffer += data
+        while self._step():
+            pass
+    
+    def close(self):
+        """数据结束，检查最后一个条目是否完整"""
+        if self._state not in ('header', 'done') or (self._state == 'header' and self._buffer):
+            raise ZipStreamError(f"压缩包在第 {self.bytes_in} 字节处意外结束")
+    
+    def _step(self) -> bool:
+        """处理缓冲区中的数据，还能继续处理时返回 True"""
+        if self._state == 'header':
+            return self._read_header()
+        if self._state == 'data':
+            return self._read_data()
+        if self._state == 'descriptor':
+            return self._read_descriptor()
+        return False
+    
+    def _read_header(self) -> bool:
+        if len(self._buffer) < 4:
+            return False
+        signature = struct.unpack_from('<I', self._buffer)[0]
+        if signature in _END_SIGS:
+            self._state = 'done'
+            self._buffer.clear()
+            return False
+        if signature != _LOCAL_HEADER_SIG:
+            raise ZipStreamError(f"无效的本地文件头签名: {signature:#010x}")
+        if len(self._buffer) < _LOCAL_HEADER.size:
+            return False
+        (_, _, flags, method, _, _, crc, compressed_size, size,
+         name_length, extra_length) = _LOCAL_HEADER.unpack_from(self._buffer)
+        header_size = _LOCAL_HEADER.size + name_length + extra_length
+        if len(self._buffer) < header_size:
+            return False
+        raw_name = bytes(self._buffer[_LOCAL_HEADER.size:_LOCAL_HEADER.size + name_length])
+        extra = bytes(self._buffer[_LOCAL_HEADER.size + name_length:header_size])
+        del self._buffer[:header_size]
+        
+        name = raw_name.decode('utf-8' if flags & 0x800 else 'cp437')
+        zip64 = False
+        # zip64 扩展字段按顺序只包含本地头中为 0xFFFFFFFF 的大小
+        offset = 0
+        while offset + 4 <= len(extra):
+            field_id, field_size = struct.unpack_from('<HH', extra, offset)
+            if field_id == _ZIP64_EXTRA_ID:
+                zip64 = True
+                values = extra[offset + 4:offset + 4 + field_size]
+                position = 0
+                if size == 0xFFFFFFFF:
+                    size = struct.unpack_from('<Q', values, position)[0]
+                    position += 8
+                if compressed_size == 0xFFFFFFFF:
+                    compressed_size = struct.unpack_from('<Q', values, position)[0]
+            offset += 4 + field_size
+        
+        if flags & _FLAG_ENCRYPTED:
+            raise ZipStreamError(f"不支持加密条目: {name}")
+        if method not in (_METHOD_STORED, _METHOD_DEFLATED):
+            raise ZipStreamError(f"不支持的压缩方式 {method}: {name}")
+        has_descriptor = bool(flags & _FLAG_DATA_DESCRIPTOR)
+        if has_descriptor and method == _METHOD_STORED:
+            # 未压缩且大小写在数据之后，无法确定数据结束位置
+            raise ZipStreamError(f"不支持带数据描述符的未压缩条目: {name}")
+        
+        basename = os.path.basename(name)
+        write = bool(basename) and not name.endswith('/') and self.wanted(basename)
+        self._entry = {
+            'name': basename,
+            'method': method,
+            'crc': crc,
+            'size': size,
+            'compressed_size': compressed_size,
+            'descriptor': has_descriptor,
+            'zip64': zip64,
+            'remaining': compressed_size,
+            'written': 0,
+            'actual_crc': 0,
+            'write': write,
+            'path': os.path.join(self.extract_to, basename) if write else None,
+            # 不需要的 deflate 条目大小已知时直接跳过，不必解压
+            'inflater': zlib.decompressobj(-15) if method == _METHOD_DEFLATED and (write or has_descriptor) else None,
+        }
+        if write:
+            self._out = open(self._entry['path'] + '.part', 'wb')
+        self._state = 'data'
+        return True
+    
+    def _read_data(self) -> bool:
+        entry = self._entry
+        if not self._buffer:
+            return False
+        inflater = entry['inflater']
+        if entry['descriptor']:
+            # 大小未知，依靠 deflate 流自身的结束标记
+            data = bytes(self._buffer)
+            self._buffer.clear()
+            self._write(inflater.decompress(data))
+            if inflater.eof:
+                self._buffer[:0] = inflater.unused_data
+                self._state = 'descriptor'
+            return inflater.eof
+        
+        take = min(entry['remaining'], len(self._buffer))
+        data = bytes(self._buffer[:take])
+        del self._buffer[:take]
+        entry['remaining'] -= take
+        if inflater is not None:
+            self._write(inflater.decompress(data))
+        elif entry['method'] == _METHOD_STORED:
+            self._write(data)
+        if entry['remaining'] == 0:
+            if inflater is not None:
+                self._write(inflater.flush())
+                if not inflater.eof:
+                    raise ZipStreamError(f"压缩数据不完整: {entry['name']}")
+            self._finish_entry()
+            self._state = 'header'
+            return True
+        return False
+    
+    def _read_descriptor(self) -> bool:
+        entry = self._entry
+        size_bytes = 8 if entry['zip64'] else 4
+        length = 4 + size_bytes * 2
+        if len(self._buffer) < 4:
+            return False
+        # 数据描述符的签名是可选的
+        has_signature = struct.unpack_from('<I', self._buffer)[0] == _DATA_DESCRIPTOR_SIG
+        if has_signature:
+            length += 4
+        if len(self._buffer) < length:
+            return False
+        offset = 4 if has_signature else 0
+        fmt = '<IQQ' if entry['zip64'] else '<III'
+        entry['crc'], entry['compressed_size'], entry['size'] = struct.unpack_from(fmt, self._buffer, offset)
+        del self._buffer[:length]
+        self._finish_entry()
+        self._state = 'header'
+        return True
+    
+    def _write(self, data: bytes):
+        if not data or not self._entry['write']:
+            return
+        self._entry['actual_crc'] = zlib.crc32(data, self._entry['actual_crc'])
+        self._entry['written'] += len(data)
+        self._out.write(data)
+    
+    def _finish_entry(self):
+        entry = self._entry
+        self._entry = None
+        if not entry['write']:
+            return
+        self._out.close()
+        self._out = None
+        part_path = entry['path'] + '.part'
+        if entry['written'] != entry['size'] or entry['actual_crc'] != entry['crc']:
+            os.remove(part_path)
+            raise ZipStreamError(f"文件校验失败: {entry['name']} "
+                                 f"(大小 {entry['written']}/{entry['size']}, CRC {entry['actual_crc']:#x}/{entry['crc']:#x})")
+        os.replace(part_path, entry['path'])
+        if self.on_file is not None:
+            self.on_file(entry['name'], entry['path'])
+    
+    def discard(self):
+        """中止时关闭并删除写了一半的文件"""
+        if self._out is not None:
+            self._out.close()
+            self._out = None
+            if self._entry is not None and os.path.exists(self._entry['path'] + '.part'):
+                os.remove(self._entry['path'] + '.part')
+
+
+class StreamingExtraction:
+    """
+    在后台线程中流式解压的会话
+    
+    feed 把下载到的数据块放入有界队列（队列满时下载端等待），
+    files[文件名] 是该文件解压完成时完成的 Future，结果为文件路径；压缩包中没有该文件时结果为 None，
+    解压出错时所有未完成的 Future 都以该异常结束。
+    """
+    
+    def __init__(self, extract_to: str, file_names: Iterable[str]):
+        self.extract_to = extract_to
+        self._loop = asyncio.get_running_loop()
+        self.files: Dict[str, asyncio.Future] = {name: self._loop.create_future() for name in file_names}
+        self.error: Optional[BaseException] = None
+        self._queue: queue.Queue = queue.Queue(maxsize=STREAM_QUEUE_CHUNKS)
+        self._extractor = ZipStreamExtractor(extract_to, self.files.__contains__, self._on_file)
+        self._thread = threading.Thread(target=self._run, name='sde-stream-extract', daemon=True)
+        self._thread.start()
+    
+    @property
+    def failed(self) -> bool:
+        return self.error is not None
+    
+    async def feed(self, chunk: bytes):
+        """送入下一段数据；解压已失败时丢弃（下载仍可完成，用于回退到完整解压）"""
+        if self.failed:
+            return
+        try:
+            self._queue.put_nowait(chunk)
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, chunk)
+    
+    async def finish(self):
+        """数据全部送入后等待解压结束，没有出现在压缩包中的文件结果为 None"""
+        await asyncio.to_thread(self._queue.put, None)
+        await asyncio.to_thread(self._thread.join)
+        if self.error is not None:
+            raise self.error
+        for future in self.files.values():
+            if not future.done():
+                future.set_result(None)
+    
+    async def abort(self, error: BaseException):
+        """下载失败时中止解压，等待中的导入任务以 error 结束"""
+        if self._thread.is_alive():
+            self._fail(error)
+            await asyncio.to_thread(self._queue.put, None)
+            await asyncio.to_thread(self._thread.join)
+        self._set_exception(error)
+    
+    def _run(self):
+        chunk = b''
+        try:
+            while True:
+                chunk = self._queue.get()
+                if chunk is None:
+                    if self.error is None:
+                        self._extractor.close()
+                    break
+                if self.error is None:
+                    self._extractor.feed(chunk)
+        except Exception as e:
+            self._fail(e)
+            # 继续取出剩余数据，避免下载端阻塞在已满的队列上
+            while chunk is not None:
+                chunk = self._queue.get()
+        finally:
+            self._extractor.discard()
+    
+    def _fail(self, error: BaseException):
+        if self.error is None:
+            self.error = error
+            logger.error(f"流式解压失败: {error}")
+            self._loop.call_soon_threadsafe(self._set_exception, error)
+    
+    def _set_exception(self, error: BaseException):
+        for future in self.files.values():
+            if not future.done():
+                future.set_exception(error)
+    
+    def _on_file(self, name: str, path: str):
+        logger.info(f"流式解压完成: {name}")
+        self._loop.call_soon_threadsafe(self._resolve, name, path)
+    
+    def _resolve(self, name: str, path: str):
+        future = self.files[name]
+        if not future.done():
+            future.set_result(path)
+
+
 class SDEExtractor:
     """SDE 数据包解压器"""
     
@@ -51,13 +375,20 @@ class SDEExtractor:
             logger.error(f"验证 ZIP 文件时出错: {zip_path}, 错误: {e}")
             return False
     
-    def extract(self, zip_path: str, extract_to: Optional[str] = None) -> Optional[str]:
+    def get_extract_dir(self, zip_path: str) -> str:
+        """数据包对应的解压目录：ZIP 文件名（不含扩展名）"""
+        zip_name = os.path.splitext(os.path.basename(zip_path))[0]
+        return os.path.join(self.extract_path, zip_name)
+    
+    def extract(self, zip_path: str, extract_to: Optional[str] = None,
+                members: Optional[Callable[[str], bool]] = None) -> Optional[str]:
         """
         解压 ZIP 文件
         
         Args:
             zip_path: ZIP 文件路径
             extract_to: 解压目标目录，如果为 None 则使用默认目录
+            members: 按文件名筛选需要解压的条目，为 None 时解压全部
         
         Returns:
             解压后的目录路径，失败返回 None
@@ -68,15 +399,9 @@ class SDEExtractor:
         
         if extract_to is None:
             # 使用 ZIP 文件名（不含扩展名）作为解压目录名
-            zip_name = os.path.splitext(os.path.basename(zip_path))[0]
-            extract_to = os.path.join(self.extract_path, zip_name)
+            extract_to = self.get_extract_dir(zip_path)
         
-        # 如果目录已存在，先删除
-        if os.path.exists(extract_to):
-            logger.info(f"清理已存在的解压目录: {extract_to}")
-            shutil.rmtree(extract_to)
-        
-        os.makedirs(extract_to, exist_ok=True)
+        self.prepare_dir(extract_to)
         
         logger.info(f"开始解压: {zip_path} -> {extract_to}")
         
@@ -84,6 +409,8 @@ class SDEExtractor:
             with zipfile.ZipFile(zip_path, 'r') as zip_ref:
                 # 获取文件列表
                 file_list = zip_ref.namelist()
+                if members is not None:
+                    file_list = [name for name in file_list if members(os.path.basename(name))]
                 total_files = len(file_list)
                 
                 # 解压所有文件
@@ -111,6 +438,27 @@ class SDEExtractor:
                     pass
             return None
     
+    def prepare_dir(self, extract_to: str):
+        """清空并建立解压目录"""
+        # 如果目录已存在，先删除
+        if os.path.exists(extract_to):
+            logger.info(f"清理已存在的解压目录: {extract_to}")
+            shutil.rmtree(extract_to)
+        
+        os.makedirs(extract_to, exist_ok=True)
+    
+    def stream_extract(self, extract_to: str, file_names: Iterable[str]) -> StreamingExtraction:
+        """
+        开始流式解压会话，只写出 file_names 中的文件
+        
+        Args:
+            extract_to: 解压目标目录（会先清空）
+            file_names: 需要写出的文件名
+        """
+        self.prepare_dir(extract_to)
+        logger.info(f"开始流式解压 -> {extract_to}")
+        return StreamingExtraction(extract_to, file_names)
+    
     def verify_extracted_files(self, extract_dir: str) -> bool:
         """
         验证解压后的文件
@@ -1,13 +1,29 @@
 """
 SDE 导入模块
 将解析后的数据批量导入 PostgreSQL
+
+默认使用 COPY 导入（Import_Method = "copy"）：
+1. 为每张表建立不带索引的影子表 {表名}__staging
+2. 各文件在独立连接上并行解析，通过 asyncpg copy_records_to_table 以二进制 COPY 写入影子表
+3. 全部写入后再按原表的索引定义为影子表建索引并 ANALYZE
+4. 在一个短事务中将原表与影子表改名互换并删除旧表，读者只会看到完整的旧版本或新版本
+已安装过版本且 Update_Mode = "diff" 时，第 3、4 步改为增量应用：按主键比较影子表与正式表的行哈希，
+只对正式表执行新增、修改、删除，并把逐行变更记录到 _sde_changes（仅记录，可用 SdeUtils.get_changed_type_ids 查询）。
+Import_Method = "insert" 时沿用原来的单事务 TRUNCATE + 批量 INSERT。
+流式下载解压时（见 SDEBuilder.stream_update）传入 files_ready，每个文件解压完成即开始 COPY。
 """
 import os
+import re
 import json
-from typing import List, Dict, Any, Optional, Iterator
+import asyncio
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+import multiprocessing
+from typing import List, Dict, Any, Optional, Iterator, Tuple
 from sqlalchemy import text
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from src_v2.core.config.config import config
 from src_v2.core.log import logger
 from .parser import SDEParser
 from .model_generator import SDEModelGenerator
@@ -22,6 +38,65 @@ from .inv_categories_model import InvCategories, process_inv_categories_row
 from .market_groups_model import MarketGroups, process_market_groups_row
 from .map_solar_systems_model import MapSolarSystems, process_map_solar_systems_row
 from .map_regions_model import MapRegions, process_map_regions_row
+from .sde_changes_model import SdeChanges, CHANGE_INSERT, CHANGE_UPDATE, CHANGE_DELETE, CHANGE_FULL
+from .parallel_parser import ROW_SPECS, PARSE_CHUNK_BYTES, copy_value, get_row_spec, iter_parsed_chunks
+
+STAGING_SUFFIX = "__staging"
+OLD_SUFFIX = "__old"
+# PostgreSQL 标识符最长 63 字节，超出部分会被静默截断
+PG_IDENTIFIER_MAX = 63
+
+BLUEPRINT_TABLES = [
+    'industryBlueprints',
+    'industryActivities',
+    'industryActivityMaterials',
+    'industryActivityProducts',
+]
+
+# 各表中指向 typeID 的列，变更记录据此汇总受影响的物品
+TYPE_ID_COLUMNS = {
+    'invTypes': ['typeID'],
+    'industryBlueprints': ['blueprintTypeID'],
+    'industryActivities': ['blueprintTypeID'],
+    'industryActivityMaterials': ['blueprintTypeID', 'materialTypeID'],
+    'industryActivityProducts': ['blueprintTypeID', 'productTypeID'],
+}
+
+_INDEX_DEF_PATTERN = re.compile(r'^(CREATE (?:UNIQUE )?INDEX )(\S+)( ON (?:ONLY )?)(\S+)( USING .*)$', re.S)
+
+
+def temp_table_name(name: str, suffix: str) -> str:
+    """带后缀的临时名称，超长时用哈希缩短，保证不被截断后互相冲突"""
+    candidate = f"{name}{suffix}"
+    if len(candidate.encode("utf-8")) <= PG_IDENTIFIER_MAX:
+        return candidate
+    digest = hashlib.md5(name.encode("utf-8")).hexdigest()[:8]
+    return f"{name[:PG_IDENTIFIER_MAX - len(suffix) - 9]}_{digest}{suffix}"
+
+
+def quote_ident(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+def rewrite_index_def(index_def: str, index_name: str, table_name: str) -> str:
+    """把 pg_get_indexdef 的结果改写为在另一张表上建立的同结构索引"""
+    match = _INDEX_DEF_PATTERN.match(index_def)
+    if not match:
+        raise ValueError(f"无法解析索引定义: {index_def}")
+    return f"{match.group(1)}{quote_ident(index_name)}{match.group(3)}public.{quote_ident(table_name)}{match.group(5)}"
+
+
+def target_tables(table_name: str) -> List[str]:
+    """文件对应的数据库表名"""
+    if table_name in ('types', 'invTypes'):
+        return ['invTypes']
+    if table_name == 'blueprints':
+        return list(BLUEPRINT_TABLES)
+    if table_name == 'groups':
+        return ['invGroups']
+    if table_name == 'categories':
+        return ['invCategories']
+    return [table_name]
 
 
 class SDEImporter:
@@ -39,6 +114,18 @@ class SDEImporter:
         self.parser = parser
         self.model_generator = SDEModelGenerator(parser)
         self.batch_size = 5000  # 批量大小
+        self.import_method = config.get('SDE_BUILDER', 'Import_Method', fallback='copy').strip('"').lower()
+        self.import_concurrency = max(1, config.getint('SDE_BUILDER', 'Import_Concurrency', fallback=4))
+        # 并行解析的进程数，0 表示在当前进程逐行解析
+        self.parse_workers = config.getint('SDE_BUILDER', 'Parse_Workers', fallback=os.cpu_count() or 1)
+        self.parse_chunk_bytes = PARSE_CHUNK_BYTES
+        self.update_mode = config.get('SDE_BUILDER', 'Update_Mode', fallback='diff').strip('"').lower()
+        # 最近一次导入的结果：{"build": 版本, "mode": "diff"/"full", "counts": {表: {op: 行数}}, "type_ids": 变更的 typeID}
+        self.last_changes: Optional[Dict[str, Any]] = None
+        # 导入期间 表名 -> 实际写入的影子表名
+        self._load_targets: Dict[str, str] = {}
+        # COPY 失败过的表，后续批次直接使用 INSERT
+        self._copy_disabled: set = set()
     
     async def get_current_version(self) -> Optional[int]:
         """
@@ -168,8 +255,8 @@ class SDEImporter:
     async def bulk_insert_via_copy(self, conn, table_name: str, columns: List[str], 
                                    data_batch: List[Dict[str, Any]]) -> bool:
         """
-        使用 PostgreSQL COPY 命令批量插入数据（最快）
-        注意：由于 asyncpg 的 COPY 需要特殊处理，这里暂时返回 False 以使用批量 INSERT
+        使用 PostgreSQL 二进制 COPY 批量写入数据（asyncpg copy_records_to_table）
+        COPY 在保存点中执行，失败时回滚保存点并返回 False，由调用方改用批量 INSERT
         
         Args:
             conn: 数据库连接
@@ -178,11 +265,70 @@ class SDEImporter:
             data_batch: 数据批次
         
         Returns:
-            是否成功（暂时总是返回 False 以使用批量 INSERT）
+            是否成功
         """
-        # TODO: 实现真正的 COPY 命令（需要直接使用 asyncpg 的 copy_from_stream）
-        # 目前暂时使用批量 INSERT
-        return False
+        if self.import_method != 'copy' or table_name in self._copy_disabled:
+            return False
+        if not data_batch:
+            return True
+        
+        records = [tuple(copy_value(row.get(col)) for col in columns) for row in data_batch]
+        return await self._copy_records(conn, table_name, columns, records)
+    
+    async def _copy_records(self, conn, table_name: str, columns: List[str], records: List[tuple]) -> bool:
+        """以 COPY 写入按列顺序排列的元组，失败时回滚保存点并返回 False"""
+        try:
+            raw_conn = await conn.get_raw_connection()
+            async with conn.begin_nested():
+                await raw_conn.driver_connection.copy_records_to_table(
+                    table_name, records=records, columns=columns, schema_name='public'
+                )
+            logger.debug(f"通过 COPY 写入了 {len(records)} 条记录到 {table_name}")
+            return True
+        except Exception as e:
+            logger.warning(f"COPY 写入 {table_name} 失败，改用批量 INSERT: {e}")
+            self._copy_disabled.add(table_name)
+            return False
+    
+    async def bulk_insert(self, conn, table_name: str, columns: List[str],
+                          data_batch: List[Dict[str, Any]]) -> bool:
+        """
+        写入一批数据：导入期间写入对应的影子表，优先 COPY，不可用时使用批量 INSERT
+        
+        Args:
+            conn: 数据库连接
+            table_name: 表名
+            columns: 列名列表
+            data_batch: 数据批次
+        
+        Returns:
+            是否成功
+        """
+        table_name = self._load_targets.get(table_name, table_name)
+        if await self.bulk_insert_via_copy(conn, table_name, columns, data_batch):
+            return True
+        return await self.bulk_insert_via_sql(conn, table_name, columns, data_batch)
+    
+    async def bulk_insert_records(self, conn, table_name: str, columns: List[str], records: List[tuple]) -> bool:
+        """
+        写入按列顺序排列的元组（并行解析的输出），优先 COPY，不可用时转为字典走批量 INSERT
+        
+        Args:
+            conn: 数据库连接
+            table_name: 表名
+            columns: 列名列表
+            records: 元组列表
+        
+        Returns:
+            是否成功
+        """
+        if not records:
+            return True
+        table_name = self._load_targets.get(table_name, table_name)
+        if (self.import_method == 'copy' and table_name not in self._copy_disabled
+                and await self._copy_records(conn, table_name, columns, records)):
+            return True
+        return await self.bulk_insert_via_sql(conn, table_name, columns, [dict(zip(columns, record)) for record in records])
     
     async def bulk_insert_via_sql(self, conn, table_name: str, columns: List[str],
                                   data_batch: List[Dict[str, Any]]) -> bool:
@@ -348,10 +494,8 @@ class SDEImporter:
                 
                 # 达到批量大小时执行插入
                 if len(batch) >= self.batch_size:
-                    # 尝试使用 COPY，失败则使用批量 INSERT
-                    success = await self.bulk_insert_via_copy(conn, table_name, columns, batch)
-                    if not success:
-                        await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                    # 优先使用 COPY，失败则使用批量 INSERT
+                    await self.bulk_insert(conn, table_name, columns, batch)
                     
                     total_count += len(batch)
                     batch = []
@@ -361,9 +505,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                success = await self.bulk_insert_via_copy(conn, table_name, columns, batch)
-                if not success:
-                    await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"文件导入完成: {file_path} -> 表: {table_name}, 共 {total_count} 条记录")
@@ -373,6 +515,35 @@ class SDEImporter:
             logger.error(f"导入文件失败: {file_path}, 错误: {e}")
             raise
     
+    async def import_file_parallel(self, conn, file_path: str, table_name: str, executor) -> int:
+        """
+        用进程池并行解析文件，解析结果按块直接写入
+        
+        Args:
+            conn: 数据库连接
+            file_path: 文件路径
+            table_name: 表名（需在 ROW_SPECS 中）
+            executor: 进程池
+        
+        Returns:
+            导入的记录数（各输出表之和）
+        """
+        spec = get_row_spec(table_name)
+        logger.info(f"开始并行导入文件: {file_path} -> 表: {list(spec.tables)}")
+        counts = {name: 0 for name in spec.tables}
+        error_count = 0
+        async for records, errors in iter_parsed_chunks(
+            file_path, table_name, executor, self.parse_chunk_bytes, max(2, self.parse_workers * 2)
+        ):
+            error_count += errors
+            for name, rows in records.items():
+                await self.bulk_insert_records(conn, name, spec.tables[name], rows)
+                counts[name] += len(rows)
+        if error_count:
+            logger.warning(f"{file_path} 有 {error_count} 行解析或处理失败，已跳过")
+        logger.info(f"文件导入完成: {file_path}, {counts}")
+        return sum(counts.values())
+    
     async def import_inv_types(self, conn, file_path: str) -> int:
         """
         特殊处理：导入 InvTypes 表数据
@@ -387,12 +558,7 @@ class SDEImporter:
         logger.info(f"使用特殊处理导入 InvTypes 表: {file_path}")
         
         table_name = 'invTypes'
-        columns = [
-            'typeID', 'groupID', 'typeName_en', 'typeName_zh', 'description_en', 'description_zh',
-            'mass', 'volume', 'packagedVolume', 'capacity', 'portionSize', 'factionID', 'raceID',
-            'basePrice', 'published', 'marketGroupID', 'graphicID', 'radius', 'iconID', 'soundID',
-            'sofFactionName', 'sofMaterialSetID', 'metaGroupID', 'variationparentTypeID'
-        ]
+        columns = ROW_SPECS[table_name].tables[table_name]
         
         batch = []
         total_count = 0
@@ -417,7 +583,7 @@ class SDEImporter:
                         
                         # 达到批量大小时执行插入
                         if len(batch) >= self.batch_size:
-                            await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                            await self.bulk_insert(conn, table_name, columns, batch)
                             total_count += len(batch)
                             batch = []
                             
@@ -433,7 +599,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"InvTypes 表导入完成: {file_path}, 共 {total_count} 条记录")
@@ -464,10 +630,8 @@ class SDEImporter:
         logger.info(f"开始读取蓝图文件: {file_path}")
         
         # 定义4个表的列名
-        blueprints_columns = ['blueprintTypeID', 'maxProductionLimit']
-        activities_columns = ['blueprintTypeID', 'activityID', 'time']
-        materials_columns = ['blueprintTypeID', 'activityID', 'materialTypeID', 'quantity']
-        products_columns = ['blueprintTypeID', 'activityID', 'productTypeID', 'quantity', 'probability']
+        blueprints_columns, activities_columns, materials_columns, products_columns = \
+            ROW_SPECS['blueprints'].tables.values()
         
         # 批量收集数据
         blueprints_batch = []
@@ -518,7 +682,7 @@ class SDEImporter:
                             # 插入 IndustryBlueprints
                             if blueprints_batch:
                                 try:
-                                    await self.bulk_insert_via_sql(conn, 'industryBlueprints', blueprints_columns, blueprints_batch)
+                                    await self.bulk_insert(conn, 'industryBlueprints', blueprints_columns, blueprints_batch)
                                     total_blueprints += len(blueprints_batch)
                                     blueprints_batch = []
                                 except Exception as e:
@@ -528,7 +692,7 @@ class SDEImporter:
                             # 插入 IndustryActivities
                             if activities_batch:
                                 try:
-                                    await self.bulk_insert_via_sql(conn, 'industryActivities', activities_columns, activities_batch)
+                                    await self.bulk_insert(conn, 'industryActivities', activities_columns, activities_batch)
                                     total_activities += len(activities_batch)
                                     activities_batch = []
                                 except Exception as e:
@@ -538,7 +702,7 @@ class SDEImporter:
                             # 插入 IndustryActivityMaterials
                             if materials_batch:
                                 try:
-                                    await self.bulk_insert_via_sql(conn, 'industryActivityMaterials', materials_columns, materials_batch)
+                                    await self.bulk_insert(conn, 'industryActivityMaterials', materials_columns, materials_batch)
                                     total_materials += len(materials_batch)
                                     materials_batch = []
                                 except Exception as e:
@@ -548,7 +712,7 @@ class SDEImporter:
                             # 插入 IndustryActivityProducts
                             if products_batch:
                                 try:
-                                    await self.bulk_insert_via_sql(conn, 'industryActivityProducts', products_columns, products_batch)
+                                    await self.bulk_insert(conn, 'industryActivityProducts', products_columns, products_batch)
                                     total_products += len(products_batch)
                                     products_batch = []
                                 except Exception as e:
@@ -570,7 +734,7 @@ class SDEImporter:
             # 插入剩余数据
             if blueprints_batch:
                 try:
-                    await self.bulk_insert_via_sql(conn, 'industryBlueprints', blueprints_columns, blueprints_batch)
+                    await self.bulk_insert(conn, 'industryBlueprints', blueprints_columns, blueprints_batch)
                     total_blueprints += len(blueprints_batch)
                     logger.debug(f"插入剩余 IndustryBlueprints 记录: {len(blueprints_batch)} 条")
                 except Exception as e:
@@ -579,7 +743,7 @@ class SDEImporter:
             
             if activities_batch:
                 try:
-                    await self.bulk_insert_via_sql(conn, 'industryActivities', activities_columns, activities_batch)
+                    await self.bulk_insert(conn, 'industryActivities', activities_columns, activities_batch)
                     total_activities += len(activities_batch)
                     logger.debug(f"插入剩余 IndustryActivities 记录: {len(activities_batch)} 条")
                 except Exception as e:
@@ -588,7 +752,7 @@ class SDEImporter:
             
             if materials_batch:
                 try:
-                    await self.bulk_insert_via_sql(conn, 'industryActivityMaterials', materials_columns, materials_batch)
+                    await self.bulk_insert(conn, 'industryActivityMaterials', materials_columns, materials_batch)
                     total_materials += len(materials_batch)
                     logger.debug(f"插入剩余 IndustryActivityMaterials 记录: {len(materials_batch)} 条")
                 except Exception as e:
@@ -597,7 +761,7 @@ class SDEImporter:
             
             if products_batch:
                 try:
-                    await self.bulk_insert_via_sql(conn, 'industryActivityProducts', products_columns, products_batch)
+                    await self.bulk_insert(conn, 'industryActivityProducts', products_columns, products_batch)
                     total_products += len(products_batch)
                     logger.debug(f"插入剩余 IndustryActivityProducts 记录: {len(products_batch)} 条")
                 except Exception as e:
@@ -631,10 +795,7 @@ class SDEImporter:
         logger.info(f"使用特殊处理导入 MetaGroups 表: {file_path}")
         
         table_name = 'metaGroups'
-        columns = [
-            'metaGroupID', 'nameID_en', 'nameID_zh', 'descriptionID_en', 'descriptionID_zh',
-            'iconID', 'iconSuffix'
-        ]
+        columns = ROW_SPECS[table_name].tables[table_name]
         
         batch = []
         total_count = 0
@@ -659,7 +820,7 @@ class SDEImporter:
                         
                         # 达到批量大小时执行插入
                         if len(batch) >= self.batch_size:
-                            await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                            await self.bulk_insert(conn, table_name, columns, batch)
                             total_count += len(batch)
                             batch = []
                             
@@ -675,7 +836,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"MetaGroups 表导入完成: {file_path}, 共 {total_count} 条记录")
@@ -699,10 +860,7 @@ class SDEImporter:
         logger.info(f"使用特殊处理导入 InvGroups 表: {file_path}")
         
         table_name = 'invGroups'
-        columns = [
-            'groupID', 'categoryID', 'groupName_en', 'groupName_zh', 'iconID',
-            'useBasePrice', 'anchored', 'anchorable', 'fittableNonSingleton', 'published'
-        ]
+        columns = ROW_SPECS[table_name].tables[table_name]
         
         batch = []
         total_count = 0
@@ -727,7 +885,7 @@ class SDEImporter:
                         
                         # 达到批量大小时执行插入
                         if len(batch) >= self.batch_size:
-                            await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                            await self.bulk_insert(conn, table_name, columns, batch)
                             total_count += len(batch)
                             batch = []
                             
@@ -743,7 +901,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"InvGroups 表导入完成: {file_path}, 共 {total_count} 条记录")
@@ -767,9 +925,7 @@ class SDEImporter:
         logger.info(f"使用特殊处理导入 InvCategories 表: {file_path}")
         
         table_name = 'invCategories'
-        columns = [
-            'categoryID', 'categoryName_en', 'categoryName_zh', 'published', 'iconID'
-        ]
+        columns = ROW_SPECS[table_name].tables[table_name]
         
         batch = []
         total_count = 0
@@ -794,7 +950,7 @@ class SDEImporter:
                         
                         # 达到批量大小时执行插入
                         if len(batch) >= self.batch_size:
-                            await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                            await self.bulk_insert(conn, table_name, columns, batch)
                             total_count += len(batch)
                             batch = []
                             
@@ -810,7 +966,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"InvCategories 表导入完成: {file_path}, 共 {total_count} 条记录")
@@ -834,10 +990,7 @@ class SDEImporter:
         logger.info(f"使用特殊处理导入 MarketGroups 表: {file_path}")
         
         table_name = 'marketGroups'
-        columns = [
-            'marketGroupID', 'nameID_en', 'nameID_zh', 'descriptionID_en', 'descriptionID_zh',
-            'hasTypes', 'iconID', 'parentGroupID'
-        ]
+        columns = ROW_SPECS[table_name].tables[table_name]
         
         batch = []
         total_count = 0
@@ -862,7 +1015,7 @@ class SDEImporter:
                         
                         # 达到批量大小时执行插入
                         if len(batch) >= self.batch_size:
-                            await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                            await self.bulk_insert(conn, table_name, columns, batch)
                             total_count += len(batch)
                             batch = []
                             
@@ -878,7 +1031,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"MarketGroups 表导入完成: {file_path}, 共 {total_count} 条记录")
@@ -902,11 +1055,7 @@ class SDEImporter:
         logger.info(f"使用特殊处理导入 MapSolarSystems 表: {file_path}")
         
         table_name = 'mapSolarSystems'
-        columns = [
-            'solarSystemID', 'solarSystemName_en', 'solarSystemName_zh', 'regionID', 'constellationID',
-            'x', 'y', 'z', 'luminosity', 'border', 'hub', 'international', 'regional',
-            'security', 'radius', 'sunTypeID', 'securityClass'
-        ]
+        columns = ROW_SPECS[table_name].tables[table_name]
         
         batch = []
         total_count = 0
@@ -931,7 +1080,7 @@ class SDEImporter:
                         
                         # 达到批量大小时执行插入
                         if len(batch) >= self.batch_size:
-                            await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                            await self.bulk_insert(conn, table_name, columns, batch)
                             total_count += len(batch)
                             batch = []
                             
@@ -947,7 +1096,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"MapSolarSystems 表导入完成: {file_path}, 共 {total_count} 条记录")
@@ -971,10 +1120,7 @@ class SDEImporter:
         logger.info(f"使用特殊处理导入 MapRegions 表: {file_path}")
         
         table_name = 'mapRegions'
-        columns = [
-            'regionID', 'regionName_en', 'regionName_zh', 'x', 'y', 'z',
-            'factionID', 'nameID_en', 'nameID_zh', 'descriptionID_en', 'descriptionID_zh'
-        ]
+        columns = ROW_SPECS[table_name].tables[table_name]
         
         batch = []
         total_count = 0
@@ -999,7 +1145,7 @@ class SDEImporter:
                         
                         # 达到批量大小时执行插入
                         if len(batch) >= self.batch_size:
-                            await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                            await self.bulk_insert(conn, table_name, columns, batch)
                             total_count += len(batch)
                             batch = []
                             
@@ -1015,7 +1161,7 @@ class SDEImporter:
             
             # 插入剩余数据
             if batch:
-                await self.bulk_insert_via_sql(conn, table_name, columns, batch)
+                await self.bulk_insert(conn, table_name, columns, batch)
                 total_count += len(batch)
             
             logger.info(f"MapRegions 表导入完成: {file_path}, 共 {total_count} 条记录")
@@ -1025,20 +1171,30 @@ class SDEImporter:
             logger.error(f"导入 MapRegions 表失败: {file_path}, 错误: {e}")
             raise
     
-    async def full_update(self, extract_dir: str) -> bool:
+    async def full_update(self, extract_dir: str, files_ready: Optional[Dict[str, asyncio.Future]] = None) -> bool:
         """
         执行全量更新
         
         Args:
             extract_dir: 解压目录
+            files_ready: 流式解压时各文件名对应的 Future（结果为文件路径，压缩包中没有该文件时为 None），
+                COPY 导入时每个文件解压完成即开始导入，不必等待整个压缩包
         
         Returns:
             是否成功
         """
         logger.info("开始执行全量更新")
         
+        if files_ready is not None and self.import_method != 'copy':
+            # 单事务 INSERT 需要全部文件就绪
+            await asyncio.gather(*files_ready.values())
+            files_ready = None
+        
         # 获取需要导入的文件列表
-        files_to_parse = self.parser.get_files_to_parse(extract_dir)
+        if files_ready is not None:
+            files_to_parse = [os.path.join(extract_dir, filename) for filename in files_ready]
+        else:
+            files_to_parse = self.parser.get_files_to_parse(extract_dir)
         
         # 检查是否包含 blueprints.jsonl
         blueprints_found = any('blueprints.jsonl' in f for f in files_to_parse)
@@ -1059,6 +1215,9 @@ class SDEImporter:
             logger.error("数据库引擎未初始化，请先调用 init_database()")
             return False
         
+        if self.import_method == 'copy':
+            return await self.full_update_via_staging(extract_dir, files_to_parse, files_ready)
+        
         # 开始事务
         async with self.db_manager.engine.begin() as conn:
             try:
@@ -1140,6 +1299,11 @@ class SDEImporter:
                 if count == 0:
                     raise Exception("_sde 表没有数据，更新失败")
                 
+                build_number = await self._get_staging_build_number(conn)
+                await conn.run_sync(SdeChanges.__table__.create, checkfirst=True)
+                await self._record_full_update(conn, build_number)
+                self.last_changes = {"build": build_number, "mode": CHANGE_FULL, "counts": {}, "type_ids": None}
+                
                 logger.info("全量更新完成，提交事务")
                 # 事务会在 with 块结束时自动提交
                 return True
@@ -1148,4 +1312,275 @@ class SDEImporter:
                 logger.error(f"全量更新失败: {e}")
                 # 事务会自动回滚
                 raise
-
+    
+    async def full_update_via_staging(self, extract_dir: str, files_to_parse: List[str],
+                                      files_ready: Optional[Dict[str, asyncio.Future]] = None) -> bool:
+        """
+        通过影子表执行全量更新：并行 COPY 写入影子表 -> 建索引 -> 改名互换
+        导入过程中原表保持可读，失败时删除影子表，原表不受影响
+        
+        Args:
+            extract_dir: 解压目录
+            files_to_parse: 需要导入的文件列表
+            files_ready: 流式解压时各文件的就绪 Future，见 full_update；
+                此时表结构与影子表在对应文件就绪后才建立
+        
+        Returns:
+            是否成功
+        """
+        jobs: List[Tuple[str, str]] = []
+        tables: List[str] = []
+        for file_path in files_to_parse:
+            table_name = os.path.splitext(os.path.basename(file_path))[0]
+            if table_name == 'types':
+                table_name = 'invTypes'
+            jobs.append((file_path, table_name))
+            tables.extend(t for t in target_tables(table_name) if t not in tables)
+        if '_sde' not in tables:
+            raise Exception("文件列表中没有 _sde.jsonl，无法确定版本")
+        
+        # 阶段一：确保原表存在，并建立不带索引的影子表
+        current_version = await self.get_current_version()
+        logger.info(f"当前数据库版本: {current_version}")
+        async with self.db_manager.engine.begin() as conn:
+            if files_ready is None:
+                await self.model_generator.create_all_tables(conn, extract_dir)
+            await conn.run_sync(SdeChanges.__table__.create, checkfirst=True)
+            if files_ready is None:
+                for table_name in tables:
+                    await self._create_staging_table(conn, table_name)
+        diff_mode = self.update_mode == 'diff' and current_version is not None
+        
+        self._load_targets = {table_name: temp_table_name(table_name, STAGING_SUFFIX) for table_name in tables}
+        self._copy_disabled = set()
+        semaphore = asyncio.Semaphore(self.import_concurrency)
+        
+        # 解析放在独立进程中；使用 spawn 避免在带事件循环与线程的进程中 fork
+        executor = None
+        if self.parse_workers > 0:
+            executor = ProcessPoolExecutor(self.parse_workers, mp_context=multiprocessing.get_context('spawn'))
+        
+        async def load(file_path: str, table_name: str) -> int:
+            if files_ready is not None:
+                # 等待流式解压写出该文件，不占用并发名额
+                if await files_ready[os.path.basename(file_path)] is None:
+                    logger.info(f"压缩包中没有 {os.path.basename(file_path)}，跳过")
+                    for target in target_tables(table_name):
+                        tables.remove(target)
+                    return 0
+            async with semaphore:
+                async with self.db_manager.engine.begin() as conn:
+                    if files_ready is not None:
+                        await self.model_generator.create_table_from_file(conn, file_path, table_name)
+                        for target in target_tables(table_name):
+                            await self._create_staging_table(conn, target)
+                    # 影子表在改名前对读者不可见，丢失最后几个事务只会导致本次导入失败重来
+                    await conn.execute(text("SET LOCAL synchronous_commit = off"))
+                    if executor is not None and get_row_spec(table_name) is not None:
+                        return await self.import_file_parallel(conn, file_path, table_name, executor)
+                    return await self.import_file(conn, file_path, table_name)
+        
+        async def build_indexes(table_name: str) -> List[Tuple[str, str]]:
+            async with semaphore:
+                async with self.db_manager.engine.begin() as conn:
+                    return await self._build_staging_indexes(conn, table_name)
+        
+        try:
+            # 阶段二：各文件在独立连接上并行写入影子表
+            logger.info(f"开始并行导入 {len(jobs)} 个文件（并发 {self.import_concurrency}）")
+            counts = await asyncio.gather(*(load(file_path, table_name) for file_path, table_name in jobs))
+            logger.info(f"影子表写入完成，共 {sum(counts)} 条记录")
+            if '_sde' not in tables:
+                raise Exception("压缩包中没有 _sde.jsonl，无法确定版本")
+            
+            if diff_mode:
+                # 阶段三：在一个事务中把差异应用到正式表，影子表随后删除
+                async with self.db_manager.engine.begin() as conn:
+                    build_number = await self._get_staging_build_number(conn)
+                    self.last_changes = await self._apply_diff(conn, tables, build_number)
+                await self._drop_staging_tables(tables)
+                logger.info(f"增量更新完成: {current_version} -> {build_number}, "
+                            f"变更 typeID {len(self.last_changes['type_ids'])} 个")
+                return True
+            
+            # 阶段三：写入完成后再建索引
+            renames = await asyncio.gather(*(build_indexes(table_name) for table_name in tables))
+            
+            # 阶段四：校验并在一个事务中改名互换
+            async with self.db_manager.engine.begin() as conn:
+                build_number = await self._get_staging_build_number(conn)
+                await self._swap_tables(conn, tables, dict(zip(tables, renames)))
+                await self._record_full_update(conn, build_number)
+            self.last_changes = {"build": build_number, "mode": CHANGE_FULL, "counts": {}, "type_ids": None}
+            logger.info("全量更新完成，影子表已切换为正式表")
+            return True
+        except Exception as e:
+            logger.error(f"全量更新失败: {e}")
+            await self._drop_staging_tables(tables)
+            raise
+        finally:
+            self._load_targets = {}
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+    
+    async def _create_staging_table(self, conn, table_name: str):
+        """按原表的列定义建立空影子表（不含索引与默认值）"""
+        staging = temp_table_name(table_name, STAGING_SUFFIX)
+        await conn.execute(text(f'DROP TABLE IF EXISTS {quote_ident(staging)}'))
+        await conn.execute(text(f'CREATE TABLE {quote_ident(staging)} (LIKE {quote_ident(table_name)})'))
+    
+    async def _build_staging_indexes(self, conn, table_name: str) -> List[Tuple[str, str]]:
+        """
+        按原表的索引定义在影子表上建索引，主键通过 USING INDEX 恢复
+        
+        Returns:
+            [(影子表索引名, 原索引名)]，改名互换后用于恢复原索引名
+        """
+        staging = temp_table_name(table_name, STAGING_SUFFIX)
+        result = await conn.execute(text("""
+            SELECT c.relname, pg_get_indexdef(i.indexrelid), i.indisprimary
+            FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE i.indrelid = CAST(:table_name AS regclass)
+            ORDER BY i.indisprimary DESC, c.relname
+        """), {"table_name": f'public.{quote_ident(table_name)}'})
+        renames = []
+        for index_name, index_def, is_primary in result.all():
+            staging_index = temp_table_name(index_name, STAGING_SUFFIX)
+            await conn.execute(text(f'DROP INDEX IF EXISTS {quote_ident(staging_index)}'))
+            await conn.execute(text(rewrite_index_def(index_def, staging_index, staging)))
+            if is_primary:
+                await conn.execute(text(
+                    f'ALTER TABLE {quote_ident(staging)} ADD CONSTRAINT {quote_ident(staging_index)} '
+                    f'PRIMARY KEY USING INDEX {quote_ident(staging_index)}'
+                ))
+            renames.append((staging_index, index_name))
+        await conn.execute(text(f'ANALYZE {quote_ident(staging)}'))
+        logger.info(f"影子表 {staging} 已建立 {len(renames)} 个索引")
+        return renames
+    
+    async def _swap_tables(self, conn, tables: List[str], renames: Dict[str, List[Tuple[str, str]]]):
+        """在同一事务中把影子表改名为正式表，删除旧表并恢复索引名"""
+        for table_name in tables:
+            old = temp_table_name(table_name, OLD_SUFFIX)
+            await conn.execute(text(f'DROP TABLE IF EXISTS {quote_ident(old)}'))
+            await conn.execute(text(f'ALTER TABLE IF EXISTS {quote_ident(table_name)} RENAME TO {quote_ident(old)}'))
+            await conn.execute(text(
+                f'ALTER TABLE {quote_ident(temp_table_name(table_name, STAGING_SUFFIX))} RENAME TO {quote_ident(table_name)}'
+            ))
+        for table_name in tables:
+            # 不使用 CASCADE：若有视图等依赖旧表，整个切换回滚
+            await conn.execute(text(f'DROP TABLE IF EXISTS {quote_ident(temp_table_name(table_name, OLD_SUFFIX))}'))
+            for staging_index, index_name in renames.get(table_name, []):
+                await conn.execute(text(f'ALTER INDEX {quote_ident(staging_index)} RENAME TO {quote_ident(index_name)}'))
+        logger.info(f"已切换 {len(tables)} 张表: {tables}")
+    
+    async def _drop_staging_tables(self, tables: List[str]):
+        try:
+            async with self.db_manager.engine.begin() as conn:
+                for table_name in tables:
+                    await conn.execute(text(f'DROP TABLE IF EXISTS {quote_ident(temp_table_name(table_name, STAGING_SUFFIX))}'))
+        except Exception as e:
+            logger.warning(f"清理影子表失败: {e}")
+    
+    async def _get_staging_build_number(self, conn) -> int:
+        """影子表中新版本的版本号，没有数据时视为导入失败"""
+        result = await conn.execute(text(
+            f'SELECT "buildNumber" FROM {quote_ident(self._load_targets.get("_sde", "_sde"))} WHERE "_key" = :key'
+        ), {"key": "sde"})
+        build_number = result.scalar()
+        if build_number is None:
+            raise Exception("_sde 表没有数据，更新失败")
+        return build_number
+    
+    async def _primary_key_columns(self, conn, table_name: str) -> List[str]:
+        result = await conn.execute(text("""
+            SELECT a.attname
+            FROM pg_index i
+            JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = ANY(i.indkey)
+            WHERE i.indrelid = CAST(:table_name AS regclass) AND i.indisprimary
+            ORDER BY array_position(CAST(i.indkey AS int2[]), a.attnum)
+        """), {"table_name": f'public.{quote_ident(table_name)}'})
+        return [row[0] for row in result.all()]
+    
+    async def _apply_diff(self, conn, tables: List[str], build_number: int) -> Dict[str, Any]:
+        """
+        按主键比较影子表与正式表的行哈希，只把新增、修改、删除应用到正式表，并写入变更记录
+        修改按先删后插处理；没有主键的表整表替换
+        
+        Returns:
+            {"build": 版本, "mode": "diff", "counts": {表: {op: 行数}}, "type_ids": 变更的 typeID 集合}
+        """
+        counts: Dict[str, Dict[str, int]] = {}
+        type_ids: set = set()
+        for table_name in tables:
+            live = quote_ident(table_name)
+            staging = quote_ident(self._load_targets[table_name])
+            pk = await self._primary_key_columns(conn, table_name)
+            if not pk:
+                await conn.execute(text(f'DELETE FROM {live}'))
+                await conn.execute(text(f'INSERT INTO {live} SELECT * FROM {staging}'))
+                await self._record_full_update(conn, build_number, table_name)
+                counts[table_name] = {CHANGE_FULL: 1}
+                logger.warning(f"表 {table_name} 没有主键，已整表替换")
+                continue
+            
+            pk_list = ', '.join(quote_ident(col) for col in pk)
+            extra = [col for col in TYPE_ID_COLUMNS.get(table_name, []) if col not in pk]
+            extra_select = ''.join(f', {quote_ident(col)}' for col in extra)
+            # 非主键的 typeID 列同时保留新旧值，修改前后涉及的物品都计入变更
+            extra_coalesce = ''.join(
+                f'COALESCE(s.{quote_ident(col)}, l.{quote_ident(col)}) AS {quote_ident(col)}, '
+                f'l.{quote_ident(col)} AS {quote_ident(col + "__old")}, '
+                for col in extra
+            )
+            pk_match = ' AND '.join(f't.{quote_ident(col)} = d.{quote_ident(col)}' for col in pk)
+            
+            await conn.execute(text(f"""
+                CREATE TEMP TABLE "_sde_diff" AS
+                SELECT {pk_list}, {extra_coalesce}
+                    CASE WHEN l."_hash" IS NULL THEN '{CHANGE_INSERT}'
+                         WHEN s."_hash" IS NULL THEN '{CHANGE_DELETE}'
+                         ELSE '{CHANGE_UPDATE}' END AS "op"
+                FROM (SELECT {pk_list}{extra_select}, md5(CAST(t AS text)) AS "_hash" FROM {staging} t) s
+                FULL JOIN (SELECT {pk_list}{extra_select}, md5(CAST(t AS text)) AS "_hash" FROM {live} t) l
+                USING ({pk_list})
+                WHERE s."_hash" IS DISTINCT FROM l."_hash"
+            """))
+            await conn.execute(text(
+                f'DELETE FROM {live} t USING "_sde_diff" d WHERE d."op" <> \'{CHANGE_INSERT}\' AND {pk_match}'
+            ))
+            await conn.execute(text(
+                f'INSERT INTO {live} SELECT t.* FROM {staging} t JOIN "_sde_diff" d USING ({pk_list}) '
+                f'WHERE d."op" <> \'{CHANGE_DELETE}\''
+            ))
+            
+            key_expr = ', '.join(f"'{col}', d.{quote_ident(col)}" for col in pk)
+            type_columns = TYPE_ID_COLUMNS.get(table_name, []) + [col + '__old' for col in extra]
+            type_expr = (
+                f'array_remove(ARRAY[{", ".join(f"d.{quote_ident(col)}" for col in type_columns)}], NULL)'
+                if type_columns else 'NULL'
+            )
+            await conn.execute(text(f"""
+                INSERT INTO "_sde_changes" ("buildNumber", "tableName", "op", "key", "typeIDs")
+                SELECT CAST(:build_number AS bigint), CAST(:table_name AS text), d."op", jsonb_build_object({key_expr}), {type_expr}
+                FROM "_sde_diff" d
+            """), {"build_number": build_number, "table_name": table_name})
+            
+            result = await conn.execute(text('SELECT "op", COUNT(*) FROM "_sde_diff" GROUP BY "op"'))
+            counts[table_name] = {op: count for op, count in result.all()}
+            if type_columns:
+                result = await conn.execute(text(
+                    f'SELECT DISTINCT unnest({type_expr}) FROM "_sde_diff" d'
+                ))
+                type_ids.update(row[0] for row in result.all())
+            await conn.execute(text('DROP TABLE "_sde_diff"'))
+            if counts[table_name]:
+                logger.info(f"表 {table_name} 变更: {counts[table_name]}")
+        return {"build": build_number, "mode": "diff", "counts": counts, "type_ids": type_ids}
+    
+    async def _record_full_update(self, conn, build_number: int, table_name: str = '*'):
+        """记录该版本以整表替换方式导入，无法给出逐行变更"""
+        await conn.execute(text("""
+            INSERT INTO "_sde_changes" ("buildNumber", "tableName", "op", "key", "typeIDs")
+            VALUES (:build_number, :table_name, :op, CAST('{}' AS jsonb), NULL)
+        """), {"build_number": build_number, "table_name": table_name, "op": CHANGE_FULL})
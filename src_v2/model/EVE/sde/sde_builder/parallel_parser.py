@@ -0,0 +1,196 @@
+"""
+SDE 并行解析模块
+
+大文件（types、blueprints 等）按字节范围切成若干块，每块的起止都对齐到换行符，
+交给进程池解析：worker 自行 seek 读取自己的范围，用 orjson（未安装时退回标准库 json）解析，
+再经 process_*_row 处理后直接输出按列顺序排列的元组，可原样交给 COPY。
+父进程只保留有限个在途块，按文件顺序逐块产出，内存占用与文件大小无关。
+"""
+import asyncio
+import json
+import os
+from collections import deque
+from concurrent.futures import Executor
+from typing import Any, AsyncIterator, Callable, Dict, List, NamedTuple, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+from .inv_types_model import process_inv_types_row
+from .blueprints_model import process_blueprints_row
+from .meta_groups_model import process_meta_groups_row
+from .inv_groups_model import process_inv_groups_row
+from .inv_categories_model import process_inv_categories_row
+from .market_groups_model import process_market_groups_row
+from .map_solar_systems_model import process_map_solar_systems_row
+from .map_regions_model import process_map_regions_row
+
+# 每块的目标字节数
+PARSE_CHUNK_BYTES = 4 * 1024 * 1024
+
+
+class RowSpec(NamedTuple):
+    """
+    processor: 单行处理函数
+    tables: 输出表名 -> 列名；多张表时 processor 按相同顺序返回各表的记录列表
+    """
+    processor: Callable[[dict], Any]
+    tables: Dict[str, List[str]]
+
+
+ROW_SPECS: Dict[str, RowSpec] = {
+    'invTypes': RowSpec(process_inv_types_row, {
+        'invTypes': [
+            'typeID', 'groupID', 'typeName_en', 'typeName_zh', 'description_en', 'description_zh',
+            'mass', 'volume', 'packagedVolume', 'capacity', 'portionSize', 'factionID', 'raceID',
+            'basePrice', 'published', 'marketGroupID', 'graphicID', 'radius', 'iconID', 'soundID',
+            'sofFactionName', 'sofMaterialSetID', 'metaGroupID', 'variationparentTypeID'
+        ],
+    }),
+    'blueprints': RowSpec(process_blueprints_row, {
+        'industryBlueprints': ['blueprintTypeID', 'maxProductionLimit'],
+        'industryActivities': ['blueprintTypeID', 'activityID', 'time'],
+        'industryActivityMaterials': ['blueprintTypeID', 'activityID', 'materialTypeID', 'quantity'],
+        'industryActivityProducts': ['blueprintTypeID', 'activityID', 'productTypeID', 'quantity', 'probability'],
+    }),
+    'metaGroups': RowSpec(process_meta_groups_row, {
+        'metaGroups': [
+            'metaGroupID', 'nameID_en', 'nameID_zh', 'descriptionID_en', 'descriptionID_zh',
+            'iconID', 'iconSuffix'
+        ],
+    }),
+    'invGroups': RowSpec(process_inv_groups_row, {
+        'invGroups': [
+            'groupID', 'categoryID', 'groupName_en', 'groupName_zh', 'iconID',
+            'useBasePrice', 'anchored', 'anchorable', 'fittableNonSingleton', 'published'
+        ],
+    }),
+    'invCategories': RowSpec(process_inv_categories_row, {
+        'invCategories': [
+            'categoryID', 'categoryName_en', 'categoryName_zh', 'published', 'iconID'
+        ],
+    }),
+    'marketGroups': RowSpec(process_market_groups_row, {
+        'marketGroups': [
+            'marketGroupID', 'nameID_en', 'nameID_zh', 'descriptionID_en', 'descriptionID_zh',
+            'hasTypes', 'iconID', 'parentGroupID'
+        ],
+    }),
+    'mapSolarSystems': RowSpec(process_map_solar_systems_row, {
+        'mapSolarSystems': [
+            'solarSystemID', 'solarSystemName_en', 'solarSystemName_zh', 'regionID', 'constellationID',
+            'x', 'y', 'z', 'luminosity', 'border', 'hub', 'international', 'regional',
+            'security', 'radius', 'sunTypeID', 'securityClass'
+        ],
+    }),
+    'mapRegions': RowSpec(process_map_regions_row, {
+        'mapRegions': [
+            'regionID', 'regionName_en', 'regionName_zh', 'x', 'y', 'z',
+            'factionID', 'nameID_en', 'nameID_zh', 'descriptionID_en', 'descriptionID_zh'
+        ],
+    }),
+}
+
+_SPEC_ALIASES = {
+    'types': 'invTypes',
+    'groups': 'invGroups',
+    'categories': 'invCategories',
+}
+
+
+def get_row_spec(table_name: str):
+    """文件表名对应的行处理规则，通用表返回 None"""
+    return ROW_SPECS.get(_SPEC_ALIASES.get(table_name, table_name))
+
+
+def json_loads(raw) -> Any:
+    """JSON 解析，优先使用 orjson"""
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def copy_value(value: Any) -> Any:
+    """嵌套对象以 JSON 字符串写入"""
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def split_ranges(file_path: str, chunk_bytes: int = PARSE_CHUNK_BYTES) -> List[Tuple[int, int]]:
+    """
+    把文件切成约 chunk_bytes 大小的字节范围，每个范围都结束在换行符之后
+
+    Returns:
+        [(start, end)]，首尾相接覆盖整个文件
+    """
+    size = os.path.getsize(file_path)
+    ranges = []
+    start = 0
+    with open(file_path, 'rb') as f:
+        while start < size:
+            end = start + chunk_bytes
+            if end >= size:
+                end = size
+            else:
+                f.seek(end)
+                f.readline()
+                end = f.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def parse_range(file_path: str, start: int, end: int, table_name: str) -> Tuple[Dict[str, List[tuple]], int]:
+    """
+    解析文件中的一个字节范围（在 worker 进程中执行）
+
+    Returns:
+        (表名 -> 元组列表, 失败行数)
+    """
+    spec = get_row_spec(table_name)
+    outputs = list(spec.tables.items())
+    records: Dict[str, List[tuple]] = {name: [] for name, _ in outputs}
+    errors = 0
+    with open(file_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    for line in data.splitlines():
+        if not line.strip():
+            continue
+        try:
+            processed = spec.processor(json_loads(line))
+        except Exception:
+            errors += 1
+            continue
+        groups = (processed,) if len(outputs) == 1 else processed
+        for (name, columns), rows in zip(outputs, groups):
+            if len(outputs) == 1:
+                rows = (rows,)
+            # process_*_row 的输出均为标量；个别嵌套值会让 COPY 失败并由导入器回退 INSERT 处理
+            records[name].extend(tuple(map(row.get, columns)) for row in rows)
+    return records, errors
+
+
+async def iter_parsed_chunks(file_path: str, table_name: str, executor: Executor,
+                             chunk_bytes: int = PARSE_CHUNK_BYTES,
+                             max_pending: int = 8) -> AsyncIterator[Tuple[Dict[str, List[tuple]], int]]:
+    """
+    用进程池并行解析整个文件，按文件顺序逐块产出 (表名 -> 元组列表, 失败行数)
+    同时在途的块不超过 max_pending 个
+    """
+    loop = asyncio.get_running_loop()
+    pending = deque()
+    ranges = iter(split_ranges(file_path, chunk_bytes))
+    try:
+        for start, end in ranges:
+            pending.append(loop.run_in_executor(executor, parse_range, file_path, start, end, table_name))
+            if len(pending) >= max_pending:
+                yield await pending.popleft()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        for future in pending:
+            future.cancel()
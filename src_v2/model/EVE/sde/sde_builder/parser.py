@@ -9,6 +9,7 @@ from collections import defaultdict
 
 from src_v2.core.config.config import config
 from src_v2.core.log import logger
+from .parallel_parser import json_loads
 
 
 class SDEParser:
@@ -152,7 +153,7 @@ class SDEParser:
                         continue
                     
                     try:
-                        data = json.loads(line)
+                        data = json_loads(line)
                         
                         # 处理多语言字段
                         processed_data = {}
@@ -306,4 +307,18 @@ class SDEParser:
         
         logger.info(f"找到 {len(files_to_parse)} 个文件需要解析")
         return files_to_parse
+    
+    def get_expected_file_names(self) -> List[str]:
+        """
+        按白名单可能需要解析的文件名（含 .jsonl），用于解压前筛选压缩包中的条目
+        
+        Returns:
+            文件名列表，_sde.jsonl 始终在首位
+        """
+        names = ['_sde.jsonl']
+        for file_basename in self.whitelist:
+            filename = f"{file_basename}.jsonl"
+            if filename not in names:
+                names.append(filename)
+        return names
 
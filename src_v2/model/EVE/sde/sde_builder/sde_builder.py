@@ -6,12 +6,15 @@ import os
 import asyncio
 from typing import Optional
 
+from src_v2.core.config.config import config
 from src_v2.core.log import logger
+from src_v2.core.utils import KahunaException
 from .database_manager import SDEDatabaseManager, SDEModel
 from .downloader import SDEDownloader
-from .extractor import SDEExtractor
+from .extractor import SDEExtractor, ZipStreamError
 from .parser import SDEParser
 from .importer import SDEImporter
+from .snapshot import build_snapshot_from_db
 
 
 class SDEBuilder:
@@ -23,6 +26,9 @@ class SDEBuilder:
         self.extractor = SDEExtractor()
         self.parser = SDEParser()
         self.importer = SDEImporter(self.db_manager, self.parser)
+        # 边下载边解压导入，只在 COPY 导入方式下生效
+        self.stream_import = (config.getboolean('SDE_BUILDER', 'Stream_Import', fallback=True)
+                              and self.importer.import_method == 'copy')
     
     async def init_database(self):
         """初始化数据库和表结构"""
@@ -104,104 +110,24 @@ class SDEBuilder:
                         logger.info("已是最新版本，跳过更新")
                         return True
             
-            # 步骤2: 下载数据包（带重试机制）
-            logger.info("步骤 1/4: 下载 SDE 数据包")
-            max_retries = 3
-            zip_path = None
-            
-            for attempt in range(max_retries):
-                if attempt > 0:
-                    logger.info(f"重试下载 (第 {attempt + 1}/{max_retries} 次)")
-                
-                if target_version:
-                    # 下载指定版本
-                    url = f"https://developers.eveonline.com/static-data/tranquility/eve-online-static-data-{target_version}-jsonl.zip"
-                    zip_path = await self.downloader.download(url, target_version)
-                else:
-                    # 下载最新版本
-                    zip_path = await self.downloader.download_latest()
-                
-                if not zip_path:
-                    logger.error("下载失败")
-                    if attempt < max_retries - 1:
-                        logger.info("等待 5 秒后重试...")
-                        await asyncio.sleep(5)
-                        continue
+            if self.stream_import:
+                # 下载、解压与导入重叠进行
+                logger.info("步骤 1/2: 初始化数据库")
+                await self.init_database()
+                logger.info("步骤 2/2: 流式下载、解压并导入数据")
+                success = await self.stream_update(target_version)
+            else:
+                extract_dir = await self.download_and_extract(target_version)
+                if not extract_dir:
                     return False
                 
-                # 验证 ZIP 文件有效性
-                logger.info("验证下载的 ZIP 文件...")
-                if self.extractor.is_valid_zip(zip_path):
-                    logger.info("ZIP 文件验证通过")
-                    break
-                else:
-                    logger.warning(f"ZIP 文件无效，删除并重新下载: {zip_path}")
-                    # 删除无效的 ZIP 文件
-                    try:
-                        if os.path.exists(zip_path):
-                            os.remove(zip_path)
-                            logger.info(f"已删除无效的 ZIP 文件: {zip_path}")
-                    except Exception as e:
-                        logger.warning(f"删除无效 ZIP 文件失败: {e}")
-                    
-                    zip_path = None
-                    if attempt < max_retries - 1:
-                        logger.info("等待 5 秒后重新下载...")
-                        await asyncio.sleep(5)
-                    else:
-                        logger.error("达到最大重试次数，下载失败")
-                        return False
-            
-            if not zip_path:
-                logger.error("下载失败")
-                return False
-            
-            # 步骤3: 解压数据包
-            logger.info("步骤 2/4: 解压 SDE 数据包")
-            extract_dir = self.extractor.extract(zip_path)
-            if not extract_dir:
-                logger.error("解压失败")
-                # 如果解压失败，可能是 ZIP 文件损坏，尝试重新下载
-                if os.path.exists(zip_path):
-                    logger.warning("解压失败，可能是 ZIP 文件损坏，尝试重新下载...")
-                    try:
-                        os.remove(zip_path)
-                        logger.info(f"已删除损坏的 ZIP 文件: {zip_path}")
-                    except Exception as e:
-                        logger.warning(f"删除损坏 ZIP 文件失败: {e}")
-                    
-                    # 重新下载一次
-                    logger.info("重新下载 ZIP 文件...")
-                    if target_version:
-                        url = f"https://developers.eveonline.com/static-data/tranquility/eve-online-static-data-{target_version}-jsonl.zip"
-                        zip_path = await self.downloader.download(url, target_version)
-                    else:
-                        zip_path = await self.downloader.download_latest()
-                    
-                    if zip_path and self.extractor.is_valid_zip(zip_path):
-                        logger.info("重新下载成功，再次尝试解压...")
-                        extract_dir = self.extractor.extract(zip_path)
-                        if not extract_dir:
-                            logger.error("重新下载后解压仍然失败")
-                            return False
-                    else:
-                        logger.error("重新下载失败或文件仍然无效")
-                        return False
-                else:
-                    return False
-            
-            # 验证解压文件
-            if not self.extractor.verify_extracted_files(extract_dir):
-                logger.error("解压文件验证失败")
-                return False
-            
-            # 步骤4: 初始化数据库（如果需要）
-            logger.info("步骤 3/4: 初始化数据库")
-            await self.init_database()
-            
-            # 步骤5: 导入数据
-            logger.info("步骤 4/4: 导入数据到数据库")
-            success = await self.importer.full_update(extract_dir)
+                # 步骤4: 初始化数据库（如果需要）
+                logger.info("步骤 3/4: 初始化数据库")
+                await self.init_database()
+                
+                # 步骤5: 导入数据
+                logger.info("步骤 4/4: 导入数据到数据库")
+                success = await self.importer.full_update(extract_dir)
             
             if success:
                 # 更新配置文件中的版本号
@@ -213,6 +139,18 @@ class SDEBuilder:
                         update_config('SDE_BUILDER', 'Current_Build_Number', str(build_number))
                         logger.info(f"已更新配置文件中的版本号: {build_number}")
                 
+                changes = self.importer.last_changes
+                if changes and changes["type_ids"] is not None:
+                    logger.info(f"版本 {changes['build']} 增量变更 typeID {len(changes['type_ids'])} 个，"
+                                f"已记录到 _sde_changes")
+                
+                # 导出只读快照，失败时各进程继续使用数据库查询
+                await self.build_snapshot()
+                
+                # 本进程内的查询切换到新快照，丢弃旧名称列表与模糊搜索索引
+                from ..utils import SdeUtils
+                await SdeUtils.reload_sde()
+                
                 logger.info("=" * 60)
                 logger.info("SDE 数据构建完成！")
                 logger.info("=" * 60)
@@ -225,6 +163,184 @@ class SDEBuilder:
             logger.error(f"SDE 数据构建失败: {e}", exc_info=True)
             return False
     
+    def _download_url(self, target_version: Optional[int]) -> Optional[str]:
+        """指定版本的下载地址，为 None 时使用最新版本地址"""
+        if target_version:
+            return f"https://developers.eveonline.com/static-data/tranquility/eve-online-static-data-{target_version}-jsonl.zip"
+        return None
+    
+    async def download_and_extract(self, target_version: Optional[int] = None) -> Optional[str]:
+        """
+        完整下载数据包后解压（非流式流程）
+        
+        Args:
+            target_version: 目标版本号，如果为 None 则使用最新版本
+        
+        Returns:
+            解压目录，失败返回 None
+        """
+        # 步骤2: 下载数据包（带重试机制）
+        logger.info("步骤 1/4: 下载 SDE 数据包")
+        max_retries = 3
+        zip_path = None
+        
+        for attempt in range(max_retries):
+            if attempt > 0:
+                logger.info(f"重试下载 (第 {attempt + 1}/{max_retries} 次)")
+            
+            if target_version:
+                # 下载指定版本
+                url = f"https://developers.eveonline.com/static-data/tranquility/eve-online-static-data-{target_version}-jsonl.zip"
+                zip_path = await self.downloader.download(url, target_version)
+            else:
+                # 下载最新版本
+                zip_path = await self.downloader.download_latest()
+            
+            if not zip_path:
+                logger.error("下载失败")
+                if attempt < max_retries - 1:
+                    logger.info("等待 5 秒后重试...")
+                    await asyncio.sleep(5)
+                    continue
+                return None
+            
+            # 验证 ZIP 文件有效性
+            logger.info("验证下载的 ZIP 文件...")
+            if self.extractor.is_valid_zip(zip_path):
+                logger.info("ZIP 文件验证通过")
+                break
+            else:
+                logger.warning(f"ZIP 文件无效，删除并重新下载: {zip_path}")
+                # 删除无效的 ZIP 文件
+                try:
+                    if os.path.exists(zip_path):
+                        os.remove(zip_path)
+                        logger.info(f"已删除无效的 ZIP 文件: {zip_path}")
+                except Exception as e:
+                    logger.warning(f"删除无效 ZIP 文件失败: {e}")
+                
+                zip_path = None
+                if attempt < max_retries - 1:
+                    logger.info("等待 5 秒后重新下载...")
+                    await asyncio.sleep(5)
+                else:
+                    logger.error("达到最大重试次数，下载失败")
+                    return None
+        
+        if not zip_path:
+            logger.error("下载失败")
+            return None
+        
+        # 步骤3: 解压数据包
+        logger.info("步骤 2/4: 解压 SDE 数据包")
+        extract_dir = self.extractor.extract(zip_path)
+        if not extract_dir:
+            logger.error("解压失败")
+            # 如果解压失败，可能是 ZIP 文件损坏，尝试重新下载
+            if os.path.exists(zip_path):
+                logger.warning("解压失败，可能是 ZIP 文件损坏，尝试重新下载...")
+                try:
+                    os.remove(zip_path)
+                    logger.info(f"已删除损坏的 ZIP 文件: {zip_path}")
+                except Exception as e:
+                    logger.warning(f"删除损坏 ZIP 文件失败: {e}")
+                
+                # 重新下载一次
+                logger.info("重新下载 ZIP 文件...")
+                if target_version:
+                    url = f"https://developers.eveonline.com/static-data/tranquility/eve-online-static-data-{target_version}-jsonl.zip"
+                    zip_path = await self.downloader.download(url, target_version)
+                else:
+                    zip_path = await self.downloader.download_latest()
+                
+                if zip_path and self.extractor.is_valid_zip(zip_path):
+                    logger.info("重新下载成功，再次尝试解压...")
+                    extract_dir = self.extractor.extract(zip_path)
+                    if not extract_dir:
+                        logger.error("重新下载后解压仍然失败")
+                        return None
+                else:
+                    logger.error("重新下载失败或文件仍然无效")
+                    return None
+            else:
+                return None
+        
+        # 验证解压文件
+        if not self.extractor.verify_extracted_files(extract_dir):
+            logger.error("解压文件验证失败")
+            return None
+        
+        return extract_dir
+    
+    async def stream_update(self, target_version: Optional[int] = None) -> bool:
+        """
+        边下载边解压边导入：下载到的数据块送入流式解压，只写出白名单中的 JSONL，
+        每个文件写完即开始 COPY 导入影子表，全部完成后按原流程切换或应用差异
+        
+        压缩包中有流式解压不支持的条目时，等下载完成后退回完整解压再导入
+        
+        Args:
+            target_version: 目标版本号，如果为 None 则使用最新版本
+        
+        Returns:
+            是否成功
+        """
+        if not target_version:
+            latest_info = await self.get_latest_version()
+            target_version = latest_info.get('buildNumber') if latest_info else None
+        url = self._download_url(target_version)
+        extract_dir = self.extractor.get_extract_dir(self.downloader.get_file_path(target_version))
+        
+        extraction = self.extractor.stream_extract(extract_dir, self.parser.get_expected_file_names())
+        import_task = asyncio.create_task(self.importer.full_update(extract_dir, files_ready=extraction.files))
+        try:
+            zip_path = await self.downloader.download(url, target_version, on_chunk=extraction.feed)
+            if not zip_path:
+                raise KahunaException("SDE 数据包下载失败")
+            if not extraction.failed:
+                await extraction.finish()
+        except Exception as e:
+            if not extraction.failed:
+                await extraction.abort(e)
+            # 导入任务会因文件 Future 失败而清理影子表
+            await asyncio.gather(import_task, return_exceptions=True)
+            logger.error(f"流式下载失败: {e}")
+            return False
+        
+        if not extraction.failed:
+            return await import_task
+        
+        await asyncio.gather(import_task, return_exceptions=True)
+        if not isinstance(extraction.error, ZipStreamError):
+            return False
+        logger.warning(f"流式解压不可用（{extraction.error}），退回完整解压")
+        if not self.extractor.is_valid_zip(zip_path):
+            logger.error(f"ZIP 文件无效: {zip_path}")
+            return False
+        names = set(self.parser.get_expected_file_names())
+        extract_dir = self.extractor.extract(zip_path, extract_dir, members=names.__contains__)
+        if not extract_dir or not self.extractor.verify_extracted_files(extract_dir):
+            logger.error("解压失败")
+            return False
+        return await self.importer.full_update(extract_dir)
+    
+    async def build_snapshot(self) -> Optional[str]:
+        """
+        由当前数据库内容生成 mmap 只读快照
+        
+        Returns:
+            快照文件路径，失败返回 None
+        """
+        try:
+            version = await self.get_current_version()
+            if version is None:
+                logger.warning("SDE 数据库中没有版本信息，跳过快照生成")
+                return None
+            return await build_snapshot_from_db(self.db_manager, version)
+        except Exception as e:
+            logger.error(f"SDE 快照生成失败: {e}", exc_info=True)
+            return None
+    
     async def update(self, force: bool = False, target_version: Optional[int] = None) -> bool:
         """
         执行更新操作（build 的别名）
@@ -0,0 +1,30 @@
+"""
+SdeChanges 表模型
+增量更新时每个版本的逐行变更记录（仅记录，供排查与按 typeID 查询；下游缓存目前按 SDE 版本整体刷新）
+"""
+from sqlalchemy import Column, BigInteger, Integer, Text, Index
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from .database_manager import SDEModel
+
+# op 取值
+CHANGE_INSERT = 'insert'
+CHANGE_UPDATE = 'update'
+CHANGE_DELETE = 'delete'
+# 该版本以全量替换方式导入，无法给出逐行变更
+CHANGE_FULL = 'full'
+
+
+class SdeChanges(SDEModel):
+    """SdeChanges 表模型 - 每个版本的逐行变更"""
+    __tablename__ = '_sde_changes'
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    buildNumber = Column(BigInteger, nullable=False)  # 变更所属的 SDE 版本
+    tableName = Column(Text, nullable=False)  # 变更的表
+    op = Column(Text, nullable=False)  # insert / update / delete / full
+    key = Column(JSONB, nullable=False)  # 主键列 -> 值
+    typeIDs = Column(ARRAY(Integer), nullable=True)  # 该行关联的 typeID
+
+    __table_args__ = (
+        Index('idx_sde_changes_build', 'buildNumber'),
+    )
@@ -0,0 +1,611 @@
+"""
+SDE 只读快照
+
+导入完成后把热点查询用到的列导出为一个带版本号的二进制文件，各进程启动时 mmap 映射：
+    [MAGIC 8 字节][header 长度 u32][header JSON][按 64 字节对齐的列数组 ...]
+header 记录 SDE 版本号以及每张表每一列的 dtype / 偏移 / 长度。
+每张表按 id 升序存为列数组（struct-of-arrays），整数空值为 -1，浮点空值为 NaN；
+中英文名称去重后放入同一个字符串池（utf-8 字节 + 偏移数组），列中只保存字符串编号，空值为 -1。
+数组由 np.frombuffer 直接指向映射内存，不做拷贝，同一文件的页缓存由所有进程共享。
+
+写入时额外预计算派生列：
+    types.category_id            物品所属类别
+    types.market_tin             物品所属市场组的 DFS 进入序号
+    market_groups.tin / tout     市场组子树的 DFS 区间，祖先判断为一次区间比较
+    market_groups.path_start/end 市场组从根到自身的路径在 @market_paths.ids 中的范围
+"""
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import sys
+from typing import Optional
+
+import numpy as np
+from sqlalchemy import select
+
+from src_v2.core.config.config import config
+from src_v2.core.log import logger
+from src_v2.core.utils.path import TMP_PATH
+from .inv_types_model import InvTypes
+from .inv_groups_model import InvGroups
+from .inv_categories_model import InvCategories
+from .meta_groups_model import MetaGroups
+from .market_groups_model import MarketGroups
+from .map_solar_systems_model import MapSolarSystems
+from .map_regions_model import MapRegions
+
+SNAPSHOT_MAGIC = b"KSDESNP2"
+SNAPSHOT_ALIGN = 64
+SNAPSHOT_FILE_PATTERN = re.compile(r"^sde_(\d+)\.snap$")
+# 保留的历史快照数量，正在运行的进程仍可使用已映射的旧文件
+SNAPSHOT_KEEP = 2
+# id 跨度不超过行数的该倍数时额外存一张稠密索引，查询为一次数组下标
+DENSE_INDEX_RATIO = 8
+
+# 表名: (模型, {列名: (模型字段, 类型)})，类型 i 为整数，f 为浮点，s 为字符串
+SNAPSHOT_TABLES = {
+    "types": (InvTypes, {
+        "id": ("typeID", "i"),
+        "group_id": ("groupID", "i"),
+        "market_group_id": ("marketGroupID", "i"),
+        "meta_group_id": ("metaGroupID", "i"),
+        "volume": ("volume", "f"),
+        "packaged_volume": ("packagedVolume", "f"),
+        "name_en": ("typeName_en", "s"),
+        "name_zh": ("typeName_zh", "s"),
+    }),
+    "groups": (InvGroups, {
+        "id": ("groupID", "i"),
+        "category_id": ("categoryID", "i"),
+        "name_en": ("groupName_en", "s"),
+        "name_zh": ("groupName_zh", "s"),
+    }),
+    "categories": (InvCategories, {
+        "id": ("categoryID", "i"),
+        "name_en": ("categoryName_en", "s"),
+        "name_zh": ("categoryName_zh", "s"),
+    }),
+    "meta_groups": (MetaGroups, {
+        "id": ("metaGroupID", "i"),
+        "name_en": ("nameID_en", "s"),
+        "name_zh": ("nameID_zh", "s"),
+    }),
+    "market_groups": (MarketGroups, {
+        "id": ("marketGroupID", "i"),
+        "parent_id": ("parentGroupID", "i"),
+        "name_en": ("nameID_en", "s"),
+        "name_zh": ("nameID_zh", "s"),
+    }),
+    "systems": (MapSolarSystems, {
+        "id": ("solarSystemID", "i"),
+        "region_id": ("regionID", "i"),
+        "x": ("x", "f"),
+        "y": ("y", "f"),
+        "z": ("z", "f"),
+        "name_en": ("solarSystemName_en", "s"),
+        "name_zh": ("solarSystemName_zh", "s"),
+    }),
+    "regions": (MapRegions, {
+        "id": ("regionID", "i"),
+        "name_en": ("regionName_en", "s"),
+        "name_zh": ("regionName_zh", "s"),
+    }),
+}
+
+_KIND_DTYPE = {"i": "<i8", "f": "<f8", "s": "<i4"}
+# dtype 到 memoryview.cast 格式，显式指定宽度（Windows 上 'l' 只有 4 字节）
+_MEMORYVIEW_FORMAT = {"<i8": "q", "<f8": "d", "<i4": "i", "|u1": "B"}
+
+
+def get_snapshot_dir() -> str:
+    return config.get('SDE_BUILDER', 'Snapshot_Path', fallback=os.path.join(TMP_PATH, 'sde_snapshot'))
+
+
+def snapshot_path(version: int, snapshot_dir: Optional[str] = None) -> str:
+    return os.path.join(snapshot_dir or get_snapshot_dir(), f"sde_{version}.snap")
+
+
+def list_snapshots(snapshot_dir: Optional[str] = None) -> list[tuple[int, str]]:
+    """目录下的快照文件，按版本号升序"""
+    snapshot_dir = snapshot_dir or get_snapshot_dir()
+    if not os.path.isdir(snapshot_dir):
+        return []
+    result = []
+    for filename in os.listdir(snapshot_dir):
+        match = SNAPSHOT_FILE_PATTERN.match(filename)
+        if match:
+            result.append((int(match.group(1)), os.path.join(snapshot_dir, filename)))
+    return sorted(result)
+
+
+def write_snapshot(path: str, version: int, tables: dict[str, list[dict]]) -> str:
+    """
+    写入快照文件，先写临时文件再原子替换
+    Args:
+        tables: {表名: [{列名: 值}]}，列名见 SNAPSHOT_TABLES
+    """
+    strings: dict[str, int] = {}
+
+    def intern(value) -> int:
+        if value is None:
+            return -1
+        index = strings.get(value)
+        if index is None:
+            index = strings[value] = len(strings)
+        return index
+
+    arrays: dict[str, np.ndarray] = {}
+    for table, (_, columns) in SNAPSHOT_TABLES.items():
+        rows = sorted((row for row in tables.get(table, []) if row.get("id") is not None), key=lambda r: r["id"])
+        for column, (_, kind) in columns.items():
+            values = [row.get(column) for row in rows]
+            if kind == "i":
+                data = np.array([-1 if v is None else v for v in values], dtype=_KIND_DTYPE[kind])
+            elif kind == "f":
+                data = np.array([np.nan if v is None else v for v in values], dtype=_KIND_DTYPE[kind])
+            else:
+                data = np.array([intern(v) for v in values], dtype=_KIND_DTYPE[kind])
+            arrays[f"{table}.{column}"] = data
+
+        ids = arrays[f"{table}.id"]
+        if len(ids) and ids[-1] - ids[0] + 1 <= max(len(ids) * DENSE_INDEX_RATIO, 1024):
+            index = np.full(int(ids[-1] - ids[0] + 1), -1, dtype="<i4")
+            index[ids - ids[0]] = np.arange(len(ids), dtype="<i4")
+            arrays[f"{table}.@index"] = index
+
+    _add_derived_columns(arrays)
+
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<i8")
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    arrays["@strings.offsets"] = offsets
+    arrays["@strings.blob"] = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+    # header 中的偏移依赖 header 自身长度，预留空间直到放得下为止
+    layout = {name: {"dtype": array.dtype.str, "count": len(array), "offset": 0} for name, array in arrays.items()}
+    header = {"version": version, "arrays": layout}
+    reserved = 0
+    while True:
+        position = _align(len(SNAPSHOT_MAGIC) + 4 + reserved)
+        for name, array in arrays.items():
+            layout[name]["offset"] = position
+            position = _align(position + array.nbytes)
+        header_bytes = json.dumps(header).encode()
+        if len(header_bytes) <= reserved:
+            break
+        reserved = len(header_bytes) + 64
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name, array in arrays.items():
+            f.seek(layout[name]["offset"])
+            f.write(array.tobytes())
+        f.truncate(position)
+    os.replace(tmp_path, path)
+    return path
+
+
+def _lookup(keys: np.ndarray, values: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """在按 keys 升序的列中查 query 对应的值，不存在时为 -1"""
+    result = np.full(len(query), -1, dtype=values.dtype)
+    if not len(keys):
+        return result
+    pos = np.minimum(np.searchsorted(keys, query), len(keys) - 1)
+    found = keys[pos] == query
+    result[found] = values[pos[found]]
+    return result
+
+
+def _add_derived_columns(arrays: dict[str, np.ndarray]):
+    arrays["types.category_id"] = _lookup(arrays["groups.id"], arrays["groups.category_id"], arrays["types.group_id"])
+    closure = MarketGroupClosure.build(arrays["market_groups.id"], arrays["market_groups.parent_id"])
+    arrays["market_groups.tin"] = closure.tin
+    arrays["market_groups.tout"] = closure.tout
+    arrays["market_groups.path_start"] = closure.path_start
+    arrays["market_groups.path_end"] = closure.path_end
+    arrays["@market_paths.ids"] = closure.path_ids
+    arrays["types.market_tin"] = _lookup(closure.ids, closure.tin, arrays["types.market_group_id"])
+
+
+def _align(position: int) -> int:
+    return (position + SNAPSHOT_ALIGN - 1) // SNAPSHOT_ALIGN * SNAPSHOT_ALIGN
+
+
+async def build_snapshot_from_db(db_manager, version: int, snapshot_dir: Optional[str] = None) -> str:
+    """从 SDE 数据库导出快照，并清理多余的旧版本"""
+    tables = {}
+    async with db_manager.get_readonly_session() as session:
+        for table, (model, columns) in SNAPSHOT_TABLES.items():
+            fields = [getattr(model, field).label(column) for column, (field, _) in columns.items()]
+            result = await session.execute(select(*fields))
+            tables[table] = [dict(row._mapping) for row in result]
+    path = write_snapshot(snapshot_path(version, snapshot_dir), version, tables)
+    logger.info(f"SDE 快照已生成: {path} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+
+    for old_version, old_path in list_snapshots(snapshot_dir)[:-SNAPSHOT_KEEP]:
+        try:
+            os.remove(old_path)
+        except OSError as e:
+            logger.warning(f"删除旧 SDE 快照 {old_path} 失败: {e}")
+    return path
+
+
+class MarketGroupClosure:
+    """
+    市场组层级的祖先/后代关系
+    对市场组树做一次 DFS，记录每个节点的进入序号 tin 与子树最大序号 tout：
+    A 是 B 的祖先（或自身）当且仅当 tin[A] <= tin[B] <= tout[A]，判断为 O(1)。
+    同时记录每个节点从根到自身的 id 路径（CSR 形式）。
+    """
+
+    def __init__(self, ids, tin, tout, path_start, path_end, path_ids):
+        self.ids = ids
+        self.tin = tin
+        self.tout = tout
+        self.path_start = path_start
+        self.path_end = path_end
+        self.path_ids = path_ids
+
+    @classmethod
+    def build(cls, ids, parent_ids) -> "MarketGroupClosure":
+        ids = np.asarray(ids, dtype=np.int64)
+        parent_ids = np.asarray(parent_ids, dtype=np.int64)
+        order = np.argsort(ids, kind="stable")
+        ids, parent_ids = ids[order], parent_ids[order]
+        n = len(ids)
+        row_of = {group_id: row for row, group_id in enumerate(ids.tolist())}
+        children = [[] for _ in range(n)]
+        roots = []
+        for row, parent_id in enumerate(parent_ids.tolist()):
+            parent_row = row_of.get(parent_id)
+            (roots if parent_row is None else children[parent_row]).append(row)
+
+        tin = np.full(n, -1, dtype=np.int64)
+        tout = np.full(n, -1, dtype=np.int64)
+        path_start = np.zeros(n, dtype=np.int64)
+        path_end = np.zeros(n, dtype=np.int64)
+        path_ids: list[int] = []
+        path: list[int] = []
+        counter = 0
+        # 栈中 row 表示进入节点，~row 表示离开节点；成环的节点不可达，tin 保持 -1
+        stack = list(reversed(roots))
+        while stack:
+            item = stack.pop()
+            if item < 0:
+                tout[~item] = counter - 1
+                path.pop()
+                continue
+            tin[item] = counter
+            counter += 1
+            path.append(int(ids[item]))
+            path_start[item] = len(path_ids)
+            path_ids.extend(path)
+            path_end[item] = len(path_ids)
+            stack.append(~item)
+            stack.extend(reversed(children[item]))
+        return cls(ids, tin, tout, path_start, path_end, np.asarray(path_ids, dtype=np.int64))
+
+    def _row(self, group_id: int) -> int:
+        pos = int(np.searchsorted(self.ids, group_id))
+        if pos < len(self.ids) and self.ids[pos] == group_id:
+            return pos
+        return -1
+
+    def tins(self, group_ids) -> np.ndarray:
+        """市场组的进入序号，不存在时为 -1"""
+        return _lookup(self.ids, self.tin, np.asarray(group_ids, dtype=np.int64))
+
+    def contains(self, ancestor_id: int, group_id: int) -> bool:
+        """ancestor_id 是否为 group_id 的祖先或自身"""
+        ancestor, row = self._row(ancestor_id), self._row(group_id)
+        if ancestor < 0 or row < 0 or self.tin[row] < 0:
+            return False
+        return bool(self.tin[ancestor] <= self.tin[row] <= self.tout[ancestor])
+
+    def contains_tins(self, ancestor_ids, tins: np.ndarray) -> np.ndarray:
+        """批量判断：进入序号为 tins 的节点是否位于任一 ancestor_ids 的子树中"""
+        tins = np.asarray(tins, dtype=np.int64)
+        mask = np.zeros(len(tins), dtype=bool)
+        for ancestor_id in ancestor_ids:
+            row = self._row(ancestor_id)
+            if row >= 0 and self.tin[row] >= 0:
+                mask |= (tins >= self.tin[row]) & (tins <= self.tout[row])
+        return mask
+
+    def path(self, group_id: int) -> list[int]:
+        """从根到自身的市场组 id"""
+        row = self._row(group_id)
+        if row < 0:
+            return []
+        return self.path_ids[self.path_start[row]:self.path_end[row]].tolist()
+
+
+class SnapshotTable:
+    """
+    一张表的列视图，行号通过稠密索引或二分查找得到
+    columns 为 numpy 数组，供批量/向量化使用；单值查询走 memoryview，直接返回 Python 标量，避免 numpy 标量开销
+    """
+
+    def __init__(self, columns: dict[str, np.ndarray], values: dict[str, memoryview]):
+        self.columns = columns
+        self.ids = columns["id"]
+        self._values = values
+        self._ids = values["id"]
+        self._index = values.get("@index")
+        self._base = self._ids[0] if len(self._ids) else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    def row(self, key: int) -> int:
+        """id 对应的行号，不存在时为 -1"""
+        if self._index is not None:
+            pos = key - self._base
+            if 0 <= pos < len(self._index):
+                return self._index[pos]
+            return -1
+        pos = int(np.searchsorted(self.ids, key))
+        if pos < len(self._ids) and self._ids[pos] == key:
+            return pos
+        return -1
+
+    def rows(self, keys) -> np.ndarray:
+        """批量 id 对应的行号数组，不存在时为 -1"""
+        keys = np.asarray(keys, dtype=np.int64)
+        result = np.full(len(keys), -1, dtype=np.int64)
+        if not len(self.ids):
+            return result
+        index = self.columns.get("@index")
+        if index is not None:
+            pos = keys - self._base
+            valid = (pos >= 0) & (pos < len(index))
+            result[valid] = index[pos[valid]]
+            return result
+        pos = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+        found = self.ids[pos] == keys
+        result[found] = pos[found]
+        return result
+
+    def value(self, column: str, row: int):
+        return self._values[column][row]
+
+    def __getitem__(self, column: str) -> np.ndarray:
+        return self.columns[column]
+
+
+class SdeSnapshot:
+    """mmap 映射的只读 SDE 快照"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mmap[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} 不是 SDE 快照文件")
+        header_len = struct.unpack_from("<I", self._mmap, len(SNAPSHOT_MAGIC))[0]
+        start = len(SNAPSHOT_MAGIC) + 4
+        header = json.loads(self._mmap[start:start + header_len])
+        self.version = header["version"]
+        self._blob_offset = header["arrays"]["@strings.blob"]["offset"]
+
+        buffer = memoryview(self._mmap)
+        columns: dict[str, dict[str, np.ndarray]] = {}
+        values: dict[str, dict[str, memoryview]] = {}
+        for name, meta in header["arrays"].items():
+            table, column = name.split(".", 1)
+            dtype = np.dtype(meta["dtype"])
+            array = np.frombuffer(self._mmap, dtype=dtype, count=meta["count"], offset=meta["offset"])
+            columns.setdefault(table, {})[column] = array
+            # 文件为小端序，大端平台上退回 numpy 标量读取
+            values.setdefault(table, {})[column] = (
+                buffer[meta["offset"]:meta["offset"] + array.nbytes].cast(_MEMORYVIEW_FORMAT[dtype.str])
+                if sys.byteorder == "little" else array
+            )
+        self._string_offsets = values.pop("@strings")["offsets"]
+        columns.pop("@strings")
+        values.pop("@market_paths")
+        market_paths = columns.pop("@market_paths")["ids"]
+        market_groups = columns["market_groups"]
+        self.market_closure = MarketGroupClosure(
+            market_groups["id"], market_groups["tin"], market_groups["tout"],
+            market_groups["path_start"], market_groups["path_end"], market_paths,
+        )
+        self.tables = {table: SnapshotTable(columns[table], values[table]) for table in columns}
+        self._name_to_type_id: dict[bool, dict[str, int]] = {}
+
+    @classmethod
+    def open_latest(cls, snapshot_dir: Optional[str] = None) -> Optional["SdeSnapshot"]:
+        """映射目录中版本号最大的快照，没有可用快照时返回 None"""
+        for version, path in reversed(list_snapshots(snapshot_dir)):
+            try:
+                return cls(path)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"SDE 快照 {path} 无法读取: {e}")
+        return None
+
+    def string(self, index: int) -> Optional[str]:
+        if index < 0:
+            return None
+        start = self._blob_offset + self._string_offsets[index]
+        end = self._blob_offset + self._string_offsets[index + 1]
+        return self._mmap[start:end].decode("utf-8")
+
+    def _name(self, table: str, key: int, zh: bool) -> Optional[str]:
+        t = self.tables[table]
+        row = t.row(key)
+        if row < 0:
+            return None
+        return self.string(t.value("name_zh" if zh else "name_en", row))
+
+    def _int(self, table: str, key: int, column: str) -> Optional[int]:
+        t = self.tables[table]
+        row = t.row(key)
+        if row < 0:
+            return None
+        value = t.value(column, row)
+        return None if value < 0 else value
+
+    def has_type(self, type_id: int) -> bool:
+        return self.tables["types"].row(type_id) >= 0
+
+    def type_name(self, type_id: int, zh: bool = False) -> Optional[str]:
+        return self._name("types", type_id, zh)
+
+    def type_volume(self, type_id: int, packaged: bool = False) -> float:
+        t = self.tables["types"]
+        row = t.row(type_id)
+        if row < 0:
+            return 0.0
+        value = t.value("packaged_volume" if packaged else "volume", row)
+        return 0.0 if math.isnan(value) else value
+
+    def type_names(self, type_ids, zh: bool = False) -> dict[int, Optional[str]]:
+        types = self.tables["types"]
+        column = types["name_zh" if zh else "name_en"]
+        rows = types.rows(type_ids)
+        return {
+            int(type_id): self.string(int(column[row])) if row >= 0 else None
+            for type_id, row in zip(type_ids, rows.tolist())
+        }
+
+    def type_volumes(self, type_ids, packaged: bool = False) -> np.ndarray:
+        """与 type_ids 对齐的体积数组，不存在或为空时为 0"""
+        types = self.tables["types"]
+        rows = types.rows(type_ids)
+        result = np.zeros(len(rows), dtype=np.float64)
+        found = rows >= 0
+        result[found] = types["packaged_volume" if packaged else "volume"][rows[found]]
+        return np.nan_to_num(result, nan=0.0)
+
+    def type_rows(self, type_ids) -> dict[int, dict]:
+        """物品的组、类别、meta 等属性，不存在的物品不在结果中"""
+        result = {}
+        types = self.tables["types"]
+        for type_id, row in zip(type_ids, types.rows(type_ids).tolist()):
+            if row < 0:
+                continue
+            type_id = int(type_id)
+            group_id = self._int("types", type_id, "group_id")
+            category_id = self._int("types", type_id, "category_id")
+            meta_group_id = self._int("types", type_id, "meta_group_id")
+            volume = types.value("volume", row)
+            packaged_volume = types.value("packaged_volume", row)
+            result[type_id] = {
+                "type_id": type_id,
+                "group_id": group_id,
+                "category_id": category_id,
+                "market_group_id": self._int("types", type_id, "market_group_id"),
+                "meta_group_id": meta_group_id,
+                "volume": None if math.isnan(volume) else volume,
+                "packaged_volume": None if math.isnan(packaged_volume) else packaged_volume,
+                "name_en": self.string(types.value("name_en", row)),
+                "name_zh": self.string(types.value("name_zh", row)),
+                "group_name_en": None if group_id is None else self._name("groups", group_id, False),
+                "group_name_zh": None if group_id is None else self._name("groups", group_id, True),
+                "category_name_en": None if category_id is None else self._name("categories", category_id, False),
+                "category_name_zh": None if category_id is None else self._name("categories", category_id, True),
+                "meta_name_en": None if meta_group_id is None else self._name("meta_groups", meta_group_id, False),
+                "meta_name_zh": None if meta_group_id is None else self._name("meta_groups", meta_group_id, True),
+            }
+        return result
+
+    def group_name(self, type_id: int, zh: bool = False) -> Optional[str]:
+        group_id = self._int("types", type_id, "group_id")
+        return None if group_id is None else self._name("groups", group_id, zh)
+
+    def category_name(self, type_id: int, zh: bool = False) -> Optional[str]:
+        category_id = self._int("types", type_id, "category_id")
+        return None if category_id is None else self._name("categories", category_id, zh)
+
+    def meta_name(self, meta_id: int, zh: bool = False) -> Optional[str]:
+        return self._name("meta_groups", meta_id, zh)
+
+    def type_meta_name(self, type_id: int, zh: bool = False) -> Optional[str]:
+        meta_id = self._int("types", type_id, "meta_group_id")
+        return None if meta_id is None else self._name("meta_groups", meta_id, zh)
+
+    def market_group_name(self, market_group_id: int, zh: bool = False) -> Optional[str]:
+        return self._name("market_groups", market_group_id, zh)
+
+    def market_group_list(self, type_id: int, zh: bool = False) -> list[str]:
+        """物品的市场组路径（从根到物品本身），与 SdeUtils.get_market_group_list 一致"""
+        market_group_id = self._int("types", type_id, "market_group_id")
+        if market_group_id is None or not self.market_group_name(market_group_id, zh):
+            return []
+        names = [self.market_group_name(group_id, zh) for group_id in self.market_closure.path(market_group_id)]
+        return [name for name in names if name] + [self.type_name(type_id, zh)]
+
+    def market_group_ids_by_name(self, name: str, zh: bool = False) -> list[int]:
+        """同名市场组可能有多个（如舰船与蓝图下都有“护卫舰”）"""
+        groups = self.tables["market_groups"]
+        column = groups["name_zh" if zh else "name_en"]
+        return [
+            group_id for group_id, index in zip(groups.ids.tolist(), column.tolist())
+            if index >= 0 and self.string(index) == name
+        ]
+
+    def is_type_in_market_group(self, type_id: int, market_group_id: int) -> bool:
+        types = self.tables["types"]
+        row = types.row(type_id)
+        if row < 0:
+            return False
+        tin = types.value("market_tin", row)
+        return bool(tin >= 0 and self.market_closure.contains_tins([market_group_id], [tin])[0])
+
+    def types_in_market_groups(self, type_ids, market_group_ids) -> np.ndarray:
+        """与 type_ids 对齐的布尔数组：物品是否位于任一市场组之下"""
+        types = self.tables["types"]
+        rows = types.rows(type_ids)
+        tins = np.full(len(rows), -1, dtype=np.int64)
+        found = rows >= 0
+        tins[found] = types["market_tin"][rows[found]]
+        return self.market_closure.contains_tins(market_group_ids, tins) & (tins >= 0)
+
+    def type_ids_in_market_groups(self, market_group_ids) -> np.ndarray:
+        """位于任一市场组之下的全部 typeID"""
+        types = self.tables["types"]
+        return types.ids[self.market_closure.contains_tins(market_group_ids, types["market_tin"]) & (types["market_tin"] >= 0)]
+
+    def system_info(self, system_id: int, zh: bool = False) -> Optional[dict]:
+        systems = self.tables["systems"]
+        row = systems.row(system_id)
+        if row < 0:
+            return None
+        region_id = systems.value("region_id", row)
+        if self.tables["regions"].row(region_id) < 0:
+            return None
+
+        def coord(column):
+            value = systems.value(column, row)
+            return None if math.isnan(value) else value
+
+        return {
+            'system_name': self.string(systems.value("name_zh" if zh else "name_en", row)),
+            'system_id': system_id,
+            'region_id': region_id,
+            'region_name': self._name("regions", region_id, zh),
+            'x': coord("x"),
+            'y': coord("y"),
+            'z': coord("z"),
+        }
+
+    def type_id_by_name(self, name: str, zh: bool = False) -> Optional[int]:
+        """名称到 typeID，每种语言首次调用时构建映射"""
+        mapping = self._name_to_type_id.get(zh)
+        if mapping is None:
+            types = self.tables["types"]
+            # 倒序写入，重名时保留 id 最小的物品
+            mapping = {
+                self.string(index): type_id
+                for type_id, index in zip(types.ids.tolist()[::-1], types["name_zh" if zh else "name_en"].tolist()[::-1])
+                if index >= 0
+            }
+            self._name_to_type_id[zh] = mapping
+        return mapping.get(name)
@@ -1,8 +1,9 @@
 import asyncio
 import networkx as nx
-from thefuzz import fuzz, process
-from typing import Optional, List
-from sqlalchemy import select
+import numpy as np
+from typing import Optional, List, Dict, Iterable
+from sqlalchemy import select, text, any_, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import selectinload
 from aiocache import cached
 from aiocache.serializers import PickleSerializer
@@ -17,11 +18,18 @@ from .sde_builder import (
     IndustryBlueprints,
     MetaGroups,
     MarketGroups,
+    SdeSnapshot,
+    MarketGroupClosure,
+    SdeChanges,
 )
+from .sde_builder.sde_changes_model import CHANGE_FULL
 from src_v2.core.log import logger
+from .fuzzy_index import FuzzyIndex, FUZZY_NGRAM_EN, FUZZY_NGRAM_ZH
 
 # 数据库管理器单例
 _db_manager: Optional[SDEDatabaseManager] = None
+# mmap 只读快照，存在时热点查询不再访问数据库
+_snapshot: Optional[SdeSnapshot] = None
 _init_lock = asyncio.Lock()
 
 # 数据列表缓存锁
@@ -31,6 +39,7 @@ _meta_name_list_lock = asyncio.Lock()
 _blueprint_name_list_lock = asyncio.Lock()
 _market_group_name_list_lock = asyncio.Lock()
 _category_name_list_lock = asyncio.Lock()
+_fuzzy_index_lock = asyncio.Lock()
 
 # 数据列表缓存（将在后续步骤中改为异步加载）
 _en_invtype_name_list: Optional[List[str]] = None
@@ -46,6 +55,9 @@ _zh_market_group_name_list: Optional[List[str]] = None
 _en_category_name_list: Optional[List[str]] = None
 _zh_category_name_list: Optional[List[str]] = None
 
+# 模糊搜索索引 {(名称列表, 是否中文): FuzzyIndex}，SDE 快照版本变化时重建
+_fuzzy_indexes: Dict[tuple, FuzzyIndex] = {}
+
 
 async def get_db_manager() -> SDEDatabaseManager:
     """获取数据库管理器单例"""
@@ -67,15 +79,57 @@ class SdeUtils:
         """初始化 SDE 数据库连接"""
         await get_db_manager()
         logger.info("SDE 数据库连接已初始化")
+        cls.load_snapshot()
+
+    @classmethod
+    def load_snapshot(cls, snapshot_dir: Optional[str] = None) -> Optional[SdeSnapshot]:
+        """映射最新的 SDE 只读快照，没有快照时继续使用数据库查询"""
+        global _snapshot
+        snapshot = SdeSnapshot.open_latest(snapshot_dir)
+        if snapshot is None:
+            logger.info("未找到 SDE 快照，查询将直接访问数据库")
+            return None
+        _snapshot = snapshot
+        logger.info(f"已映射 SDE 快照: {snapshot.path} (版本 {snapshot.version})")
+        return snapshot
+
+    @classmethod
+    async def reload_sde(cls, snapshot_dir: Optional[str] = None) -> Optional[SdeSnapshot]:
+        """SDE 更新完成后重新映射快照，并清空名称列表与查询缓存，模糊搜索索引随之按新数据重建"""
+        snapshot = cls.load_snapshot(snapshot_dir)
+        await cls.clear_caches()
+        return snapshot
+
+    @classmethod
+    async def clear_caches(cls):
+        """清空名称列表、@cached 查询缓存和模糊搜索索引"""
+        global _en_invtype_name_list, _zh_invtype_name_list, _en_invgroup_name_list, _zh_invgroup_name_list
+        global _en_meta_name_list, _zh_meta_name_list, _en_blueprint_name_list, _zh_blueprint_name_list
+        global _en_market_group_name_list, _zh_market_group_name_list, _en_category_name_list, _zh_category_name_list
+        _en_invtype_name_list = _zh_invtype_name_list = None
+        _en_invgroup_name_list = _zh_invgroup_name_list = None
+        _en_meta_name_list = _zh_meta_name_list = None
+        _en_blueprint_name_list = _zh_blueprint_name_list = None
+        _en_market_group_name_list = _zh_market_group_name_list = None
+        _en_category_name_list = _zh_category_name_list = None
+        for attr in vars(cls).values():
+            cache = getattr(getattr(attr, "__func__", attr), "cache", None)
+            if cache is not None:
+                await cache.clear()
+        _fuzzy_indexes.clear()
+        cls._market_tree = None
+        logger.info("已清空 SDE 名称列表与查询缓存")
 
     @classmethod
     async def close_database(cls):
         """关闭 SDE 数据库连接"""
-        global _db_manager
+        global _db_manager, _snapshot
         if _db_manager:
             await _db_manager.close()
             _db_manager = None
             logger.info("SDE 数据库连接已关闭")
+        # 已取出的数组仍引用映射内存，这里只丢弃引用，由垃圾回收释放
+        _snapshot = None
 
     @staticmethod
     @cached(ttl=3600, serializer=PickleSerializer())
@@ -274,71 +328,59 @@ class SdeUtils:
             return [row[0] for row in result if row[0] is not None]
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
-    async def get_battleship(zh: bool = False) -> List[str]:
-        """获取所有战列舰名称列表"""
+    async def _get_ship_names_in_market_groups(market_group_name_en: str, market_group_name_zh: str,
+                                               zh: bool = False) -> List[str]:
+        """舰船类别中位于指定名称市场组（含同名的全部市场组）之下的物品名称"""
+        market_group_ids = await SdeUtils.get_market_group_ids_by_name(market_group_name_zh if zh else market_group_name_en, zh)
+        if not market_group_ids:
+            return []
         async with (await get_db_manager()).get_readonly_session() as session:
             name_field = InvTypes.typeName_zh if zh else InvTypes.typeName_en
             category_name_field = InvCategories.categoryName_zh if zh else InvCategories.categoryName_en
-            
+
             stmt = (
                 select(InvTypes.typeID, name_field)
                 .select_from(InvTypes)
                 .join(InvGroups, InvTypes.groupID == InvGroups.groupID)
                 .join(InvCategories, InvGroups.categoryID == InvCategories.categoryID)
                 .where(category_name_field == ("舰船" if zh else "Ship"))
+                .where(InvTypes.marketGroupID.isnot(None))
             )
-            result = await session.execute(stmt)
-            
-            battleship_list = []
-            for row in result:
-                type_id = row.typeID
-                type_name = row[1]  # name_field
-                market_list = await SdeUtils.get_market_group_list(type_id, zh=zh)
-                target_name = "战列舰" if zh else "Battleships"
-                if target_name in market_list:
-                    battleship_list.append(type_name)
-            
-            return battleship_list
+            rows = (await session.execute(stmt)).all()
+        mask = await SdeUtils.filter_types_in_market_groups([row[0] for row in rows], market_group_ids)
+        return [row[1] for row, hit in zip(rows, mask.tolist()) if hit]
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def get_battleship(zh: bool = False) -> List[str]:
+        """获取所有战列舰名称列表"""
+        return await SdeUtils._get_ship_names_in_market_groups("Battleships", "战列舰", zh)
 
     @staticmethod
     @cached(ttl=3600, serializer=PickleSerializer())
     async def get_capital_ship(zh: bool = False) -> List[str]:
         """获取所有旗舰名称列表"""
-        async with (await get_db_manager()).get_readonly_session() as session:
-            name_field = InvTypes.typeName_zh if zh else InvTypes.typeName_en
-            category_name_field = InvCategories.categoryName_zh if zh else InvCategories.categoryName_en
-            
-            stmt = (
-                select(InvTypes.typeID, name_field)
-                .select_from(InvTypes)
-                .join(InvGroups, InvTypes.groupID == InvGroups.groupID)
-                .join(InvCategories, InvGroups.categoryID == InvCategories.categoryID)
-                .where(category_name_field == ("舰船" if zh else "Ship"))
-            )
-            result = await session.execute(stmt)
-            
-            capital_ship_list = []
-            for row in result:
-                type_id = row.typeID
-                type_name = row[1]  # name_field
-                market_list = await SdeUtils.get_market_group_list(type_id, zh=zh)
-                target_name = "旗舰" if zh else "Capital Ships"
-                if target_name in market_list:
-                    capital_ship_list.append(type_name)
-            
-            # 移除特定物品
-            exclude_items = ["Venerable", "Vanguard"] if not zh else ["可敬级", "先锋级"]
-            for item in exclude_items:
-                if item in capital_ship_list:
-                    capital_ship_list.remove(item)
-            
-            return capital_ship_list
+        capital_ship_list = await SdeUtils._get_ship_names_in_market_groups("Capital Ships", "旗舰", zh)
+
+        # 移除特定物品
+        exclude_items = ["Venerable", "Vanguard"] if not zh else ["可敬级", "先锋级"]
+        for item in exclude_items:
+            if item in capital_ship_list:
+                capital_ship_list.remove(item)
+
+        return capital_ship_list
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_groupname_by_id(invtpye_id: int, zh: bool = False) -> Optional[str]:
         """根据 typeID 获取组名称"""
+        if _snapshot is not None:
+            return _snapshot.group_name(invtpye_id, zh)
+        return await SdeUtils._get_groupname_by_id_db(invtpye_id, zh)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_groupname_by_id_db(invtpye_id: int, zh: bool = False) -> Optional[str]:
+        """根据 typeID 获取组名称（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 group_name_field = InvGroups.groupName_zh if zh else InvGroups.groupName_en
@@ -383,9 +425,16 @@ class SdeUtils:
             return None
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_invtype_packagedvolume_by_id(invtpye_id: int) -> float:
         """根据 typeID 获取 packagedVolume"""
+        if _snapshot is not None:
+            return _snapshot.type_volume(invtpye_id, packaged=True)
+        return await SdeUtils._get_invtype_packagedvolume_by_id_db(invtpye_id)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_invtype_packagedvolume_by_id_db(invtpye_id: int) -> float:
+        """根据 typeID 获取 packagedVolume（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 stmt = select(InvTypes.packagedVolume).where(InvTypes.typeID == invtpye_id)
@@ -397,9 +446,16 @@ class SdeUtils:
             return 0.0
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_metaname_by_metaid(meta_id: int, zh: bool = False) -> Optional[str]:
         """根据 metaGroupID 获取 meta 名称"""
+        if _snapshot is not None:
+            return _snapshot.meta_name(meta_id, zh)
+        return await SdeUtils._get_metaname_by_metaid_db(meta_id, zh)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_metaname_by_metaid_db(meta_id: int, zh: bool = False) -> Optional[str]:
+        """根据 metaGroupID 获取 meta 名称（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 name_field = MetaGroups.nameID_zh if zh else MetaGroups.nameID_en
@@ -411,9 +467,16 @@ class SdeUtils:
             return None
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_metaname_by_typeid(typeid: int, zh: bool = False) -> Optional[str]:
         """根据 typeID 获取 meta 名称"""
+        if _snapshot is not None:
+            return _snapshot.type_meta_name(typeid, zh)
+        return await SdeUtils._get_metaname_by_typeid_db(typeid, zh)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_metaname_by_typeid_db(typeid: int, zh: bool = False) -> Optional[str]:
+        """根据 typeID 获取 meta 名称（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 name_field = MetaGroups.nameID_zh if zh else MetaGroups.nameID_en
@@ -445,9 +508,16 @@ class SdeUtils:
             return None
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_id_by_name(name: str) -> Optional[int]:
         """根据物品名称获取 typeID"""
+        if _snapshot is not None:
+            return _snapshot.type_id_by_name(name, SdeUtils.maybe_chinese(name))
+        return await SdeUtils._get_id_by_name_db(name)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_id_by_name_db(name: str) -> Optional[int]:
+        """根据物品名称获取 typeID（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 is_zh = SdeUtils.maybe_chinese(name)
@@ -460,9 +530,16 @@ class SdeUtils:
             return None
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_name_by_id(type_id: int, zh: bool = False) -> Optional[str]:
         """根据 typeID 获取物品名称"""
+        if _snapshot is not None:
+            return _snapshot.type_name(type_id, zh)
+        return await SdeUtils._get_name_by_id_db(type_id, zh)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_name_by_id_db(type_id: int, zh: bool = False) -> Optional[str]:
+        """根据 typeID 获取物品名称（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 name_field = InvTypes.typeName_zh if zh else InvTypes.typeName_en
@@ -503,9 +580,16 @@ class SdeUtils:
         return cls._market_tree
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_market_group_name_by_groupid(market_group_id: int, zh: bool = False) -> Optional[str]:
         """根据 marketGroupID 获取市场组名称"""
+        if _snapshot is not None:
+            return _snapshot.market_group_name(market_group_id, zh)
+        return await SdeUtils._get_market_group_name_by_groupid_db(market_group_id, zh)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_market_group_name_by_groupid_db(market_group_id: int, zh: bool = False) -> Optional[str]:
+        """根据 marketGroupID 获取市场组名称（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 name_field = MarketGroups.nameID_zh if zh else MarketGroups.nameID_en
@@ -531,10 +615,84 @@ class SdeUtils:
             logger.warning(f"获取 market_group_name={market_group_name} 的 marketGroupID 时出错: {e}")
             return None
 
-    @classmethod
+    @staticmethod
+    async def get_market_group_ids_by_name(market_group_name: str, zh: bool = False) -> List[int]:
+        """根据市场组名称获取全部同名市场组的 marketGroupID"""
+        if _snapshot is not None:
+            return _snapshot.market_group_ids_by_name(market_group_name, zh)
+        return await SdeUtils._get_market_group_ids_by_name_db(market_group_name, zh)
+
+    @staticmethod
     @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_market_group_ids_by_name_db(market_group_name: str, zh: bool = False) -> List[int]:
+        """根据市场组名称获取全部同名市场组的 marketGroupID（数据库查询）"""
+        async with (await get_db_manager()).get_readonly_session() as session:
+            name_field = MarketGroups.nameID_zh if zh else MarketGroups.nameID_en
+            stmt = select(MarketGroups.marketGroupID).where(name_field == market_group_name)
+            return sorted(row[0] for row in await session.execute(stmt))
+
+    @staticmethod
+    async def get_market_group_closure() -> MarketGroupClosure:
+        """市场组祖先关系，优先使用快照中预计算的 DFS 区间"""
+        if _snapshot is not None:
+            return _snapshot.market_closure
+        return await SdeUtils._get_market_group_closure_db()
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_market_group_closure_db() -> MarketGroupClosure:
+        """市场组祖先关系（数据库查询，整表读取后构建）"""
+        async with (await get_db_manager()).get_readonly_session() as session:
+            rows = (await session.execute(select(MarketGroups.marketGroupID, MarketGroups.parentGroupID))).all()
+        return MarketGroupClosure.build(
+            [row[0] for row in rows],
+            [-1 if row[1] is None else row[1] for row in rows],
+        )
+
+    @staticmethod
+    async def filter_types_in_market_groups(type_ids: List[int], market_group_ids: Iterable[int]) -> np.ndarray:
+        """
+        批量判断物品是否位于任一市场组（含子孙市场组）之下
+        Returns:
+            np.ndarray: 与 type_ids 对齐的布尔数组
+        """
+        type_ids = [int(type_id) for type_id in type_ids]
+        market_group_ids = list(market_group_ids)
+        if _snapshot is not None:
+            return _snapshot.types_in_market_groups(type_ids, market_group_ids)
+        mask = np.zeros(len(type_ids), dtype=bool)
+        if not type_ids or not market_group_ids:
+            return mask
+        closure = await SdeUtils.get_market_group_closure()
+        unique_ids = list(dict.fromkeys(type_ids))
+        async with (await get_db_manager()).get_readonly_session() as session:
+            stmt = (
+                select(InvTypes.typeID, InvTypes.marketGroupID)
+                .where(InvTypes.typeID == SdeUtils._ids_param(unique_ids))
+                .where(InvTypes.marketGroupID.isnot(None))
+            )
+            market_group_of = {type_id: market_group_id for type_id, market_group_id in await session.execute(stmt)}
+        tins = closure.tins([market_group_of.get(type_id, -1) for type_id in type_ids])
+        return closure.contains_tins(market_group_ids, tins) & (tins >= 0)
+
+    @staticmethod
+    async def is_type_in_market_group(type_id: int, market_group_id: int) -> bool:
+        """物品是否位于市场组（含子孙市场组）之下"""
+        if _snapshot is not None:
+            return _snapshot.is_type_in_market_group(type_id, market_group_id)
+        return bool((await SdeUtils.filter_types_in_market_groups([type_id], [market_group_id]))[0])
+
+    @classmethod
     async def get_market_group_list(cls, type_id: int, zh: bool = False) -> List[str]:
         """根据 typeID 获取市场组列表（从根到叶子）"""
+        if _snapshot is not None:
+            return _snapshot.market_group_list(type_id, zh)
+        return await cls._get_market_group_list_db(type_id, zh)
+
+    @classmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_market_group_list_db(cls, type_id: int, zh: bool = False) -> List[str]:
+        """根据 typeID 获取市场组列表（数据库查询，从根到叶子）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 # 获取物品信息和市场组ID
@@ -594,9 +752,16 @@ class SdeUtils:
 
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_category_by_id(type_id: int, zh: bool = False) -> Optional[str]:
         """根据 typeID 获取类别名称"""
+        if _snapshot is not None:
+            return _snapshot.category_name(type_id, zh)
+        return await SdeUtils._get_category_by_id_db(type_id, zh)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_category_by_id_db(type_id: int, zh: bool = False) -> Optional[str]:
+        """根据 typeID 获取类别名称（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 category_name_field = InvCategories.categoryName_zh if zh else InvCategories.categoryName_en
@@ -614,9 +779,16 @@ class SdeUtils:
             return None
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_system_info_by_id(system_id: int, zh: bool = False) -> Optional[dict]:
         """根据 systemID 获取星系信息"""
+        if _snapshot is not None:
+            return _snapshot.system_info(system_id, zh)
+        return await SdeUtils._get_system_info_by_id_db(system_id, zh)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_system_info_by_id_db(system_id: int, zh: bool = False) -> Optional[dict]:
+        """根据 systemID 获取星系信息（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 system_name_field = MapSolarSystems.solarSystemName_zh if zh else MapSolarSystems.solarSystemName_en
@@ -653,6 +825,176 @@ class SdeUtils:
             logger.warning(f"获取 system_id={system_id} 的星系信息时出错: {e}")
             return None
 
+    # ---------- 批量查询：一次快照扫描或一次 = ANY(:ids) 查询 ----------
+
+    @staticmethod
+    def _ids_param(ids: List[int]):
+        return any_(bindparam("ids", ids, type_=ARRAY(Integer)))
+
+    @staticmethod
+    async def get_names_by_ids(type_ids: Iterable[int], zh: bool = False) -> Dict[int, Optional[str]]:
+        """批量获取物品名称，不存在的 typeID 对应 None"""
+        type_ids = list(dict.fromkeys(int(type_id) for type_id in type_ids))
+        if _snapshot is not None:
+            return _snapshot.type_names(type_ids, zh)
+        result = dict.fromkeys(type_ids)
+        if not type_ids:
+            return result
+        async with (await get_db_manager()).get_readonly_session() as session:
+            name_field = InvTypes.typeName_zh if zh else InvTypes.typeName_en
+            stmt = select(InvTypes.typeID, name_field).where(InvTypes.typeID == SdeUtils._ids_param(type_ids))
+            for type_id, name in await session.execute(stmt):
+                result[type_id] = name
+        return result
+
+    @staticmethod
+    async def get_type_rows(type_ids: Iterable[int]) -> Dict[int, dict]:
+        """
+        批量获取物品属性
+        Returns:
+            dict: {type_id: {group_id, category_id, market_group_id, meta_group_id, volume, packaged_volume,
+                   name_en/zh, group_name_en/zh, category_name_en/zh, meta_name_en/zh}}，不存在的物品不在结果中
+        """
+        type_ids = list(dict.fromkeys(int(type_id) for type_id in type_ids))
+        if _snapshot is not None:
+            return _snapshot.type_rows(type_ids)
+        if not type_ids:
+            return {}
+        async with (await get_db_manager()).get_readonly_session() as session:
+            stmt = (
+                select(
+                    InvTypes.typeID.label('type_id'),
+                    InvTypes.groupID.label('group_id'),
+                    InvGroups.categoryID.label('category_id'),
+                    InvTypes.marketGroupID.label('market_group_id'),
+                    InvTypes.metaGroupID.label('meta_group_id'),
+                    InvTypes.volume.label('volume'),
+                    InvTypes.packagedVolume.label('packaged_volume'),
+                    InvTypes.typeName_en.label('name_en'),
+                    InvTypes.typeName_zh.label('name_zh'),
+                    InvGroups.groupName_en.label('group_name_en'),
+                    InvGroups.groupName_zh.label('group_name_zh'),
+                    InvCategories.categoryName_en.label('category_name_en'),
+                    InvCategories.categoryName_zh.label('category_name_zh'),
+                    MetaGroups.nameID_en.label('meta_name_en'),
+                    MetaGroups.nameID_zh.label('meta_name_zh'),
+                )
+                .select_from(InvTypes)
+                .outerjoin(InvGroups, InvTypes.groupID == InvGroups.groupID)
+                .outerjoin(InvCategories, InvGroups.categoryID == InvCategories.categoryID)
+                .outerjoin(MetaGroups, InvTypes.metaGroupID == MetaGroups.metaGroupID)
+                .where(InvTypes.typeID == SdeUtils._ids_param(type_ids))
+            )
+            result = await session.execute(stmt)
+            return {row.type_id: dict(row._mapping) for row in result}
+
+    @staticmethod
+    async def get_volumes(type_ids: List[int], packaged: bool = False) -> np.ndarray:
+        """批量获取体积，返回与 type_ids 对齐的数组，不存在或为空时为 0"""
+        type_ids = [int(type_id) for type_id in type_ids]
+        if _snapshot is not None:
+            return _snapshot.type_volumes(type_ids, packaged)
+        volumes = {}
+        if type_ids:
+            async with (await get_db_manager()).get_readonly_session() as session:
+                volume_field = InvTypes.packagedVolume if packaged else InvTypes.volume
+                stmt = select(InvTypes.typeID, volume_field).where(
+                    InvTypes.typeID == SdeUtils._ids_param(list(set(type_ids)))
+                )
+                volumes = {type_id: volume for type_id, volume in await session.execute(stmt)}
+        return np.array([volumes.get(type_id) or 0.0 for type_id in type_ids], dtype=np.float64)
+
+    @staticmethod
+    async def get_system_infos(system_ids: Iterable[int], zh: bool = False) -> Dict[int, Optional[dict]]:
+        """批量获取星系信息，字段与 get_system_info_by_id 一致，不存在的星系对应 None"""
+        system_ids = list(dict.fromkeys(int(system_id) for system_id in system_ids))
+        if _snapshot is not None:
+            return {system_id: _snapshot.system_info(system_id, zh) for system_id in system_ids}
+        result = dict.fromkeys(system_ids)
+        if not system_ids:
+            return result
+        async with (await get_db_manager()).get_readonly_session() as session:
+            system_name_field = MapSolarSystems.solarSystemName_zh if zh else MapSolarSystems.solarSystemName_en
+            region_name_field = MapRegions.regionName_zh if zh else MapRegions.regionName_en
+            stmt = (
+                select(
+                    system_name_field.label('system_name'),
+                    MapSolarSystems.solarSystemID.label('system_id'),
+                    MapSolarSystems.regionID.label('region_id'),
+                    region_name_field.label('region_name'),
+                    MapSolarSystems.x.label('x'),
+                    MapSolarSystems.y.label('y'),
+                    MapSolarSystems.z.label('z')
+                )
+                .select_from(MapSolarSystems)
+                .join(MapRegions, MapSolarSystems.regionID == MapRegions.regionID)
+                .where(MapSolarSystems.solarSystemID == SdeUtils._ids_param(system_ids))
+            )
+            for row in await session.execute(stmt):
+                result[row.system_id] = dict(row._mapping)
+        return result
+
+    @staticmethod
+    async def get_market_group_paths(type_ids: Iterable[int], zh: bool = False) -> Dict[int, List[str]]:
+        """批量获取市场组路径，与 get_market_group_list 一致（从根到物品本身），无市场组时为空列表"""
+        type_ids = list(dict.fromkeys(int(type_id) for type_id in type_ids))
+        if _snapshot is not None:
+            return {type_id: _snapshot.market_group_list(type_id, zh) for type_id in type_ids}
+        result = {type_id: [] for type_id in type_ids}
+        if not type_ids:
+            return result
+        async with (await get_db_manager()).get_readonly_session() as session:
+            type_name_field = InvTypes.typeName_zh if zh else InvTypes.typeName_en
+            group_name_field = MarketGroups.nameID_zh if zh else MarketGroups.nameID_en
+            type_rows = (await session.execute(
+                select(InvTypes.typeID, InvTypes.marketGroupID, type_name_field)
+                .where(InvTypes.typeID == SdeUtils._ids_param(type_ids))
+            )).all()
+            # 市场组只有几千行，整表读取后在内存中回溯父节点
+            groups = {
+                group_id: (parent_id, name)
+                for group_id, parent_id, name in await session.execute(
+                    select(MarketGroups.marketGroupID, MarketGroups.parentGroupID, group_name_field)
+                )
+            }
+        for type_id, market_group_id, type_name in type_rows:
+            if market_group_id not in groups or not groups[market_group_id][1]:
+                continue
+            path = [type_name, groups[market_group_id][1]]
+            parent_id = groups[market_group_id][0]
+            while parent_id in groups:
+                parent_id, parent_name = groups[parent_id]
+                if parent_name:
+                    path.append(parent_name)
+            path.reverse()
+            result[type_id] = path
+        return result
+
+    @staticmethod
+    async def get_build_number() -> Optional[int]:
+        """当前 SDE 版本号，优先使用快照记录的版本"""
+        if _snapshot is not None:
+            return _snapshot.version
+        async with (await get_db_manager()).get_readonly_session() as session:
+            result = await session.execute(text('SELECT "buildNumber" FROM "_sde" WHERE "_key" = :key'), {"key": "sde"})
+            return result.scalar()
+
+    @staticmethod
+    async def get_changed_type_ids(since_build: int) -> Optional[set]:
+        """
+        since_build 之后的 SDE 版本中变更过的 typeID（读取 _sde_changes 中的记录）
+        Returns:
+            typeID 集合；区间内有整表替换的版本时返回 None，表示需要全量重建
+        """
+        async with (await get_db_manager()).get_readonly_session() as session:
+            stmt = select(SdeChanges.op, SdeChanges.typeIDs).where(SdeChanges.buildNumber > since_build)
+            type_ids = set()
+            for op, ids in await session.execute(stmt):
+                if op == CHANGE_FULL:
+                    return None
+                type_ids.update(ids or [])
+            return type_ids
+
     @staticmethod
     def maybe_chinese(strs):
         en_count = 0
@@ -664,18 +1006,39 @@ class SdeUtils:
                 en_count += 1
         return cn_count > en_count
 
+    @staticmethod
+    async def _get_fuzzy_index(kind: str, zh: bool) -> FuzzyIndex:
+        """获取名称列表的模糊搜索索引，首次使用或 SDE 版本变化时在工作线程中构建"""
+        version = _snapshot.version if _snapshot is not None else None
+        index = _fuzzy_indexes.get((kind, zh))
+        if index is not None and index.version == version:
+            return index
+        async with _fuzzy_index_lock:
+            index = _fuzzy_indexes.get((kind, zh))
+            if index is None or index.version != version:
+                names = await getattr(SdeUtils, f"_get_{kind}_name_list")(zh=zh)
+                index = await asyncio.to_thread(
+                    FuzzyIndex, names, FUZZY_NGRAM_ZH if zh else FUZZY_NGRAM_EN, version
+                )
+                _fuzzy_indexes[(kind, zh)] = index
+        return index
+
+    @staticmethod
+    async def _fuzz_extract(kind: str, item_name: str, zh: bool, list_len: int):
+        """n-gram 索引剪枝后用 rapidfuzz 打分，返回 [(名称, 得分)]"""
+        index = await SdeUtils._get_fuzzy_index(kind, zh)
+        return await asyncio.to_thread(index.extract, item_name, list_len)
+
     @staticmethod
     async def fuzz_en_type(item_name: str, list_len: int = 5) -> List[str]:
         """英文物品类型模糊搜索"""
-        choice = await SdeUtils._get_invtype_name_list(zh=False)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("invtype", item_name, False, list_len)
         return [res[0] for res in result]
 
     @staticmethod
     async def fuzz_zh_type(item_name: str, list_len: int = 5) -> List[str]:
         """中文物品类型模糊搜索"""
-        choice = await SdeUtils._get_invtype_name_list(zh=True)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("invtype", item_name, True, list_len)
         return [res[0] for res in result]
 
     @staticmethod
@@ -689,15 +1052,13 @@ class SdeUtils:
     @staticmethod
     async def fuzz_zh_group(item_name: str, list_len: int = 5) -> List[str]:
         """中文组名称模糊搜索"""
-        choice = await SdeUtils._get_invgroup_name_list(zh=True)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("invgroup", item_name, True, list_len)
         return [res[0] for res in result]
 
     @staticmethod
     async def fuzz_en_group(item_name: str, list_len: int = 5) -> List[str]:
         """英文组名称模糊搜索"""
-        choice = await SdeUtils._get_invgroup_name_list(zh=False)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("invgroup", item_name, False, list_len)
         return [res[0] for res in result]
 
     @staticmethod
@@ -711,15 +1072,13 @@ class SdeUtils:
     @staticmethod
     async def fuzz_zh_meta(item_name: str, list_len: int = 5) -> List[str]:
         """中文 meta 名称模糊搜索"""
-        choice = await SdeUtils._get_meta_name_list(zh=True)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("meta", item_name, True, list_len)
         return [res[0] for res in result]
 
     @staticmethod
     async def fuzz_en_meta(item_name: str, list_len: int = 5) -> List[str]:
         """英文 meta 名称模糊搜索"""
-        choice = await SdeUtils._get_meta_name_list(zh=False)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("meta", item_name, False, list_len)
         return [res[0] for res in result]
 
     @staticmethod
@@ -741,15 +1100,13 @@ class SdeUtils:
     @staticmethod
     async def fuzz_zh_blueprint(item_name: str, list_len: int = 5) -> List[str]:
         """中文蓝图名称模糊搜索"""
-        choice = await SdeUtils._get_blueprint_name_list(zh=True)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("blueprint", item_name, True, list_len)
         return [res[0] for res in result]
 
     @staticmethod
     async def fuzz_en_blueprint(item_name: str, list_len: int = 5) -> List[str]:
         """英文蓝图名称模糊搜索"""
-        choice = await SdeUtils._get_blueprint_name_list(zh=False)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("blueprint", item_name, False, list_len)
         logger.info(f"input: {item_name}, fuzz_en_blueprint result: {result}")
         return [res[0] for res in result]
 
@@ -764,15 +1121,13 @@ class SdeUtils:
     @staticmethod
     async def fuzz_zh_market_group(item_name: str, list_len: int = 5) -> List[str]:
         """中文市场组名称模糊搜索"""
-        choice = await SdeUtils._get_market_group_name_list(zh=True)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("market_group", item_name, True, list_len)
         return [res[0] for res in result]
 
     @staticmethod
     async def fuzz_en_market_group(item_name: str, list_len: int = 5) -> List[str]:
         """英文市场组名称模糊搜索"""
-        choice = await SdeUtils._get_market_group_name_list(zh=False)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("market_group", item_name, False, list_len)
         return [res[0] for res in result]
 
     @staticmethod
@@ -786,15 +1141,13 @@ class SdeUtils:
     @staticmethod
     async def fuzz_zh_category(item_name: str, list_len: int = 5) -> List[str]:
         """中文类别名称模糊搜索"""
-        choice = await SdeUtils._get_category_name_list(zh=True)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("category", item_name, True, list_len)
         return [res[0] for res in result]
 
     @staticmethod
     async def fuzz_en_category(item_name: str, list_len: int = 5) -> List[str]:
         """英文类别名称模糊搜索"""
-        choice = await SdeUtils._get_category_name_list(zh=False)
-        result = process.extract(item_name, choice, scorer=fuzz.token_sort_ratio, limit=list_len)
+        result = await SdeUtils._fuzz_extract("category", item_name, False, list_len)
         return [res[0] for res in result]
 
     @staticmethod
@@ -834,9 +1187,16 @@ class SdeUtils:
             return [row[0] for row in result]
 
     @staticmethod
-    @cached(ttl=3600, serializer=PickleSerializer())
     async def get_volume_by_type_id(type_id: int) -> float:
         """根据 typeID 获取体积"""
+        if _snapshot is not None:
+            return _snapshot.type_volume(type_id)
+        return await SdeUtils._get_volume_by_type_id_db(type_id)
+
+    @staticmethod
+    @cached(ttl=3600, serializer=PickleSerializer())
+    async def _get_volume_by_type_id_db(type_id: int) -> float:
+        """根据 typeID 获取体积（数据库查询）"""
         try:
             async with (await get_db_manager()).get_readonly_session() as session:
                 stmt = select(InvTypes.volume).where(InvTypes.typeID == type_id)
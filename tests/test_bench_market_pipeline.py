@@ -0,0 +1,69 @@
+"""
+市场基准回归对比测试用例
+测试 Redis 往返计数、峰值内存与基线对比
+"""
+import pytest
+from unittest.mock import patch
+
+from benchmark.bench_market_pipeline import RoundTripCounter, compare, make_redis, percentile, peak_rss_mb
+
+TARGET_MODULE_PATH = 'benchmark.bench_market_pipeline'
+
+
+class TestRoundTripCounter:
+    """RoundTripCounter 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_pipeline_counts_once(self):
+        """测试单条命令各计一次，pipeline 整体计一次"""
+        fakeredis = pytest.importorskip("fakeredis")
+        redis = fakeredis.FakeAsyncRedis(decode_responses=True)
+        counter = RoundTripCounter()
+
+        with counter.patch():
+            await redis.set("a", 1)
+            await redis.get("a")
+            async with redis.pipeline(transaction=False) as pipe:
+                for i in range(100):
+                    pipe.set(f"k{i}", i)
+                await pipe.execute()
+
+        assert counter.count == 3
+
+
+class TestMakeRedis:
+    """Redis 连接测试类"""
+
+    def test_missing_fakeredis_exits_with_hint(self):
+        """测试未安装 fakeredis 时给出安装或使用 --redis-url 的提示"""
+        with patch.dict('sys.modules', {'fakeredis': None}):
+            with pytest.raises(SystemExit, match="--redis-url"):
+                make_redis(None)
+
+
+class TestPeakRss:
+    """峰值内存测试类"""
+
+    def test_without_resource_module(self):
+        """测试没有 resource 模块（Windows）时返回 None，对比时跳过该指标"""
+        with patch(f'{TARGET_MODULE_PATH}.resource', None):
+            assert peak_rss_mb() is None
+        assert compare({"rss": {"peak_mb": None}}, {"rss": {"peak_mb": 100.0}}, threshold=0.2) == []
+
+
+class TestCompare:
+    """基线对比测试类"""
+
+    def test_regression_over_threshold(self):
+        """测试超出阈值的指标判定为回归，缺失的指标跳过"""
+        baseline = {"refresh": {"total_s": 10.0, "redis_round_trips": 20}, "lookup": {"cold_p95_ms": 5.0}}
+        current = {"refresh": {"total_s": 13.0, "redis_round_trips": 20}, "lookup": {"cold_p95_ms": 5.5}}
+
+        regressions = compare(current, baseline, threshold=0.2)
+
+        assert len(regressions) == 1
+        assert regressions[0].startswith("refresh.total_s")
+
+    def test_percentile(self):
+        assert percentile([3, 1, 2, 4], 0.5) in (2, 3)
+        assert percentile([], 0.95) == 0.0
@@ -0,0 +1,116 @@
+"""
+蓝图图谱批量导入测试用例
+测试内存中计算的节点与边、版本标记跳过以及批量写入流程
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src_v2.model.EVE.industry.blueprint import BPManager, build_bp_graph, BP_GRAPH_NAME
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.industry.blueprint'
+
+# (blueprintTypeID, activityID, productTypeID, quantity)
+PRODUCT_ROWS = [
+    (1001, 1, 100, 1),       # 100 由 1001 制造
+    (1001, 8, 2001, 1),      # 1001 发明得到 T2 蓝图 2001
+    (2001, 1, 200, 1),       # 200 由 2001 制造
+    (3001, 11, 300, 200),    # 300 由 3001 反应，产出 200 个
+    (45732, 1, 400, 1),      # 测试蓝图，排除
+]
+# (blueprintTypeID, activityID, materialTypeID, quantity)
+MATERIAL_ROWS = [
+    (1001, 1, 34, 10),
+    (1001, 8, 20410, 2),     # 发明材料不计入
+    (2001, 1, 100, 1),
+    (2001, 1, 300, 5),
+    (3001, 11, 16634, 100),
+    (45732, 1, 35, 1),
+]
+
+
+class TestBuildBpGraph:
+    """内存计算蓝图图谱测试类"""
+
+    def test_nodes_and_edges(self):
+        """测试节点包含全部产品及材料，边只来自制造/反应材料"""
+        nodes, edges = build_bp_graph(PRODUCT_ROWS, MATERIAL_ROWS, BPManager.ACTIVITY_ID_MAP)
+
+        assert set(nodes) == {100, 2001, 200, 300, 400, 34, 16634}
+        assert nodes[100]["bp_type_id"] == 1001
+        assert nodes[300]["bp_type_id"] == 3001
+        assert nodes[400]["bp_type_id"] is None
+        assert nodes[34]["bp_type_id"] is None
+
+        by_pair = {(edge["product"], edge["material"]): edge for edge in edges}
+        assert set(by_pair) == {(100, 34), (2001, 34), (200, 100), (200, 300), (300, 16634)}
+        assert by_pair[(200, 300)]["material_num"] == 5
+        assert by_pair[(300, 16634)]["product_num"] == 200
+        assert by_pair[(300, 16634)]["activity_type"] == "Reactions"
+        assert by_pair[(100, 34)]["activity_type"] == "Manufacturing"
+
+    def test_invention_product_has_unknown_activity(self):
+        """测试只有发明产出的 T2 蓝图节点，活动类型为 Unknown（与逐个递归写入一致）"""
+        _, edges = build_bp_graph(PRODUCT_ROWS, MATERIAL_ROWS, BPManager.ACTIVITY_ID_MAP)
+
+        edge = next(edge for edge in edges if edge["product"] == 2001)
+        assert edge["activity_id"] is None
+        assert edge["activity_type"] == "Unknown"
+
+
+class TestInitBpDataToNeo4j:
+    """批量写入测试类"""
+
+    @pytest.mark.asyncio
+    async def test_skip_when_version_unchanged(self):
+        """测试版本标记与 SDE 版本相同时直接跳过"""
+        with patch(f'{TARGET_MODULE_PATH}.SdeUtils') as mock_sde, \
+                patch(f'{TARGET_MODULE_PATH}.NIU') as mock_niu, \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_sde.get_build_number = AsyncMock(return_value=3000000)
+            mock_niu.get_graph_version = AsyncMock(return_value=3000000)
+            mock_niu.batch_merge_nodes = AsyncMock()
+
+            assert await BPManager.init_bp_data_to_neo4j() is False
+
+        mock_niu.get_graph_version.assert_awaited_once_with(BP_GRAPH_NAME)
+        mock_niu.batch_merge_nodes.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_bulk_load(self):
+        """测试先写节点、再写关系、清理过期数据，最后更新版本标记"""
+        calls = []
+
+        def record(name, result=0):
+            async def fake(*args, **kwargs):
+                calls.append((name, args))
+                return result
+            return fake
+
+        with patch(f'{TARGET_MODULE_PATH}.SdeUtils') as mock_sde, \
+                patch(f'{TARGET_MODULE_PATH}.NIU') as mock_niu, \
+                patch.object(BPManager, "get_bp_graph_rows", AsyncMock(return_value=(PRODUCT_ROWS, MATERIAL_ROWS))), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_sde.get_build_number = AsyncMock(return_value=3000001)
+            mock_sde.get_type_rows = AsyncMock(return_value={100: {"name_en": "Item", "meta_name_en": "Tech I"}})
+            mock_sde.get_market_group_paths = AsyncMock(return_value={100: ["Ships", "Item"]})
+            mock_niu.get_graph_version = AsyncMock(return_value=3000000)
+            mock_niu.ensure_constraints = record("constraints")
+            mock_niu.batch_merge_nodes = record("nodes")
+            mock_niu.batch_merge_relations = record("relations")
+            mock_niu.delete_stale = record("stale")
+            mock_niu.set_graph_version = record("version")
+
+            assert await BPManager.init_bp_data_to_neo4j() is True
+
+        assert [name for name, _ in calls] == ["constraints", "nodes", "relations", "stale", "stale", "version"]
+        assert [model.__name__ for model in calls[0][1]] == ["Blueprint", "GraphVersion"]
+        label, index_keys, node_rows, _ = calls[1][1]
+        assert (label, index_keys) == ("Blueprint", ["type_id"])
+        node = next(row for row in node_rows if row["type_id"] == 100)
+        assert node["type_name"] == "Item"
+        assert node["market_list"] == ["Ships", "Item"]
+        assert node["bp_type_id"] == 1001
+        assert all(row["sde_version"] == 3000001 for row in node_rows)
+        edge_rows = calls[2][1][6]
+        assert len(edge_rows) == 5
+        assert calls[-1][1] == (BP_GRAPH_NAME, 3000001)
@@ -0,0 +1,78 @@
+"""
+esi_decode 测试用例
+测试 ESI 大体积分页的记录类型解析
+"""
+import json
+
+import pytest
+from unittest.mock import patch
+
+from src_v2.model.EVE.eveesi import esi_decode
+from src_v2.model.EVE.eveesi.esi_decode import MarketOrder, AssetItem, IndustryJob
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.eveesi.esi_decode'
+
+ORDERS = [
+    {
+        "duration": 90, "is_buy_order": False, "issued": "2025-01-01T00:00:00Z", "location_id": 60003760,
+        "min_volume": 1, "order_id": 1, "price": 5.5, "range": "station", "system_id": 30000142,
+        "type_id": 34, "volume_remain": 100, "volume_total": 200
+    },
+    {
+        "duration": 90, "is_buy_order": True, "issued": "2025-01-01T00:00:00Z", "location_id": 60003760,
+        "min_volume": 1, "order_id": 2, "price": 4.5, "range": "region", "system_id": 30000142,
+        "type_id": 34, "volume_remain": 50, "volume_total": 50
+    },
+]
+
+
+@pytest.fixture(params=["native", "fallback"])
+def build_decoder(request):
+    """分别测试 msgspec 路径与 json/orjson 回退路径"""
+    if request.param == "native":
+        if esi_decode.msgspec is None:
+            pytest.skip("msgspec 未安装")
+        yield esi_decode._build_decoder
+    else:
+        with patch(f'{TARGET_MODULE_PATH}.msgspec', None):
+            yield esi_decode._build_decoder
+
+
+class TestEsiDecode:
+    """esi_decode 测试类"""
+
+    def test_decode_market_orders(self, build_decoder):
+        """测试订单解析为 MarketOrder 且只保留必要字段"""
+        orders = build_decoder(MarketOrder)(json.dumps(ORDERS).encode())
+
+        assert orders == [
+            MarketOrder(order_id=1, type_id=34, location_id=60003760, price=5.5, volume_remain=100,
+                        is_buy_order=False, system_id=30000142),
+            MarketOrder(order_id=2, type_id=34, location_id=60003760, price=4.5, volume_remain=50,
+                        is_buy_order=True, system_id=30000142),
+        ]
+        assert not hasattr(orders[0], "__dict__")
+
+    def test_optional_field_default(self, build_decoder):
+        """测试可选字段缺失时使用默认值"""
+        raw = json.dumps([{
+            "item_id": 1, "type_id": 34, "location_id": 60003760, "location_flag": "Hangar",
+            "location_type": "station", "quantity": 10, "is_singleton": False
+        }]).encode()
+        assets = build_decoder(AssetItem)(raw)
+
+        assert assets[0].is_blueprint_copy is False
+
+    def test_job_without_product_type(self, build_decoder):
+        """测试没有产物的作业"""
+        raw = json.dumps([{
+            "job_id": 1, "activity_id": 5, "blueprint_type_id": 681, "installer_id": 2, "output_location_id": 3,
+            "runs": 1, "status": "active", "end_date": "2025-01-01T00:00:00Z"
+        }]).encode()
+        jobs = build_decoder(IndustryJob)(raw)
+
+        assert jobs[0].product_type_id == 0
+
+    def test_json_loads(self):
+        """测试通用解析"""
+        assert esi_decode.json_loads(b'[1, 2]') == [1, 2]
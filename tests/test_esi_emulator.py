@@ -0,0 +1,130 @@
+"""
+本地 ESI 替身测试用例
+测试替身服务的分页/缓存/错误限额响应头、录制回放，以及 get_request_async 的基础地址切换
+"""
+import json
+
+import pytest
+import pytest_asyncio
+from unittest.mock import patch
+from aiohttp.test_utils import TestServer, TestClient
+
+from benchmark.esi_emulator import EsiEmulator
+from src_v2.model.EVE.eveesi import eveutils
+from src_v2.model.EVE.eveesi.esi_record import ResponseStore
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.eveesi.eveutils'
+
+
+@pytest_asyncio.fixture
+async def make_client():
+    clients = []
+
+    async def _make(emulator: EsiEmulator) -> TestClient:
+        client = TestClient(TestServer(emulator.make_app()))
+        await client.start_server()
+        clients.append(client)
+        return client
+    yield _make
+    for client in clients:
+        await client.close()
+
+
+class TestEsiEmulator:
+    """EsiEmulator 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_paged_orders_headers(self, make_client):
+        """测试市场订单分页与缓存响应头"""
+        client = await make_client(EsiEmulator(order_pages=3))
+
+        resp = await client.get("/latest/markets/10000002/orders/", params={"page": 2})
+        data = await resp.json()
+
+        assert resp.status == 200
+        assert resp.headers["X-Pages"] == "3"
+        for header in ("ETag", "Expires", "Last-Modified", "X-ESI-Error-Limit-Remain"):
+            assert header in resp.headers
+        assert data and "price" in data[0]
+
+    @pytest.mark.asyncio
+    async def test_orders_per_page(self, make_client):
+        """测试可配置每页订单数，用于生成百万级订单"""
+        client = await make_client(EsiEmulator(order_pages=1, orders_per_page=2500))
+
+        resp = await client.get("/markets/10000002/orders/", params={"page": 1})
+
+        assert len(await resp.json()) == 2500
+
+    @pytest.mark.asyncio
+    async def test_out_of_range_page(self, make_client):
+        """测试超出页数返回 404 并消耗错误限额"""
+        client = await make_client(EsiEmulator(order_pages=3))
+
+        resp = await client.get("/markets/10000002/orders/", params={"page": 4})
+
+        assert resp.status == 404
+        assert resp.headers["X-ESI-Error-Limit-Remain"] == "99"
+
+    @pytest.mark.asyncio
+    async def test_if_none_match(self, make_client):
+        """测试 ETag 条件请求返回 304"""
+        client = await make_client(EsiEmulator())
+
+        first = await client.get("/markets/prices/")
+        second = await client.get("/markets/prices/", headers={"If-None-Match": first.headers["ETag"]})
+
+        assert first.status == 200
+        assert second.status == 304
+
+    @pytest.mark.asyncio
+    async def test_error_limit_exhausted(self, make_client):
+        """测试错误限额耗尽后返回 420"""
+        emulator = EsiEmulator(error_rate=1.0)
+        emulator.error_limit_remain = 1
+        client = await make_client(emulator)
+
+        first = await client.get("/markets/prices/")
+        second = await client.get("/markets/prices/")
+
+        assert first.status >= 500
+        assert second.status == 420
+
+    @pytest.mark.asyncio
+    async def test_replay_recorded_response(self, make_client, tmp_path):
+        """测试优先回放录制目录中的响应"""
+        store = ResponseStore(str(tmp_path))
+        store.save(
+            "https://esi.evetech.net/latest/markets/prices/", {"datasource": "tranquility"},
+            200, {"X-Pages": "1", "Content-Type": "application/json; charset=UTF-8"},
+            b'[{"type_id": 34, "adjusted_price": 1.5}]'
+        )
+        client = await make_client(EsiEmulator(record_dir=str(tmp_path)))
+
+        resp = await client.get("/markets/prices/")
+
+        assert await resp.json() == [{"type_id": 34, "adjusted_price": 1.5}]
+
+
+class TestBaseUrlSwitch:
+    """get_request_async 基础地址切换与录制测试类"""
+
+    @pytest.mark.asyncio
+    async def test_request_routed_and_recorded(self, make_client, tmp_path):
+        """测试请求改发到本地替身，且成功响应被录制"""
+        client = await make_client(EsiEmulator(order_pages=2))
+        base_url = str(client.make_url("")).rstrip("/")
+        store = ResponseStore(str(tmp_path))
+
+        with patch(f'{TARGET_MODULE_PATH}.ESI_BASE_URL', base_url), \
+                patch(f'{TARGET_MODULE_PATH}.esi_record_store', store):
+            data, pages, status = await eveutils.get_request_async(
+                "https://esi.evetech.net/latest/markets/10000002/orders/",
+                params={"page": 2, "datasource": "tranquility"}, log=False
+            )
+
+        assert status == 200
+        assert pages == 2
+        recorded = store.load("/markets/10000002/orders/", {"page": 2})
+        assert recorded is not None
+        assert json.loads(recorded[2]) == data
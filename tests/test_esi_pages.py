@@ -0,0 +1,127 @@
+"""
+esi_pages 测试用例
+测试流式分页拉取的窗口控制、提前退出与失败分页
+"""
+import asyncio
+
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from src_v2.core.utils import KahunaException
+from src_v2.model.EVE.eveesi.esi_pages import esi_pages
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.eveesi.esi_pages'
+
+
+class FakePagedEndpoint:
+    """模拟分页ESI函数，记录同时在途的请求数"""
+
+    def __init__(self, pages: int, fail_page: int = None):
+        self.pages = pages
+        self.fail_page = fail_page
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.requested = []
+        self.__name__ = "fake_paged"
+
+    async def __call__(self, region_id, page=1, single_page=False):
+        assert single_page
+        self.requested.append(page)
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(0.001 * (self.pages - page + 1))
+        finally:
+            self.in_flight -= 1
+        if page == self.fail_page:
+            return None, self.pages
+        return [{"page": page, "region_id": region_id}], self.pages
+
+
+@pytest.fixture(autouse=True)
+def mock_progress():
+    with patch(f'{TARGET_MODULE_PATH}.tqdm_manager') as tqdm_manager:
+        tqdm_manager.add_mission = AsyncMock()
+        tqdm_manager.update_mission = AsyncMock()
+        tqdm_manager.complete_mission = AsyncMock()
+        yield tqdm_manager
+
+
+class TestEsiPages:
+    """esi_pages 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_yields_every_page_once(self):
+        """测试每一页都会且只会返回一次"""
+        endpoint = FakePagedEndpoint(pages=20)
+        pages = [page[0]["page"] async for page in esi_pages(endpoint, 10000002, window=4)]
+
+        assert sorted(pages) == list(range(1, 21))
+        assert pages[0] == 1
+
+    @pytest.mark.asyncio
+    async def test_window_bounds_in_flight_requests(self):
+        """测试在途请求数量不超过窗口大小"""
+        endpoint = FakePagedEndpoint(pages=30)
+        async for _ in esi_pages(endpoint, 10000002, window=3):
+            await asyncio.sleep(0)
+
+        assert endpoint.max_in_flight <= 3
+
+    @pytest.mark.asyncio
+    async def test_early_exit_cancels_pending(self):
+        """测试调用方提前退出时不再请求后续分页"""
+        endpoint = FakePagedEndpoint(pages=50)
+        stream = esi_pages(endpoint, 10000002, window=2)
+        async for _ in stream:
+            break
+        await stream.aclose()
+
+        assert len(endpoint.requested) <= 3
+        assert endpoint.in_flight == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_page_raises(self):
+        """测试分页请求失败时抛出异常"""
+        endpoint = FakePagedEndpoint(pages=5, fail_page=3)
+        with pytest.raises(KahunaException):
+            async for _ in esi_pages(endpoint, 10000002, window=2):
+                pass
+
+    @pytest.mark.asyncio
+    async def test_network_error_on_first_page_raises(self):
+        """测试第一页网络错误（get_request_async 返回 []、状态码 0）时抛出异常，不当作空区域"""
+        from src_v2.model.EVE.eveesi.esi_api.market import markets_region_orders
+
+        with patch('src_v2.model.EVE.eveesi.esi_api.market.get_request_async',
+                   AsyncMock(return_value=([], 0, 0))):
+            with pytest.raises(KahunaException):
+                async for _ in esi_pages(markets_region_orders.__wrapped__, 10000002):
+                    pass
+
+    @pytest.mark.asyncio
+    async def test_out_of_range_page_is_failure(self):
+        """测试单页请求返回非 200 时数据为 None"""
+        from src_v2.model.EVE.eveesi.esi_api.market import markets_region_orders
+
+        with patch('src_v2.model.EVE.eveesi.esi_api.market.get_request_async',
+                   AsyncMock(return_value=([], 0, 404))):
+            assert await markets_region_orders.__wrapped__(10000002, page=2, single_page=True) == (None, 1)
+
+    @pytest.mark.asyncio
+    async def test_awaitable_token_resolved_once(self):
+        """测试协程形式的 access_token 只解析一次并复用"""
+        seen_tokens = []
+
+        async def fake_with_token(access_token, character_id, page=1, single_page=False):
+            seen_tokens.append(access_token)
+            return [page], 3
+        fake_with_token.__name__ = "fake_with_token"
+
+        async def token():
+            return "token-value"
+
+        pages = [page async for page in esi_pages(fake_with_token, token(), 1)]
+
+        assert len(pages) == 3
+        assert seen_tokens == ["token-value"] * 3
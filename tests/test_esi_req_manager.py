@@ -0,0 +1,259 @@
+"""
+EsiReqManager 测试用例
+测试 esi_request 装饰器的请求合并（single-flight）与 Redis 共享令牌桶
+"""
+import asyncio
+
+import jwt
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from src_v2.model.EVE.eveesi import esi_req_manager
+from src_v2.model.EVE.eveesi.esi_req_manager import esi_request, esi_manager
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.eveesi.esi_req_manager'
+
+
+def make_token(character_id: int) -> str:
+    """构造带 sub 的测试 token"""
+    return jwt.encode({"sub": f"CHARACTER:EVE:{character_id}", "nonce": character_id}, "secret", algorithm="HS256")
+
+
+async def run_immediately(req):
+    """替代队列，直接执行请求"""
+    async def _run():
+        try:
+            req.future.set_result(await req.func())
+        except Exception as e:
+            req.future.set_exception(e)
+    asyncio.create_task(_run())
+
+
+@pytest.fixture(autouse=True)
+def clean_manager():
+    esi_manager.inflight_requests.clear()
+    esi_manager.result_cache.clear()
+    with patch.object(esi_manager, 'add_request', side_effect=run_immediately):
+        yield
+    esi_manager.inflight_requests.clear()
+    esi_manager.result_cache.clear()
+
+
+class TestEsiRequestCoalesce:
+    """esi_request 请求合并测试类"""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_identical_calls_share_one_request(self):
+        """测试并发的相同请求只执行一次"""
+        calls = []
+
+        @esi_request
+        async def fake_prices(log=True):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return [{"type_id": 34}]
+
+        results = await asyncio.gather(fake_prices(), fake_prices(log=False), fake_prices())
+
+        assert len(calls) == 1
+        assert results[0] is results[1] is results[2]
+        assert not esi_manager.inflight_requests
+
+    @pytest.mark.asyncio
+    async def test_different_arguments_not_coalesced(self):
+        """测试参数不同的请求不会被合并"""
+        calls = []
+
+        @esi_request
+        async def fake_orders(region_id: int, page: int = 1, log=True):
+            calls.append((region_id, page))
+            await asyncio.sleep(0.01)
+            return [region_id, page]
+
+        await asyncio.gather(fake_orders(1), fake_orders(1, page=2), fake_orders(2))
+
+        assert sorted(calls) == [(1, 1), (1, 2), (2, 1)]
+
+    @pytest.mark.asyncio
+    async def test_access_token_grouped_by_identity(self):
+        """测试 access_token 按身份区分，相同身份不同 token 也会合并"""
+        calls = []
+
+        @esi_request
+        async def fake_blueprints(access_token, corporation_id: int, log=True):
+            calls.append(access_token)
+            await asyncio.sleep(0.01)
+            return [corporation_id]
+
+        async def awaitable_token():
+            return make_token(1)
+
+        await asyncio.gather(
+            fake_blueprints(make_token(1), 100),
+            fake_blueprints(awaitable_token(), 100),
+            fake_blueprints(make_token(2), 100),
+        )
+
+        assert len(calls) == 2
+        assert all(isinstance(token, str) for token in calls)
+
+    @pytest.mark.asyncio
+    async def test_result_ttl_cache(self):
+        """测试结果短期缓存"""
+        calls = []
+
+        @esi_request(result_ttl=60)
+        async def fake_systems(log=True):
+            calls.append(1)
+            return [{"solar_system_id": 30000142}]
+
+        first = await fake_systems()
+        second = await fake_systems()
+
+        assert len(calls) == 1
+        assert first is second
+
+    @pytest.mark.asyncio
+    async def test_failed_result_not_cached(self):
+        """测试失败结果不会被缓存"""
+        calls = []
+
+        @esi_request(result_ttl=60)
+        async def fake_systems(log=True):
+            calls.append(1)
+            return None
+
+        await fake_systems()
+        await fake_systems()
+
+        assert len(calls) == 2
+
+    @pytest.mark.asyncio
+    async def test_exception_propagated_to_all_waiters(self):
+        """测试异常会传播给所有合并的调用方"""
+        @esi_request
+        async def fake_fail(log=True):
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        with patch(f'{TARGET_MODULE_PATH}.logger'):
+            results = await asyncio.gather(fake_fail(), fake_fail(), return_exceptions=True)
+
+        assert all(isinstance(r, ValueError) for r in results)
+
+    @pytest.mark.asyncio
+    async def test_coalesce_disabled(self):
+        """测试关闭合并后每次调用都会执行"""
+        calls = []
+
+        @esi_request(coalesce=False)
+        async def fake_verify(access_token, log=True):
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {}
+
+        token = make_token(1)
+        await asyncio.gather(fake_verify(token), fake_verify(token))
+
+        assert len(calls) == 2
+
+    def test_unhashable_argument_skips_coalesce(self):
+        """测试无法规范化的参数不参与合并"""
+        def fake(obj, log=True):
+            pass
+
+        import inspect
+        bound = inspect.signature(fake).bind(object())
+        bound.apply_defaults()
+        assert esi_req_manager.build_request_key(fake, bound) is None
+
+
+class TestRedisTokenBucket:
+    """Redis 共享令牌桶测试类"""
+
+    @pytest.fixture
+    def fake_redis(self):
+        fakeredis = pytest.importorskip("fakeredis")
+        pytest.importorskip("lupa")
+        return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+    @pytest.fixture
+    def manager(self, fake_redis):
+        manager = esi_req_manager.EsiReqManager()
+        manager.redis_bucket = esi_req_manager.RedisTokenBucket(
+            fake_redis, "test:esi_bucket", manager.token_generation_rate, manager.max_token_pool
+        )
+        manager.prefetch_tokens = 120
+        return manager
+
+    @pytest.mark.asyncio
+    async def test_take_respects_capacity(self, fake_redis):
+        """测试共享令牌池不超过最大容量"""
+        bucket = esi_req_manager.RedisTokenBucket(fake_redis, "test:cap", 300, 600)
+        await fake_redis.hset("test:cap", mapping={"tokens": 0, "ts": 0})
+
+        granted, tokens = await bucket.take(10000, 1)
+
+        assert granted == 600
+        assert tokens == pytest.approx(0, abs=1)
+
+    @pytest.mark.asyncio
+    async def test_min_take_not_met(self, fake_redis):
+        """测试可用令牌少于最少获取数量时不扣除"""
+        bucket = esi_req_manager.RedisTokenBucket(fake_redis, "test:min", 300, 600)
+
+        granted, _ = await bucket.take(100, 100)
+
+        assert granted == 0
+
+    @pytest.mark.asyncio
+    async def test_prefetch_reduces_round_trips(self, manager, fake_redis):
+        """测试本地预取后小请求无需访问 Redis"""
+        await fake_redis.hset("test:esi_bucket", mapping={"tokens": 600, "ts": 9999999999})
+
+        assert await manager.get_tokens(60)
+        assert manager.prefetched_tokens == 60
+        remaining = float(await fake_redis.hget("test:esi_bucket", "tokens"))
+
+        assert await manager.get_tokens(60)
+        assert manager.prefetched_tokens == 0
+        assert float(await fake_redis.hget("test:esi_bucket", "tokens")) == remaining
+
+    @pytest.mark.asyncio
+    async def test_two_managers_share_budget(self, fake_redis):
+        """测试两个进程（管理器）共享同一份令牌预算"""
+        managers = []
+        for _ in range(2):
+            m = esi_req_manager.EsiReqManager()
+            m.redis_bucket = esi_req_manager.RedisTokenBucket(fake_redis, "test:shared", 300, 600)
+            m.prefetch_tokens = 60
+            managers.append(m)
+        await fake_redis.hset("test:shared", mapping={"tokens": 120, "ts": 9999999999})
+
+        assert await managers[0].get_tokens(60)
+        assert await managers[1].get_tokens(60)
+        assert not await managers[0].get_tokens(60)
+
+    @pytest.mark.asyncio
+    async def test_penalty_shared_and_clears_prefetch(self, manager, fake_redis):
+        """测试错误惩罚作用于共享令牌池并清空本地预取"""
+        await fake_redis.hset("test:esi_bucket", mapping={"tokens": 600, "ts": 9999999999})
+        await manager.get_tokens(10)
+        assert manager.prefetched_tokens > 0
+
+        with patch.object(manager, 'logger'):
+            await manager.deduct_error_penalty(220)
+
+        assert manager.prefetched_tokens == 0
+        assert float(await fake_redis.hget("test:esi_bucket", "tokens")) == pytest.approx(600 - 120 - 220, abs=1)
+
+    @pytest.mark.asyncio
+    async def test_fallback_to_local_on_redis_error(self, manager):
+        """测试 Redis 异常时回退到进程内令牌池"""
+        manager.redis_bucket.take = AsyncMock(side_effect=ConnectionError("down"))
+        manager.token_pool = 600
+
+        with patch.object(manager, 'logger'):
+            assert await manager.get_tokens(60)
+
+        assert manager.token_pool <= 600 - 60 + 1
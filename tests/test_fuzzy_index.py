@@ -0,0 +1,119 @@
+"""
+名称模糊搜索索引测试用例
+测试 n-gram 候选剪枝、与逐个比较结果一致、中文名称检索，以及 SdeUtils 按 SDE 版本重建索引、更新后清空名称缓存
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+from rapidfuzz import fuzz, process
+from rapidfuzz.utils import default_process
+
+from src_v2.model.EVE.sde.fuzzy_index import FuzzyIndex, FUZZY_NGRAM_ZH, ngrams, normalize
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.sde.utils'
+
+NAMES = [
+    "Large Shield Extender II", "Large Shield Extender I", "Medium Shield Extender II",
+    "Hobgoblin II", "Hobgoblin I", "Hammerhead II", "Ogre II",
+    "Medium Armor Repairer II", "Large Armor Repairer II", "Warp Scrambler II",
+    "Warp Disruptor II", "Capital Cap Battery I", "Nanofiber Internal Structure II",
+]
+
+
+def brute_force(query, names, limit):
+    """逐个比较的参考结果"""
+    result = process.extract(query, names, scorer=fuzz.token_sort_ratio, processor=default_process, limit=limit)
+    return [name for name, _, _ in result]
+
+
+class TestFuzzyIndex:
+    """FuzzyIndex 测试类"""
+
+    def test_normalize_sorts_tokens(self):
+        """测试归一化后按词排序"""
+        assert normalize("Shield-Extender  LARGE") == "extender large shield"
+        assert ngrams("ab", 3) == {" ab", "ab "}
+
+    @pytest.mark.parametrize("query", ["large shield extendr", "hobgoblin", "armor reparer", "warp scram", "ii ogre"])
+    def test_matches_brute_force(self, query):
+        """测试剪枝后结果与全量比较一致"""
+        index = FuzzyIndex(NAMES)
+
+        assert [name for name, _ in index.extract(query, 3)] == brute_force(query, NAMES, 3)
+
+    def test_candidates_are_pruned(self):
+        """测试只对有 n-gram 重合的少量候选打分"""
+        index = FuzzyIndex(NAMES)
+        candidates = index.candidates(normalize("hobgoblin"), max_candidates=4)
+
+        assert len(candidates) <= 4
+        assert {index.names[i] for i in candidates} >= {"Hobgoblin I", "Hobgoblin II"}
+        assert list(candidates) == sorted(candidates)
+
+    def test_no_overlap_falls_back_to_full_scan(self):
+        """测试有重合的候选不足时退回全量打分"""
+        index = FuzzyIndex(NAMES)
+
+        assert len(index.extract("zzzz", 2)) == 2
+        assert index.extract("", 2) == []
+
+    def test_chinese_names(self):
+        """测试中文名称使用二元组检索"""
+        index = FuzzyIndex(["大型护盾扩展装置 II", "中型护盾扩展装置 II", "地精 II", "裂谷级"], FUZZY_NGRAM_ZH)
+
+        assert index.extract("大型护盾扩展", 1)[0][0] == "大型护盾扩展装置 II"
+        assert index.extract("地精", 1)[0][0] == "地精 II"
+
+    def test_duplicates_and_empty_names(self):
+        """测试重复与空名称只保留一份"""
+        index = FuzzyIndex(["Ogre II", "Ogre II", None, ""])
+
+        assert len(index) == 1
+
+
+class TestSdeUtilsFuzz:
+    """SdeUtils 模糊搜索测试类"""
+
+    @pytest.mark.asyncio
+    async def test_index_built_once_per_version(self):
+        """测试索引只构建一次，SDE 快照版本变化后重建"""
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        loader = AsyncMock(return_value=NAMES)
+        snapshot = type("Snapshot", (), {"version": 1})()
+        with patch(f'{TARGET_MODULE_PATH}._fuzzy_indexes', {}), \
+                patch(f'{TARGET_MODULE_PATH}._snapshot', snapshot), \
+                patch.object(SdeUtils, '_get_invtype_name_list', loader):
+            assert await SdeUtils.fuzz_type("hobgoblin ii", 2) == ["Hobgoblin II", "Hobgoblin I"]
+            await SdeUtils.fuzz_en_type("ogre")
+            assert loader.await_count == 1
+
+            snapshot.version = 2
+            await SdeUtils.fuzz_en_type("ogre")
+            assert loader.await_count == 2
+
+    @pytest.mark.asyncio
+    async def test_reload_clears_name_lists_and_index(self):
+        """测试 SDE 更新后重新加载快照，名称列表全局变量、@cached 缓存与索引一并清空"""
+        from src_v2.model.EVE.sde import utils
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        session = AsyncMock()
+        session.execute = AsyncMock(return_value=[("New Name",)])
+        session.__aenter__.return_value = session
+        db_manager = AsyncMock()
+        db_manager.get_readonly_session = lambda: session
+        snapshot = type("Snapshot", (), {"version": 2, "path": "/snapshot/sde-2.snap"})()
+        with patch(f'{TARGET_MODULE_PATH}._fuzzy_indexes', {("invtype", False): object()}) as indexes, \
+                patch(f'{TARGET_MODULE_PATH}._en_invtype_name_list', ["Old Name"]), \
+                patch(f'{TARGET_MODULE_PATH}._snapshot', None), \
+                patch(f'{TARGET_MODULE_PATH}.get_db_manager', AsyncMock(return_value=db_manager)), \
+                patch.object(utils.SdeSnapshot, 'open_latest', return_value=snapshot), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            assert await SdeUtils._get_invtype_name_list(zh=False) == ["Old Name"]
+
+            assert await SdeUtils.reload_sde() is snapshot
+
+            assert utils._snapshot is snapshot
+            assert indexes == {}
+            assert await SdeUtils._get_invtype_name_list(zh=False) == ["New Name"]
+            await SdeUtils.clear_caches()
@@ -0,0 +1,113 @@
+"""
+市场历史存储测试用例
+测试条件请求刷新流程与 get_request_async 的 304 处理
+"""
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from unittest.mock import patch, AsyncMock
+from aiohttp.test_utils import TestServer, TestClient
+
+from benchmark.esi_emulator import EsiEmulator
+from src_v2.model.EVE.eveesi import eveutils
+from src_v2.model.EVE.market.market_history import MarketHistoryManager
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.market.market_history'
+
+
+@pytest_asyncio.fixture
+async def emulator_client():
+    client = TestClient(TestServer(EsiEmulator().make_app()))
+    await client.start_server()
+    yield client
+    await client.close()
+
+
+class TestConditionalRequest:
+    """条件请求测试类"""
+
+    @pytest.mark.asyncio
+    async def test_etag_round_trip(self, emulator_client):
+        """测试首次请求返回 ETag，带 If-None-Match 再次请求返回 304"""
+        base_url = str(emulator_client.make_url("")).rstrip("/")
+        url = "https://esi.evetech.net/markets/10000002/history/"
+
+        with patch('src_v2.model.EVE.eveesi.eveutils.ESI_BASE_URL', base_url):
+            meta = {}
+            data, _, status = await eveutils.get_request_async(url, params={"type_id": 34}, response_meta=meta)
+            again_meta = {}
+            again, _, again_status = await eveutils.get_request_async(
+                url, headers={"If-None-Match": meta["ETag"]}, params={"type_id": 34}, response_meta=again_meta
+            )
+
+        assert status == 200 and data
+        assert "Expires" in meta
+        assert again_status == 304
+        assert again is None
+        assert again_meta["ETag"] == meta["ETag"]
+
+
+class TestMarketHistoryManager:
+    """MarketHistoryManager 测试类"""
+
+    @pytest.fixture
+    def db(self):
+        with patch(f'{TARGET_MODULE_PATH}.EveMarketHistoryRefreshDBUtils') as refresh_utils, \
+                patch(f'{TARGET_MODULE_PATH}.EveMarketHistoryDBUtils') as history_utils, \
+                patch(f'{TARGET_MODULE_PATH}.EveMarketHistoryStatsDBUtils') as stats_utils, \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            history_utils.upsert_history_rows = AsyncMock()
+            refresh_utils.upsert_states = AsyncMock()
+            stats_utils.refresh_stats = AsyncMock()
+            yield SimpleNamespace(refresh=refresh_utils, history=history_utils, stats=stats_utils)
+
+    @pytest.mark.asyncio
+    async def test_refresh_skips_unexpired_and_handles_304(self, db):
+        """测试未过期物品不请求，304 只更新状态，变化的物品写入历史并重算统计"""
+        now = datetime.now(timezone.utc)
+        db.refresh.select_by_type_ids = AsyncMock(return_value={
+            34: SimpleNamespace(etag='"a"', expires=now + timedelta(hours=1), refresh_time=now),
+            35: SimpleNamespace(etag='"b"', expires=now - timedelta(hours=1), refresh_time=now - timedelta(days=1)),
+        })
+        history = [
+            {"date": (now - timedelta(days=d)).date().isoformat(), "average": 5.0, "highest": 6.0,
+             "lowest": 4.0, "order_count": 10, "volume": 100}
+            for d in range(30)
+        ]
+
+        async def fake_history(region_id, type_id, etag=None, log=True):
+            if type_id == 35:
+                assert etag == '"b"'
+                return None, 304, {"ETag": '"b"'}
+            return history, 200, {"ETag": '"c"', "Expires": "Sat, 17 Oct 2026 11:05:00 GMT"}
+
+        with patch(f'{TARGET_MODULE_PATH}.eveesi.markets_region_history_conditional', side_effect=fake_history) as api:
+            summary = await MarketHistoryManager().refresh_region_history(10000002, [34, 35, 36])
+
+        assert api.call_count == 2
+        assert summary == {"requested": 2, "changed": 1, "not_modified": 1, "failed": 0}
+        rows = db.history.upsert_history_rows.call_args.args[0]
+        assert len(rows) == 30 and all(r["type_id"] == 36 for r in rows)
+        states = db.refresh.upsert_states.call_args.args[0]
+        assert {s["type_id"]: s["etag"] for s in states} == {35: '"b"', 36: '"c"'}
+        db.stats.refresh_stats.assert_awaited_once_with(10000002, [36])
+
+    @pytest.mark.asyncio
+    async def test_known_type_only_writes_recent_days(self, db):
+        """测试已有历史的物品只写入最近几天"""
+        now = datetime.now(timezone.utc)
+        db.refresh.select_by_type_ids = AsyncMock(return_value={
+            34: SimpleNamespace(etag='"a"', expires=None, refresh_time=now - timedelta(days=1)),
+        })
+        history = [{"date": (now - timedelta(days=d)).date().isoformat(), "average": 1, "volume": 1}
+                   for d in range(400)]
+
+        with patch(f'{TARGET_MODULE_PATH}.eveesi.markets_region_history_conditional',
+                   AsyncMock(return_value=(history, 200, {}))):
+            await MarketHistoryManager().refresh_region_history(10000002, [34])
+
+        rows = db.history.upsert_history_rows.call_args.args[0]
+        assert len(rows) <= 5
+        assert db.refresh.upsert_states.call_args.args[0][0]["etag"] == '"a"'
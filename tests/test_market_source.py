@@ -0,0 +1,110 @@
+"""
+多市场数据源测试用例
+测试市场注册表、同区域多贸易中心共享一次拉取，以及多市场批量价格查询
+"""
+import time
+
+import pytest
+from unittest.mock import patch
+
+from src_v2.core.database.connect_manager import redis_manager
+from src_v2.core.utils import KahunaException
+from src_v2.model.EVE.eveesi.esi_decode import MarketOrder
+from src_v2.model.EVE.market.market_source import MarketSource, MarketSourceRegistry, NPC_HUBS
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.market.market_manager'
+JITA = 60003760
+PERIMETER = 1028858195912
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch.object(redis_manager, '_redis', fake):
+        yield fake
+
+
+@pytest.fixture
+def market_manager_module():
+    try:
+        from src_v2.model.EVE.market import market_manager
+    except KeyError:
+        pytest.skip("market_manager 依赖 config.toml 中的 [EVE] 配置")
+    return market_manager
+
+
+class TestMarketSourceRegistry:
+    """MarketSourceRegistry 测试类"""
+
+    def test_register_and_get(self):
+        """测试注册与查询"""
+        registry = MarketSourceRegistry()
+        registry.register(NPC_HUBS[1])
+
+        assert registry.get("amarr").location_ids == (60008494,)
+        with pytest.raises(KahunaException):
+            registry.get("jita")
+
+    def test_region_source_requires_location(self):
+        """测试 NPC 贸易中心必须配置区域与空间站"""
+        with pytest.raises(KahunaException):
+            MarketSourceRegistry().register(MarketSource("bad", region_id=10000002))
+
+    def test_refresh_ttl_follows_expires(self):
+        """测试刷新标记优先使用订单响应的 Expires，缺失时使用 refresh_seconds，过近时不低于下限"""
+        from email.utils import formatdate
+        from src_v2.model.EVE.eveesi.eveutils import expires_in
+        from src_v2.model.EVE.market.market_source import MIN_REFRESH_SECONDS
+
+        source = MarketSource("jita", region_id=10000002, location_ids=(JITA,), refresh_seconds=14400)
+
+        assert 295 <= source.refresh_ttl(expires_in({"Expires": formatdate(time.time() + 300, usegmt=True)})) <= 300
+        assert source.refresh_ttl(expires_in({})) == 14400
+        assert source.refresh_ttl(expires_in({"Expires": "invalid"})) == 14400
+        assert source.refresh_ttl(expires_in({"Expires": formatdate(time.time() - 30, usegmt=True)})) == MIN_REFRESH_SECONDS
+
+    def test_structure_source(self):
+        """测试玩家建筑数据源使用建筑 id 作为订单簿编号"""
+        source = MarketSource("frt", structure_id=1035466617946, character_id=1)
+
+        assert source.is_structure
+        assert source.book_id == 1035466617946
+        assert source.price_prefix == "market_price:frt"
+
+
+class TestMultiHubRefresh:
+    """多市场刷新测试类"""
+
+    @pytest.mark.asyncio
+    async def test_same_region_hubs_share_one_pull(self, fake_redis, market_manager_module, tmp_path):
+        """测试同一区域的两个市场只拉取一次区域订单，且可一次批量查询"""
+        registry = MarketSourceRegistry()
+        registry.register(MarketSource("jita", region_id=10000002, location_ids=(JITA,)))
+        registry.register(MarketSource("perimeter", region_id=10000002, location_ids=(PERIMETER,)))
+        calls = []
+
+        async def fake_pages(func, *args, **kwargs):
+            calls.append(args)
+            yield [
+                MarketOrder(1, 34, JITA, 5.0, 100, False),
+                MarketOrder(2, 34, JITA, 4.0, 100, True),
+                MarketOrder(3, 34, PERIMETER, 4.8, 10, False),
+            ]
+
+        manager = market_manager_module.MarketManager.__new__(market_manager_module.MarketManager)
+        manager.__init__()
+        with patch(f'{TARGET_MODULE_PATH}.market_source_registry', registry), \
+                patch(f'{TARGET_MODULE_PATH}.eveesi.esi_pages', fake_pages), \
+                patch(f'{TARGET_MODULE_PATH}.OrderBookSnapshot.default_path',
+                      side_effect=lambda book_id: str(tmp_path / f"{book_id}.npz")), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            await manager.refresh_markets()
+            await manager.refresh_markets()
+            prices = await manager.get_hub_prices([34, 35])
+
+        assert len(calls) == 1
+        assert prices["jita"][34] == {"max_buy": 4.0, "min_sell": 5.0}
+        assert prices["perimeter"][34] == {"max_buy": None, "min_sell": 4.8}
+        assert prices["perimeter"][35] == {"max_buy": None, "min_sell": None}
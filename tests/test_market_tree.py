@@ -0,0 +1,149 @@
+"""
+市场树测试用例
+测试市场树导出的构建与按版本缓存、从缓存读取子节点以及批量导入流程
+"""
+import importlib
+from contextlib import nullcontext
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src_v2.core.config.config import config
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.industry.industry_utils.market_tree'
+
+GROUP_ROWS = [
+    {"market_group_id": 4, "has_types": 0, "icon_id": 1, "name_id": "Ships", "name_id_zh": "舰船", "parent_group_id": None},
+    {"market_group_id": 391, "has_types": 1, "icon_id": 2, "name_id": "Frigates", "name_id_zh": "护卫舰", "parent_group_id": 4},
+]
+TYPE_ROWS = [
+    {"type_id": 587, "type_name": "Rifter", "type_name_zh": "裂谷级", "meta_group_name": "Tech I",
+     "category_name": "Ship", "category_name_zh": "舰船", "bp_id": 691, "market_group_id": 391},
+    {"type_id": 588, "type_name": "Reaper", "type_name_zh": "死神级", "meta_group_name": "Tech I",
+     "category_name": "Ship", "category_name_zh": "舰船", "bp_id": None, "market_group_id": 391},
+]
+
+
+@pytest.fixture(scope="module")
+def market_tree():
+    """导入市场树模块；industry_utils 导入链会读取 [EVE]、[ESI] 配置，缺少时临时补上空配置"""
+    missing = {section: {} for section in ("EVE", "ESI") if section not in config}
+    if "EVE" in missing:
+        missing["EVE"] = {"CLIENT_ID": ""}
+    with patch.dict(config._data, missing) if missing else nullcontext():
+        return importlib.import_module(TARGET_MODULE_PATH)
+
+
+@pytest.fixture(autouse=True)
+def reset_cache(market_tree):
+    market_tree._market_tree_export = None
+    market_tree._market_tree_rows = None
+    market_tree._market_tree_version_checked_at = 0.0
+    yield
+    market_tree._market_tree_export = None
+    market_tree._market_tree_rows = None
+
+
+class TestMarketTreeExport:
+    """市场树导出测试类"""
+
+    def test_build_export(self, market_tree):
+        """测试按父节点分组，节点字段与原逐层查询一致"""
+        export = market_tree.build_market_tree_export(GROUP_ROWS, TYPE_ROWS, 3000000)
+
+        assert export["version"] == 3000000
+        root = export["children"]["root"]
+        assert [node["market_group_id"] for node in root] == [4]
+        assert root[0]["name"] == "舰船" and root[0]["row_id"] == 4 and root[0]["hasChildren"] is True
+        assert export["children"][4][0]["market_group_id"] == 391
+        types = export["children"][391]
+        assert [node["row_id"] for node in types] == [587, 588]
+        assert types[0]["can_add_plan"] is True and types[1]["can_add_plan"] is False
+        assert types[0]["hasChildren"] is False and "market_group_id" not in types[0]
+
+    @pytest.mark.asyncio
+    async def test_get_market_tree_from_cache(self, market_tree):
+        """测试同一 SDE 版本只构建一次，缓存有效期内不再查询版本，子节点查询不访问 Neo4j"""
+        get_market_tree = market_tree.get_market_tree
+        with patch(f'{TARGET_MODULE_PATH}.SdeUtils') as mock_sde, \
+                patch(f'{TARGET_MODULE_PATH}.load_market_tree_rows',
+                      AsyncMock(return_value=(GROUP_ROWS, TYPE_ROWS))) as mock_load, \
+                patch(f'{TARGET_MODULE_PATH}.get_market_tree_from_neo4j', AsyncMock()) as mock_neo4j, \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_sde.get_build_number = AsyncMock(return_value=3000000)
+
+            assert [node["row_id"] for node in await get_market_tree("root")] == [4]
+            assert [node["row_id"] for node in await get_market_tree("391")] == [587, 588]
+            assert await get_market_tree(587) == []
+            mock_sde.get_build_number.assert_awaited_once()
+
+            # 有效期过后重新确认版本，版本变化时重建
+            market_tree._market_tree_version_checked_at -= market_tree.MARKET_TREE_VERSION_TTL
+            mock_sde.get_build_number = AsyncMock(return_value=3000001)
+            await get_market_tree("root")
+
+        assert mock_load.await_count == 2
+        mock_neo4j.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_fallback_to_neo4j_without_version(self, market_tree):
+        """测试 SDE 没有版本信息时退回 Neo4j 查询"""
+        with patch(f'{TARGET_MODULE_PATH}.SdeUtils') as mock_sde, \
+                patch(f'{TARGET_MODULE_PATH}.get_market_tree_from_neo4j', AsyncMock(return_value=[])) as mock_neo4j:
+            mock_sde.get_build_number = AsyncMock(return_value=None)
+
+            assert await market_tree.get_market_tree("root") == []
+
+        mock_neo4j.assert_awaited_once_with("root")
+
+
+class TestMarketTreeImport:
+    """市场树批量导入测试类"""
+
+    @pytest.mark.asyncio
+    async def test_skip_when_version_unchanged(self, market_tree):
+        """测试版本标记与 SDE 版本相同时跳过导入"""
+        with patch(f'{TARGET_MODULE_PATH}.SdeUtils') as mock_sde, \
+                patch(f'{TARGET_MODULE_PATH}.NIU') as mock_niu, \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_sde.get_build_number = AsyncMock(return_value=3000000)
+            mock_niu.get_graph_version = AsyncMock(return_value=3000000)
+            mock_niu.batch_merge_nodes = AsyncMock()
+
+            assert await market_tree.MarketTree.init_market_tree() is False
+            assert await market_tree.MarketTree.link_type_to_market_group() is False
+
+        mock_niu.batch_merge_nodes.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_bulk_import(self, market_tree):
+        """测试市场组与物品批量写入共用一次读取，最后清理过期数据并写入版本标记"""
+        MarketTree = market_tree.MarketTree
+        with patch(f'{TARGET_MODULE_PATH}.SdeUtils') as mock_sde, \
+                patch(f'{TARGET_MODULE_PATH}.NIU') as mock_niu, \
+                patch(f'{TARGET_MODULE_PATH}.load_market_tree_rows',
+                      AsyncMock(return_value=(GROUP_ROWS, TYPE_ROWS))) as mock_load, \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_sde.get_build_number = AsyncMock(return_value=3000001)
+            mock_niu.get_graph_version = AsyncMock(return_value=3000000)
+            mock_niu.ensure_constraints = AsyncMock()
+            mock_niu.batch_merge_nodes = AsyncMock(return_value=2)
+            mock_niu.batch_merge_relations = AsyncMock(return_value=1)
+            mock_niu.delete_stale = AsyncMock(return_value=0)
+            mock_niu.set_graph_version = AsyncMock()
+
+            assert await MarketTree.init_market_tree() is True
+            mock_niu.set_graph_version.assert_not_awaited()
+            assert await MarketTree.link_type_to_market_group() is True
+
+        assert [[model.__name__ for model in call.args] for call in mock_niu.ensure_constraints.await_args_list] == \
+               [["MarketGroup", "GraphVersion"], ["Type", "MarketGroup", "GraphVersion"]]
+        group_call, type_call = mock_niu.batch_merge_nodes.await_args_list
+        assert group_call.args[:2] == ("MarketGroup", ["market_group_id"])
+        assert all("parent_group_id" not in row and row["sde_version"] == 3000001 for row in group_call.args[2])
+        assert type_call.args[:2] == ("Type", ["type_id"])
+        group_links = mock_niu.batch_merge_relations.await_args_list[0].args[6]
+        assert group_links == [{"child": 391, "parent": 4, "sde_version": 3000001}]
+        assert mock_niu.delete_stale.await_count == 3
+        mock_niu.set_graph_version.assert_awaited_once_with(market_tree.MARKET_TREE_GRAPH_NAME, 3000001)
+        mock_load.assert_awaited_once()
@@ -0,0 +1,105 @@
+"""
+Neo4j 模型管理器测试用例
+测试唯一性约束创建前删除旧索引、每条语句独立事务以及约束缺失时抛出异常
+"""
+from contextlib import asynccontextmanager
+
+import pytest
+from unittest.mock import patch
+
+from src_v2.core.database.neo4j_model_manager import Neo4jModelManager
+from src_v2.core.database.neo4j_models import Blueprint, GraphVersion, MarketGroup, Type
+from src_v2.core.utils import KahunaException
+
+TARGET_MODULE_PATH = 'src_v2.core.database.neo4j_model_manager'
+
+
+class FakeResult:
+    def __init__(self, records):
+        self.records = records
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for record in self.records:
+            yield record
+
+
+class FakeNeo4j:
+    """每个事务单独记录执行的语句，fail_on 中的约束创建失败"""
+
+    def __init__(self, fail_on=()):
+        self.transactions = []
+        self.constraints = set()
+        self.fail_on = set(fail_on)
+
+    @asynccontextmanager
+    async def get_transaction(self):
+        statements = []
+        self.transactions.append(statements)
+        yield FakeTx(self, statements)
+
+    @asynccontextmanager
+    async def get_session(self):
+        yield self
+
+    async def run(self, query):
+        assert query == "SHOW CONSTRAINTS YIELD name"
+        return FakeResult([{"name": name} for name in sorted(self.constraints)])
+
+
+class FakeTx:
+    def __init__(self, neo4j, statements):
+        self.neo4j = neo4j
+        self.statements = statements
+
+    async def run(self, query):
+        query = " ".join(query.split())
+        self.statements.append(query)
+        if query.startswith("CREATE CONSTRAINT"):
+            name = query.split()[2]
+            if name in self.neo4j.fail_on:
+                raise RuntimeError("equivalent index already exists")
+            self.neo4j.constraints.add(name)
+
+
+class TestEnsureConstraints:
+    """唯一性约束测试类"""
+
+    @pytest.mark.asyncio
+    async def test_drop_legacy_index_before_constraint(self):
+        """测试先删除同属性的旧 RANGE 索引，再在独立事务中创建约束"""
+        neo4j = FakeNeo4j()
+        with patch(f'{TARGET_MODULE_PATH}.neo4j_manager', neo4j), patch(f'{TARGET_MODULE_PATH}.logger'):
+            await Neo4jModelManager().ensure_constraints(Blueprint, GraphVersion)
+
+        assert neo4j.transactions == [
+            ["DROP INDEX blueprint_type_id_index IF EXISTS"],
+            ["CREATE CONSTRAINT blueprint_type_id_unique IF NOT EXISTS FOR (n:Blueprint) REQUIRE n.type_id IS UNIQUE"],
+            ["DROP INDEX graphversion_name_index IF EXISTS"],
+            ["CREATE CONSTRAINT graphversion_name_unique IF NOT EXISTS FOR (n:GraphVersion) REQUIRE n.name IS UNIQUE"],
+        ]
+
+    @pytest.mark.asyncio
+    async def test_failure_does_not_block_other_models_and_raises(self):
+        """测试一个约束失败时其他模型的约束照常创建，最后因约束缺失抛出异常"""
+        neo4j = FakeNeo4j(fail_on={"blueprint_type_id_unique"})
+        with patch(f'{TARGET_MODULE_PATH}.neo4j_manager', neo4j), patch(f'{TARGET_MODULE_PATH}.logger'):
+            with pytest.raises(KahunaException, match="blueprint_type_id_unique"):
+                await Neo4jModelManager().ensure_constraints(Blueprint, GraphVersion)
+
+        assert neo4j.constraints == {"graphversion_name_unique"}
+
+    @pytest.mark.asyncio
+    async def test_market_tree_models_drop_legacy_indexes(self):
+        """测试市场组与物品节点同样先删除旧版本的 RANGE 索引"""
+        neo4j = FakeNeo4j()
+        with patch(f'{TARGET_MODULE_PATH}.neo4j_manager', neo4j), patch(f'{TARGET_MODULE_PATH}.logger'):
+            await Neo4jModelManager().ensure_constraints(MarketGroup, Type)
+
+        assert [statements[0] for statements in neo4j.transactions[::2]] == [
+            "DROP INDEX marketgroup_market_group_id_index IF EXISTS",
+            "DROP INDEX type_type_id_index IF EXISTS",
+        ]
+        assert neo4j.constraints == {"marketgroup_market_group_id_unique", "type_type_id_unique"}
@@ -0,0 +1,196 @@
+"""
+列式订单簿测试用例
+测试买入成本/卖出收入的向量化计算、分段累计精度、深度查询与快照保存加载
+"""
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from src_v2.model.EVE.eveesi.esi_decode import MarketOrder
+from src_v2.model.EVE.market.order_book import OrderBookBuilder, OrderBookSnapshot
+
+
+def make_orders(count: int, seed: int = 0) -> list[MarketOrder]:
+    rng = random.Random(seed)
+    return [
+        MarketOrder(order_id=i, type_id=rng.randint(1, 20), location_id=rng.choice([60003760, 60008494]),
+                    price=round(rng.uniform(1, 100), 2), volume_remain=rng.randint(1, 50),
+                    is_buy_order=rng.random() < 0.5)
+        for i in range(count)
+    ]
+
+
+def brute_force(orders, type_id, quantity, is_buy):
+    """逐档成交的参考实现"""
+    book = sorted((o for o in orders if o.type_id == type_id and o.is_buy_order == is_buy),
+                  key=lambda o: -o.price if is_buy else o.price)
+    total, filled, worst = 0.0, 0, None
+    for o in book:
+        if filled >= quantity:
+            break
+        take = min(o.volume_remain, quantity - filled)
+        total += take * o.price
+        filled += take
+        worst = o.price
+    return total, filled, worst
+
+
+@pytest.fixture
+def orders():
+    return make_orders(2000)
+
+
+@pytest.fixture
+def snapshot(orders):
+    builder = OrderBookBuilder(10000002)
+    for i in range(0, len(orders), 300):
+        builder.append(orders[i:i + 300])
+    return builder.build()
+
+
+class TestOrderBookSnapshot:
+    """OrderBookSnapshot 测试类"""
+
+    def test_cost_to_buy_matches_reference(self, orders, snapshot):
+        """测试向量化买入成本与逐档成交结果一致"""
+        type_ids = list(range(0, 22))
+        quantities = [1, 10, 100, 500, 5000] * 4 + [1, 1]
+
+        result = snapshot.cost_to_buy(type_ids, quantities)
+
+        for i, (type_id, quantity) in enumerate(zip(type_ids, quantities)):
+            total, filled, worst = brute_force(orders, type_id, quantity, is_buy=False)
+            assert result.total[i] == pytest.approx(total)
+            assert result.filled[i] == filled
+            if filled:
+                assert result.worst_price[i] == worst
+            else:
+                assert np.isnan(result.avg_price[i])
+
+    def test_proceeds_from_selling_matches_reference(self, orders, snapshot):
+        """测试向量化卖出收入与逐档成交结果一致"""
+        type_ids = np.arange(1, 21)
+
+        result = snapshot.proceeds_from_selling(type_ids, 250)
+
+        for i, type_id in enumerate(type_ids):
+            total, filled, _ = brute_force(orders, int(type_id), 250, is_buy=True)
+            assert result.total[i] == pytest.approx(total)
+            assert result.filled[i] == filled
+
+    def test_top_k(self, orders, snapshot):
+        """测试前 k 档深度按价格优先级排序"""
+        depth = snapshot.top_k(5, k=3)
+
+        sells = sorted(o.price for o in orders if o.type_id == 5 and not o.is_buy_order)[:3]
+        buys = sorted((o.price for o in orders if o.type_id == 5 and o.is_buy_order), reverse=True)[:3]
+        assert [p for p, _ in depth["sell"]] == sells
+        assert [p for p, _ in depth["buy"]] == buys
+
+    def test_filter_locations(self, orders, snapshot):
+        """测试按地点过滤"""
+        jita = snapshot.filter_locations([60003760])
+
+        assert len(jita) == sum(1 for o in orders if o.location_id == 60003760)
+        jita_orders = [o for o in orders if o.location_id == 60003760]
+        total, _, _ = brute_force(jita_orders, 3, 100, is_buy=False)
+        assert jita.cost_to_buy([3], [100]).total[0] == pytest.approx(total)
+
+    def test_save_and_load(self, snapshot, tmp_path):
+        """测试快照保存后加载结果一致"""
+        path = str(tmp_path / "10000002.npz")
+        snapshot.save(path)
+
+        loaded = OrderBookSnapshot.load(path)
+
+        assert loaded.region_id == 10000002
+        assert len(loaded) == len(snapshot)
+        np.testing.assert_allclose(loaded.cost_to_buy([1, 2], 100).total, snapshot.cost_to_buy([1, 2], 100).total)
+
+    def test_empty_snapshot(self):
+        """测试空订单簿"""
+        snapshot = OrderBookBuilder(1).build()
+
+        result = snapshot.cost_to_buy([34], [10])
+
+        assert result.filled[0] == 0
+        assert np.isnan(result.avg_price[0])
+
+
+def huge_segment_orders():
+    """前面的物品挂有 1e18 ISK 量级的离谱订单，后面的物品是正常小额订单"""
+    return [
+        MarketOrder(0, 1, 60003760, 1e10, 100000000, False),
+        MarketOrder(1, 2, 60003760, 4.01, 5, False),
+        MarketOrder(2, 2, 60003760, 4.02, 5, False),
+        MarketOrder(3, 1, 60003760, 1e10, 100000000, True),
+        MarketOrder(4, 2, 60003760, 3.99, 5, True),
+        MarketOrder(5, 2, 60003760, 3.98, 5, True),
+    ]
+
+
+class TestSegmentPrecision:
+    """累计值分段精度测试类"""
+
+    def test_fill_after_huge_segment(self):
+        """测试前面物品累计成交额极大时，后面物品的成交额不丢精度"""
+        builder = OrderBookBuilder(10000002)
+        builder.append(huge_segment_orders())
+        snapshot = builder.build()
+
+        cost = snapshot.cost_to_buy([2, 2], [10, 7])
+        proceeds = snapshot.proceeds_from_selling([2], [10])
+
+        assert cost.total.tolist() == pytest.approx([40.15, 5 * 4.01 + 2 * 4.02], rel=1e-12)
+        assert cost.worst_price.tolist() == [4.02, 4.02]
+        assert proceeds.total[0] == pytest.approx(39.85, rel=1e-12)
+        assert snapshot.cost_to_buy([1], [1e8]).total[0] == pytest.approx(1e18, rel=1e-12)
+
+
+class TestPriceModels:
+    """价格模型测试类"""
+
+    def test_troll_order_trimmed(self):
+        """测试极小量离谱卖单不影响 trimmed/percentile 价格"""
+        from src_v2.model.EVE.market.price_models import compute_price_models
+
+        orders = [MarketOrder(0, 34, 60003760, 0.01, 1, False)]
+        orders += [MarketOrder(i, 34, 60003760, 5.0 + i * 0.01, 1000, False) for i in range(1, 11)]
+        orders += [MarketOrder(100, 34, 60003760, 4.0, 1000, True)]
+        builder = OrderBookBuilder(10000002)
+        builder.append(orders)
+
+        models = compute_price_models(builder.build(), [34], percentile=0.05, trim_ratio=0.01)
+
+        assert models["sell_trimmed"][0] == 5.01
+        assert models["sell_pct"][0] == pytest.approx(5.0, abs=0.02)
+        assert models["buy_pct"][0] == 4.0
+        assert models["mid_price"][0] == pytest.approx((0.01 + 4.0) / 2, abs=0.01)
+
+    def test_models_after_huge_segment(self):
+        """测试前面物品有离谱大额订单时，percentile 均价仍落在最优价与次优价之间"""
+        from src_v2.model.EVE.market.price_models import compute_price_models
+
+        builder = OrderBookBuilder(10000002)
+        builder.append(huge_segment_orders())
+
+        # 7 个跨越两档，需要用到段内累计成交额
+        models = compute_price_models(builder.build(), [2], percentile=0.7, trim_ratio=0.01)
+
+        assert models["sell_pct"][0] == 4.01
+        assert models["buy_pct"][0] == 3.99
+        assert models["sell_trimmed"][0] == 4.01
+        assert models["mid_price"][0] == 4.0
+
+    def test_missing_side_not_written(self):
+        """测试无订单的一侧价格模型不写入"""
+        from src_v2.model.EVE.market.price_models import price_model_mappings
+
+        builder = OrderBookBuilder(10000002)
+        builder.append([MarketOrder(0, 34, 60003760, 5.0, 10, False)])
+
+        mapping = price_model_mappings(builder.build(), [34])[34]
+
+        assert mapping == {"sell_pct": 5.0, "sell_trimmed": 5.0}
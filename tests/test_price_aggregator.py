@@ -0,0 +1,192 @@
+"""
+PriceAggregator 测试用例
+测试流式最优价聚合、MarketManager.update_jita_price 的写入结果，以及拉取失败时保留当前价格快照
+"""
+import importlib
+import time
+from contextlib import nullcontext
+
+import pytest
+from unittest.mock import patch, AsyncMock, MagicMock
+
+from src_v2.core.config.config import config
+
+from src_v2.model.EVE.eveesi.esi_decode import MarketOrder
+from src_v2.model.EVE.market.price_aggregator import PriceAggregator
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.market.market_manager'
+JITA = 60003760
+
+
+def order(type_id, price, is_buy, volume=1, location_id=JITA):
+    return MarketOrder(order_id=0, type_id=type_id, location_id=location_id, price=price,
+                       volume_remain=volume, is_buy_order=is_buy)
+
+
+class TestPriceAggregator:
+    """PriceAggregator 测试类"""
+
+    def test_first_order_is_compared(self):
+        """测试每个物品的首个订单也参与比较"""
+        aggregator = PriceAggregator(location_ids=[JITA])
+        aggregator.fold([order(34, 5.0, True), order(35, 9.0, False)])
+        aggregator.fold([order(34, 4.0, True), order(35, 10.0, False)])
+
+        assert aggregator.quotes[34].max_buy == 5.0
+        assert aggregator.quotes[35].min_sell == 9.0
+
+    def test_missing_side_not_written(self):
+        """测试没有订单的一侧不写价格字段"""
+        aggregator = PriceAggregator()
+        aggregator.fold([order(34, 5.0, True)])
+
+        mapping = dict(aggregator.items())[34]
+        assert mapping["max_buy"] == 5.0
+        assert "min_sell" not in mapping
+        assert mapping["sell_orders"] == 0
+
+    def test_counts_and_volume_per_side(self):
+        """测试每侧订单数与挂单量统计，并过滤其他地点"""
+        aggregator = PriceAggregator(location_ids=[JITA])
+        aggregator.fold([
+            order(34, 5.0, True, volume=10),
+            order(34, 6.0, True, volume=20),
+            order(34, 7.0, False, volume=5),
+            order(34, 1.0, False, volume=100, location_id=60008494),
+        ])
+
+        quote = aggregator.quotes[34]
+        assert (quote.buy_orders, quote.buy_volume) == (2, 30)
+        assert (quote.sell_orders, quote.sell_volume, quote.min_sell) == (1, 5, 7.0)
+        summary = aggregator.summary()
+        assert summary["scanned_orders"] == 4
+        assert summary["matched_orders"] == 3
+
+
+class TestUpdateJitaPrice:
+    """MarketManager.update_jita_price 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_update_jita_price_writes_quotes(self):
+        """测试逐页聚合后发布价格快照"""
+        try:
+            from src_v2.model.EVE.market.market_manager import MarketManager
+        except KeyError:
+            pytest.skip("market_manager 依赖 config.toml 中的 [EVE] 配置")
+
+        async def fake_pages(*args, **kwargs):
+            yield [order(34, 5.0, True), order(34, 7.0, False)]
+            yield [order(34, 6.0, True)]
+
+        mock_redis = MagicMock()
+        mock_redis.mget = AsyncMock(return_value=[None])
+        mock_redis.set = AsyncMock()
+        published = {}
+
+        async def fake_publish(items):
+            published.update(items)
+            return 1
+
+        with patch(f'{TARGET_MODULE_PATH}.rdm') as mock_rdm, \
+                patch(f'{TARGET_MODULE_PATH}.eveesi.esi_pages', fake_pages), \
+                patch(f'{TARGET_MODULE_PATH}.jita_price_snapshot.publish', side_effect=fake_publish), \
+                patch(f'{TARGET_MODULE_PATH}.OrderBookSnapshot.save'), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_rdm.r = mock_redis
+            await MarketManager().update_jita_price()
+
+        assert published[34]["max_buy"] == 6.0
+        assert published[34]["min_sell"] == 7.0
+        mock_redis.set.assert_awaited_once()
+        assert len(MarketManager().order_books[10000002]) == 3
+
+    @pytest.mark.asyncio
+    async def test_update_flag_expires_with_esi_cache(self):
+        """测试刷新标记的过期时间取订单响应的 Expires"""
+        from email.utils import formatdate
+        try:
+            from src_v2.model.EVE.market.market_manager import MarketManager
+        except KeyError:
+            pytest.skip("market_manager 依赖 config.toml 中的 [EVE] 配置")
+
+        async def fake_pages(*args, response_meta=None, **kwargs):
+            response_meta["Expires"] = formatdate(time.time() + 300, usegmt=True)
+            yield [order(34, 5.0, True), order(34, 7.0, False)]
+
+        mock_redis = MagicMock()
+        mock_redis.mget = AsyncMock(return_value=[None])
+        mock_redis.set = AsyncMock()
+        with patch(f'{TARGET_MODULE_PATH}.rdm') as mock_rdm, \
+                patch(f'{TARGET_MODULE_PATH}.eveesi.esi_pages', fake_pages), \
+                patch(f'{TARGET_MODULE_PATH}.jita_price_snapshot.publish', AsyncMock(return_value=1)), \
+                patch(f'{TARGET_MODULE_PATH}.OrderBookSnapshot.save'), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_rdm.r = mock_redis
+            await MarketManager().update_jita_price()
+
+        assert 295 <= mock_redis.set.await_args.kwargs["ex"] <= 300
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("pages", [[[]], [[order(34, 5.0, False, location_id=60008494)]]])
+    async def test_no_quotes_keeps_snapshot(self, pages):
+        """测试没有订单或目标地点没有报价时不发布空快照、不设置刷新标记"""
+        try:
+            from src_v2.model.EVE.market.market_manager import MarketManager
+        except KeyError:
+            pytest.skip("market_manager 依赖 config.toml 中的 [EVE] 配置")
+
+        async def fake_pages(*args, **kwargs):
+            for page in pages:
+                yield page
+
+        mock_redis = MagicMock()
+        mock_redis.mget = AsyncMock(return_value=[None])
+        mock_redis.set = AsyncMock()
+        with patch(f'{TARGET_MODULE_PATH}.rdm') as mock_rdm, \
+                patch(f'{TARGET_MODULE_PATH}.eveesi.esi_pages', fake_pages), \
+                patch(f'{TARGET_MODULE_PATH}.jita_price_snapshot.publish', AsyncMock()) as mock_publish, \
+                patch(f'{TARGET_MODULE_PATH}.OrderBookSnapshot.save'), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            mock_rdm.r = mock_redis
+            await MarketManager().update_jita_price()
+
+        mock_publish.assert_not_awaited()
+        mock_redis.set.assert_not_awaited()
+
+
+@pytest.fixture(scope="module")
+def plan_operate():
+    """导入计划操作模块；导入链会读取 [EVE]、[ESI] 配置，缺少时临时补上空配置"""
+    missing = {section: {} for section in ("EVE", "ESI") if section not in config}
+    if "EVE" in missing:
+        missing["EVE"] = {"CLIENT_ID": ""}
+    with patch.dict(config._data, missing) if missing else nullcontext():
+        return importlib.import_module('src_v2.model.EVE.industry.plan_configflow_operate')
+
+
+class TestRefreshMarketPrice:
+    """全服调整价刷新测试类"""
+
+    @pytest.mark.asyncio
+    async def test_failed_pull_keeps_snapshot(self, plan_operate):
+        """测试拉取失败时不发布空快照、不设置当天的状态标记"""
+        mock_redis = MagicMock()
+        mock_redis.get = AsyncMock(return_value=None)
+        mock_redis.set = AsyncMock()
+        with patch.object(plan_operate, 'rds') as mock_rds, \
+                patch.object(plan_operate.eveesi, 'markets_prices', AsyncMock(return_value=None)), \
+                patch.object(plan_operate.market_price_snapshot, 'publish', AsyncMock()) as mock_publish, \
+                patch.object(plan_operate, 'logger'):
+            mock_rds.r = mock_redis
+            await plan_operate.ConfigFlowOperateCenter.refresh_market_price()
+
+        mock_publish.assert_not_awaited()
+        mock_redis.set.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_markets_prices_network_error_is_none(self):
+        """测试网络错误时 markets_prices 返回 None，短期结果缓存不会保存失败结果"""
+        from src_v2.model.EVE.eveesi.esi_api.market import markets_prices
+
+        with patch('src_v2.model.EVE.eveesi.esi_api.market.get_request_async', AsyncMock(return_value=([], 0, 0))):
+            assert await markets_prices.__wrapped__() is None
@@ -0,0 +1,105 @@
+"""
+批量价格查询测试用例
+测试单次 pipeline 读取、缺失价格返回 None、进程内缓存与快照切换后的失效
+"""
+import pytest
+from unittest.mock import patch
+
+from src_v2.core.database.connect_manager import redis_manager
+from src_v2.core.database.redis_snapshot import RedisSnapshotStore
+from src_v2.core.utils import KahunaException
+from src_v2.model.EVE.market.price_service import PriceService, ADJUSTED_PRICE_HUB
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.market.price_service'
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch.object(redis_manager, '_redis', fake):
+        yield fake
+
+
+@pytest.fixture
+def service():
+    return PriceService.__new__(PriceService)
+
+
+class TestPriceService:
+    """PriceService 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_get_many(self, fake_redis, service):
+        """测试批量读取，缺失的物品与字段返回 None，重复 id 只返回一次"""
+        service.__init__()
+        await RedisSnapshotStore("market_price:jita").publish([(34, {"max_buy": 4.0, "min_sell": 5.0})])
+
+        prices = await service.get_many([34, 35, 34])
+
+        assert prices == {34: {"max_buy": 4.0, "min_sell": 5.0}, 35: {"max_buy": None, "min_sell": None}}
+
+    @pytest.mark.asyncio
+    async def test_cache_hit_and_version_invalidation(self, fake_redis, service):
+        """测试同一版本命中缓存不读 hash，发布新快照后读到新价格"""
+        service.__init__()
+        store = RedisSnapshotStore("market_price:jita")
+        await store.publish([(34, {"max_buy": 4.0, "min_sell": 5.0})])
+        await service.get_many([34])
+
+        with patch.object(RedisSnapshotStore, 'hmget_many_at', side_effect=AssertionError("不应读取")):
+            assert (await service.get_many([34]))[34]["min_sell"] == 5.0
+
+        await store.publish([(34, {"max_buy": 4.5, "min_sell": 5.5})])
+        assert (await service.get_many([34]))[34] == {"max_buy": 4.5, "min_sell": 5.5}
+
+    @pytest.mark.asyncio
+    async def test_one_sided_type(self, fake_redis, service):
+        """测试只有卖单的物品 max_buy 为 None，与价格为 0 区分"""
+        from src_v2.model.EVE.market.price_aggregator import PriceAggregator
+        from src_v2.model.EVE.eveesi.esi_decode import MarketOrder
+
+        service.__init__()
+        aggregator = PriceAggregator()
+        aggregator.fold([MarketOrder(0, 34, 60003760, 5.0, 10, False), MarketOrder(1, 35, 60003760, 0.0, 10, True)])
+        await RedisSnapshotStore("market_price:jita").publish(aggregator.items())
+
+        prices = await service.get_many([34, 35])
+
+        assert prices[34] == {"max_buy": None, "min_sell": 5.0}
+        assert prices[35] == {"max_buy": 0.0, "min_sell": None}
+
+    @pytest.mark.asyncio
+    async def test_no_version_not_cached(self, fake_redis, service):
+        """测试快照没有版本号时不写入缓存，每次读取最新值"""
+        service.__init__()
+        await fake_redis.hset("market_price:jita:34", mapping={"max_buy": 4.0, "min_sell": 5.0})
+
+        assert (await service.get_many([34]))[34] == {"max_buy": 4.0, "min_sell": 5.0}
+        assert len(service._cache) == 0
+
+        await fake_redis.hset("market_price:jita:34", "min_sell", 5.5)
+        assert (await service.get_many([34]))[34]["min_sell"] == 5.5
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction(self, fake_redis, service):
+        """测试超过容量时淘汰最久未使用的条目"""
+        service.__init__(cache_size=2)
+        await RedisSnapshotStore("market_price:jita").publish([(1, {"min_sell": 1.0})])
+        await service.get_many([1, 2, 3])
+
+        assert len(service._cache) == 2
+        assert [key[2] for key in service._cache] == [2, 3]
+
+    @pytest.mark.asyncio
+    async def test_adjusted_price_hub(self, fake_redis, service):
+        """测试调整价快照与字段校验"""
+        service.__init__()
+        await RedisSnapshotStore("market_price_cache").publish([(34, {"adjusted_price": 3.2, "average_price": 3.0})])
+
+        prices = await service.get_many([34], ("adjusted_price",), ADJUSTED_PRICE_HUB)
+
+        assert prices == {34: {"adjusted_price": 3.2}}
+        with pytest.raises(KahunaException):
+            await service.get_many([34], ("min_sell",), ADJUSTED_PRICE_HUB)
@@ -0,0 +1,86 @@
+"""
+RedisSnapshotStore 测试用例
+测试版本化快照的整批发布、指针切换与旧快照过期
+"""
+import pytest
+
+from src_v2.core.database.redis_snapshot import RedisSnapshotStore
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+class TestRedisSnapshotStore:
+    """RedisSnapshotStore 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_publish_and_read(self, fake_redis):
+        """测试发布后通过当前指针读取"""
+        store = RedisSnapshotStore("test_price", redis=fake_redis, chunk_size=2)
+
+        version = await store.publish((type_id, {"max_buy": type_id * 1.5}) for type_id in range(5))
+
+        assert await store.current_version() == version
+        assert float(await store.hget(3, "max_buy")) == 4.5
+        assert await store.hmget(4, "max_buy", "min_sell") == ["6.0", None]
+        assert await fake_redis.scard(store.members_key(version)) == 5
+
+    @pytest.mark.asyncio
+    async def test_readers_see_previous_snapshot_until_swap(self, fake_redis):
+        """测试新快照写入过程中读取方仍读到完整的旧快照"""
+        store = RedisSnapshotStore("test_price", redis=fake_redis, chunk_size=1)
+        await store.publish([(34, {"max_buy": 1}), (35, {"max_buy": 1})])
+
+        seen = []
+
+        def items():
+            yield 34, {"max_buy": 2}
+            yield 35, {"max_buy": 2}
+
+        async def check_during_write():
+            seen.append(await store.hget(34, "max_buy"))
+
+        original_write = store._write_chunk
+
+        async def write_and_check(version, chunk):
+            await original_write(version, chunk)
+            await check_during_write()
+        store._write_chunk = write_and_check
+
+        await store.publish(items())
+
+        assert seen == ["1", "1"]
+        assert await store.hget(34, "max_buy") == "2"
+
+    @pytest.mark.asyncio
+    async def test_old_snapshot_retired(self, fake_redis):
+        """测试被替换的旧快照设置过期时间"""
+        store = RedisSnapshotStore("test_price", redis=fake_redis, retire_seconds=60)
+        old = await store.publish([(34, {"max_buy": 1})])
+        new = await store.publish([(34, {"max_buy": 2})])
+
+        assert 0 < await fake_redis.ttl(store.member_key(old, 34)) <= 60
+        assert await fake_redis.ttl(store.member_key(new, 34)) == -1
+
+    @pytest.mark.asyncio
+    async def test_stale_publisher_does_not_swap(self, fake_redis):
+        """测试版本号较旧的发布不会覆盖当前指针"""
+        store = RedisSnapshotStore("test_price", redis=fake_redis)
+        await fake_redis.set(store.pointer_key, 100)
+
+        version = await store.publish([(34, {"max_buy": 1})])
+
+        assert version < 100
+        assert await store.current_version() == 100
+
+    @pytest.mark.asyncio
+    async def test_legacy_key_fallback(self, fake_redis):
+        """测试未发布快照时读取旧格式 key"""
+        store = RedisSnapshotStore("test_price", redis=fake_redis)
+        await fake_redis.hset("test_price:34", mapping={"max_buy": 7})
+
+        assert await store.hget(34, "max_buy") == "7"
@@ -0,0 +1,91 @@
+"""
+定时任务调度测试用例
+测试 Redis 锁选主、按刷新标记判断到期以及任务失败后的重试安排
+"""
+import time
+
+import pytest
+from unittest.mock import patch, AsyncMock
+
+from src_v2.core.scheduler import LeaderScheduler, ScheduledJob
+
+TARGET_MODULE_PATH = 'src_v2.core.scheduler'
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    with patch(f'{TARGET_MODULE_PATH}.logger'):
+        yield fakeredis.FakeAsyncRedis(decode_responses=True)
+
+
+class TestLeaderScheduler:
+    """LeaderScheduler 测试类"""
+
+    @pytest.mark.asyncio
+    async def test_only_one_leader(self, fake_redis):
+        """测试只有一个进程获得主进程锁，释放后其他进程可接管"""
+        a = LeaderScheduler("scheduler:test", redis=fake_redis)
+        b = LeaderScheduler("scheduler:test", redis=fake_redis)
+
+        assert await a.try_acquire_leader()
+        assert not await b.try_acquire_leader()
+        assert await a.try_acquire_leader()
+
+        await a.release_leader()
+        assert await b.try_acquire_leader()
+
+    @pytest.mark.asyncio
+    async def test_lost_lock_is_detected(self, fake_redis):
+        """测试锁被其他进程接管后不再认为自己是主进程"""
+        a = LeaderScheduler("scheduler:test", redis=fake_redis)
+        assert await a.try_acquire_leader()
+        await fake_redis.set("scheduler:test", "other")
+
+        assert not await a.try_acquire_leader()
+
+    @pytest.mark.asyncio
+    async def test_job_runs_when_flag_missing(self, fake_redis):
+        """测试标记不存在时执行任务，并按标记 TTL 安排下次检查"""
+        scheduler = LeaderScheduler("scheduler:test", redis=fake_redis)
+
+        async def refresh():
+            await fake_redis.set("flag:a", "ok", ex=600)
+
+        run = AsyncMock(side_effect=refresh)
+        job = ScheduledJob("a", run, lambda: ["flag:a"])
+        scheduler.add_job(job)
+
+        await scheduler.tick()
+        await scheduler.tick()
+
+        run.assert_awaited_once()
+        assert 590 < job.next_run - time.time() <= 600
+
+    @pytest.mark.asyncio
+    async def test_failed_job_retries_after_min_interval(self, fake_redis):
+        """测试任务失败不影响其他任务，并在最小间隔后重试"""
+        scheduler = LeaderScheduler("scheduler:test", redis=fake_redis)
+        failing = ScheduledJob("fail", AsyncMock(side_effect=RuntimeError("esi down")), lambda: ["flag:fail"],
+                               min_interval=30)
+        other = ScheduledJob("other", AsyncMock(), lambda: ["flag:other"])
+        scheduler.add_job(failing)
+        scheduler.add_job(other)
+
+        await scheduler.tick()
+
+        other.run.assert_awaited_once()
+        assert 25 < failing.next_run - time.time() <= 30
+
+    @pytest.mark.asyncio
+    async def test_follower_does_not_run_jobs(self, fake_redis):
+        """测试非主进程不执行任务"""
+        await fake_redis.set("scheduler:test", "other", ex=30)
+        scheduler = LeaderScheduler("scheduler:test", redis=fake_redis)
+        job = ScheduledJob("a", AsyncMock(), lambda: ["flag:a"])
+        scheduler.add_job(job)
+
+        await scheduler.tick()
+
+        job.run.assert_not_awaited()
@@ -0,0 +1,313 @@
+"""
+SDE 下载与流式解压测试用例
+测试断点续传与校验、增量解析 ZIP 本地文件头（数据描述符、zip64）以及后台线程流式解压
+"""
+import hashlib
+import io
+import json
+import os
+import zipfile
+
+import aiohttp
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src_v2.model.EVE.sde.sde_builder import downloader as downloader_module
+from src_v2.model.EVE.sde.sde_builder.downloader import SDEDownloader, parse_content_range, expected_md5
+from src_v2.model.EVE.sde.sde_builder.extractor import ZipStreamExtractor, ZipStreamError, StreamingExtraction
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.sde.sde_builder.downloader'
+
+URL = "https://example.com/sde.zip"
+DATA = os.urandom(10000)
+DATA_MD5 = hashlib.md5(DATA).hexdigest()
+
+
+class FakeContent:
+    def __init__(self, body, fail_after=None):
+        self.body = body
+        self.fail_after = fail_after
+
+    async def iter_chunked(self, size):
+        for i, start in enumerate(range(0, len(self.body), 1000)):
+            if self.fail_after is not None and i >= self.fail_after:
+                raise aiohttp.ClientPayloadError("连接中断")
+            yield self.body[start:start + 1000]
+
+
+class FakeResponse:
+    def __init__(self, status, headers, body, fail_after=None):
+        self.status = status
+        self.headers = headers
+        self.content = FakeContent(body, fail_after)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+
+class FakeServer:
+    """支持 Range 的文件服务器，第一次请求在 fail_after 个数据块后断开"""
+
+    def __init__(self, data, etag, fail_after=None, reject_range=False):
+        self.data = data
+        self.etag = etag
+        self.fail_after = fail_after
+        self.reject_range = reject_range
+        self.requests = []
+
+    def __call__(self):
+        return self
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    def get(self, url, headers=None, **kwargs):
+        headers = headers or {}
+        self.requests.append(headers)
+        fail_after, self.fail_after = self.fail_after, None
+        if 'Range' in headers and self.reject_range:
+            return FakeResponse(416, {}, b'')
+        if 'Range' in headers and headers.get('If-Range', self.etag) == self.etag:
+            start = int(headers['Range'][len('bytes='):-1])
+            return FakeResponse(206, {
+                'ETag': self.etag,
+                'Content-Range': f'bytes {start}-{len(self.data) - 1}/{len(self.data)}',
+            }, self.data[start:], fail_after)
+        return FakeResponse(200, {'ETag': self.etag, 'Content-Length': str(len(self.data))}, self.data, fail_after)
+
+
+@pytest.fixture
+def downloader(tmp_path):
+    with patch(f'{TARGET_MODULE_PATH}.config') as mock_config:
+        mock_config.get.side_effect = lambda section, key, fallback=None: (
+            str(tmp_path) if key == 'Download_Path' else fallback)
+        mock_config.getint.return_value = 3
+        yield SDEDownloader()
+
+
+async def run_download(downloader, server, **kwargs):
+    with patch.object(downloader_module.aiohttp, 'ClientSession', server), \
+            patch(f'{TARGET_MODULE_PATH}.asyncio.sleep', AsyncMock()), \
+            patch(f'{TARGET_MODULE_PATH}.logger'):
+        return await downloader.download(URL, 3000000, **kwargs)
+
+
+class TestDownloadHelpers:
+    """下载辅助函数测试类"""
+
+    def test_parse_content_range(self):
+        """测试解析续传起点与总大小"""
+        assert parse_content_range("bytes 100-199/200") == (100, 200)
+        assert parse_content_range("bytes 100-199/*") == (100, 0)
+
+    def test_expected_md5(self):
+        """测试 Content-MD5 优先，分段上传的 ETag 不作为 MD5"""
+        assert expected_md5({'ETag': f'"{DATA_MD5.upper()}"'}) == DATA_MD5
+        assert expected_md5({'ETag': '"0123456789abcdef0123456789abcdef-4"'}) is None
+        assert expected_md5({'Content-MD5': "1B2M2Y8AsgTpgAmY7PhCfg==", 'ETag': f'"{DATA_MD5}"'}) == \
+               "d41d8cd98f00b204e9800998ecf8427e"
+
+
+class TestResumableDownload:
+    """断点续传测试类"""
+
+    @pytest.mark.asyncio
+    async def test_resume_after_interruption(self, downloader):
+        """测试中断后按 Range 续传，每个字节只交给 on_chunk 一次，完成后记录校验和"""
+        server = FakeServer(DATA, f'"{DATA_MD5}"', fail_after=3)
+        received = bytearray()
+
+        async def on_chunk(chunk):
+            received.extend(chunk)
+
+        file_path = await run_download(downloader, server, on_chunk=on_chunk)
+
+        assert file_path == downloader.get_file_path(3000000)
+        assert server.requests[1] == {'Range': 'bytes=3000-', 'If-Range': f'"{DATA_MD5}"'}
+        assert bytes(received) == DATA
+        with open(file_path, 'rb') as f:
+            assert f.read() == DATA
+        assert not os.path.exists(file_path + '.part')
+        assert not os.path.exists(file_path + '.part.json')
+        assert downloader.verify_file(file_path)
+
+    @pytest.mark.asyncio
+    async def test_resume_previous_part(self, downloader):
+        """测试上次留下的 .part 从磁盘读出交给 on_chunk，其余部分续传"""
+        part_path = downloader.get_file_path(3000000) + '.part'
+        with open(part_path, 'wb') as f:
+            f.write(DATA[:4000])
+        with open(part_path + '.json', 'w') as f:
+            json.dump({'url': URL, 'etag': f'"{DATA_MD5}"'}, f)
+        server = FakeServer(DATA, f'"{DATA_MD5}"')
+        received = bytearray()
+
+        async def on_chunk(chunk):
+            received.extend(chunk)
+
+        assert await run_download(downloader, server, on_chunk=on_chunk)
+        assert len(server.requests) == 1 and server.requests[0]['Range'] == 'bytes=4000-'
+        assert bytes(received) == DATA
+
+    @pytest.mark.asyncio
+    async def test_range_rejected_on_last_attempt(self, downloader):
+        """测试最后一次尝试仍被拒绝续传（416）时返回失败，不把不完整的文件当作下载结果"""
+        # 分段上传的 ETag 不是 MD5，无法靠 MD5 校验兜底
+        server = FakeServer(DATA, '"etag-2"', fail_after=3, reject_range=True)
+        downloader.max_retries = 2
+
+        assert await run_download(downloader, server) is None
+        file_path = downloader.get_file_path(3000000)
+        assert len(server.requests) == 2 and 'Range' in server.requests[1]
+        assert not os.path.exists(file_path)
+        assert not os.path.exists(file_path + '.sha256')
+
+    @pytest.mark.asyncio
+    async def test_md5_mismatch(self, downloader):
+        """测试服务器 MD5 与下载内容不一致时丢弃文件"""
+        server = FakeServer(DATA, '"0123456789abcdef0123456789abcdef"')
+
+        assert await run_download(downloader, server) is None
+        file_path = downloader.get_file_path(3000000)
+        assert not os.path.exists(file_path)
+        assert not os.path.exists(file_path + '.part')
+
+    @pytest.mark.asyncio
+    async def test_existing_file_checksum(self, downloader):
+        """测试已有文件校验和不符时重新下载"""
+        file_path = downloader.get_file_path(3000000)
+        with open(file_path, 'wb') as f:
+            f.write(b'broken')
+        with open(file_path + '.sha256', 'w') as f:
+            f.write(f"{hashlib.sha256(DATA).hexdigest()}  {os.path.basename(file_path)}\n")
+        server = FakeServer(DATA, f'"{DATA_MD5}"')
+
+        assert await run_download(downloader, server) == file_path
+        assert len(server.requests) == 1
+        with open(file_path, 'rb') as f:
+            assert f.read() == DATA
+
+
+class Unseekable(io.RawIOBase):
+    """不可 seek 的输出，zipfile 会改用数据描述符记录大小与 CRC"""
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        return self.buffer.write(data)
+
+
+def jsonl(count, prefix):
+    return "".join(json.dumps({"_key": i, "name": f"{prefix}{i}", "noise": os.urandom(8).hex()}) + "\n"
+                   for i in range(count)).encode()
+
+
+FILES = {
+    "_sde.jsonl": b'{"_key": "sde", "buildNumber": 3000000}\n',
+    "types.jsonl": jsonl(2000, "type"),
+    "skins.jsonl": jsonl(500, "skin"),
+}
+
+
+def make_zip(compression=zipfile.ZIP_DEFLATED, stream=False, force_zip64=False):
+    output = Unseekable() if stream else io.BytesIO()
+    with zipfile.ZipFile(output, 'w', compression) as zf:
+        for name, content in FILES.items():
+            with zf.open(name, 'w', force_zip64=force_zip64) as f:
+                f.write(content)
+    return (output.buffer if stream else output).getvalue()
+
+
+def extract_stream(data, extract_to, chunk_size=4096):
+    finished = []
+    extractor = ZipStreamExtractor(str(extract_to), {"_sde.jsonl", "types.jsonl"}.__contains__,
+                                   lambda name, path: finished.append(name))
+    for start in range(0, len(data), chunk_size):
+        extractor.feed(data[start:start + chunk_size])
+    extractor.close()
+    return finished
+
+
+class TestZipStreamExtractor:
+    """ZIP 增量解压测试类"""
+
+    @pytest.mark.parametrize("compression, stream, force_zip64", [
+        (zipfile.ZIP_DEFLATED, False, False),
+        (zipfile.ZIP_DEFLATED, True, False),
+        (zipfile.ZIP_DEFLATED, True, True),
+        (zipfile.ZIP_STORED, False, False),
+    ], ids=["deflate", "data_descriptor", "zip64", "stored"])
+    def test_extract_wanted_files(self, tmp_path, compression, stream, force_zip64):
+        """测试只写出需要的文件，内容与原文件一致"""
+        data = make_zip(compression, stream, force_zip64)
+
+        assert extract_stream(data, tmp_path, chunk_size=777) == ["_sde.jsonl", "types.jsonl"]
+        assert sorted(os.listdir(tmp_path)) == ["_sde.jsonl", "types.jsonl"]
+        for name in ("_sde.jsonl", "types.jsonl"):
+            assert (tmp_path / name).read_bytes() == FILES[name]
+
+    def test_crc_mismatch(self, tmp_path):
+        """测试 CRC 不符时报错并删除写了一半的文件"""
+        data = bytearray(make_zip(zipfile.ZIP_STORED))
+        position = data.index(b'"type0"')
+        data[position + 1] ^= 0x20
+
+        with pytest.raises(ZipStreamError):
+            extract_stream(bytes(data), tmp_path)
+        assert not (tmp_path / "types.jsonl").exists()
+
+    def test_truncated(self, tmp_path):
+        """测试数据在条目中间结束时报错"""
+        data = make_zip()
+
+        with pytest.raises(ZipStreamError):
+            extract_stream(data[:len(data) // 2], tmp_path)
+
+    def test_stored_with_descriptor_unsupported(self, tmp_path):
+        """测试无法确定结束位置的条目报不支持"""
+        with pytest.raises(ZipStreamError):
+            extract_stream(make_zip(zipfile.ZIP_STORED, stream=True), tmp_path)
+
+
+class TestStreamingExtraction:
+    """后台线程流式解压测试类"""
+
+    @pytest.mark.asyncio
+    async def test_files_ready(self, tmp_path):
+        """测试各文件写完即完成对应 Future，压缩包中没有的文件结果为 None"""
+        data = make_zip(stream=True)
+        with patch('src_v2.model.EVE.sde.sde_builder.extractor.logger'):
+            extraction = StreamingExtraction(str(tmp_path), ["_sde.jsonl", "types.jsonl", "groups.jsonl"])
+            for start in range(0, len(data), 1000):
+                await extraction.feed(data[start:start + 1000])
+            await extraction.finish()
+
+        assert await extraction.files["_sde.jsonl"] == str(tmp_path / "_sde.jsonl")
+        assert (tmp_path / "types.jsonl").read_bytes() == FILES["types.jsonl"]
+        assert await extraction.files["groups.jsonl"] is None
+        assert not (tmp_path / "skins.jsonl").exists()
+
+    @pytest.mark.asyncio
+    async def test_error_fails_pending_files(self, tmp_path):
+        """测试解压出错后后续数据被丢弃，未完成的 Future 以该异常结束"""
+        with patch('src_v2.model.EVE.sde.sde_builder.extractor.logger'):
+            extraction = StreamingExtraction(str(tmp_path), ["_sde.jsonl"])
+            await extraction.feed(b'not a zip file')
+            for _ in range(100):
+                await extraction.feed(b'x' * 1000)
+            with pytest.raises(ZipStreamError):
+                await extraction.finish()
+
+        assert extraction.failed
+        with pytest.raises(ZipStreamError):
+            await extraction.files["_sde.jsonl"]
@@ -0,0 +1,302 @@
+"""
+SDE 导入器测试用例
+测试 COPY 写入影子表、COPY 失败回退 INSERT、索引定义改写、影子表改名互换、流式解压就绪导入以及增量更新流程
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src_v2.model.EVE.sde.sde_builder.importer import (
+    SDEImporter, rewrite_index_def, target_tables, temp_table_name, STAGING_SUFFIX, PG_IDENTIFIER_MAX,
+)
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.sde.sde_builder.importer'
+
+
+class FakeResult:
+    def __init__(self, rows=None, scalar=None):
+        self.rows = rows or []
+        self._scalar = scalar
+
+    def all(self):
+        return list(self.rows)
+
+    def scalar(self):
+        return self._scalar
+
+
+class FakeConnection:
+    """记录执行的 SQL，索引查询返回 index_rows，COUNT 返回 1"""
+
+    def __init__(self, log, index_rows, copy=None):
+        self.log = log
+        self.index_rows = index_rows
+        self.driver_connection = MagicMock()
+        self.driver_connection.copy_records_to_table = copy or AsyncMock()
+
+    async def execute(self, stmt, params=None):
+        sql = str(stmt)
+        self.log.append(sql)
+        if "pg_get_indexdef" in sql:
+            return FakeResult(self.index_rows.get(params["table_name"], []))
+        if "indisprimary" in sql:
+            return FakeResult([(row[1].split('("')[1].rstrip('")'),)
+                               for row in self.index_rows.get(params["table_name"], []) if row[2]])
+        if '"buildNumber" FROM' in sql:
+            return FakeResult(scalar=3000000)
+        if "unnest" in sql:
+            return FakeResult([(34,), (35,)])
+        if "COUNT(*)" in sql:
+            return FakeResult(scalar=1)
+        return FakeResult()
+
+    async def run_sync(self, fn, *args, **kwargs):
+        self.log.append(f"run_sync {getattr(fn, '__name__', fn)}")
+
+    async def get_raw_connection(self):
+        return self
+
+    @asynccontextmanager
+    async def begin_nested(self):
+        self.log.append("SAVEPOINT")
+        yield
+
+
+class FakeEngine:
+    def __init__(self, index_rows=None):
+        self.log = []
+        self.index_rows = index_rows or {}
+
+    @asynccontextmanager
+    async def begin(self):
+        yield FakeConnection(self.log, self.index_rows)
+
+
+@pytest.fixture
+def importer():
+    db_manager = MagicMock()
+    db_manager.engine = FakeEngine({
+        'public."invTypes"': [
+            ("invTypes_pkey", 'CREATE UNIQUE INDEX "invTypes_pkey" ON public."invTypes" USING btree ("typeID")', True),
+            ('ix_invTypes_typeName_en',
+             'CREATE INDEX "ix_invTypes_typeName_en" ON public."invTypes" USING btree ("typeName_en")', False),
+        ],
+    })
+    with patch(f'{TARGET_MODULE_PATH}.config') as mock_config:
+        mock_config.get.return_value = "copy"
+        mock_config.getint.return_value = 2
+        importer = SDEImporter(db_manager, MagicMock())
+    importer.parse_workers = 0
+    return importer
+
+
+class TestHelpers:
+    """辅助函数测试类"""
+
+    def test_temp_table_name_fits_identifier_limit(self):
+        """测试超长名称被哈希缩短且互不冲突"""
+        assert temp_table_name("invTypes", STAGING_SUFFIX) == "invTypes__staging"
+        long_a, long_b = "a" * 60 + "x", "a" * 60 + "y"
+        assert len(temp_table_name(long_a, STAGING_SUFFIX)) <= PG_IDENTIFIER_MAX
+        assert temp_table_name(long_a, STAGING_SUFFIX) != temp_table_name(long_b, STAGING_SUFFIX)
+        assert temp_table_name(long_a, STAGING_SUFFIX).endswith(STAGING_SUFFIX)
+
+    def test_rewrite_index_def(self):
+        """测试索引定义改写到影子表"""
+        index_def = 'CREATE UNIQUE INDEX "industryActivities_pkey" ON public."industryActivities" USING btree ("blueprintTypeID", "activityID")'
+
+        assert rewrite_index_def(index_def, "industryActivities_pkey__staging", "industryActivities__staging") == (
+            'CREATE UNIQUE INDEX "industryActivities_pkey__staging" ON public."industryActivities__staging" '
+            'USING btree ("blueprintTypeID", "activityID")'
+        )
+        with pytest.raises(ValueError):
+            rewrite_index_def("CREATE TABLE x", "a", "b")
+
+    def test_target_tables(self):
+        """测试文件到数据库表的映射"""
+        assert target_tables("types") == ["invTypes"]
+        assert target_tables("blueprints") == [
+            "industryBlueprints", "industryActivities", "industryActivityMaterials", "industryActivityProducts",
+        ]
+        assert target_tables("groups") == ["invGroups"]
+        assert target_tables("_sde") == ["_sde"]
+
+
+class TestBulkInsert:
+    """批量写入测试类"""
+
+    @pytest.mark.asyncio
+    async def test_copy_into_staging_table(self, importer):
+        """测试导入期间以 COPY 写入影子表，JSON 字段序列化"""
+        conn = FakeConnection([], {})
+        importer._load_targets = {"_sde": "_sde__staging"}
+
+        await importer.bulk_insert(conn, "_sde", ["_key", "extra"], [{"_key": "sde", "extra": {"a": "舰船"}}, {"_key": "x"}])
+
+        conn.driver_connection.copy_records_to_table.assert_awaited_once_with(
+            "_sde__staging", records=[("sde", json.dumps({"a": "舰船"}, ensure_ascii=False)), ("x", None)],
+            columns=["_key", "extra"], schema_name="public",
+        )
+        assert conn.log == ["SAVEPOINT"]
+
+    @pytest.mark.asyncio
+    async def test_copy_failure_falls_back_to_insert(self, importer):
+        """测试 COPY 失败后本批及后续批次改用 INSERT"""
+        conn = FakeConnection([], {}, copy=AsyncMock(side_effect=TypeError("expected str")))
+
+        with patch.object(importer, "bulk_insert_via_sql", AsyncMock(return_value=True)) as mock_sql, \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            await importer.bulk_insert(conn, "invTypes", ["typeID"], [{"typeID": 34}])
+            await importer.bulk_insert(conn, "invTypes", ["typeID"], [{"typeID": 35}])
+
+        assert mock_sql.await_count == 2
+        assert conn.driver_connection.copy_records_to_table.await_count == 1
+        assert "invTypes" in importer._copy_disabled
+
+    @pytest.mark.asyncio
+    async def test_insert_method_skips_copy(self, importer):
+        """测试 Import_Method = insert 时不尝试 COPY"""
+        importer.import_method = "insert"
+        conn = FakeConnection([], {})
+
+        with patch.object(importer, "bulk_insert_via_sql", AsyncMock(return_value=True)) as mock_sql:
+            await importer.bulk_insert(conn, "invTypes", ["typeID"], [{"typeID": 34}])
+
+        mock_sql.assert_awaited_once()
+        conn.driver_connection.copy_records_to_table.assert_not_awaited()
+
+
+class TestFullUpdateViaStaging:
+    """影子表全量更新测试类"""
+
+    @pytest.mark.asyncio
+    async def test_load_index_and_swap(self, importer):
+        """测试先写影子表、再建索引、最后在一个事务内改名互换"""
+        files = ["/sde/_sde.jsonl", "/sde/types.jsonl"]
+        loaded = []
+
+        async def fake_import_file(conn, file_path, table_name):
+            loaded.append((table_name, dict(importer._load_targets)))
+            return 1
+
+        importer.model_generator.create_all_tables = AsyncMock(return_value=True)
+        with patch.object(importer, "get_current_version", AsyncMock(return_value=1)), \
+                patch.object(importer, "import_file", side_effect=fake_import_file), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            assert await importer.full_update_via_staging("/sde", files) is True
+
+        log = importer.db_manager.engine.log
+        assert [table for table, _ in loaded] == ["_sde", "invTypes"]
+        assert loaded[0][1] == {"_sde": "_sde__staging", "invTypes": "invTypes__staging"}
+        assert importer._load_targets == {}
+        assert 'CREATE TABLE "invTypes__staging" (LIKE "invTypes")' in log
+
+        create_index = log.index(
+            'CREATE UNIQUE INDEX "invTypes_pkey__staging" ON public."invTypes__staging" USING btree ("typeID")')
+        assert create_index > log.index("SET LOCAL synchronous_commit = off")
+        assert ('ALTER TABLE "invTypes__staging" ADD CONSTRAINT "invTypes_pkey__staging" '
+                'PRIMARY KEY USING INDEX "invTypes_pkey__staging"') in log
+        swap = log.index('ALTER TABLE "invTypes__staging" RENAME TO "invTypes"')
+        assert swap > create_index
+        assert log.index('ALTER TABLE IF EXISTS "invTypes" RENAME TO "invTypes__old"') < swap
+        assert log.index('ALTER INDEX "invTypes_pkey__staging" RENAME TO "invTypes_pkey"') > \
+               log.index('DROP TABLE IF EXISTS "invTypes__old"', swap)
+
+    @pytest.mark.asyncio
+    async def test_streaming_files_ready(self, importer):
+        """测试流式解压时按文件就绪顺序建表导入，压缩包中没有的文件不参与切换"""
+        loop = asyncio.get_running_loop()
+        files_ready = {name: loop.create_future() for name in ("_sde.jsonl", "types.jsonl", "groups.jsonl")}
+        loaded = []
+
+        async def fake_import_file(conn, file_path, table_name):
+            loaded.append(table_name)
+            return 1
+
+        async def resolve_later():
+            files_ready["types.jsonl"].set_result("/sde/types.jsonl")
+            await asyncio.sleep(0)
+            files_ready["_sde.jsonl"].set_result("/sde/_sde.jsonl")
+            files_ready["groups.jsonl"].set_result(None)
+
+        importer.model_generator.create_all_tables = AsyncMock()
+        importer.model_generator.create_table_from_file = AsyncMock(return_value=True)
+        with patch.object(importer, "get_current_version", AsyncMock(return_value=1)), \
+                patch.object(importer, "import_file", side_effect=fake_import_file), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            resolver = loop.create_task(resolve_later())
+            assert await importer.full_update("/sde", files_ready=files_ready) is True
+            await resolver
+
+        importer.model_generator.create_all_tables.assert_not_awaited()
+        assert loaded == ["invTypes", "_sde"]
+        assert [c.args[2] for c in importer.model_generator.create_table_from_file.await_args_list] == \
+               ["invTypes", "_sde"]
+        log = importer.db_manager.engine.log
+        assert 'ALTER TABLE "invTypes__staging" RENAME TO "invTypes"' in log
+        assert not any('invGroups' in sql for sql in log)
+
+    @pytest.mark.asyncio
+    async def test_failure_drops_staging_tables(self, importer):
+        """测试导入失败时删除影子表，原表不改名"""
+        importer.model_generator.create_all_tables = AsyncMock(return_value=True)
+        with patch.object(importer, "get_current_version", AsyncMock(return_value=1)), \
+                patch.object(importer, "import_file", AsyncMock(side_effect=RuntimeError("boom"))), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            with pytest.raises(RuntimeError):
+                await importer.full_update_via_staging("/sde", ["/sde/_sde.jsonl", "/sde/types.jsonl"])
+
+        log = importer.db_manager.engine.log
+        assert 'DROP TABLE IF EXISTS "invTypes__staging"' in log[-2:]
+        assert not any("RENAME TO" in sql for sql in log)
+        assert importer._load_targets == {}
+
+
+class TestDiffUpdate:
+    """增量更新测试类"""
+
+    @pytest.mark.asyncio
+    async def test_diff_applies_changes_without_swap(self, importer):
+        """测试已安装版本时只把差异应用到正式表，记录变更并删除影子表"""
+        importer.update_mode = "diff"
+        importer.db_manager.engine.index_rows['public."_sde"'] = [
+            ("_sde_pkey", 'CREATE UNIQUE INDEX "_sde_pkey" ON public."_sde" USING btree ("_key")', True),
+        ]
+        importer.model_generator.create_all_tables = AsyncMock(return_value=True)
+        with patch.object(importer, "get_current_version", AsyncMock(return_value=2999999)), \
+                patch.object(importer, "import_file", AsyncMock(return_value=1)), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            assert await importer.full_update_via_staging("/sde", ["/sde/_sde.jsonl", "/sde/types.jsonl"]) is True
+
+        log = importer.db_manager.engine.log
+        assert not any("RENAME TO" in sql or "CREATE UNIQUE INDEX" in sql for sql in log)
+        diff_sql = next(sql for sql in log if 'CREATE TEMP TABLE "_sde_diff"' in sql and '"invTypes__staging"' in sql)
+        assert 'USING ("typeID")' in diff_sql
+        assert 'md5(CAST(t AS text))' in diff_sql
+        assert any(sql.startswith('DELETE FROM "invTypes" t USING "_sde_diff" d') for sql in log)
+        assert any(sql.startswith('INSERT INTO "invTypes" SELECT t.* FROM "invTypes__staging" t') for sql in log)
+        changes_sql = [sql for sql in log if 'INSERT INTO "_sde_changes"' in sql]
+        assert len(changes_sql) == 2
+        assert 'array_remove(ARRAY[d."typeID"], NULL)' in changes_sql[1]
+        assert 'DROP TABLE IF EXISTS "invTypes__staging"' in log[-2:]
+        assert importer.last_changes["build"] == 3000000
+        assert importer.last_changes["mode"] == "diff"
+        assert importer.last_changes["type_ids"] == {34, 35}
+
+    @pytest.mark.asyncio
+    async def test_first_install_uses_full_swap(self, importer):
+        """测试首次安装时走改名互换并记录整表替换"""
+        importer.update_mode = "diff"
+        importer.model_generator.create_all_tables = AsyncMock(return_value=True)
+        with patch.object(importer, "get_current_version", AsyncMock(return_value=None)), \
+                patch.object(importer, "import_file", AsyncMock(return_value=1)), \
+                patch(f'{TARGET_MODULE_PATH}.logger'):
+            assert await importer.full_update_via_staging("/sde", ["/sde/_sde.jsonl", "/sde/types.jsonl"]) is True
+
+        log = importer.db_manager.engine.log
+        assert 'ALTER TABLE "invTypes__staging" RENAME TO "invTypes"' in log
+        assert not any('"_sde_diff"' in sql for sql in log)
+        assert importer.last_changes == {"build": 3000000, "mode": "full", "counts": {}, "type_ids": None}
@@ -0,0 +1,169 @@
+"""
+SDE 并行解析测试用例
+测试字节范围切分、单块解析与逐行处理结果一致、进程池并行产出的顺序与在途块上限，以及解析结果直接写入
+"""
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import pytest
+from unittest.mock import AsyncMock, MagicMock, patch
+
+from src_v2.model.EVE.sde.sde_builder.blueprints_model import process_blueprints_row
+from src_v2.model.EVE.sde.sde_builder.inv_types_model import process_inv_types_row
+from src_v2.model.EVE.sde.sde_builder.parallel_parser import (
+    ROW_SPECS, get_row_spec, iter_parsed_chunks, parse_range, split_ranges,
+)
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.sde.sde_builder.parallel_parser'
+
+
+def make_type(type_id):
+    return {"_key": type_id, "groupID": 25, "volume": 10.0, "published": True,
+            "name": {"en": f"Type {type_id}", "zh": f"物品{type_id}"}}
+
+
+def make_blueprint(type_id):
+    return {"blueprintTypeID": type_id, "maxProductionLimit": 10,
+            "activities": {"manufacturing": {"time": 600,
+                                             "materials": [{"typeID": 34, "quantity": 5}, {"typeID": 35, "quantity": 2}],
+                                             "products": [{"typeID": type_id + 1, "quantity": 1}]}}}
+
+
+def write_jsonl(path, rows, broken_line=None):
+    lines = [json.dumps(row, ensure_ascii=False) for row in rows]
+    if broken_line is not None:
+        lines.insert(broken_line, "{broken")
+        lines.insert(broken_line, "")
+    path.write_text("\n".join(lines) + "\n", encoding="utf-8")
+    return str(path)
+
+
+def expected_types(rows):
+    columns = ROW_SPECS['invTypes'].tables['invTypes']
+    return [tuple(process_inv_types_row(row).get(col) for col in columns) for row in rows]
+
+
+class TestSplitAndParse:
+    """切分与单块解析测试类"""
+
+    def test_split_ranges_align_to_lines(self, tmp_path):
+        """测试字节范围首尾相接且都落在行边界"""
+        path = write_jsonl(tmp_path / "types.jsonl", [make_type(i) for i in range(200)])
+        ranges = split_ranges(path, chunk_bytes=1000)
+        data = open(path, "rb").read()
+
+        assert len(ranges) > 5
+        assert ranges[0][0] == 0 and ranges[-1][1] == len(data)
+        assert all(a[1] == b[0] for a, b in zip(ranges, ranges[1:]))
+        assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+
+    def test_parse_range_matches_row_processing(self, tmp_path):
+        """测试分块解析拼接后与逐行 process_*_row 的结果一致，坏行计数跳过"""
+        rows = [make_type(i) for i in range(1, 120)]
+        path = write_jsonl(tmp_path / "types.jsonl", rows, broken_line=50)
+
+        records, errors = [], 0
+        for start, end in split_ranges(path, chunk_bytes=700):
+            chunk, chunk_errors = parse_range(path, start, end, "types")
+            records.extend(chunk["invTypes"])
+            errors += chunk_errors
+
+        assert records == expected_types(rows)
+        assert errors == 1
+
+    def test_parse_range_blueprints_fan_out(self, tmp_path):
+        """测试蓝图一行拆分到四张表"""
+        rows = [make_blueprint(1000), make_blueprint(2000)]
+        path = write_jsonl(tmp_path / "blueprints.jsonl", rows)
+
+        records, errors = parse_range(path, 0, len(open(path, "rb").read()), "blueprints")
+
+        assert errors == 0
+        assert records["industryBlueprints"] == [(1000, 10), (2000, 10)]
+        assert records["industryActivities"] == [(1000, 1, 600), (2000, 1, 600)]
+        assert records["industryActivityMaterials"][:2] == [(1000, 1, 34, 5), (1000, 1, 35, 2)]
+        assert records["industryActivityProducts"] == [
+            tuple(p.values()) for row in rows for p in process_blueprints_row(row)[3]
+        ]
+
+    def test_row_spec_aliases(self):
+        """测试文件名别名与通用表"""
+        assert get_row_spec("types") is ROW_SPECS["invTypes"]
+        assert get_row_spec("groups") is ROW_SPECS["invGroups"]
+        assert get_row_spec("_sde") is None
+
+
+class TestIterParsedChunks:
+    """并行产出测试类"""
+
+    @pytest.mark.asyncio
+    async def test_chunks_in_file_order(self, tmp_path):
+        """测试多线程并行解析时仍按文件顺序产出"""
+        rows = [make_type(i) for i in range(1, 300)]
+        path = write_jsonl(tmp_path / "types.jsonl", rows)
+
+        records = []
+        with ThreadPoolExecutor(4) as executor:
+            async for chunk, _ in iter_parsed_chunks(path, "types", executor, chunk_bytes=500, max_pending=3):
+                records.extend(chunk["invTypes"])
+
+        assert records == expected_types(rows)
+
+    @pytest.mark.asyncio
+    async def test_bounded_pending(self, tmp_path):
+        """测试在途块数量不超过 max_pending"""
+        path = write_jsonl(tmp_path / "types.jsonl", [make_type(i) for i in range(1, 300)])
+        executor = MagicMock()
+        submitted = []
+
+        async def fake_result(*args):
+            return {"invTypes": []}, 0
+
+        loop_patch = MagicMock()
+        loop_patch.run_in_executor.side_effect = lambda _executor, fn, *args: submitted.append(args) or fake_result()
+        with patch(f'{TARGET_MODULE_PATH}.asyncio.get_running_loop', return_value=loop_patch):
+            produced = 0
+            async for _ in iter_parsed_chunks(path, "types", executor, chunk_bytes=500, max_pending=3):
+                produced += 1
+                assert len(submitted) - produced <= 2
+
+        assert produced == len(submitted) > 3
+
+    @pytest.mark.asyncio
+    async def test_process_pool(self, tmp_path):
+        """测试在独立进程中解析"""
+        import multiprocessing
+
+        rows = [make_type(i) for i in range(1, 50)]
+        path = write_jsonl(tmp_path / "types.jsonl", rows)
+
+        records = []
+        with ProcessPoolExecutor(2, mp_context=multiprocessing.get_context("spawn")) as executor:
+            async for chunk, _ in iter_parsed_chunks(path, "types", executor, chunk_bytes=800):
+                records.extend(chunk["invTypes"])
+
+        assert records == expected_types(rows)
+
+
+class TestImportFileParallel:
+    """并行解析结果直接写入测试类"""
+
+    @pytest.mark.asyncio
+    async def test_records_copied_to_staging(self, tmp_path):
+        """测试解析出的元组不经字典直接 COPY 到影子表"""
+        from src_v2.model.EVE.sde.sde_builder.importer import SDEImporter
+
+        path = write_jsonl(tmp_path / "blueprints.jsonl", [make_blueprint(1000), make_blueprint(2000)])
+        importer = SDEImporter(MagicMock(), MagicMock())
+        importer.import_method = "copy"
+        importer.parse_chunk_bytes = 200
+        importer._load_targets = {"industryBlueprints": "industryBlueprints__staging"}
+
+        with patch.object(importer, "_copy_records", AsyncMock(return_value=True)) as mock_copy, \
+                ThreadPoolExecutor(2) as executor:
+            total = await importer.import_file_parallel(MagicMock(), path, "blueprints", executor)
+
+        assert total == 2 + 2 + 4 + 2
+        copied = [call.args[1:] for call in mock_copy.await_args_list]
+        assert ("industryBlueprints__staging", ["blueprintTypeID", "maxProductionLimit"], [(1000, 10)]) in copied
+        assert all(table != "industryBlueprints" for table, _, _ in copied)
@@ -0,0 +1,329 @@
+"""
+SDE 只读快照测试用例
+测试快照写入/映射往返、空值处理、稀疏 id 的二分查找、SdeUtils 优先读取快照以及批量查询
+"""
+import math
+
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src_v2.model.EVE.sde.sde_builder.snapshot import SdeSnapshot, list_snapshots, snapshot_path, write_snapshot
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.sde.utils'
+
+TABLES = {
+    "types": [
+        {"id": 34, "group_id": 18, "market_group_id": 1857, "meta_group_id": None,
+         "volume": 0.01, "packaged_volume": 0.01, "name_en": "Tritanium", "name_zh": "三钛合金"},
+        {"id": 587, "group_id": 25, "market_group_id": 61, "meta_group_id": 1,
+         "volume": 27289.0, "packaged_volume": 2500.0, "name_en": "Rifter", "name_zh": "裂谷级"},
+        {"id": 11379, "group_id": 25, "market_group_id": None, "meta_group_id": 2,
+         "volume": None, "packaged_volume": None, "name_en": "Wolf", "name_zh": None},
+    ],
+    "groups": [
+        {"id": 18, "category_id": 4, "name_en": "Mineral", "name_zh": "矿物"},
+        {"id": 25, "category_id": 6, "name_en": "Frigate", "name_zh": "护卫舰"},
+    ],
+    "categories": [
+        {"id": 4, "name_en": "Material", "name_zh": "材料"},
+        {"id": 6, "name_en": "Ship", "name_zh": "舰船"},
+    ],
+    "meta_groups": [
+        {"id": 1, "name_en": "Tech I", "name_zh": "一级科技"},
+        {"id": 2, "name_en": "Tech II", "name_zh": "二级科技"},
+    ],
+    "market_groups": [
+        {"id": 4, "parent_id": None, "name_en": "Ships", "name_zh": "舰船"},
+        {"id": 1361, "parent_id": 4, "name_en": "Frigates", "name_zh": "护卫舰"},
+        {"id": 61, "parent_id": 1361, "name_en": "Minmatar", "name_zh": "米玛塔尔"},
+    ],
+    "systems": [
+        {"id": 30000142, "region_id": 10000002, "x": 1.5, "y": None, "z": -3.0,
+         "name_en": "Jita", "name_zh": "吉他"},
+    ],
+    "regions": [
+        {"id": 10000002, "name_en": "The Forge", "name_zh": "伪造者"},
+    ],
+}
+
+
+@pytest.fixture
+def snapshot(tmp_path):
+    path = write_snapshot(snapshot_path(100, str(tmp_path)), 100, TABLES)
+    return SdeSnapshot(path)
+
+
+class TestSdeSnapshot:
+    """SdeSnapshot 测试类"""
+
+    def test_type_lookups(self, snapshot):
+        """测试物品名称、体积、组、类别与 meta 查询"""
+        assert snapshot.version == 100
+        assert snapshot.type_name(587) == "Rifter"
+        assert snapshot.type_name(587, zh=True) == "裂谷级"
+        assert snapshot.type_volume(587) == 27289.0
+        assert snapshot.type_volume(587, packaged=True) == 2500.0
+        assert snapshot.group_name(587, zh=True) == "护卫舰"
+        assert snapshot.category_name(34) == "Material"
+        assert snapshot.type_meta_name(11379) == "Tech II"
+        assert snapshot.meta_name(1, zh=True) == "一级科技"
+
+    def test_missing_and_null_values(self, snapshot):
+        """测试不存在的 id 与空值字段"""
+        assert snapshot.type_name(35) is None
+        assert snapshot.type_name(11379, zh=True) is None
+        assert snapshot.type_volume(11379) == 0.0
+        assert snapshot.type_volume(999999) == 0.0
+        assert snapshot.type_meta_name(34) is None
+        assert snapshot.group_name(-1) is None
+
+    def test_strings_are_interned(self, snapshot):
+        """测试相同字符串只存一份"""
+        types, groups = snapshot.tables["types"], snapshot.tables["groups"]
+        # 组名“护卫舰”与市场组名“护卫舰”共用同一个字符串编号
+        frigate = snapshot.tables["market_groups"]
+        assert groups["name_zh"][groups.row(25)] == frigate["name_zh"][frigate.row(1361)]
+        assert len(snapshot._string_offsets) - 1 < sum(len(rows) * 2 for rows in TABLES.values())
+        assert not types["id"].flags.writeable
+
+    def test_market_group_list(self, snapshot):
+        """测试市场组路径从根到物品"""
+        assert snapshot.market_group_list(587) == ["Ships", "Frigates", "Minmatar", "Rifter"]
+        assert snapshot.market_group_list(11379) == []
+
+    def test_system_info(self, snapshot):
+        """测试星系信息与所属星域"""
+        info = snapshot.system_info(30000142, zh=True)
+
+        assert info["system_name"] == "吉他"
+        assert info["region_name"] == "伪造者"
+        assert info["x"] == 1.5 and info["y"] is None and info["z"] == -3.0
+        assert snapshot.system_info(30000143) is None
+
+    def test_sparse_ids(self, tmp_path):
+        """测试 id 跨度过大时不生成稠密索引"""
+        tables = {"types": [{"id": 1, "name_en": "a"}, {"id": 50_000_000, "name_en": "b"}, {"id": 7, "name_en": "c"}]}
+        snap = SdeSnapshot(write_snapshot(str(tmp_path / "sde_1.snap"), 1, tables))
+
+        assert "@index" not in snap.tables["types"].columns
+        assert snap.type_name(50_000_000) == "b"
+        assert snap.type_name(7) == "c"
+        assert snap.type_name(8) is None
+        assert math.isnan(snap.tables["types"]["volume"][0])
+
+    def test_type_id_by_name(self, snapshot):
+        """测试名称反查 typeID"""
+        assert snapshot.type_id_by_name("Rifter") == 587
+        assert snapshot.type_id_by_name("三钛合金", zh=True) == 34
+        assert snapshot.type_id_by_name("三钛合金") is None
+
+    def test_open_latest(self, tmp_path):
+        """测试映射目录中版本号最大的快照"""
+        write_snapshot(snapshot_path(1, str(tmp_path)), 1, TABLES)
+        write_snapshot(snapshot_path(2, str(tmp_path)), 2, TABLES)
+        (tmp_path / "sde_3.snap").write_bytes(b"broken")
+
+        assert [version for version, _ in list_snapshots(str(tmp_path))] == [1, 2, 3]
+        assert SdeSnapshot.open_latest(str(tmp_path)).version == 2
+        assert SdeSnapshot.open_latest(str(tmp_path / "missing")) is None
+
+
+class TestSdeUtilsSnapshot:
+    """SdeUtils 快照优先查询测试类"""
+
+    @pytest.mark.asyncio
+    async def test_lookups_prefer_snapshot(self, snapshot):
+        """测试映射快照后不再访问数据库"""
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        with patch(f'{TARGET_MODULE_PATH}._snapshot', snapshot), \
+                patch(f'{TARGET_MODULE_PATH}.get_db_manager', new_callable=AsyncMock) as mock_db:
+            assert await SdeUtils.get_name_by_id(34) == "Tritanium"
+            assert await SdeUtils.get_cn_name_by_id(587) == "裂谷级"
+            assert await SdeUtils.get_volume_by_type_id(587) == 27289.0
+            assert await SdeUtils.get_invtype_packagedvolume_by_id(587) == 2500.0
+            assert await SdeUtils.get_groupname_by_id(34) == "Mineral"
+            assert await SdeUtils.get_category_by_id(587, zh=True) == "舰船"
+            assert await SdeUtils.get_metaname_by_typeid(587) == "Tech I"
+            assert await SdeUtils.get_id_by_name("裂谷级") == 587
+            assert await SdeUtils.get_market_group_list(587) == ["Ships", "Frigates", "Minmatar", "Rifter"]
+            assert (await SdeUtils.get_system_info_by_id(30000142))["region_id"] == 10000002
+
+        mock_db.assert_not_awaited()
+
+    def test_load_snapshot(self, tmp_path):
+        """测试启动时映射最新快照"""
+        from src_v2.model.EVE.sde import utils
+
+        write_snapshot(snapshot_path(7, str(tmp_path)), 7, TABLES)
+        with patch(f'{TARGET_MODULE_PATH}._snapshot', None), patch(f'{TARGET_MODULE_PATH}.logger'):
+            assert utils.SdeUtils.load_snapshot(str(tmp_path)).version == 7
+            assert utils._snapshot.type_name(34) == "Tritanium"
+            assert utils.SdeUtils.load_snapshot(str(tmp_path / "missing")) is None
+            assert utils._snapshot.version == 7
+
+
+class FakeResult(list):
+    def all(self):
+        return list(self)
+
+
+class FakeReadonlySession:
+    """记录执行语句的只读会话替身"""
+
+    def __init__(self, results):
+        self.results = list(results)
+        self.statements = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        return False
+
+    async def execute(self, stmt):
+        self.statements.append(stmt)
+        return FakeResult(self.results.pop(0))
+
+
+class TestSdeUtilsBatch:
+    """SdeUtils 批量查询测试类"""
+
+    @pytest.mark.asyncio
+    async def test_batch_from_snapshot(self, snapshot):
+        """测试批量接口从快照一次取回"""
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        with patch(f'{TARGET_MODULE_PATH}._snapshot', snapshot):
+            names = await SdeUtils.get_names_by_ids([34, 587, 35, 34], zh=True)
+            volumes = await SdeUtils.get_volumes([587, 11379, 35, 587], packaged=True)
+            rows = await SdeUtils.get_type_rows([587, 35])
+            paths = await SdeUtils.get_market_group_paths([587, 34], zh=True)
+            systems = await SdeUtils.get_system_infos([30000142, 1])
+
+        assert names == {34: "三钛合金", 587: "裂谷级", 35: None}
+        assert volumes.tolist() == [2500.0, 0.0, 0.0, 2500.0]
+        assert list(rows) == [587]
+        assert rows[587]["group_name_zh"] == "护卫舰"
+        assert rows[587]["category_name_en"] == "Ship"
+        assert rows[587]["meta_name_en"] == "Tech I"
+        assert paths == {587: ["舰船", "护卫舰", "米玛塔尔", "裂谷级"], 34: []}
+        assert systems[30000142]["system_name"] == "Jita" and systems[1] is None
+
+    @pytest.mark.asyncio
+    async def test_batch_from_database_uses_single_any_query(self):
+        """测试无快照时一次 = ANY(:ids) 查询取回全部物品"""
+        from sqlalchemy.dialects import postgresql
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        session = FakeReadonlySession([[(34, "Tritanium"), (587, "Rifter")]])
+        db_manager = AsyncMock()
+        db_manager.get_readonly_session = lambda: session
+        with patch(f'{TARGET_MODULE_PATH}._snapshot', None), \
+                patch(f'{TARGET_MODULE_PATH}.get_db_manager', AsyncMock(return_value=db_manager)):
+            names = await SdeUtils.get_names_by_ids([34, 587, 35])
+
+        assert names == {34: "Tritanium", 587: "Rifter", 35: None}
+        assert len(session.statements) == 1
+        assert "= ANY" in str(session.statements[0].compile(dialect=postgresql.dialect()))
+
+    @pytest.mark.asyncio
+    async def test_market_group_paths_from_database(self):
+        """测试无快照时市场组路径在内存中回溯父节点"""
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        session = FakeReadonlySession([
+            [(587, 61, "Rifter"), (34, None, "Tritanium")],
+            [(4, None, "Ships"), (1361, 4, "Frigates"), (61, 1361, "Minmatar")],
+        ])
+        db_manager = AsyncMock()
+        db_manager.get_readonly_session = lambda: session
+        with patch(f'{TARGET_MODULE_PATH}._snapshot', None), \
+                patch(f'{TARGET_MODULE_PATH}.get_db_manager', AsyncMock(return_value=db_manager)):
+            paths = await SdeUtils.get_market_group_paths([587, 34, 35])
+
+        assert paths == {587: ["Ships", "Frigates", "Minmatar", "Rifter"], 34: [], 35: []}
+
+
+class TestSdeUtilsChanges:
+    """SdeUtils 变更记录查询测试类"""
+
+    @pytest.mark.asyncio
+    async def test_get_changed_type_ids(self):
+        """测试汇总变更 typeID，区间内有整表替换时返回 None"""
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        session = FakeReadonlySession([
+            [("insert", [34]), ("update", [35, 34]), ("delete", None)],
+            [("insert", [34]), ("full", None)],
+        ])
+        db_manager = AsyncMock()
+        db_manager.get_readonly_session = lambda: session
+        with patch(f'{TARGET_MODULE_PATH}.get_db_manager', AsyncMock(return_value=db_manager)):
+            assert await SdeUtils.get_changed_type_ids(1) == {34, 35}
+            assert await SdeUtils.get_changed_type_ids(1) is None
+
+
+class TestMarketGroupClosure:
+    """市场组祖先关系测试类"""
+
+    def test_build_intervals_and_paths(self):
+        """测试 DFS 区间判断祖先与根到自身的路径"""
+        from src_v2.model.EVE.sde.sde_builder.snapshot import MarketGroupClosure
+
+        # 4 -> 1361 -> 61, 4 -> 9; 2 为另一棵树的根；7 <-> 8 成环不可达
+        closure = MarketGroupClosure.build([61, 4, 1361, 9, 2, 7, 8], [1361, -1, 4, 4, -1, 8, 7])
+
+        assert closure.contains(4, 61) and closure.contains(1361, 61) and closure.contains(61, 61)
+        assert not closure.contains(61, 4)
+        assert not closure.contains(9, 61)
+        assert not closure.contains(2, 61)
+        assert not closure.contains(7, 8) and not closure.contains(999, 61)
+        assert closure.path(61) == [4, 1361, 61]
+        assert closure.path(2) == [2]
+        assert closure.path(999) == []
+        tins = closure.tins([61, 9, 2, 999])
+        assert closure.contains_tins([1361, 2], tins).tolist() == [True, False, True, False]
+
+    def test_snapshot_membership(self, snapshot):
+        """测试快照中物品的市场组归属与预计算类别"""
+        assert snapshot.is_type_in_market_group(587, 4)
+        assert snapshot.is_type_in_market_group(587, 61)
+        assert not snapshot.is_type_in_market_group(34, 4)
+        assert not snapshot.is_type_in_market_group(11379, 4)
+        assert snapshot.types_in_market_groups([587, 34, 35, 11379], [1361]).tolist() == [True, False, False, False]
+        assert snapshot.type_ids_in_market_groups([4]).tolist() == [587]
+        assert snapshot.market_group_ids_by_name("护卫舰", zh=True) == [1361]
+        assert snapshot.tables["types"]["category_id"].tolist() == [4, 6, 6]
+
+    @pytest.mark.asyncio
+    async def test_sde_utils_membership(self, snapshot):
+        """测试 SdeUtils 祖先判断优先使用快照"""
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        with patch(f'{TARGET_MODULE_PATH}._snapshot', snapshot), \
+                patch(f'{TARGET_MODULE_PATH}.get_db_manager', new_callable=AsyncMock) as mock_db:
+            assert await SdeUtils.is_type_in_market_group(587, 4)
+            assert (await SdeUtils.filter_types_in_market_groups([34, 587], [4])).tolist() == [False, True]
+            assert await SdeUtils.get_market_group_ids_by_name("Frigates") == [1361]
+
+        mock_db.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_sde_utils_membership_from_database(self):
+        """测试无快照时整表构建祖先关系并一次查询物品的市场组"""
+        from src_v2.model.EVE.sde.utils import SdeUtils
+
+        session = FakeReadonlySession([
+            [(4, None), (1361, 4), (61, 1361), (9, 4)],
+            [(587, 61), (34, 1857)],
+        ])
+        db_manager = AsyncMock()
+        db_manager.get_readonly_session = lambda: session
+        with patch(f'{TARGET_MODULE_PATH}._snapshot', None), \
+                patch(f'{TARGET_MODULE_PATH}.get_db_manager', AsyncMock(return_value=db_manager)):
+            await SdeUtils._get_market_group_closure_db.cache.clear()
+            mask = await SdeUtils.filter_types_in_market_groups([587, 34, 35, 587], [1361])
+
+        assert mask.tolist() == [True, False, False, True]
+        assert len(session.statements) == 2
@@ -0,0 +1,139 @@
+"""
+工业星系成本指数表测试用例
+测试表构建、向量化查询、版本化发布与进程内缓存，以及拉取失败时保留当前表
+"""
+import importlib
+from contextlib import nullcontext
+
+import numpy as np
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from src_v2.core.config.config import config
+from src_v2.core.database.connect_manager import redis_manager
+from src_v2.model.EVE.industry import system_cost
+from src_v2.model.EVE.industry.system_cost import (
+    DEFAULT_SYSTEM_COST_INDEX,
+    SystemCostTable,
+    job_cost_factors,
+    load_system_cost_table,
+    publish_system_cost_table,
+)
+
+TARGET_MODULE_PATH = 'src_v2.model.EVE.industry.system_cost'
+
+PAYLOAD = [
+    {"solar_system_id": 30000142, "cost_indices": [
+        {"activity": "manufacturing", "cost_index": 0.05},
+        {"activity": "reaction", "cost_index": 0.01},
+    ]},
+    {"solar_system_id": 30000001, "cost_indices": [
+        {"activity": "manufacturing", "cost_index": 0.02},
+    ]},
+]
+
+
+@pytest.fixture
+def fake_redis():
+    fakeredis = pytest.importorskip("fakeredis")
+    fake = fakeredis.FakeAsyncRedis(decode_responses=True)
+    with patch.object(redis_manager, '_redis', fake), \
+            patch.object(system_cost, '_cached_table', None):
+        yield fake
+
+
+class TestSystemCostTable:
+    """SystemCostTable 测试类"""
+
+    def test_lookup(self):
+        """测试按星系/活动向量化查询，未知星系与活动使用默认指数"""
+        table = SystemCostTable.from_esi(PAYLOAD)
+
+        result = table.lookup([30000142, 30000001, 30000001, 1], ["manufacturing", "manufacturing", "reaction", "reaction"])
+
+        np.testing.assert_allclose(result, [0.05, 0.02, 0.0, DEFAULT_SYSTEM_COST_INDEX])
+        assert table.get(30000142) == {"manufacturing": 0.05, "reaction": 0.01}
+        assert table.get(1) == {}
+
+    def test_empty_table(self):
+        """测试空表全部返回默认指数"""
+        result = SystemCostTable.empty().lookup([30000142], "manufacturing")
+
+        assert result.tolist() == [DEFAULT_SYSTEM_COST_INDEX]
+
+    def test_dumps_loads(self):
+        """测试序列化往返"""
+        table = SystemCostTable.loads(SystemCostTable.from_esi(PAYLOAD, version=3).dumps())
+
+        assert table.version == 3
+        assert table.get(30000001)["manufacturing"] == 0.02
+
+    def test_job_cost_factors(self):
+        """测试安装费系数合并建筑加成与税"""
+        factors = job_cost_factors(np.array([0.05, 0.05]), np.array([0.05, 0.0]), np.array([0.04, 0.04]))
+
+        np.testing.assert_allclose(factors, [0.05 * 0.95 + 0.04, 0.09])
+
+
+class TestPublishAndLoad:
+    """发布与读取测试类"""
+
+    @pytest.mark.asyncio
+    async def test_publish_and_cached_load(self, fake_redis):
+        """测试发布后一次读取整表，版本不变时使用进程内缓存，新版本发布后重新读取"""
+        await publish_system_cost_table(PAYLOAD)
+        first = await load_system_cost_table()
+
+        original_get = fake_redis.get
+        keys = []
+
+        async def counting_get(key):
+            keys.append(key)
+            return await original_get(key)
+
+        with patch.object(fake_redis, 'get', counting_get):
+            again = await load_system_cost_table()
+        assert again is first
+        assert keys == ["system_cost_table:current"]
+
+        await publish_system_cost_table(PAYLOAD[:1])
+        second = await load_system_cost_table()
+        assert second.version == first.version + 1
+        assert second.get(30000001) == {}
+        assert await fake_redis.ttl(f"system_cost_table:v{first.version}") > 0
+
+
+@pytest.fixture(scope="module")
+def plan_operate():
+    """导入计划操作模块；导入链会读取 [EVE]、[ESI] 配置，缺少时临时补上空配置"""
+    missing = {section: {} for section in ("EVE", "ESI") if section not in config}
+    if "EVE" in missing:
+        missing["EVE"] = {"CLIENT_ID": ""}
+    with patch.dict(config._data, missing) if missing else nullcontext():
+        return importlib.import_module('src_v2.model.EVE.industry.plan_configflow_operate')
+
+
+class TestRefreshSystemCost:
+    """成本指数刷新测试类"""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("payload", [None, []])
+    async def test_failed_pull_keeps_table(self, fake_redis, plan_operate, payload):
+        """测试拉取失败时不覆盖当前表、不让旧版本过期，也不设置状态标记"""
+        await publish_system_cost_table(PAYLOAD)
+        with patch.object(plan_operate.eveesi, 'industry_systems', AsyncMock(return_value=payload)), \
+                patch.object(plan_operate, 'logger'):
+            await plan_operate.ConfigFlowOperateCenter.refresh_system_cost()
+
+        assert await fake_redis.get("system_cost_table:current") == "1"
+        assert await fake_redis.ttl("system_cost_table:v1") == -1
+        assert await fake_redis.get("system_cost_cache:status") is None
+        assert (await load_system_cost_table()).get(30000001) == {"manufacturing": 0.02, "reaction": 0.0}
+
+    @pytest.mark.asyncio
+    async def test_industry_systems_network_error_is_none(self):
+        """测试网络错误时 industry_systems 返回 None，短期结果缓存不会保存失败结果"""
+        from src_v2.model.EVE.eveesi.esi_api.industry import industry_systems
+
+        with patch('src_v2.model.EVE.eveesi.esi_api.industry.get_request_async', AsyncMock(return_value=([], 0, 0))):
+            assert await industry_systems.__wrapped__() is None